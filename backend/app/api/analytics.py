@@ -2,16 +2,23 @@
 Analytics API endpoints - aggregated metrics and insights
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.schemas.analytics import (
     AnalyticsSummaryResponse,
     TrendsResponse,
     ModelsResponse,
-    TopTracesResponse
+    ToolsResponse,
+    AgentsResponse,
+    CriticalPathResponse,
+    CompareResponse,
+    AnomaliesResponse,
+    TopTracesResponse,
+    DashboardResponse
 )
 from app.crud import analytics as analytics_crud
+from app.core.profile import to_folded, to_tree
 from typing import Optional, List
 from datetime import datetime
 import csv
@@ -152,22 +159,24 @@ def get_model_breakdown(
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
-@router.get("/top-traces", response_model=TopTracesResponse)
-def get_top_traces(
+@router.get("/tools", response_model=ToolsResponse)
+def get_tool_breakdown(
     time_range: str = Query("this_year", regex="^(last_24h|last_7d|last_30d|this_year|all_time|custom)$"),
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     project_ids: Optional[str] = None,
-    limit: int = Query(10, ge=1, le=100),
-    sort_by: str = Query("tokens", regex="^(tokens|cost|duration)$"),
+    limit: int = Query(50, ge=1, le=500),
+    sort_by: str = Query("total_time", regex="^(total_time|self_time|calls|errors|p99)$"),
     db: Session = Depends(get_db)
 ):
     """
-    Get top traces by usage
+    Get call counts, error rate, total/self time and latency percentiles per tool
+    
+    Served from the span rollups, so ranking across millions of calls is cheap.
     
     Query params:
-    - limit: Number of traces to return (1-100, default 10)
-    - sort_by: Sort field (tokens, cost, duration)
+    - limit: Number of tools to return (1-500, default 50)
+    - sort_by: Sort field (total_time, self_time, calls, errors, p99)
     """
     try:
         # Parse project IDs
@@ -182,7 +191,7 @@ def get_top_traces(
                 detail="start_date and end_date are required when time_range is 'custom'"
             )
         
-        traces = analytics_crud.get_top_traces(
+        tools = analytics_crud.get_tool_breakdown(
             db=db,
             time_range=time_range,
             start_date=start_date,
@@ -192,7 +201,7 @@ def get_top_traces(
             sort_by=sort_by
         )
         
-        return {"traces": traces}
+        return {"tools": tools}
     
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -200,17 +209,24 @@ def get_top_traces(
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
-@router.get("/export")
-def export_analytics(
-    format: str = Query("csv", regex="^(csv|json)$"),
+@router.get("/agents", response_model=AgentsResponse)
+def get_agent_breakdown(
     time_range: str = Query("this_year", regex="^(last_24h|last_7d|last_30d|this_year|all_time|custom)$"),
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     project_ids: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    sort_by: str = Query("total_time", regex="^(total_time|self_time|calls|errors|p99)$"),
     db: Session = Depends(get_db)
 ):
     """
-    Export analytics data in CSV or JSON format
+    Get call counts, error rate, total/self time and latency percentiles per agent
+    
+    Agents are the LLM spans the ADK wrapper records per agent ("<agent>:<AgentClass>").
+    
+    Query params:
+    - limit: Number of agents to return (1-500, default 50)
+    - sort_by: Sort field (total_time, self_time, calls, errors, p99)
     """
     try:
         # Parse project IDs
@@ -225,39 +241,407 @@ def export_analytics(
                 detail="start_date and end_date are required when time_range is 'custom'"
             )
         
-        # Get all data
-        summary = analytics_crud.get_analytics_summary(
+        agents = analytics_crud.get_agent_breakdown(
             db=db,
             time_range=time_range,
             start_date=start_date,
             end_date=end_date,
-            project_ids=project_id_list
+            project_ids=project_id_list,
+            limit=limit,
+            sort_by=sort_by
         )
         
-        trends_data, granularity = analytics_crud.get_analytics_trends(
+        return {"agents": agents}
+    
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.get("/critical-path", response_model=CriticalPathResponse)
+def get_critical_path_breakdown(
+    time_range: str = Query("this_year", regex="^(last_24h|last_7d|last_30d|this_year|all_time|custom)$"),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    project_ids: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    sort_by: str = Query("dominant", regex="^(dominant|time|traces)$"),
+    db: Session = Depends(get_db)
+):
+    """
+    Get the span names that most often dominate traces' critical paths
+    
+    The critical path of a trace is the chain of spans that determined when
+    it finished; parallel work off the path didn't add to its latency.
+    
+    Query params:
+    - limit: Number of span names to return (1-500, default 50)
+    - sort_by: dominant (traces where the name had the largest share of the
+      path), time (total time on the path) or traces (traces with it on the path)
+    """
+    try:
+        # Parse project IDs
+        project_id_list = None
+        if project_ids:
+            project_id_list = [pid.strip() for pid in project_ids.split(",")]
+        
+        # Validate custom date range
+        if time_range == "custom" and (not start_date or not end_date):
+            raise HTTPException(
+                status_code=400,
+                detail="start_date and end_date are required when time_range is 'custom'"
+            )
+        
+        span_names, trace_count = analytics_crud.get_critical_path_breakdown(
             db=db,
             time_range=time_range,
             start_date=start_date,
             end_date=end_date,
-            project_ids=project_id_list
+            project_ids=project_id_list,
+            limit=limit,
+            sort_by=sort_by
         )
         
-        models = analytics_crud.get_model_breakdown(
+        return {"trace_count": trace_count, "span_names": span_names}
+    
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.get("/flamegraph")
+def get_flamegraph(
+    time_range: str = Query("this_year", regex="^(last_24h|last_7d|last_30d|this_year|all_time|custom)$"),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    project_ids: Optional[str] = None,
+    family: Optional[str] = None,
+    tag: Optional[str] = None,
+    weight: str = Query("total", regex="^(total|self)$"),
+    format: str = Query("tree", regex="^(tree|folded)$"),
+    db: Session = Depends(get_db)
+):
+    """
+    Get one flame graph of the span trees of all matching traces
+    
+    Spans are merged by their path of span names from the root, so the
+    result covers any number of traces at the cost of the distinct paths.
+    
+    Query params:
+    - family: Only traces of this name family (trace names with ids and
+      numbers replaced by "*", e.g. "ResearchAgent_run_*")
+    - tag: Only traces with this tag
+    - weight: total (span durations) or self (time not spent in child spans)
+    - format: tree (d3-flame-graph JSON) or folded (collapsed stacks text, in ms)
+    """
+    try:
+        # Parse project IDs
+        project_id_list = None
+        if project_ids:
+            project_id_list = [pid.strip() for pid in project_ids.split(",")]
+        
+        # Validate custom date range
+        if time_range == "custom" and (not start_date or not end_date):
+            raise HTTPException(
+                status_code=400,
+                detail="start_date and end_date are required when time_range is 'custom'"
+            )
+        
+        result = analytics_crud.get_flamegraph(
             db=db,
             time_range=time_range,
             start_date=start_date,
             end_date=end_date,
-            project_ids=project_id_list
+            project_ids=project_id_list,
+            trace_family=family,
+            tag=tag,
+            weight=weight
         )
         
-        top_traces = analytics_crud.get_top_traces(
+        if format == "folded":
+            return PlainTextResponse(to_folded(result["stacks"]))
+        return {
+            "family": family,
+            "tag": tag,
+            "weight": weight,
+            "trace_count": result["trace_count"],
+            "span_count": result["span_count"],
+            "total_ms": result["total_ms"],
+            "flamegraph": to_tree(result["stacks"], root_name=family or "all traces")
+        }
+    
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.get("/compare", response_model=CompareResponse)
+def compare_cohorts(
+    time_range: str = Query("last_7d", regex="^(last_24h|last_7d|last_30d|this_year|all_time|custom)$"),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    project_ids: Optional[str] = None,
+    baseline_start: Optional[datetime] = None,
+    baseline_end: Optional[datetime] = None,
+    candidate_start: Optional[datetime] = None,
+    candidate_end: Optional[datetime] = None,
+    cohort: Optional[str] = None,
+    baseline: Optional[str] = None,
+    candidate: Optional[str] = None,
+    alpha: float = Query(0.01, gt=0, lt=1),
+    min_change_pct: float = Query(5.0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    top: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """
+    Compare two cohorts of traces per trace family, model and tool and flag regressions
+    
+    Cohorts are two time windows (baseline_start/_end and
+    candidate_start/_end), or the traces with two values of a cohort key in
+    the same time range (e.g. cohort=tag&baseline=v1.2&candidate=v1.3, or a
+    meta key from ANALYTICS_COHORT_META_KEYS such as cohort=release), or both.
+    
+    Query params:
+    - alpha: False discovery rate for significant shifts (default 0.01)
+    - min_change_pct: Smallest change counted as a regression (default 5%)
+    - limit: Number of trace families/models/tools to return
+    - top: Number of regressions to return, largest first
+    """
+    try:
+        # Parse project IDs
+        project_id_list = None
+        if project_ids:
+            project_id_list = [pid.strip() for pid in project_ids.split(",")]
+        
+        cohorts = []
+        for label, window_start, window_end, value in (
+            ("baseline", baseline_start, baseline_end, baseline),
+            ("candidate", candidate_start, candidate_end, candidate),
+        ):
+            if (window_start is None) != (window_end is None):
+                raise ValueError(f"{label}_start and {label}_end must be given together")
+            if cohort and not value:
+                raise ValueError(f"{label} is required when comparing by cohort")
+            if window_start is not None:
+                window = {"time_range": "custom", "start_date": window_start, "end_date": window_end}
+            elif time_range == "custom" and (not start_date or not end_date):
+                raise ValueError("start_date and end_date are required when time_range is 'custom'")
+            else:
+                window = {"time_range": time_range, "start_date": start_date, "end_date": end_date}
+            cohorts.append({**window, "cohort": cohort, "value": value if cohort else None})
+        if cohorts[0] == cohorts[1]:
+            raise ValueError("Give two time windows or a cohort key with two values to compare")
+        
+        return analytics_crud.compare_cohorts(
             db=db,
+            baseline=cohorts[0],
+            candidate=cohorts[1],
+            project_ids=project_id_list,
+            alpha=alpha,
+            min_change_pct=min_change_pct,
+            limit=limit,
+            top=top
+        )
+    
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.get("/anomalies", response_model=AnomaliesResponse)
+def get_anomalies(
+    time_range: str = Query("last_7d", regex="^(last_24h|last_7d|last_30d|this_year|all_time|custom)$"),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    project_ids: Optional[str] = None,
+    kind: Optional[str] = Query(None, regex="^(trace|model)$"),
+    name: Optional[str] = None,
+    metric: Optional[str] = Query(None, regex="^(error_rate|p95_duration_ms|avg_tokens|cost)$"),
+    direction: Optional[str] = Query(None, regex="^(up|down)$"),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    """
+    Get hours whose error rate, p95 latency, tokens per trace/call or spend
+    deviated from the baseline of their trace family or model
+    
+    Baselines are updated as traces are ingested: an hour is scored once
+    traces of a later hour arrive, so anomalies show up about an hour late at most.
+    
+    Query params:
+    - kind: trace (name = trace family) or model
+    - metric: error_rate, p95_duration_ms, avg_tokens or cost
+    - direction: up (above the baseline) or down
+    - limit: Number of anomalies to return, newest first
+    """
+    # Validated outside the try so it isn't turned into a 500 below
+    if time_range == "custom" and (not start_date or not end_date):
+        raise HTTPException(
+            status_code=400,
+            detail="start_date and end_date are required when time_range is 'custom'"
+        )
+    
+    try:
+        # Parse project IDs
+        project_id_list = None
+        if project_ids:
+            project_id_list = [pid.strip() for pid in project_ids.split(",")]
+        
+        anomalies = analytics_crud.get_anomalies(
+            db=db,
+            time_range=time_range,
+            start_date=start_date,
+            end_date=end_date,
+            project_ids=project_id_list,
+            kind=kind,
+            name=name,
+            metric=metric,
+            direction=direction,
+            limit=limit
+        )
+        
+        return {"anomalies": anomalies}
+    
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.get("/top-traces", response_model=TopTracesResponse)
+def get_top_traces(
+    time_range: str = Query("this_year", regex="^(last_24h|last_7d|last_30d|this_year|all_time|custom)$"),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    project_ids: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=100),
+    sort_by: str = Query("tokens", regex="^(tokens|cost|duration)$"),
+    db: Session = Depends(get_db)
+):
+    """
+    Get top traces by usage
+    
+    Query params:
+    - limit: Number of traces to return (1-100, default 10)
+    - sort_by: Sort field (tokens, cost, duration)
+    """
+    try:
+        # Parse project IDs
+        project_id_list = None
+        if project_ids:
+            project_id_list = [pid.strip() for pid in project_ids.split(",")]
+        
+        # Validate custom date range
+        if time_range == "custom" and (not start_date or not end_date):
+            raise HTTPException(
+                status_code=400,
+                detail="start_date and end_date are required when time_range is 'custom'"
+            )
+        
+        traces = analytics_crud.get_top_traces(
+            db=db,
+            time_range=time_range,
+            start_date=start_date,
+            end_date=end_date,
+            project_ids=project_id_list,
+            limit=limit,
+            sort_by=sort_by
+        )
+        
+        return {"traces": traces}
+    
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.get("/dashboard", response_model=DashboardResponse)
+def get_dashboard(
+    time_range: str = Query("this_year", regex="^(last_24h|last_7d|last_30d|this_year|all_time|custom)$"),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    project_ids: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=100),
+    sort_by: str = Query("tokens", regex="^(tokens|cost|duration)$")
+):
+    """
+    Get every dashboard panel in one response (summary, trends, models, top traces)
+    
+    Panel queries run concurrently on separate database connections.
+    Query params are those of the individual panel endpoints; limit and
+    sort_by apply to top traces.
+    """
+    try:
+        # Parse project IDs
+        project_id_list = None
+        if project_ids:
+            project_id_list = [pid.strip() for pid in project_ids.split(",")]
+        
+        # Validate custom date range
+        if time_range == "custom" and (not start_date or not end_date):
+            raise HTTPException(
+                status_code=400,
+                detail="start_date and end_date are required when time_range is 'custom'"
+            )
+        
+        return analytics_crud.get_dashboard(
+            time_range=time_range,
+            start_date=start_date,
+            end_date=end_date,
+            project_ids=project_id_list,
+            top_limit=limit,
+            sort_by=sort_by
+        )
+    
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.get("/export")
+def export_analytics(
+    format: str = Query("csv", regex="^(csv|json)$"),
+    time_range: str = Query("this_year", regex="^(last_24h|last_7d|last_30d|this_year|all_time|custom)$"),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    project_ids: Optional[str] = None
+):
+    """
+    Export analytics data in CSV or JSON format
+    """
+    try:
+        # Parse project IDs
+        project_id_list = None
+        if project_ids:
+            project_id_list = [pid.strip() for pid in project_ids.split(",")]
+        
+        # Validate custom date range
+        if time_range == "custom" and (not start_date or not end_date):
+            raise HTTPException(
+                status_code=400,
+                detail="start_date and end_date are required when time_range is 'custom'"
+            )
+        
+        # Get all data (panels run concurrently)
+        dashboard = analytics_crud.get_dashboard(
             time_range=time_range,
             start_date=start_date,
             end_date=end_date,
             project_ids=project_id_list,
-            limit=50
+            top_limit=50
         )
+        summary = dashboard["summary"]
+        trends_data = dashboard["trends"]["data"]
+        granularity = dashboard["trends"]["granularity"]
+        models = dashboard["models"]
+        top_traces = dashboard["top_traces"]
         
         # Generate timestamp for filename
         timestamp = datetime.utcnow().strftime("%Y-%m-%d_%H-%M-%S")
@@ -311,6 +695,8 @@ def export_analytics(
             writer.writerow(["Max Duration (ms)", summary["max_duration_ms"]])
             writer.writerow(["Total Duration (ms)", summary["total_duration_ms"]])
             writer.writerow(["Unique Projects", summary["unique_projects"]])
+            writer.writerow(["SDK Overhead (ms)", summary["total_sdk_overhead_ms"]])
+            writer.writerow(["Instrumentation Overhead (%)", summary["instrumentation_overhead_pct"]])
             writer.writerow([])
             
             # Model breakdown section
@@ -0,0 +1,114 @@
+"""
+What it does: OTLP/HTTP trace receiver (POST /v1/traces) - accepts spans from OpenTelemetry SDKs and collectors
+Feeds the same bulk ingest path as /traces/ingest/batch
+"""
+import json
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+from app.database import get_ingest_db
+from app.crud import project as project_crud
+from app.crud import ingest as ingest_crud
+from app.core.otlp import otlp_to_ingest
+from app.core.compression import GzipRoute
+from app.core.load_shedding import ingest_admission
+from app.config import settings
+
+try:
+    from google.protobuf.json_format import MessageToDict
+    from google.protobuf.message import DecodeError
+    from opentelemetry.proto.collector.trace.v1.trace_service_pb2 import (
+        ExportTraceServiceRequest, ExportTraceServiceResponse
+    )
+except ImportError:  # JSON-only without opentelemetry-proto
+    ExportTraceServiceRequest = None
+
+logger = logging.getLogger(__name__)
+limiter = Limiter(key_func=get_remote_address)
+
+router = APIRouter(tags=["otlp"], route_class=GzipRoute)
+
+PROTOBUF = "application/x-protobuf"
+
+
+def _api_key(request: Request) -> str:
+    """API key from x-agentops-api-key or Authorization: Bearer"""
+    api_key = request.headers.get("x-agentops-api-key")
+    if not api_key:
+        authorization = request.headers.get("Authorization", "")
+        if authorization.lower().startswith("bearer "):
+            api_key = authorization[7:].strip()
+    if not api_key:
+        raise HTTPException(status_code=401, detail="Missing API key (x-agentops-api-key or Authorization: Bearer)")
+    return api_key
+
+
+def _decode(body: bytes, content_type: str) -> tuple[dict, str]:
+    """Parse the request body; returns (request dict, id encoding)"""
+    if content_type == PROTOBUF:
+        if ExportTraceServiceRequest is None:
+            raise HTTPException(status_code=415, detail="Protobuf OTLP requires opentelemetry-proto; send application/json")
+        message = ExportTraceServiceRequest()
+        try:
+            message.ParseFromString(body)
+        except DecodeError:
+            raise HTTPException(status_code=400, detail="Invalid OTLP protobuf body")
+        return MessageToDict(message, use_integers_for_enums=True), "base64"
+    if content_type == "application/json":
+        try:
+            return json.loads(body), "hex"
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid OTLP JSON body")
+    raise HTTPException(status_code=415, detail=f"Unsupported content type {content_type!r}")
+
+
+def _export_response(content_type: str, rejected_spans: int, error_message: str) -> Response:
+    """ExportTraceServiceResponse in the request's encoding (partial_success only if something was rejected)"""
+    if content_type == PROTOBUF:
+        message = ExportTraceServiceResponse()
+        if rejected_spans:
+            message.partial_success.rejected_spans = rejected_spans
+            message.partial_success.error_message = error_message
+        return Response(content=message.SerializeToString(), media_type=PROTOBUF)
+    payload = {}
+    if rejected_spans:
+        payload["partialSuccess"] = {"rejectedSpans": str(rejected_spans), "errorMessage": error_message}
+    return Response(content=json.dumps(payload), media_type="application/json")
+
+
+def _ingest(db: Session, api_key: str, otlp_request: dict, id_encoding: str) -> tuple[int, int, list]:
+    project = project_crud.get_project_by_api_key(db, api_key)
+    if not project:
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    
+    items = otlp_to_ingest(otlp_request, api_key, id_encoding)
+    accepted, rejected = ingest_crud.ingest_batch(db, items, {api_key: project.id})
+    
+    spans_per_trace = {item.trace.trace_id: len(item.spans) + 1 for item in items}
+    rejected_spans = sum(spans_per_trace.get(r["trace_id"], 0) for r in rejected)
+    return len(accepted), rejected_spans, rejected
+
+
+@router.post("/v1/traces")
+@limiter.limit(f"{settings.RATE_LIMIT_PER_MINUTE}/minute")
+async def receive_otlp_traces(
+    request: Request,
+    _admitted: None = Depends(ingest_admission),
+    db: Session = Depends(get_ingest_db)
+):
+    """
+    OTLP/HTTP trace export (protobuf or JSON, optionally gzip-compressed)
+    Called by: SDK OTLP exporter (AGENTOPS_OTLP_ENDPOINT) or any OpenTelemetry collector
+    """
+    api_key = _api_key(request)
+    content_type = request.headers.get("Content-Type", "application/json").split(";")[0].strip().lower()
+    otlp_request, id_encoding = _decode(await request.body(), content_type)
+    
+    accepted, rejected_spans, rejected = await run_in_threadpool(_ingest, db, api_key, otlp_request, id_encoding)
+    
+    logger.info(f"OTLP: ingested {accepted} traces, rejected {len(rejected)}")
+    error_message = "; ".join(f"{r['trace_id']}: {r['error']}" for r in rejected[:5])
+    return _export_response(content_type, rejected_spans, error_message)
@@ -4,7 +4,7 @@ What it does: Project endpoints - create projects, list projects, get API keys
 from fastapi import APIRouter, Depends, HTTPException, Header
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.schemas.project import ProjectCreate, ProjectResponse
+from app.schemas.project import ProjectCreate, ProjectResponse, ProjectRetentionUpdate
 from app.crud import project as project_crud
 from app.core.security import decode_token
 from uuid import UUID
@@ -35,3 +35,16 @@ def list_projects(
 ):
     """List all user's projects"""
     return project_crud.get_user_projects(db, user_id)
+
+@router.put("/{project_id}/retention", response_model=ProjectResponse)
+def update_project_retention(
+    project_id: UUID,
+    update: ProjectRetentionUpdate,
+    db: Session = Depends(get_db),
+    user_id: UUID = Depends(get_current_user_id)
+):
+    """Set how many days of traces the project keeps (null = server default, 0 = forever)"""
+    project = project_crud.update_retention(db, project_id, user_id, update.retention_days)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return project
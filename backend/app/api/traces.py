@@ -2,30 +2,44 @@
 What it does: Trace endpoints - ingest data from SDK, get traces for dashboard
 """
 import logging
-from fastapi import APIRouter, Depends, HTTPException, Request
+from typing import Optional
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
 from slowapi import Limiter
 from slowapi.util import get_remote_address
-from app.database import get_db
-from app.schemas.trace import TraceIngest, TraceResponse
+from app.database import get_db, get_ingest_db
+from app.schemas.trace import TraceIngest, TraceBatchIngest, TraceResponse
 from app.crud import project as project_crud
 from app.crud import trace as trace_crud
+from app.crud import ingest as ingest_crud
+from app.crud import profile as profile_crud
+from app.crud import blob as blob_crud
+from app.core.profile import to_folded, to_tree
+from app.core.compression import GzipRoute
+from app.core.load_shedding import ingest_admission
 from app.config import settings
 
 logger = logging.getLogger(__name__)
 limiter = Limiter(key_func=get_remote_address)
 
-router = APIRouter(prefix="/traces", tags=["traces"])
+router = APIRouter(prefix="/traces", tags=["traces"], route_class=GzipRoute)
 
 
 @router.post("/ingest")
 @limiter.limit(f"{settings.RATE_LIMIT_PER_MINUTE}/minute")
-def ingest_trace(request: Request, data: TraceIngest, db: Session = Depends(get_db)):
+def ingest_trace(
+    request: Request,
+    data: TraceIngest,
+    _admitted: None = Depends(ingest_admission),
+    db: Session = Depends(get_ingest_db)
+):
     """
     Ingest trace data from SDK
     Called by: SDK when agent executes
     """
-    logger.info(f"Receiving trace ingest from {request.client.host}")
+    logger.debug(f"Receiving trace ingest from {request.client.host}")
     
     # Validate API key
     project = project_crud.get_project_by_api_key(db, data.api_key)
@@ -35,28 +49,40 @@ def ingest_trace(request: Request, data: TraceIngest, db: Session = Depends(get_
     
     logger.info(f"Ingesting trace {data.trace.trace_id} for project {project.id}")
     
-    # Create trace
-    trace = trace_crud.create_trace(db, project.id, data.trace)
-    
-    # Create spans
-    for span_data in data.spans:
-        span = trace_crud.create_span(db, span_data)
-        
-        # Create LLM call if exists
-        if span_data.span_id in data.llm_calls:
-            trace_crud.create_llm_call(db, span_data.span_id, data.llm_calls[span_data.span_id])
-        
-        # Create tool call if exists
-        if span_data.span_id in data.tool_calls:
-            trace_crud.create_tool_call(db, span_data.span_id, data.tool_calls[span_data.span_id])
-    
-    # Update trace metrics (sum tokens, costs)
-    trace_crud.update_trace_metrics(db, data.trace.trace_id)
+    # Save trace, spans, calls and profiles in one transaction
+    # (merged into the stored trace if this is another fragment of it)
+    try:
+        trace = ingest_crud.ingest_trace(db, project.id, data)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     
     logger.info(f"Successfully ingested trace {trace.trace_id}")
     return {"success": True, "trace_id": trace.trace_id}
 
 
+@router.post("/ingest/batch")
+@limiter.limit(f"{settings.RATE_LIMIT_PER_MINUTE}/minute")
+def ingest_trace_batch(
+    request: Request,
+    data: TraceBatchIngest,
+    _admitted: None = Depends(ingest_admission),
+    db: Session = Depends(get_ingest_db)
+):
+    """
+    Ingest a batch of traces in one transaction
+    Called by: agentops-collector, which batches traces from many SDK processes
+    
+    Traces with an invalid API key or a duplicate trace_id are rejected
+    individually; the rest of the batch is still saved.
+    """
+    accepted, rejected = ingest_crud.ingest_batch(db, data.traces)
+    
+    if rejected:
+        logger.warning(f"Rejected {len(rejected)} of {len(data.traces)} traces in batch from {request.client.host}")
+    logger.info(f"Ingested batch of {len(accepted)} traces")
+    return {"success": True, "accepted": len(accepted), "rejected": rejected}
+
+
 @router.get("/{project_id}", response_model=list[TraceResponse])
 def get_traces(project_id: str, skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
     """Get traces for project (for dashboard)"""
@@ -72,5 +98,90 @@ def get_trace_detail(trace_id: str, db: Session = Depends(get_db)):
     
     return {
         "trace": trace,
-        "spans": trace.spans
+        "spans": trace_crud.get_trace_spans(db, trace)
+    }
+
+
+@router.get("/detail/{trace_id}/blobs/{blob_hash}")
+def get_trace_blob(trace_id: str, blob_hash: str, db: Session = Depends(get_db)):
+    """
+    Large payload of a span, LLM call or tool call in this trace, loaded on demand
+    (the detail endpoint returns only its *_blob hash)
+    """
+    trace = trace_crud.get_trace_by_id(db, trace_id)
+    if not trace:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    
+    blob = blob_crud.get_trace_blob(db, trace, blob_hash)
+    if blob is None:
+        raise HTTPException(status_code=404, detail="Blob not found")
+    return blob
+
+
+def _render_flamegraph(stacks: dict, root_name: str, format: str, extra: dict):
+    """Return stacks (weighted in ms) as folded text or a d3-flame-graph tree"""
+    if format == "folded":
+        return PlainTextResponse(to_folded(stacks))
+    return {
+        **extra,
+        "total_ms": round(sum(stacks.values()), 3),
+        "flamegraph": to_tree(stacks, root_name=root_name)
     }
+
+
+@router.get("/detail/{trace_id}/flamegraph")
+def get_trace_flamegraph(
+    trace_id: str,
+    format: str = Query("tree", regex="^(tree|folded)$"),
+    db: Session = Depends(get_db)
+):
+    """Merged profiler flame graph for all spans of one trace"""
+    trace = trace_crud.get_trace_by_id(db, trace_id)
+    if not trace:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    
+    stacks = profile_crud.get_trace_profile(db, trace_id)
+    return _render_flamegraph(stacks, trace.name, format, {"trace_id": trace_id})
+
+
+@router.get("/profiles/flamegraph")
+def get_span_name_flamegraph(
+    span_name: str,
+    format: str = Query("tree", regex="^(tree|folded)$"),
+    time_range: str = Query("this_year", regex="^(last_24h|last_7d|last_30d|this_year|all_time|custom)$"),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    project_ids: Optional[str] = None,  # Comma-separated project IDs
+    limit: int = Query(1000, ge=1, le=10000),
+    db: Session = Depends(get_db)
+):
+    """
+    Merged profiler flame graph for every span with this name across traces
+    
+    Query params:
+    - span_name: Span name to merge (e.g. a tool name)
+    - format: tree (d3-flame-graph JSON) or folded (collapsed stacks text)
+    - limit: Maximum number of most recent profiled spans to merge
+    """
+    project_id_list = None
+    if project_ids:
+        project_id_list = [pid.strip() for pid in project_ids.split(",")]
+    
+    if time_range == "custom" and (not start_date or not end_date):
+        raise HTTPException(
+            status_code=400,
+            detail="start_date and end_date are required when time_range is 'custom'"
+        )
+    
+    stacks, trace_count = profile_crud.get_span_name_profile(
+        db=db,
+        span_name=span_name,
+        time_range=time_range,
+        start_date=start_date,
+        end_date=end_date,
+        project_ids=project_id_list,
+        limit=limit
+    )
+    return _render_flamegraph(
+        stacks, span_name, format, {"span_name": span_name, "trace_count": trace_count}
+    )
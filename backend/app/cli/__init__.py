@@ -0,0 +1,3 @@
+"""
+What it does: Command-line tools run with `python -m app.cli.<tool>`
+"""
@@ -0,0 +1,213 @@
+"""
+What it does: Bulk-loads trace files written by the SDK file exporter (or any JSONL of ingest payloads)
+
+Usage:
+    python -m app.cli.bulk_import /data/agentops-traces --workers 8
+
+Each line is one /traces/ingest payload. Files are loaded in parallel (one
+process per file) in batches using PostgreSQL COPY; a batch that conflicts with
+existing rows is retried through the regular ingest path, which skips
+duplicates. Progress is committed per batch and recorded in --state-dir, so
+an interrupted import resumes where it stopped when run again.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from uuid import UUID
+from pydantic import ValidationError
+from sqlalchemy.exc import DBAPIError
+from app.database import SessionLocal, engine
+from app.models.project import Project
+from app.schemas.trace import TraceIngest
+from app.crud import ingest as ingest_crud
+from app.core import analytics_cache
+
+logger = logging.getLogger("bulk_import")
+
+TRACE_FILE_SUFFIXES = (".jsonl", ".jsonl.gz")
+
+
+def find_files(paths: list[str]) -> list[str]:
+    """Expand directories into the trace files they contain (sorted, so oldest rotation first)"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in names if name.endswith(TRACE_FILE_SUFFIXES))
+        else:
+            files.append(path)
+    return sorted(set(files))
+
+
+class ImportState:
+    """Per-file progress ({"lines": n, "done": bool}) stored as one small JSON file per input"""
+
+    def __init__(self, state_dir: str):
+        self.state_dir = state_dir
+        os.makedirs(state_dir, exist_ok=True)
+
+    def _path(self, file_path: str) -> str:
+        key = hashlib.sha1(os.path.abspath(file_path).encode()).hexdigest()
+        return os.path.join(self.state_dir, f"{key}.json")
+
+    def load(self, file_path: str) -> dict:
+        try:
+            with open(self._path(file_path)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"lines": 0, "done": False}
+
+    def save(self, file_path: str, lines: int, done: bool = False):
+        path = self._path(file_path)
+        with open(path + ".tmp", "w") as f:
+            json.dump({"file": os.path.abspath(file_path), "lines": lines, "done": done}, f)
+        os.replace(path + ".tmp", path)
+
+
+def _open(file_path: str):
+    if file_path.endswith(".gz"):
+        return gzip.open(file_path, "rt", encoding="utf-8")
+    return open(file_path, encoding="utf-8")
+
+
+def _read_batches(file_path: str, skip: int, batch_size: int):
+    """Yield (lines_consumed_so_far, [TraceIngest]) after skipping already-imported lines"""
+    batch = []
+    line_no = 0
+    with _open(file_path) as f:
+        try:
+            for line_no, line in enumerate(f, start=1):
+                if line_no <= skip or not line.strip():
+                    continue
+                try:
+                    batch.append(TraceIngest.model_validate_json(line))
+                except ValidationError as e:
+                    logger.warning(f"{file_path}:{line_no}: invalid trace payload skipped ({e.error_count()} errors)")
+                if len(batch) >= batch_size:
+                    yield line_no, batch
+                    batch = []
+        except EOFError:
+            # Truncated gzip, e.g. a file the exporter never closed
+            logger.warning(f"{file_path}: truncated after line {line_no}, importing what was readable")
+    yield line_no, batch
+
+
+def _save_batch(db, batch: list[TraceIngest], project_ids: dict) -> tuple[int, int]:
+    """COPY a batch; on conflicts fall back to per-trace inserts. Returns (accepted, rejected)"""
+    try:
+        accepted, rejected = ingest_crud.copy_batch(db, batch, project_ids)
+        db.commit()
+        # Imports are mostly historical; drop cached results of these projects (shared cache only)
+        analytics_cache.invalidate({project_id: None for project_id in set(project_ids.values()) if project_id})
+    except (DBAPIError, engine.dialect.dbapi.Error) as e:
+        # Raw COPY raises driver errors directly; SQLAlchemy wraps the rest
+        db.rollback()
+        logger.debug(f"COPY failed ({getattr(e, 'orig', e)}), retrying batch with per-trace inserts")
+        accepted, rejected = ingest_crud.ingest_batch(db, batch, project_ids)
+    return len(accepted), len(rejected)
+
+
+def import_file(file_path: str, state_dir: str, batch_size: int, project_id: UUID | None) -> dict:
+    """Import one file (runs in a worker process)"""
+    state = ImportState(state_dir)
+    progress = state.load(file_path)
+    result = {"file": file_path, "accepted": 0, "rejected": 0, "skipped": progress["done"]}
+    if progress["done"]:
+        return result
+    
+    project_ids = {}
+    db = SessionLocal()
+    try:
+        for lines, batch in _read_batches(file_path, progress["lines"], batch_size):
+            if batch:
+                if project_id:
+                    project_ids = {item.api_key: project_id for item in batch}
+                else:
+                    ingest_crud.resolve_projects(db, batch, cache=project_ids)
+                accepted, rejected = _save_batch(db, batch, project_ids)
+                result["accepted"] += accepted
+                result["rejected"] += rejected
+            state.save(file_path, lines)
+        state.save(file_path, lines, done=True)
+    finally:
+        db.close()
+    return result
+
+
+def _init_worker():
+    # Connections inherited from the parent must not be shared across processes
+    engine.dispose(close=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.cli.bulk_import", description=__doc__.split("\n")[1])
+    parser.add_argument("paths", nargs="+", help="Trace files (.jsonl / .jsonl.gz) or directories containing them")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="Files imported in parallel")
+    parser.add_argument("--batch-size", type=int, default=500, help="Traces per COPY batch / commit")
+    parser.add_argument("--state-dir", default=".bulk_import_state", help="Where per-file progress is kept")
+    parser.add_argument("--project-id", type=UUID, help="Import everything into this project instead of resolving each payload's API key")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args(argv)
+    
+    logging.basicConfig(
+        level=getattr(logging, args.log_level.upper()),
+        format='[%(asctime)s] %(levelname)s in %(module)s: %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    
+    files = find_files(args.paths)
+    if not files:
+        logger.error("No trace files found")
+        return 1
+    if args.project_id:
+        db = SessionLocal()
+        try:
+            project = db.get(Project, args.project_id)
+        finally:
+            db.close()
+        if project is None:
+            logger.error(f"Project {args.project_id} not found")
+            return 1
+    
+    logger.info(f"Importing {len(files)} files with {args.workers} workers")
+    started = time.monotonic()
+    totals = {"accepted": 0, "rejected": 0, "files": 0, "failed": 0}
+    
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker) as pool:
+        futures = {
+            pool.submit(import_file, path, args.state_dir, args.batch_size, args.project_id): path
+            for path in files
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                totals["failed"] += 1
+                logger.error(f"❌ {path}: {e} (progress saved, re-run to resume)")
+                continue
+            totals["files"] += 1
+            totals["accepted"] += result["accepted"]
+            totals["rejected"] += result["rejected"]
+            if result["skipped"]:
+                logger.info(f"{path}: already imported")
+            else:
+                logger.info(f"✅ {path}: {result['accepted']} traces imported, {result['rejected']} rejected")
+    
+    elapsed = time.monotonic() - started
+    rate = totals["accepted"] / elapsed if elapsed else 0
+    logger.info(
+        f"Done: {totals['accepted']} traces from {totals['files']} files in {elapsed:.1f}s "
+        f"({rate:.0f} traces/s), {totals['rejected']} rejected, {totals['failed']} files failed"
+    )
+    return 1 if totals["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
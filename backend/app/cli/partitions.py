@@ -0,0 +1,43 @@
+"""
+What it does: Runs time-partition maintenance once (create upcoming partitions, apply retention, collect orphans)
+
+Usage:
+    python -m app.cli.partitions            # e.g. from cron
+    python -m app.cli.partitions --list     # show partitions per table
+
+The API server also does this every PARTITION_MAINTENANCE_MINUTES; running it
+from cron keeps partitions ahead when the server is down or scaled to zero.
+"""
+import argparse
+import logging
+import sys
+from app.database import engine
+from app.core import partitions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Maintain time partitions of the telemetry tables")
+    parser.add_argument("--list", action="store_true", help="list partitions instead of maintaining them")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    
+    if args.list:
+        with engine.connect() as conn:
+            for table in partitions.PARTITIONED_TABLES:
+                for name, start, end in partitions.list_partitions(conn, table):
+                    print(f"{table}\t{name}\t{start:%Y-%m-%d} .. {end:%Y-%m-%d}")
+        return 0
+    
+    result = partitions.maintain(engine)
+    if result is None:
+        print("Partition maintenance is already running in another process")
+        return 1
+    print(f"✅ Created {len(result['partitions_created'])} partitions, dropped {len(result['partitions_dropped'])}, "
+          f"deleted {result['traces_deleted']} expired traces, "
+          f"{result['orphans_deleted']['blobs']} unreferenced blobs and "
+          f"{result['orphans_deleted']['prompt_segments']} prompt segments")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -20,6 +20,54 @@ class Settings(BaseSettings):
     # Rate Limiting
     RATE_LIMIT_PER_MINUTE: int = 100
     
+    # Database connection pool
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    
+    # Ingest load shedding (503 + Retry-After when overloaded)
+    INGEST_MAX_INFLIGHT: int = 64
+    INGEST_TARGET_POOL_WAIT_MS: float = 250.0
+    
+    # Large payloads (prompts, responses, span/tool inputs and outputs) go to a
+    # content-addressed store: "postgres" (blobs table) or "filesystem" (BLOB_DIR)
+    BLOB_STORE: str = "postgres"
+    BLOB_DIR: str = "./blobs"
+    BLOB_MIN_BYTES: int = 4096
+    
+    # traces/spans/llm_calls/tool_calls are range-partitioned on start_time:
+    # "day" or "week" partitions, created PARTITION_PREMAKE intervals ahead
+    PARTITION_INTERVAL: str = "week"
+    PARTITION_PREMAKE: int = 4
+    PARTITION_MAINTENANCE_MINUTES: int = 60
+    # Days of traces kept for projects without their own retention (0 = forever)
+    RETENTION_DAYS: int = 0
+    # Blobs and prompt segments no row references are deleted by maintenance once unused
+    # for ORPHAN_GC_GRACE_HOURS, at most ORPHAN_GC_BATCH of each per run
+    ORPHAN_GC_GRACE_HOURS: int = 24
+    ORPHAN_GC_BATCH: int = 10000
+    
+    # Analytics result cache: in-process, or shared by all workers in Redis when REDIS_URL is set.
+    # Ranges ending more than ANALYTICS_CACHE_SETTLE_MINUTES ago are cached until late data arrives
+    ANALYTICS_CACHE_ENABLED: bool = True
+    REDIS_URL: str = ""
+    ANALYTICS_CACHE_TTL_SECONDS: int = 300
+    ANALYTICS_CACHE_SNAP_SECONDS: int = 60
+    ANALYTICS_CACHE_SETTLE_MINUTES: int = 60
+    # Expiry of closed ranges in the in-process cache, which other workers' ingests can't invalidate
+    ANALYTICS_CACHE_LOCAL_HISTORY_TTL_SECONDS: int = 3600
+    ANALYTICS_CACHE_MAX_ENTRIES: int = 1024
+    # Threads (each with its own pooled connection) running dashboard panel queries
+    ANALYTICS_PANEL_WORKERS: int = 8
+    # Comma-separated trace meta keys (string values) that analytics can compare cohorts by, besides tags
+    ANALYTICS_COHORT_META_KEYS: str = "release,version"
+    # Anomaly detection on hourly metrics per trace family and model: EWMA weight of a new hour,
+    # |z-score| that is an anomaly, hours learned before flagging and traces/calls an hour needs for rates
+    ANALYTICS_ANOMALY_ENABLED: bool = True
+    ANALYTICS_ANOMALY_ALPHA: float = 0.1
+    ANALYTICS_ANOMALY_THRESHOLD: float = 4.0
+    ANALYTICS_ANOMALY_WARMUP_HOURS: int = 24
+    ANALYTICS_ANOMALY_MIN_COUNT: int = 10
+    
     # Logging
     LOG_LEVEL: str = "INFO"
     
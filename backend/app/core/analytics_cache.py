@@ -0,0 +1,266 @@
+"""
+What it does: Caches analytics results, invalidated by per-project generation counters that ingest bumps
+
+Entries are keyed by the normalized filters (exact custom range, or the clock
+snapped for relative ranges, sorted project ids, extra arguments) plus the current generations of the projects
+they cover. Ingest bumps a project's "live" generation on every commit, and
+its "history" generation as well when it changed data older than
+ANALYTICS_CACHE_SETTLE_MINUTES. Ranges that ended before that horizon only
+depend on history generations and are cached without expiry; open ranges
+depend on live generations and expire after ANALYTICS_CACHE_TTL_SECONDS.
+Nothing is deleted on invalidation - old keys are simply never read again.
+
+Backends: in-process LRU (default) or Redis (REDIS_URL), shared by all workers.
+The in-process cache only sees invalidations from its own worker, so there
+closed ranges also expire, after ANALYTICS_CACHE_LOCAL_HISTORY_TTL_SECONDS.
+"""
+import inspect
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+from uuid import UUID
+from app.config import settings
+
+try:
+    import redis
+except ImportError:  # local cache only
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "agentops:analytics:"
+
+# Generation scope for queries over all projects
+ALL_PROJECTS = "*"
+
+
+class LocalCache:
+    """In-process LRU with per-entry expiry (also the stand-in for Redis in tests)"""
+
+    # Other workers' invalidations don't reach it
+    shared = False
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._counters = {}
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, ttl_seconds: int | None = None):
+        expires_at = time.monotonic() + ttl_seconds if ttl_seconds else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_counters(self, keys: list[str]) -> list[int]:
+        with self._lock:
+            return [self._counters.get(key, 0) for key in keys]
+
+    def incr(self, keys: list[str]):
+        with self._lock:
+            for key in keys:
+                self._counters[key] = self._counters.get(key, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._counters.clear()
+
+
+class RedisCache:
+    """Entries and counters in Redis; values are pickled"""
+
+    shared = True
+
+    def __init__(self, url: str):
+        self.client = redis.Redis.from_url(url, socket_timeout=1.0, socket_connect_timeout=1.0)
+
+    def get(self, key: str):
+        data = self.client.get(key)
+        return pickle.loads(data) if data is not None else None
+
+    def set(self, key: str, value, ttl_seconds: int | None = None):
+        self.client.set(key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), ex=ttl_seconds or None)
+
+    def get_counters(self, keys: list[str]) -> list[int]:
+        return [int(value or 0) for value in self.client.mget(keys)]
+
+    def incr(self, keys: list[str]):
+        pipeline = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipeline.incr(key)
+        pipeline.execute()
+
+    def clear(self):
+        for key in self.client.scan_iter(f"{KEY_PREFIX}*"):
+            self.client.delete(key)
+
+
+def _create_backend():
+    if settings.REDIS_URL:
+        if redis is None:
+            logger.warning("⚠️ REDIS_URL is set but the redis package is missing; using the in-process analytics cache")
+        else:
+            logger.info("✅ Caching analytics in Redis")
+            return RedisCache(settings.REDIS_URL)
+    return LocalCache(settings.ANALYTICS_CACHE_MAX_ENTRIES)
+
+
+backend = _create_backend()
+
+
+def _generation_key(scope: str, kind: str) -> str:
+    return f"{KEY_PREFIX}gen:{scope}:{kind}"
+
+
+def _settle_horizon(now: datetime) -> datetime:
+    return now - timedelta(minutes=settings.ANALYTICS_CACHE_SETTLE_MINUTES)
+
+
+def _exact(moment: datetime | None) -> str:
+    """Time as part of a key, as naive UTC to the microsecond"""
+    if moment is None:
+        return "-"
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment.isoformat()
+
+
+def _snap(moment: datetime | None) -> str:
+    """Time as part of a key, snapped down to ANALYTICS_CACHE_SNAP_SECONDS"""
+    if moment is None:
+        return "-"
+    seconds = max(settings.ANALYTICS_CACHE_SNAP_SECONDS, 1)
+    timestamp = moment.timestamp() if moment.tzinfo else (moment - datetime(1970, 1, 1)).total_seconds()
+    return str(int(timestamp // seconds * seconds))
+
+
+def _scopes(project_ids: list | None) -> list[str]:
+    """Sorted, normalized project ids; [ALL_PROJECTS] when not filtering (or ids are invalid, as in the queries)"""
+    if not project_ids:
+        return [ALL_PROJECTS]
+    try:
+        return sorted({str(UUID(str(pid).strip())) for pid in project_ids})
+    except ValueError:
+        return [ALL_PROJECTS]
+
+
+def _is_closed(time_range: str, end_date: datetime | None, now: datetime) -> bool:
+    """Whether the range ended before the settle horizon (only late data can still change it)"""
+    if time_range != "custom" or end_date is None:
+        return False
+    if end_date.tzinfo is not None:
+        end_date = end_date.astimezone(timezone.utc).replace(tzinfo=None)
+    return end_date < _settle_horizon(now)
+
+
+def cache_key(name: str, time_range: str, start_date: datetime | None, end_date: datetime | None,
+              project_ids: list | None, extra: dict | None = None, now: datetime | None = None) -> tuple[str, bool]:
+    """(key, closed) for a query, including the generations it depends on"""
+    now = now or datetime.utcnow()
+    closed = _is_closed(time_range, end_date, now)
+    scopes = _scopes(project_ids)
+    kind = "history" if closed else "live"
+    generations = backend.get_counters(
+        [_generation_key("epoch", "all")] + [_generation_key(scope, kind) for scope in scopes]
+    )
+    if time_range == "custom":
+        # Custom ranges are queried as given, so only identical ranges share results
+        window = f"{_exact(start_date)}-{_exact(end_date)}"
+    else:
+        # Relative ranges slide with the clock
+        window = _snap(now)
+    arguments = ",".join(f"{key}={value}" for key, value in sorted((extra or {}).items()))
+    key = (
+        f"{KEY_PREFIX}{name}:{time_range}:{window}:{','.join(scopes)}:{arguments}:"
+        f"{'.'.join(str(generation) for generation in generations)}"
+    )
+    return key, closed
+
+
+def invalidate(changes: dict, now: datetime | None = None):
+    """
+    Bump generations after a commit. changes maps project_id -> oldest time
+    its data changed at (None = unknown, treated as historical).
+    """
+    if not changes:
+        return
+    horizon = _settle_horizon(now or datetime.utcnow())
+    keys = set()
+    for project_id, oldest in changes.items():
+        kinds = ["live"] if oldest is not None and oldest >= horizon else ["live", "history"]
+        for scope in (str(project_id), ALL_PROJECTS):
+            keys.update(_generation_key(scope, kind) for kind in kinds)
+    try:
+        backend.incr(sorted(keys))
+    except Exception as e:
+        logger.warning(f"⚠️ Could not invalidate analytics cache: {e}")
+
+
+def invalidate_all():
+    """Drop every cached result (e.g. after retention deleted data)"""
+    try:
+        backend.incr([_generation_key("epoch", "all")])
+    except Exception as e:
+        logger.warning(f"⚠️ Could not invalidate analytics cache: {e}")
+
+
+def cached(name: str):
+    """
+    Cache an analytics CRUD function taking (db, time_range, start_date,
+    end_date, project_ids, ...); other arguments become part of the key.
+    Cached results are shared, so callers must not modify them.
+    """
+    def decorator(function):
+        signature = inspect.signature(function)
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not settings.ANALYTICS_CACHE_ENABLED:
+                return function(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = dict(bound.arguments)
+            arguments.pop("db")
+            try:
+                key, closed = cache_key(
+                    name, arguments.pop("time_range"), arguments.pop("start_date"),
+                    arguments.pop("end_date"), arguments.pop("project_ids"), arguments
+                )
+                result = backend.get(key)
+            except Exception as e:
+                logger.warning(f"⚠️ Analytics cache unavailable: {e}")
+                return function(*args, **kwargs)
+            if result is not None:
+                return result
+
+            result = function(*args, **kwargs)
+            if not closed:
+                ttl_seconds = settings.ANALYTICS_CACHE_TTL_SECONDS
+            else:
+                ttl_seconds = None if backend.shared else settings.ANALYTICS_CACHE_LOCAL_HISTORY_TTL_SECONDS
+            try:
+                backend.set(key, result, ttl_seconds)
+            except Exception as e:
+                logger.warning(f"⚠️ Could not cache analytics result: {e}")
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,113 @@
+"""
+What it does: Streaming anomaly detection on hourly error rate, p95 latency, tokens and spend
+
+Each series (project, "trace" + trace family or "model" + model name) keeps a
+baseline per metric: an EWMA level, hour-of-day offsets (so daily traffic
+cycles aren't anomalies) and an EWMA variance of what remains. Ingest closes
+an hour of a series when it sees the series' first trace of a later hour; the
+closed hour is read from the cohort rollups (all traces), scored against the
+baseline and then folded into it. So the cost per ingested trace is constant
+and no per-trace state is written. Hours without traces leave the baseline
+alone, and hours with fewer than ANALYTICS_ANOMALY_MIN_COUNT traces/calls
+only update spend.
+"""
+import math
+from datetime import datetime, timedelta
+from app.config import settings
+from app.core import sketch
+from app.core.rollups import ALL_TRACES, truncate
+
+# Cohort row kinds with baselines: trace families and models
+KINDS = ("trace", "model")
+# error rate, p95 latency and tokens per trace/call over the hour, and its spend
+METRICS = ["error_rate", "p95_duration_ms", "avg_tokens", "cost"]
+# Smallest standard deviation used for scoring: a fraction of the expected value, and per metric
+# (so a baseline that never varied doesn't flag every change)
+MIN_RELATIVE_STDDEV = 0.05
+MIN_STDDEV = {"error_rate": 0.01, "p95_duration_ms": 1.0, "avg_tokens": 1.0, "cost": 0.0001}
+# Closed hours read at once for a series that was idle (older ones are skipped)
+MAX_CATCH_UP_HOURS = 48
+
+
+def series_hours(delta, now: datetime | None = None) -> dict:
+    """
+    (project_id, kind, name) -> latest hour with traces in a RollupDelta,
+    ignoring hours after the current one (clock skew)
+    """
+    limit = truncate(now or datetime.utcnow(), "hour")
+    hours = {}
+    for (project_id, hour, dimension, value, kind, name), row in delta.cohorts.items():
+        if (dimension, value) != ALL_TRACES or kind not in KINDS or row["count"] <= 0 or hour > limit:
+            continue
+        key = (project_id, kind, name)
+        if key not in hours or hour > hours[key]:
+            hours[key] = hour
+    return hours
+
+
+def hour_metrics(row) -> dict:
+    """Metric values of one hourly cohort row; rate metrics only with enough traces/calls"""
+    values = {"cost": float(row.cost_sum or 0.0)}
+    if row.count >= settings.ANALYTICS_ANOMALY_MIN_COUNT:
+        values["error_rate"] = row.error_count / row.count
+        values["avg_tokens"] = float(row.tokens_sum or 0) / row.count
+    if row.duration_count >= settings.ANALYTICS_ANOMALY_MIN_COUNT:
+        values["p95_duration_ms"] = sketch.quantile(row.duration_sketch, 0.95)
+    return {metric: value for metric, value in values.items() if value is not None}
+
+
+def _expected(baseline: dict, hour_of_day: int) -> float:
+    return baseline["level"] + baseline["season"][hour_of_day]
+
+
+def _stddev(metric: str, baseline: dict, expected: float, count: int) -> float:
+    stddev = max(math.sqrt(baseline["variance"]), MIN_RELATIVE_STDDEV * abs(expected), MIN_STDDEV[metric])
+    if metric == "error_rate":
+        # Sampling noise of a rate over `count` traces (with one error added, so a few errors
+        # in a quiet hour of a series that hardly ever fails aren't an anomaly)
+        rate = (min(max(expected, 0.0), 1.0) * count + 1) / (count + 2)
+        stddev = max(stddev, math.sqrt(rate * (1 - rate) / count))
+    return stddev
+
+
+def _update(baseline: dict, value: float, hour_of_day: int, alpha: float):
+    """Fold one hourly value into a baseline (additive Holt-Winters without trend)"""
+    residual = value - _expected(baseline, hour_of_day)
+    baseline["variance"] = (1 - alpha) * (baseline["variance"] + alpha * residual * residual)
+    baseline["level"] += alpha * (value - baseline["season"][hour_of_day] - baseline["level"])
+    baseline["season"][hour_of_day] += alpha * (value - baseline["level"] - baseline["season"][hour_of_day])
+    baseline["hours"] += 1
+
+
+def observe_hour(state: dict, hour: datetime, row) -> list:
+    """
+    Score a closed hour's cohort row against a series' baselines (state:
+    metric -> baseline, updated in place) and fold it in.
+    Returns [{metric, observed, expected, stddev, z_score, sample_count}] of the anomalous metrics.
+    """
+    alpha = settings.ANALYTICS_ANOMALY_ALPHA
+    threshold = settings.ANALYTICS_ANOMALY_THRESHOLD
+    hour_of_day = hour.hour
+    found = []
+    for metric, value in hour_metrics(row).items():
+        baseline = state.get(metric)
+        if baseline is None:
+            state[metric] = {"level": value, "variance": 0.0, "season": [0.0] * 24, "hours": 1}
+            continue
+        expected = _expected(baseline, hour_of_day)
+        stddev = _stddev(metric, baseline, expected, row.count)
+        z_score = (value - expected) / stddev
+        if baseline["hours"] >= settings.ANALYTICS_ANOMALY_WARMUP_HOURS and abs(z_score) >= threshold:
+            found.append({
+                "metric": metric, "observed": value, "expected": expected, "stddev": stddev,
+                "z_score": z_score, "sample_count": int(row.count),
+            })
+            # An outlier moves the baseline no further than the threshold, so one spike isn't the new normal
+            value = expected + math.copysign(threshold * stddev, z_score)
+        _update(baseline, value, hour_of_day, alpha)
+    return found
+
+
+def catch_up_start(current_hour: datetime, hour: datetime) -> datetime:
+    """First closed hour to read when a series moves from current_hour to hour"""
+    return max(current_hour, hour - timedelta(hours=MAX_CATCH_UP_HOURS))
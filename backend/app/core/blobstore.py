@@ -0,0 +1,179 @@
+"""
+What it does: Content-addressed blob storage (sha256 key, zlib-compressed, deduplicated)
+Backends: a Postgres side table (default) or a local directory (BLOB_STORE=filesystem)
+"""
+import os
+import hashlib
+import logging
+import tempfile
+import zlib
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Stored blobs (and prompt segments) an ingest reuses get their last-used stamp
+# refreshed once it is older than this; orphan collection waits far longer
+# (ORPHAN_GC_GRACE_HOURS), so anything an in-flight ingest relies on survives
+LAST_USED_REFRESH = timedelta(hours=1)
+
+
+def blob_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class PostgresBlobStore:
+    """Blobs in the `blobs` table, written in the caller's transaction"""
+
+    def put_many(self, db: Session, blobs: dict):
+        from app.models.blob import Blob
+        
+        if not blobs:
+            return
+        now = datetime.utcnow()
+        # Touch reused blobs before inserting: the update waits for a collection deleting
+        # one of them, which the insert then restores
+        db.query(Blob).filter(
+            Blob.hash.in_(sorted(blobs)),
+            Blob.last_used_at < now - LAST_USED_REFRESH
+        ).update({Blob.last_used_at: now}, synchronize_session=False)
+        rows = []
+        for digest, data in sorted(blobs.items()):
+            stored = zlib.compress(data, 6)
+            rows.append({
+                "hash": digest, "data": stored, "size": len(data), "stored_size": len(stored),
+                "last_used_at": now,
+            })
+        db.execute(insert(Blob).values(rows).on_conflict_do_nothing())
+
+    def get(self, db: Session, digest: str) -> bytes | None:
+        from app.models.blob import Blob
+        
+        row = db.get(Blob, digest)
+        return zlib.decompress(row.data) if row else None
+
+    def delete_orphans(self, conn, referenced, cutoff: datetime, limit: int) -> int:
+        """
+        Delete up to limit blobs unused since cutoff that no row references;
+        referenced(hash_sql) is the SQL condition that a row references hash_sql
+        """
+        # last_used_at is checked again on the deleted row, so a blob an ingest touches meanwhile stays
+        return conn.execute(text(
+            "DELETE FROM blobs WHERE last_used_at < :cutoff AND hash IN ("
+            "SELECT b.hash FROM blobs b WHERE b.last_used_at < :cutoff "
+            f"AND NOT ({referenced('b.hash')}) LIMIT :limit)"
+        ), {"cutoff": cutoff, "limit": limit}).rowcount
+
+
+class FilesystemBlobStore:
+    """
+    Blobs as files under root/ab/cd/<sha256>. Writes are atomic (temp file +
+    rename); a rolled-back ingest only leaves unreferenced blobs behind.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def put_many(self, db: Session, blobs: dict):
+        refresh_before = datetime.now(timezone.utc).timestamp() - LAST_USED_REFRESH.total_seconds()
+        for digest, data in blobs.items():
+            path = self._path(digest)
+            try:
+                # The file's mtime is its last-used stamp
+                if os.stat(path).st_mtime < refresh_before:
+                    os.utime(path)
+                continue
+            except FileNotFoundError:
+                # New, or being collected: write it (again)
+                pass
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(zlib.compress(data, 6))
+                os.replace(tmp_path, path)
+            except OSError:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+
+    def get(self, db: Session, digest: str) -> bytes | None:
+        try:
+            with open(self._path(digest), "rb") as f:
+                return zlib.decompress(f.read())
+        except FileNotFoundError:
+            return None
+
+    def _stale_digests(self, cutoff: float):
+        """Digests of blob files not modified since cutoff (epoch seconds)"""
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(directory, name)
+                try:
+                    if name.endswith(".gc"):
+                        # Left behind by an interrupted collection
+                        os.unlink(path)
+                    elif len(name) == 64 and os.stat(path).st_mtime < cutoff:
+                        yield name
+                except FileNotFoundError:
+                    continue
+
+    def _delete_if_stale(self, digest: str, cutoff: float) -> bool:
+        """
+        Delete a blob file unless an ingest touched it. It is renamed away first,
+        so a concurrent ingest either touched it before (and it is put back) or
+        finds it missing and writes it again.
+        """
+        path = self._path(digest)
+        graveyard = path + ".gc"
+        try:
+            os.replace(path, graveyard)
+            if os.stat(graveyard).st_mtime >= cutoff:
+                os.replace(graveyard, path)
+                return False
+            os.unlink(graveyard)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def delete_orphans(self, conn, referenced, cutoff: datetime, limit: int, chunk_size: int = 1000) -> int:
+        """Delete up to limit blob files unused since cutoff that no row references (see PostgresBlobStore)"""
+        stale_before = cutoff.replace(tzinfo=timezone.utc).timestamp()
+        deleted = 0
+        chunk = []
+        digests = self._stale_digests(stale_before)
+        while deleted < limit:
+            digest = next(digests, None)
+            if digest is not None:
+                chunk.append(digest)
+                if len(chunk) < chunk_size:
+                    continue
+            if not chunk:
+                break
+            used = set(conn.execute(
+                text(f"SELECT h FROM unnest(CAST(:hashes AS text[])) AS h WHERE {referenced('h')}"),
+                {"hashes": chunk}
+            ).scalars())
+            for orphan in chunk:
+                if orphan not in used and deleted < limit and self._delete_if_stale(orphan, stale_before):
+                    deleted += 1
+            chunk = []
+        return deleted
+
+
+def _create_blob_store():
+    if settings.BLOB_STORE == "filesystem":
+        logger.info(f"✅ Storing large payloads under {settings.BLOB_DIR}")
+        return FilesystemBlobStore(settings.BLOB_DIR)
+    if settings.BLOB_STORE != "postgres":
+        raise ValueError(f"Unknown BLOB_STORE {settings.BLOB_STORE!r}, expected 'postgres' or 'filesystem'")
+    return PostgresBlobStore()
+
+
+blob_store = _create_blob_store()
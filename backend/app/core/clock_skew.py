@@ -0,0 +1,48 @@
+"""
+What it does: Clock-skew correction for trace fragments recorded on different hosts
+Same rule as Jaeger's adjuster: a child span that doesn't fit inside its remote
+parent is shifted so it sits centered in the parent, splitting the unaccounted
+time evenly between request and response latency
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+
+def skew_adjustment(
+    parent_start: datetime,
+    parent_end: datetime | None,
+    child_start: datetime,
+    child_end: datetime | None
+) -> timedelta:
+    """
+    Offset to add to a remote child span (and everything recorded on its host)
+    Zero when the child already fits inside the parent or can't be placed
+    """
+    if parent_end is None or child_end is None:
+        return timedelta(0)
+    if parent_start <= child_start and child_end <= parent_end:
+        return timedelta(0)
+    parent_duration = parent_end - parent_start
+    child_duration = child_end - child_start
+    if child_duration > parent_duration:
+        # Child longer than its parent: the clocks disagree on more than offset
+        return timedelta(0)
+    latency = (parent_duration - child_duration) / 2
+    return parent_start + latency - child_start
+
+
+def subtree(root_id: str, spans_by_parent: dict) -> list:
+    """root_id's span ids and all of its descendants"""
+    ids = [root_id]
+    for span_id in ids:
+        ids.extend(spans_by_parent.get(span_id, []))
+    return ids
+
+
+def index_children(spans) -> dict:
+    """parent_span_id -> [span_id] for objects with span_id/parent_span_id"""
+    children = defaultdict(list)
+    for span in spans:
+        if span.parent_span_id:
+            children[span.parent_span_id].append(span.span_id)
+    return children
@@ -0,0 +1,46 @@
+# What it does: Accepts gzip-compressed request bodies sent by the SDK
+
+import zlib
+from typing import Callable
+from fastapi import HTTPException, Request, Response
+from fastapi.routing import APIRoute
+
+# Decompressed bodies larger than this are rejected (guards against gzip bombs)
+MAX_DECOMPRESSED_BYTES = 50 * 1024 * 1024  # 50 MB
+
+
+def decompress_gzip(body: bytes, max_size: int = MAX_DECOMPRESSED_BYTES) -> bytes:
+    """Inflate a gzip body, refusing to expand beyond max_size"""
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        data = decompressor.decompress(body, max_size)
+    except zlib.error:
+        raise HTTPException(status_code=400, detail="Invalid gzip request body")
+    if decompressor.unconsumed_tail:
+        raise HTTPException(status_code=413, detail="Decompressed request body too large")
+    return data
+
+
+class GzipRequest(Request):
+    """Request whose body() transparently decompresses gzip payloads"""
+
+    async def body(self) -> bytes:
+        if not hasattr(self, "_body"):
+            body = await super().body()
+            if "gzip" in self.headers.getlist("Content-Encoding"):
+                body = decompress_gzip(body)
+            self._body = body
+        return self._body
+
+
+class GzipRoute(APIRoute):
+    """Route class for routers that accept compressed SDK payloads"""
+
+    def get_route_handler(self) -> Callable:
+        original_route_handler = super().get_route_handler()
+
+        async def custom_route_handler(request: Request) -> Response:
+            request = GzipRequest(request.scope, request.receive)
+            return await original_route_handler(request)
+
+        return custom_route_handler
@@ -0,0 +1,107 @@
+# What it does: Sheds ingest load early (503 + Retry-After) when the DB pool or ingest buffer is saturated
+
+import math
+import random
+import threading
+import time
+from fastapi import HTTPException
+from app.config import settings
+
+
+class IngestLoadShedder:
+    """
+    Admission control for ingest endpoints.
+
+    Tracks two overload signals:
+    - in-flight ingest requests (requests admitted but not finished, including
+      those still waiting for a worker thread)
+    - DB pool checkout wait, as an EWMA that decays while no samples arrive
+
+    Requests over max_inflight are always rejected. When the pool wait EWMA is
+    above target, requests are rejected with a probability proportional to the
+    overage so the backend sheds just enough load instead of oscillating.
+    """
+
+    def __init__(self, max_inflight=64, target_pool_wait_ms=250.0, ewma_alpha=0.2,
+                 ewma_half_life_s=5.0, max_shed_probability=0.95, max_retry_after_s=30):
+        self.max_inflight = max_inflight
+        self.target_pool_wait_ms = target_pool_wait_ms
+        self.ewma_alpha = ewma_alpha
+        self.ewma_half_life_s = ewma_half_life_s
+        self.max_shed_probability = max_shed_probability
+        self.max_retry_after_s = max_retry_after_s
+
+        self._lock = threading.Lock()
+        self._inflight = 0
+        self._pool_wait_ms = 0.0
+        self._pool_wait_at = time.monotonic()
+        self.shed_count = 0
+
+    def pool_wait_ms(self) -> float:
+        """Current pool wait EWMA, decayed by time since the last sample"""
+        with self._lock:
+            return self._decayed_wait()
+
+    def _decayed_wait(self) -> float:
+        elapsed = time.monotonic() - self._pool_wait_at
+        return self._pool_wait_ms * 0.5 ** (elapsed / self.ewma_half_life_s)
+
+    def record_pool_wait(self, wait_ms: float):
+        with self._lock:
+            current = self._decayed_wait()
+            self._pool_wait_ms = current + self.ewma_alpha * (wait_ms - current)
+            self._pool_wait_at = time.monotonic()
+
+    def retry_after(self, pool_wait_ms: float) -> int:
+        """Seconds clients should wait, growing with the observed overload"""
+        pressure = max(self._inflight / self.max_inflight, pool_wait_ms / self.target_pool_wait_ms)
+        return max(1, min(self.max_retry_after_s, math.ceil(pressure)))
+
+    def admit(self):
+        """Reserve an in-flight slot or raise 503 with Retry-After"""
+        with self._lock:
+            pool_wait_ms = self._decayed_wait()
+            shed = self._inflight >= self.max_inflight
+            if not shed and pool_wait_ms > self.target_pool_wait_ms:
+                overage = (pool_wait_ms - self.target_pool_wait_ms) / self.target_pool_wait_ms
+                shed = random.random() < min(self.max_shed_probability, overage)
+            if shed:
+                self.shed_count += 1
+                raise HTTPException(
+                    status_code=503,
+                    detail="Ingest overloaded, retry later",
+                    headers={"Retry-After": str(self.retry_after(pool_wait_ms))}
+                )
+            self._inflight += 1
+
+    def release(self):
+        with self._lock:
+            self._inflight -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "inflight": self._inflight,
+                "max_inflight": self.max_inflight,
+                "pool_wait_ms": round(self._decayed_wait(), 3),
+                "target_pool_wait_ms": self.target_pool_wait_ms,
+                "shed_count": self.shed_count,
+            }
+
+
+ingest_shedder = IngestLoadShedder(
+    max_inflight=settings.INGEST_MAX_INFLIGHT,
+    target_pool_wait_ms=settings.INGEST_TARGET_POOL_WAIT_MS
+)
+
+
+async def ingest_admission():
+    """
+    Dependency for ingest routes. Async so it runs on the event loop as soon as
+    the request arrives, counting requests still queued for a worker thread.
+    """
+    ingest_shedder.admit()
+    try:
+        yield
+    finally:
+        ingest_shedder.release()
@@ -0,0 +1,230 @@
+"""
+What it does: Converts OTLP trace export requests into AgentOps ingest payloads
+Understands the GenAI semantic conventions and the agentops.* attributes written by the SDK's OTLP exporter
+"""
+import base64
+import json
+from collections import defaultdict
+from datetime import datetime, timedelta
+from app.schemas.trace import TraceIngest, TraceCreate, SpanCreate, LLMCallData, ToolCallData
+
+STATUS_CODE_ERROR = 2
+
+# SDK span type for each gen_ai.operation.name
+SPAN_TYPES = {
+    "chat": "llm_call",
+    "text_completion": "llm_call",
+    "generate_content": "llm_call",
+    "execute_tool": "tool_call",
+    "invoke_agent": "agent_step",
+    "create_agent": "agent_step",
+}
+
+# Attributes mapped onto dedicated fields instead of being kept in span meta
+_MAPPED_PREFIXES = ("agentops.", "gen_ai.")
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def from_otlp_trace_id(hex_id: str) -> str:
+    """Inverse of the SDK's to_otlp_trace_id: zero-padded ids map back to trace_<16 hex>"""
+    if hex_id.startswith("0" * 16):
+        return f"trace_{hex_id[16:]}"
+    return f"trace_{hex_id}"
+
+
+def from_otlp_span_id(hex_id: str) -> str:
+    return f"span_{hex_id}"
+
+
+def _hex_id(value: str | None, id_encoding: str) -> str:
+    """OTLP/JSON carries ids as hex; protobuf decoded with MessageToDict gives base64"""
+    if not value:
+        return ""
+    if id_encoding == "base64":
+        return base64.b64decode(value).hex()
+    return value.lower()
+
+
+def _timestamp(nanos) -> datetime | None:
+    nanos = int(nanos or 0)
+    if not nanos:
+        return None
+    return _EPOCH + timedelta(microseconds=nanos // 1000)
+
+
+def _value(any_value: dict):
+    """OTLP AnyValue -> Python value"""
+    if "stringValue" in any_value:
+        return any_value["stringValue"]
+    if "boolValue" in any_value:
+        return any_value["boolValue"]
+    if "intValue" in any_value:
+        return int(any_value["intValue"])
+    if "doubleValue" in any_value:
+        return float(any_value["doubleValue"])
+    if "arrayValue" in any_value:
+        return [_value(v) for v in any_value["arrayValue"].get("values", [])]
+    if "kvlistValue" in any_value:
+        return _attributes(any_value["kvlistValue"].get("values", []))
+    if "bytesValue" in any_value:
+        return any_value["bytesValue"]
+    return None
+
+
+def _attributes(key_values: list) -> dict:
+    return {kv["key"]: _value(kv.get("value", {})) for kv in key_values}
+
+
+def _json_attr(value, default=None):
+    """Structured values are exported as JSON strings"""
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    return default if value is None else value
+
+
+def _as_dict(value, key: str) -> dict:
+    value = _json_attr(value, {})
+    return value if isinstance(value, dict) else {key: value}
+
+
+def _llm_call(attrs: dict) -> LLMCallData | None:
+    if not any(key in attrs for key in ("gen_ai.request.model", "gen_ai.response.model", "gen_ai.usage.input_tokens")):
+        return None
+    return LLMCallData(
+        model_name=attrs.get("gen_ai.request.model") or attrs.get("gen_ai.response.model") or "unknown",
+        provider=attrs.get("gen_ai.system") or attrs.get("gen_ai.provider.name") or "unknown",
+        input_tokens=int(attrs.get("gen_ai.usage.input_tokens") or 0),
+        output_tokens=int(attrs.get("gen_ai.usage.output_tokens") or 0),
+        prompt=attrs.get("gen_ai.prompt"),
+        response=attrs.get("gen_ai.completion")
+    )
+
+
+def _tool_call(attrs: dict) -> ToolCallData | None:
+    if "gen_ai.tool.name" not in attrs:
+        return None
+    return ToolCallData(
+        tool_name=attrs["gen_ai.tool.name"],
+        tool_inputs=_as_dict(attrs.get("gen_ai.tool.call.arguments"), "arguments"),
+        tool_outputs=_as_dict(attrs.get("gen_ai.tool.call.result"), "result"),
+        error=attrs.get("agentops.tool.error")
+    )
+
+
+def _span_type(attrs: dict) -> str:
+    if attrs.get("agentops.span.type"):
+        return attrs["agentops.span.type"]
+    return SPAN_TYPES.get(attrs.get("gen_ai.operation.name"), "agent_step")
+
+
+def _build_trace(api_key: str, trace_hex: str, spans: list, resource: dict) -> TraceIngest:
+    """One TraceIngest from all OTLP spans sharing a trace id"""
+    root = next((span for span in spans if span["attrs"].get("agentops.trace.root")), None)
+    root_hex = root["span_id"] if root else None
+    span_ids = {span["span_id"] for span in spans}
+
+    span_models = []
+    llm_calls = {}
+    tool_calls = {}
+    for span in spans:
+        if span is root:
+            continue
+        attrs = span["attrs"]
+        parent_hex = span["parent_id"]
+        span_id = from_otlp_span_id(span["span_id"])
+
+        meta = _as_dict(attrs.get("agentops.span.meta"), "meta")
+        foreign = {key: value for key, value in attrs.items() if not key.startswith(_MAPPED_PREFIXES)}
+        if foreign:
+            meta["otel.attributes"] = foreign
+
+        status = span["status"]
+        error = None
+        if status.get("code") == STATUS_CODE_ERROR:
+            error = status.get("message") or "error"
+
+        span_models.append(SpanCreate(
+            span_id=span_id,
+            trace_id="",  # filled in below
+            parent_span_id=from_otlp_span_id(parent_hex) if parent_hex and parent_hex != root_hex else None,
+            name=span["name"],
+            type=_span_type(attrs),
+            start_time=span["start"],
+            end_time=span["end"],
+            inputs=_as_dict(attrs.get("agentops.span.inputs"), "inputs"),
+            outputs=_as_dict(attrs.get("agentops.span.outputs"), "outputs"),
+            meta=meta,
+            error=error
+        ))
+        llm_call = _llm_call(attrs)
+        if llm_call:
+            llm_calls[span_id] = llm_call
+        tool_call = _tool_call(attrs)
+        if tool_call:
+            tool_calls[span_id] = tool_call
+
+    if root:
+        attrs = root["attrs"]
+        trace = TraceCreate(
+            trace_id=attrs.get("agentops.trace.id") or from_otlp_trace_id(trace_hex),
+            name=root["name"],
+            start_time=root["start"],
+            end_time=root["end"],
+            meta=_as_dict(attrs.get("agentops.trace.meta"), "meta"),
+            tags=list(attrs.get("agentops.trace.tags") or [])
+        )
+    else:
+        # Spans from other OpenTelemetry sources: derive the trace from its top-level span
+        top = [span for span in spans if not span["parent_id"] or span["parent_id"] not in span_ids]
+        first = min(top or spans, key=lambda span: span["start"])
+        ends = [span["end"] for span in spans if span["end"]]
+        trace = TraceCreate(
+            trace_id=from_otlp_trace_id(trace_hex),
+            name=first["name"],
+            start_time=min(span["start"] for span in spans),
+            end_time=max(ends) if ends else None,
+            meta={"source": "otlp", "otel.resource": resource, "fragment_host": resource.get("host.name")},
+            tags=["otlp"]
+        )
+
+    for span_model in span_models:
+        span_model.trace_id = trace.trace_id
+    return TraceIngest(api_key=api_key, trace=trace, spans=span_models, llm_calls=llm_calls, tool_calls=tool_calls)
+
+
+def otlp_to_ingest(request: dict, api_key: str, id_encoding: str = "hex") -> list[TraceIngest]:
+    """
+    Convert an ExportTraceServiceRequest (OTLP/JSON field names) into one
+    TraceIngest per trace id. id_encoding is "hex" for OTLP/JSON bodies and
+    "base64" for protobuf messages converted with MessageToDict.
+    """
+    by_trace = defaultdict(list)
+    resources = {}
+
+    for resource_spans in request.get("resourceSpans", []):
+        resource = _attributes(resource_spans.get("resource", {}).get("attributes", []))
+        for scope_spans in resource_spans.get("scopeSpans", []):
+            for span in scope_spans.get("spans", []):
+                start = _timestamp(span.get("startTimeUnixNano"))
+                if start is None:
+                    continue
+                trace_hex = _hex_id(span.get("traceId"), id_encoding)
+                resources.setdefault(trace_hex, resource)
+                by_trace[trace_hex].append({
+                    "span_id": _hex_id(span.get("spanId"), id_encoding),
+                    "parent_id": _hex_id(span.get("parentSpanId"), id_encoding),
+                    "name": span.get("name", ""),
+                    "start": start,
+                    "end": _timestamp(span.get("endTimeUnixNano")),
+                    "status": span.get("status", {}),
+                    "attrs": _attributes(span.get("attributes", [])),
+                })
+
+    return [
+        _build_trace(api_key, trace_hex, spans, resources[trace_hex])
+        for trace_hex, spans in by_trace.items()
+    ]
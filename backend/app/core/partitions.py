@@ -0,0 +1,281 @@
+"""
+What it does: Maintains time partitions of the telemetry tables and enforces retention by dropping them
+traces, spans, llm_calls and tool_calls are range-partitioned on start_time (daily or weekly);
+future partitions are created ahead of time and expired ones are dropped instead of DELETEd
+Blobs and prompt segments that nothing references after retention are collected afterwards
+"""
+import re
+import logging
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from app.config import settings
+from app.core import analytics_cache
+from app.core.blobstore import blob_store
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_TABLES = ["traces", "spans", "llm_calls", "tool_calls"]
+
+# Spans of a trace start after it, give or take clock-skew correction; lookups of a
+# trace's spans/calls bound start_time by the trace's start minus this so they can be pruned
+PARTITION_SLACK = timedelta(hours=1)
+
+# Columns holding blob store references (see app.crud.blob.OFFLOADED)
+BLOB_REFERENCES = [
+    ("spans", "inputs_blob"), ("spans", "outputs_blob"),
+    ("llm_calls", "prompt_blob"), ("llm_calls", "response_blob"),
+    ("tool_calls", "tool_inputs_blob"), ("tool_calls", "tool_outputs_blob"),
+]
+
+# pg_try_advisory_lock key so only one worker maintains partitions at a time
+MAINTENANCE_LOCK_ID = 0x6167656E74706172
+
+_BOUND_RE = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def interval_start(moment: datetime, interval: str = None) -> datetime:
+    """Start of the partition interval ("day", or "week" starting Monday) containing moment"""
+    interval = interval or settings.PARTITION_INTERVAL
+    day = datetime(moment.year, moment.month, moment.day)
+    if interval == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def next_interval(start: datetime, interval: str = None) -> datetime:
+    interval = interval or settings.PARTITION_INTERVAL
+    return start + timedelta(days=7 if interval == "week" else 1)
+
+
+def partition_name(table: str, start: datetime) -> str:
+    return f"{table}_p{start:%Y%m%d}"
+
+
+def default_partition_name(table: str) -> str:
+    return f"{table}_default"
+
+
+def list_partitions(conn, table: str) -> list[tuple[str, datetime, datetime]]:
+    """(name, start, end) of a table's range partitions, oldest first (the default partition is left out)"""
+    rows = conn.execute(text(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = CAST(:table AS regclass)"
+    ), {"table": table}).all()
+    partitions = []
+    for name, bound in rows:
+        match = _BOUND_RE.search(bound or "")
+        if match:
+            partitions.append((name, datetime.fromisoformat(match.group(1)), datetime.fromisoformat(match.group(2))))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def is_partitioned(conn, table: str) -> bool:
+    return conn.execute(
+        text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:table)"), {"table": table}
+    ).scalar() or False
+
+
+def create_partitions(conn, table: str, start: datetime, end: datetime, interval: str = None) -> list[str]:
+    """
+    Create the missing partitions covering [start, end). Ranges overlapping an
+    existing partition are skipped, so changing PARTITION_INTERVAL later only
+    affects new partitions. Returns the names created.
+    """
+    existing = list_partitions(conn, table)
+    created = []
+    current = interval_start(start, interval)
+    while current < end:
+        upper = next_interval(current, interval)
+        if not any(current < p_end and p_start < upper for _, p_start, p_end in existing):
+            name = partition_name(table, current)
+            try:
+                with conn.begin_nested():
+                    conn.execute(text(
+                        f"CREATE TABLE {name} PARTITION OF {table} "
+                        f"FOR VALUES FROM ('{current.isoformat()}') TO ('{upper.isoformat()}')"
+                    ))
+                created.append(name)
+            except Exception as e:
+                # Rows for this range already sit in the default partition
+                logger.warning(f"⚠️ Could not create partition {name}: {e}")
+        current = upper
+    return created
+
+
+def ensure_default_partition(conn, table: str):
+    """Catch-all partition for rows outside every range (e.g. backfills older than the first partition)"""
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {default_partition_name(table)} PARTITION OF {table} DEFAULT"))
+
+
+def ensure_partitions(conn, now: datetime | None = None) -> list[str]:
+    """
+    Partitions from the previous interval (late-arriving traces) through
+    PARTITION_PREMAKE intervals ahead, for every table
+    """
+    now = now or datetime.utcnow()
+    current = interval_start(now)
+    start = interval_start(current - timedelta(days=1))
+    end = current
+    for _ in range(settings.PARTITION_PREMAKE + 1):
+        end = next_interval(end)
+    created = []
+    for table in PARTITIONED_TABLES:
+        if is_partitioned(conn, table):
+            ensure_default_partition(conn, table)
+            created += create_partitions(conn, table, start, end)
+    return created
+
+
+def _retention_days(conn) -> dict:
+    """project_id -> retention in days (0 = keep forever)"""
+    rows = conn.execute(text("SELECT id, retention_days FROM projects")).all()
+    return {
+        project_id: days if days is not None else settings.RETENTION_DAYS
+        for project_id, days in rows
+    }
+
+
+def drop_expired_partitions(conn, before: datetime) -> list[str]:
+    """Drop partitions whose whole range ends at or before `before`"""
+    dropped = []
+    for table in PARTITIONED_TABLES:
+        for name, _, end in list_partitions(conn, table):
+            if end > before:
+                break
+            if table == "traces":
+                # Profiles aren't partitioned; remove the ones belonging to these traces first
+                conn.execute(text(
+                    f"DELETE FROM span_profiles USING {name} t WHERE span_profiles.trace_id = t.trace_id"
+                ))
+            conn.execute(text(f"DROP TABLE {name}"))
+            dropped.append(name)
+        if table == "traces":
+            conn.execute(text(
+                f"DELETE FROM span_profiles USING {default_partition_name(table)} t "
+                f"WHERE span_profiles.trace_id = t.trace_id AND t.start_time < :before"
+            ), {"before": before})
+        # Out-of-range rows that landed in the default partition expire the same way
+        conn.execute(text(f"DELETE FROM {default_partition_name(table)} WHERE start_time < :before"), {"before": before})
+    return dropped
+
+
+def delete_expired_rows(conn, project_id, before: datetime) -> int:
+    """Delete a project's traces (and their spans/calls) started before `before`; returns traces deleted"""
+    params = {"project_id": project_id, "before": before}
+    expired = (
+        "SELECT trace_key FROM traces WHERE project_id = :project_id AND start_time < :before"
+    )
+    for table in ("llm_calls", "tool_calls"):
+        conn.execute(text(
+            f"DELETE FROM {table} USING spans WHERE {table}.span_key = spans.span_key "
+            f"AND spans.trace_key IN ({expired})"
+        ), params)
+    conn.execute(text(
+        "DELETE FROM span_profiles WHERE trace_id IN "
+        "(SELECT trace_id FROM traces WHERE project_id = :project_id AND start_time < :before)"
+    ), params)
+    conn.execute(text(f"DELETE FROM spans WHERE trace_key IN ({expired})"), params)
+    return conn.execute(text(
+        "DELETE FROM traces WHERE project_id = :project_id AND start_time < :before"
+    ), params).rowcount
+
+
+def apply_retention(conn, now: datetime | None = None) -> dict:
+    """
+    Enforce per-project retention. Partitions older than the longest retention
+    of any project are dropped whole; projects with a shorter retention have
+    their older rows deleted from the partitions that remain. Nothing is
+    dropped while any project keeps data forever.
+    """
+    now = now or datetime.utcnow()
+    retention = _retention_days(conn)
+    result = {"partitions_dropped": [], "traces_deleted": 0}
+    if not retention or any(days <= 0 for days in retention.values()):
+        longest = None
+    else:
+        longest = max(retention.values())
+        result["partitions_dropped"] = drop_expired_partitions(conn, now - timedelta(days=longest))
+
+    for project_id, days in retention.items():
+        if days > 0 and days != longest:
+            result["traces_deleted"] += delete_expired_rows(conn, project_id, now - timedelta(days=days))
+    return result
+
+
+def blob_referenced(hash_sql: str) -> str:
+    """SQL condition: some span, LLM call or tool call references the blob hash_sql"""
+    return " OR ".join(
+        f"EXISTS (SELECT 1 FROM {table} WHERE {column} = {hash_sql})" for table, column in BLOB_REFERENCES
+    )
+
+
+def collect_orphans(conn, now: datetime | None = None, limit: int | None = None) -> dict:
+    """
+    Delete blobs and prompt segments that no row references any more (left
+    behind by retention, or by ingests that rolled back), at most `limit` of
+    each. Only ones unused for ORPHAN_GC_GRACE_HOURS are considered, so those
+    an in-flight ingest just stored or reused are kept.
+    """
+    now = now or datetime.utcnow()
+    limit = limit or settings.ORPHAN_GC_BATCH
+    cutoff = now - timedelta(hours=settings.ORPHAN_GC_GRACE_HOURS)
+    # Segments are checked against every project's calls; ones another project also uses just stay longer
+    segments = conn.execute(text(
+        "DELETE FROM prompt_segments WHERE last_used_at < :cutoff AND (project_id, hash) IN ("
+        "SELECT s.project_id, s.hash FROM prompt_segments s WHERE s.last_used_at < :cutoff AND NOT EXISTS ("
+        "SELECT 1 FROM llm_calls WHERE CAST(prompt_parts AS jsonb) @> "
+        "jsonb_build_array(jsonb_build_object('segment', s.hash))"
+        ") LIMIT :limit)"
+    ), {"cutoff": cutoff, "limit": limit}).rowcount
+    blobs = blob_store.delete_orphans(conn, blob_referenced, cutoff, limit)
+    return {"blobs": blobs, "prompt_segments": segments}
+
+
+def maintain(engine: Engine, now: datetime | None = None) -> dict | None:
+    """
+    Create upcoming partitions, apply retention and collect unreferenced blobs
+    and prompt segments. Returns a summary, or None if another worker is
+    already doing it.
+    """
+    with engine.connect() as conn:
+        if not conn.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": MAINTENANCE_LOCK_ID}).scalar():
+            conn.rollback()
+            return None
+        conn.commit()
+        try:
+            with conn.begin():
+                created = ensure_partitions(conn, now)
+            with conn.begin():
+                result = apply_retention(conn, now)
+            if result["partitions_dropped"] or result["traces_deleted"]:
+                analytics_cache.invalidate_all()
+            result["partitions_created"] = created
+            with conn.begin():
+                result["orphans_deleted"] = collect_orphans(conn, now)
+            return result
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MAINTENANCE_LOCK_ID})
+            conn.commit()
+
+
+def start_maintenance_thread(engine: Engine) -> threading.Thread:
+    """Run maintain() every PARTITION_MAINTENANCE_MINUTES in a daemon thread"""
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(settings.PARTITION_MAINTENANCE_MINUTES * 60):
+            try:
+                result = maintain(engine)
+                if result and (
+                    result["partitions_created"] or result["partitions_dropped"] or result["traces_deleted"]
+                    or any(result["orphans_deleted"].values())
+                ):
+                    logger.info(f"🗂️ Partition maintenance: {result}")
+            except Exception as e:
+                logger.error(f"❌ Partition maintenance failed: {e}")
+
+    thread = threading.Thread(target=run, name="agentops-partitions", daemon=True)
+    thread.start()
+    return thread
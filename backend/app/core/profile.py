@@ -0,0 +1,61 @@
+# What it does: Merges collapsed-stack profiles and renders them for flame-graph viewers
+
+
+# Sampling interval assumed for profiles stored without one (the SDK profiler's default)
+DEFAULT_INTERVAL_MS = 20.0
+
+
+def merge_stacks(profiles, prefix=None) -> dict:
+    """
+    Sum collapsed stacks from many profiles, in milliseconds: the SDK
+    profiler's interval adapts, so each sample counts for its profile's
+    interval_ms rather than as one.
+    profiles: iterable of (label, stacks, interval_ms) where stacks is {"a;b;c": count}
+    prefix: if True, each stack is prefixed with its label (e.g. the span name)
+    """
+    merged = {}
+    for label, stacks, interval_ms in profiles:
+        weight = interval_ms or DEFAULT_INTERVAL_MS
+        for stack, count in (stacks or {}).items():
+            key = f"{label};{stack}" if prefix and label else stack
+            merged[key] = merged.get(key, 0.0) + int(count) * weight
+    return {stack: round(ms, 3) for stack, ms in merged.items()}
+
+
+def _format_weight(value) -> str:
+    """42 / 41.5 rather than 42.0 / 41.500"""
+    return f"{value:.3f}".rstrip("0").rstrip(".")
+
+
+def to_folded(stacks: dict) -> str:
+    """Render as Brendan Gregg's folded format ("a;b;c 42" per line)"""
+    return "\n".join(
+        f"{stack} {_format_weight(count)}"
+        for stack, count in sorted(stacks.items(), key=lambda item: -item[1])
+    )
+
+
+def to_tree(stacks: dict, root_name: str = "root") -> dict:
+    """Render as nested {"name", "value", "children"} nodes (d3-flame-graph format)"""
+    root = {"name": root_name, "value": 0, "children": {}}
+    for stack, count in stacks.items():
+        root["value"] += count
+        node = root
+        for frame in stack.split(";"):
+            child = node["children"].get(frame)
+            if child is None:
+                child = {"name": frame, "value": 0, "children": {}}
+                node["children"][frame] = child
+            child["value"] += count
+            node = child
+    return _freeze(root)
+
+
+def _freeze(node: dict) -> dict:
+    """Convert children dicts to lists sorted by weight"""
+    children = sorted(node["children"].values(), key=lambda child: -child["value"])
+    return {
+        "name": node["name"],
+        "value": round(node["value"], 3),
+        "children": [_freeze(child) for child in children],
+    }
@@ -0,0 +1,23 @@
+"""
+What it does: Rebuilds prompts sent by the SDK as parts ({"text": ...} / {"segment": hash}) of deduplicated segments
+"""
+import hashlib
+
+
+def segment_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def part_hashes(parts: list | None) -> set[str]:
+    return {part["segment"] for part in parts or [] if part.get("segment")}
+
+
+def render_prompt(parts: list, segments: dict) -> str:
+    """Join prompt parts, substituting stored segment text (a placeholder if it never arrived)"""
+    pieces = []
+    for part in parts:
+        if part.get("segment"):
+            pieces.append(segments.get(part["segment"], f"[missing prompt segment {part['segment'][:12]}]"))
+        else:
+            pieces.append(part.get("text") or "")
+    return "".join(pieces)
@@ -0,0 +1,494 @@
+"""
+What it does: Pre-aggregated analytics (hourly/daily rollups per project, model and provider)
+
+Rows keyed (project_id, bucket, model_name, provider) hold summable metrics.
+Trace-level metrics (counts, durations, overhead, span counts) live in the
+row with model_name = provider = "" and LLM call metrics in one row per
+model. Span rows keyed (project_id, bucket, kind, name) hold per-tool and
+per-agent metrics, and critical path rows keyed (project_id, bucket, name) how
+often and how long spans of each name were on their trace's critical path.
+Path rows keyed (project_id, bucket, family, tag, path) sum the spans at each
+root-to-span path of names (app.core.span_tree.span_paths) per trace family,
+once for all traces (tag "") and once per trace tag, for aggregated flame
+graphs. Cohort rows keyed (project_id, bucket, dimension, value, kind, name)
+hold per trace family, model and tool counts, errors, latencies, tokens and
+cost (with sums of squares, for significance tests) of all traces
+(dimension "") and of the traces with each tag ("tag") or value of a
+configured meta key ("meta.<key>"). Durations are also kept as latency sketches (app.core.sketch) so
+percentiles merge like sums. Ingest adds each trace's contribution in its own
+transaction; a backfill job recomputes older days from the raw tables, moving the
+`covered_from` watermark back. Analytics read rollups for whole buckets at or
+after the watermark and the raw tables for everything else.
+"""
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from app.config import settings
+from app.core import sketch
+from app.core.span_tree import span_paths
+
+logger = logging.getLogger(__name__)
+
+# model_name/provider of the row holding trace-level metrics
+TRACE_ROW = ("", "")
+
+# Metrics added together when rows are merged
+SUM_METRICS = [
+    "trace_count", "duration_count", "duration_ms_sum", "sdk_overhead_ms", "overhead_duration_ms",
+    "llm_span_count", "tool_span_count",
+    "call_count", "input_tokens", "output_tokens", "total_tokens", "cost",
+]
+# Metrics of span rows (see SPAN_KINDS)
+SPAN_SUM_METRICS = ["call_count", "error_count", "duration_count", "duration_ms_sum", "self_ms_sum"]
+# Span row kind -> span type it counts: tool_call spans by tool name, and the
+# llm_call spans the ADK wrapper opens per agent turn ("<agent>:<AgentClass>") by name
+SPAN_KINDS = {"tool": "tool_call", "agent": "llm_call"}
+# Metrics of critical path rows: traces whose path has the span name, traces
+# where it holds the largest share of the path, spans on the path and their time
+CRITICAL_SUM_METRICS = ["trace_count", "dominant_count", "span_count", "critical_ms_sum"]
+# name of the critical path row holding per-trace totals
+CRITICAL_TRACE_ROW = ""
+# Metrics of flame graph path rows: traces with the path, and the spans at it and their total and self time
+PATH_SUM_METRICS = ["trace_count", "span_count", "total_ms_sum", "self_ms_sum"]
+# path of the row holding per-trace totals, and tag of the rows counting every trace
+PATH_TRACE_ROW = ""
+ALL_TAGS = ""
+# Longer tags are cut, as they are part of the path rollup key
+MAX_TAG_CHARS = 100
+# Metrics of cohort rows: traces / LLM calls / tool calls, those with an error,
+# their durations, and tokens and cost with sums of squares (for variances)
+COHORT_SUM_METRICS = [
+    "count", "error_count", "duration_count", "duration_ms_sum",
+    "tokens_sum", "tokens_sumsq", "cost_sum", "cost_sumsq",
+]
+# (dimension, value) of the cohort rows counting every trace
+ALL_TRACES = ("", "")
+# Metrics merged with min()/max(); only ever widened (a trace whose duration
+# grows through a later fragment keeps its first duration as a candidate minimum)
+MIN_METRICS = ["duration_ms_min"]
+MAX_METRICS = ["duration_ms_max"]
+# Latency sketches: trace durations on trace rows, LLM span durations on model rows, span durations on
+# span rows; on cohort rows the durations of what they count
+SKETCH_METRICS = ["duration_sketch"]
+
+HOUR = timedelta(hours=1)
+DAY = timedelta(days=1)
+
+# pg_try_advisory_lock key so only one worker backfills at a time
+BACKFILL_LOCK_ID = 0x6167656E74726F6C
+
+
+def truncate(moment: datetime, granularity: str) -> datetime:
+    """Python equivalent of date_trunc for "hour", "day" and "week" (Monday)"""
+    if granularity == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    day = datetime(moment.year, moment.month, moment.day)
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def _ceil(moment: datetime, granularity: str) -> datetime:
+    floor = truncate(moment, granularity)
+    return floor if floor == moment else floor + (HOUR if granularity == "hour" else DAY)
+
+
+def plan_segments(start: datetime | None, end: datetime | None, covered_from: datetime | None,
+                  levels=("day", "hour")) -> list[tuple[str, datetime | None, datetime | None]]:
+    """
+    Split [start, end) into (source, start, end) segments: "day"/"hour" for
+    whole rollup buckets at or after covered_from, "raw" for the rest (the
+    part before the watermark and partial buckets at the edges). None means
+    unbounded.
+    """
+    if covered_from is None:
+        return [("raw", start, end)]
+    segments = []
+    if start is None or start < covered_from:
+        raw_end = covered_from if end is None else min(end, covered_from)
+        if start is None or start < raw_end:
+            segments.append(("raw", start, raw_end))
+        start = covered_from
+    if end is not None and start >= end:
+        return segments
+
+    def split(lo, hi, remaining):
+        if not remaining:
+            if hi is None or lo < hi:
+                segments.append(("raw", lo, hi))
+            return
+        level = remaining[0]
+        first = _ceil(lo, level)
+        last = None if hi is None else truncate(hi, level)
+        if last is None or first < last:
+            if lo < first:
+                split(lo, first, remaining[1:])
+            segments.append((level, first, last))
+            if last is not None and last < hi:
+                split(last, hi, remaining[1:])
+        else:
+            split(lo, hi, remaining[1:])
+
+    split(start, end, list(levels))
+    return segments
+
+
+def empty_row() -> dict:
+    row = {metric: 0 for metric in SUM_METRICS}
+    row.update({metric: None for metric in MIN_METRICS + MAX_METRICS})
+    row.update({metric: {} for metric in SKETCH_METRICS})
+    return row
+
+
+def empty_span_row() -> dict:
+    row = {metric: 0 for metric in SPAN_SUM_METRICS}
+    row.update({metric: {} for metric in SKETCH_METRICS})
+    return row
+
+
+def empty_critical_row() -> dict:
+    return {metric: 0 for metric in CRITICAL_SUM_METRICS}
+
+
+def empty_path_row() -> dict:
+    return {metric: 0 for metric in PATH_SUM_METRICS}
+
+
+def trace_tags(trace) -> list:
+    """Tags a trace's path rows are kept under: ALL_TAGS and its (cut, distinct) string tags"""
+    tags = {tag[:MAX_TAG_CHARS] for tag in (trace.tags or []) if isinstance(tag, str) and tag}
+    return [ALL_TAGS] + sorted(tags)
+
+
+def empty_cohort_row() -> dict:
+    row = {metric: 0 for metric in COHORT_SUM_METRICS}
+    row.update({metric: {} for metric in SKETCH_METRICS})
+    return row
+
+
+def cohort_meta_keys() -> list:
+    """Trace meta keys whose (string) values are cohorts (ANALYTICS_COHORT_META_KEYS)"""
+    return [key.strip() for key in settings.ANALYTICS_COHORT_META_KEYS.split(",") if key.strip()]
+
+
+def trace_cohorts(trace) -> list:
+    """(dimension, value) of the cohorts a trace is in: ALL_TRACES, its tags and its configured meta values"""
+    cohorts = [ALL_TRACES] + [("tag", tag) for tag in trace_tags(trace) if tag != ALL_TAGS]
+    meta = trace.meta if isinstance(trace.meta, dict) else {}
+    for key in cohort_meta_keys():
+        value = meta.get(key)
+        if isinstance(value, str) and value:
+            cohorts.append((f"meta.{key}", value[:MAX_TAG_CHARS]))
+    return cohorts
+
+
+def merge_row(target: dict, row: dict, sign: int = 1):
+    """
+    Add a row's metrics into target (the metrics are target's keys). sign=-1
+    subtracts sums and sketches and leaves min/max alone.
+    """
+    for metric in target:
+        value = row.get(metric)
+        if metric in SKETCH_METRICS:
+            sketch.merge(target[metric], value, sign)
+        elif metric in MIN_METRICS:
+            if sign > 0 and value is not None:
+                target[metric] = value if target[metric] is None else min(target[metric], value)
+        elif metric in MAX_METRICS:
+            if sign > 0 and value is not None:
+                target[metric] = value if target[metric] is None else max(target[metric], value)
+        else:
+            target[metric] += sign * (value or 0)
+
+
+def _sketch_of(duration_ms: float | None) -> dict:
+    return {sketch.bucket_index(duration_ms): 1} if duration_ms is not None else {}
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def span_summary(span) -> dict | None:
+    """
+    meta.span_summary of an SDK span-budget summary span (it stands for
+    `count` folded leaf spans), or None if the span isn't one or it's malformed
+    """
+    summary = (span.meta if isinstance(span.meta, dict) else {}).get("span_summary")
+    if not isinstance(summary, dict) or not _is_number(summary.get("count")) or summary["count"] < 1:
+        return None
+    durations = summary.get("duration_ms")
+    if not isinstance(durations, dict) or not _is_number(durations.get("total")):
+        return None
+    return summary
+
+
+def _summary_sketch(count: int, durations: dict) -> dict:
+    """Sketch of a summary's folded durations, rebuilt from its reported min/p50/p95/p99/max"""
+    result, placed, last = {}, 0, None
+    for key, q in (("min", 0.0), ("p50", 0.5), ("p95", 0.95), ("p99", 0.99), ("max", 1.0)):
+        value = durations.get(key)
+        if not _is_number(value):
+            continue
+        # Durations ranked up to q * count are put at the q-quantile
+        upto = count if key == "max" else min(count, max(1, round(q * count)))
+        if upto > placed:
+            sketch.add(result, value, upto - placed)
+            placed = upto
+        last = value
+    if last is not None and placed < count:
+        sketch.add(result, last, count - placed)
+    return result
+
+
+def _span_calls(span) -> tuple:
+    """(calls, calls with a duration, duration sum, duration sketch) a span stands for"""
+    summary = span_summary(span)
+    if summary is not None:
+        count = int(round(summary["count"]))
+        return count, count, float(summary["duration_ms"]["total"]), _summary_sketch(count, summary["duration_ms"])
+    if span.duration_ms is None:
+        return 1, 0, 0.0, {}
+    return 1, 1, span.duration_ms, _sketch_of(span.duration_ms)
+
+
+def span_row(span) -> dict:
+    """Span rollup row of a tool/agent span (a summary span counts all the spans it folded)"""
+    calls, duration_count, duration_ms_sum, duration_sketch = _span_calls(span)
+    # Folded spans are leaves, so their self time is their duration
+    self_ms = duration_ms_sum if span_summary(span) is not None else span.self_ms or 0.0
+    return {
+        "call_count": calls, "error_count": 1 if span.error else 0, "self_ms_sum": self_ms,
+        "duration_count": duration_count, "duration_ms_sum": duration_ms_sum, "duration_sketch": duration_sketch,
+    }
+
+
+def tool_cohort_row(span) -> dict:
+    """Cohort row of a tool span (a summary span counts all the calls it folded)"""
+    calls, duration_count, duration_ms_sum, duration_sketch = _span_calls(span)
+    row = _cohort_row(None, span.error is not None)
+    row.update(
+        count=calls, duration_count=duration_count, duration_ms_sum=duration_ms_sum, duration_sketch=duration_sketch
+    )
+    return row
+
+
+def _cohort_row(duration_ms: float | None, error: bool, tokens: int = 0, cost: float = 0.0) -> dict:
+    row = {
+        "count": 1, "error_count": 1 if error else 0,
+        "tokens_sum": tokens, "tokens_sumsq": float(tokens) ** 2, "cost_sum": cost, "cost_sumsq": cost ** 2,
+    }
+    if duration_ms is not None:
+        row.update(duration_count=1, duration_ms_sum=duration_ms, duration_sketch=_sketch_of(duration_ms))
+    return row
+
+
+def rekey(rows: dict, granularity: str, empty=empty_row) -> dict:
+    """Rows keyed (project_id, hour, ...) re-keyed by the bucket of the given granularity, in a stable (lock) order"""
+    result = defaultdict(empty)
+    for (project_id, hour, *names), row in rows.items():
+        merge_row(result[(project_id, truncate(hour, granularity), *names)], row)
+    return dict(sorted(result.items(), key=lambda item: (str(item[0][0]), item[0][1:])))
+
+
+class RollupDelta:
+    """
+    Pending rollup changes from ingest: rows keyed (project_id, hour,
+    model_name, provider), span rows keyed (project_id, hour, kind, name),
+    critical path rows keyed (project_id, hour, name), path rows keyed
+    (project_id, hour, family, tag, path) and cohort rows keyed (project_id,
+    hour, dimension, value, kind, name)
+    """
+
+    def __init__(self):
+        self.rows = defaultdict(empty_row)
+        self.spans = defaultdict(empty_span_row)
+        self.critical = defaultdict(empty_critical_row)
+        self.paths = defaultdict(empty_path_row)
+        self.cohorts = defaultdict(empty_cohort_row)
+
+    def add_trace(self, trace, spans: list, calls: list, sign: int = 1):
+        """
+        Add (or with sign=-1, remove) a trace's contribution: the trace row,
+        one row per model of its LLM calls, one span row per tool and agent,
+        its critical path, path and cohort rows, all in the hour the trace
+        started. calls are the trace's LLM/tool calls (other rows are ignored).
+        """
+        from app.models.span import LLMCall, ToolCall
+
+        hour = truncate(trace.start_time, "hour")
+        spans_by_id = {span.span_id: span for span in spans}
+        trace_row = {"trace_count": 1}
+        if trace.duration_ms is not None:
+            trace_row.update(
+                duration_count=1, duration_ms_sum=trace.duration_ms,
+                duration_ms_min=trace.duration_ms, duration_ms_max=trace.duration_ms,
+                duration_sketch=_sketch_of(trace.duration_ms)
+            )
+            if trace.sdk_overhead_ms is not None and trace.duration_ms > 0:
+                trace_row.update(sdk_overhead_ms=trace.sdk_overhead_ms, overhead_duration_ms=trace.duration_ms)
+        trace_row["llm_span_count"] = sum(1 for span in spans if span.type == "llm_call")
+        trace_row["tool_span_count"] = sum(1 for span in spans if span.type == "tool_call")
+        merge_row(self.rows[(trace.project_id, hour) + TRACE_ROW], trace_row, sign)
+
+        # (kind, name, row) added to each of the trace's cohorts
+        cohort_rows = [("trace", trace.family or "", _cohort_row(
+            trace.duration_ms, any(span.error is not None for span in spans),
+            trace.total_tokens or 0, trace.total_cost or 0.0
+        ))]
+        tool_names = {}
+        for call in calls:
+            if isinstance(call, ToolCall):
+                tool_names[call.span_id] = call.tool_name
+                continue
+            if not isinstance(call, LLMCall):
+                continue
+            span = spans_by_id.get(call.span_id)
+            merge_row(self.rows[(trace.project_id, hour, call.model_name, call.provider)], {
+                "call_count": 1,
+                "input_tokens": call.input_tokens or 0,
+                "output_tokens": call.output_tokens or 0,
+                "total_tokens": call.total_tokens or 0,
+                "cost": call.cost or 0.0,
+                "duration_sketch": _sketch_of(span.duration_ms if span else None),
+            }, sign)
+            cohort_rows.append(("model", call.model_name, _cohort_row(
+                span.duration_ms if span else None, span is not None and span.error is not None,
+                call.total_tokens or 0, call.cost or 0.0
+            )))
+
+        for span in spans:
+            if span.type == SPAN_KINDS["tool"]:
+                key = ("tool", tool_names.get(span.span_id) or span.name)
+            elif span.type == SPAN_KINDS["agent"]:
+                key = ("agent", span.name)
+            else:
+                continue
+            merge_row(self.spans[(trace.project_id, hour) + key], span_row(span), sign)
+            if key[0] == "tool":
+                cohort_rows.append((*key, tool_cohort_row(span)))
+
+        on_path = defaultdict(lambda: {"span_count": 0, "critical_ms_sum": 0.0})
+        for span in spans:
+            if span.on_critical_path:
+                on_path[span.name]["span_count"] += 1
+                on_path[span.name]["critical_ms_sum"] += span.critical_ms or 0.0
+        if on_path:
+            dominant = min(on_path, key=lambda name: (-on_path[name]["critical_ms_sum"], name))
+            merge_row(self.critical[(trace.project_id, hour, CRITICAL_TRACE_ROW)], {
+                "trace_count": 1,
+                "span_count": sum(row["span_count"] for row in on_path.values()),
+                "critical_ms_sum": sum(row["critical_ms_sum"] for row in on_path.values()),
+            }, sign)
+            for name, row in on_path.items():
+                merge_row(self.critical[(trace.project_id, hour, name)], {
+                    "trace_count": 1, "dominant_count": 1 if name == dominant else 0, **row
+                }, sign)
+
+        paths = span_paths(spans)
+        if paths:
+            totals = {
+                "trace_count": 1,
+                "span_count": sum(row["span_count"] for row in paths.values()),
+                "total_ms_sum": trace.duration_ms or 0.0,
+                "self_ms_sum": sum(row["self_ms_sum"] for row in paths.values()),
+            }
+            for tag in trace_tags(trace):
+                key = (trace.project_id, hour, trace.family or "", tag)
+                merge_row(self.paths[key + (PATH_TRACE_ROW,)], totals, sign)
+                for path, row in paths.items():
+                    merge_row(self.paths[key + (path,)], {"trace_count": 1, **row}, sign)
+
+        for cohort in trace_cohorts(trace):
+            for kind, name, row in cohort_rows:
+                merge_row(self.cohorts[(trace.project_id, hour, *cohort, kind, name)], row, sign)
+
+    def merge(self, other: "RollupDelta"):
+        for key, row in other.rows.items():
+            merge_row(self.rows[key], row)
+        for key, row in other.spans.items():
+            merge_row(self.spans[key], row)
+        for key, row in other.critical.items():
+            merge_row(self.critical[key], row)
+        for key, row in other.paths.items():
+            merge_row(self.paths[key], row)
+        for key, row in other.cohorts.items():
+            merge_row(self.cohorts[key], row)
+
+    def by_granularity(self, granularity: str) -> dict:
+        """Rows re-keyed by the bucket of the given granularity, in a stable (lock) order"""
+        return rekey(self.rows, granularity)
+
+    def spans_by_granularity(self, granularity: str) -> dict:
+        return rekey(self.spans, granularity, empty_span_row)
+
+    def critical_by_granularity(self, granularity: str) -> dict:
+        return rekey(self.critical, granularity, empty_critical_row)
+
+    def paths_by_granularity(self, granularity: str) -> dict:
+        return rekey(self.paths, granularity, empty_path_row)
+
+    def cohorts_by_granularity(self, granularity: str) -> dict:
+        return rekey(self.cohorts, granularity, empty_cohort_row)
+
+    def oldest_by_project(self) -> dict:
+        """project_id -> earliest hour with changes (for cache invalidation)"""
+        oldest = {}
+        for project_id, hour, *_ in list(self.rows) + list(self.spans) + list(self.critical) + list(self.paths) + list(self.cohorts):
+            if project_id not in oldest or hour < oldest[project_id]:
+                oldest[project_id] = hour
+        return oldest
+
+    def __bool__(self):
+        return bool(self.rows) or bool(self.spans) or bool(self.critical) or bool(self.paths) or bool(self.cohorts)
+
+
+def backfill(engine: Engine, max_days: int | None = None) -> int:
+    """
+    Recompute rollups for older days until the watermark reaches the oldest
+    trace (or max_days were done). Returns days recomputed, or -1 if another
+    worker holds the backfill lock.
+    """
+    from app.crud import rollup as rollup_crud
+    from app.database import SessionLocal
+
+    with engine.connect() as conn:
+        if not conn.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": BACKFILL_LOCK_ID}).scalar():
+            conn.rollback()
+            return -1
+        conn.commit()
+        try:
+            days = 0
+            while max_days is None or days < max_days:
+                db = SessionLocal()
+                try:
+                    day = rollup_crud.backfill_next_day(db)
+                    db.commit()
+                finally:
+                    db.close()
+                if day is None:
+                    break
+                days += 1
+                logger.debug(f"Rolled up analytics for {day:%Y-%m-%d}")
+            return days
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": BACKFILL_LOCK_ID})
+            conn.commit()
+
+
+def start_backfill_thread(engine: Engine) -> threading.Thread:
+    """Backfill rollups in a daemon thread (it exits once history is covered)"""
+    def run():
+        try:
+            days = backfill(engine)
+            if days > 0:
+                logger.info(f"📊 Analytics rollups backfilled for {days} days")
+        except Exception as e:
+            logger.error(f"❌ Analytics rollup backfill failed: {e}")
+
+    thread = threading.Thread(target=run, name="agentops-rollups", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,80 @@
+"""
+What it does: Mergeable latency sketches (DDSketch-style log buckets) for percentiles over rollups
+
+A sketch is a dict {bucket index: count}. Bucket i holds values in
+(GAMMA^(i-1), GAMMA^i], so any quantile is returned within RELATIVE_ACCURACY
+of the true value. Values are clamped to [MIN_VALUE_MS, MAX_VALUE_MS], which
+bounds a sketch to ~1,300 buckets without ever collapsing them; merging and
+subtracting sketches is therefore exact (plain per-bucket addition), both
+here and in SQL (the agentops_sketch_merge function and agentops_sketch_sum
+aggregate created by migration 6).
+"""
+import math
+
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+LOG_GAMMA = math.log(GAMMA)
+
+# Durations below/above are counted as these (10 µs to ~11.5 days)
+MIN_VALUE_MS = 0.01
+MAX_VALUE_MS = 1e9
+
+PERCENTILES = {"p50": 0.5, "p90": 0.9, "p99": 0.99}
+
+
+def bucket_index(value: float) -> int:
+    return math.ceil(math.log(min(max(value, MIN_VALUE_MS), MAX_VALUE_MS)) / LOG_GAMMA)
+
+
+def bucket_value(index: int) -> float:
+    """Representative value of a bucket (relative error at most RELATIVE_ACCURACY)"""
+    return 2 * GAMMA ** index / (GAMMA + 1)
+
+
+def add(sketch: dict, value: float | None, count: int = 1):
+    if value is None:
+        return
+    index = bucket_index(value)
+    sketch[index] = sketch.get(index, 0) + count
+    if not sketch[index]:
+        del sketch[index]
+
+
+def merge(target: dict, other: dict | None, sign: int = 1):
+    """Add (sign=-1: subtract) another sketch's counts into target; keys may be strings (from JSONB)"""
+    for index, count in (other or {}).items():
+        index = int(index)
+        total = target.get(index, 0) + sign * int(count)
+        if total:
+            target[index] = total
+        else:
+            target.pop(index, None)
+
+
+def count(sketch: dict | None) -> int:
+    return sum(int(value) for value in (sketch or {}).values())
+
+
+def quantile(sketch: dict | None, q: float) -> float | None:
+    """Approximate q-quantile (0..1) of the sketched values; None when empty"""
+    buckets = sorted((int(index), int(value)) for index, value in (sketch or {}).items() if int(value) > 0)
+    total = sum(value for _, value in buckets)
+    if not total:
+        return None
+    rank = q * (total - 1)
+    seen = 0
+    for index, value in buckets:
+        seen += value
+        if seen > rank:
+            return bucket_value(index)
+    return bucket_value(buckets[-1][0])
+
+
+def percentiles(sketch: dict | None, suffix: str = "duration_ms") -> dict:
+    """{"p50_<suffix>": ..., "p90_<suffix>": ..., "p99_<suffix>": ...} (0.0 when empty)"""
+    return {f"{name}_{suffix}": quantile(sketch, q) or 0.0 for name, q in PERCENTILES.items()}
+
+
+def to_json(sketch: dict) -> dict:
+    """JSONB form (string keys)"""
+    return {str(index): value for index, value in sketch.items()}
@@ -0,0 +1,164 @@
+"""
+What it does: Span tree measures - self time (a span's duration not covered by its
+children), the critical path (the chain of spans that determined when the trace ended)
+and per-path totals for aggregated flame graphs
+"""
+from collections import defaultdict
+from app.core.clock_skew import index_children
+
+
+def covered_ms(start, end, intervals) -> float:
+    """Milliseconds of [start, end] covered by the union of (start, end) intervals"""
+    covered = 0.0
+    reached = start
+    for child_start, child_end in sorted(intervals):
+        child_start, child_end = max(child_start, reached), min(child_end, end)
+        if child_end > child_start:
+            covered += (child_end - child_start).total_seconds() * 1000
+            reached = child_end
+    return covered
+
+
+def self_times(spans) -> dict:
+    """
+    span_id -> self time in ms: the span's duration minus the time at least
+    one of its direct children was running (overlapping children count
+    once), or None while the span is unfinished
+    """
+    by_id = {span.span_id: span for span in spans}
+    children = index_children(spans)
+    result = {}
+    for span in spans:
+        if span.end_time is None or span.duration_ms is None:
+            result[span.span_id] = None
+            continue
+        intervals = [
+            (by_id[child_id].start_time, by_id[child_id].end_time)
+            for child_id in children.get(span.span_id, [])
+            if child_id != span.span_id and by_id[child_id].end_time is not None
+        ]
+        result[span.span_id] = max(span.duration_ms - covered_ms(span.start_time, span.end_time, intervals), 0.0)
+    return result
+
+
+def assign_self_times(spans):
+    """Set self_ms on span rows, leaving unchanged values alone (so stored rows aren't dirtied)"""
+    times = self_times(spans)
+    for span in spans:
+        if span.self_ms != times[span.span_id]:
+            span.self_ms = times[span.span_id]
+
+
+def critical_path(spans, start=None, end=None) -> dict:
+    """
+    span_id -> milliseconds of the trace's critical path spent in that span.
+
+    Walks back from the end of each span (top-level spans: from `end`, else
+    their latest end) the way Jaeger does: the child that finished last before
+    the cursor is on the path for the part of it before the cursor, the cursor
+    moves to that child's start, and the gaps in between are the parent's.
+    Unfinished spans are never on the path, and spans only reachable through
+    a parent cycle (e.g. a span that is its own parent) are walked as
+    top-level spans.
+    """
+    finished = [span for span in spans if span.end_time is not None]
+    if not finished:
+        return {}
+    by_id = {span.span_id: span for span in finished}
+    children = defaultdict(list)
+    for span in finished:
+        children[span.parent_span_id if span.parent_span_id in by_id else None].append(span)
+    reached = set()
+
+    def reach(spans):
+        stack = list(spans)
+        while stack:
+            span = stack.pop()
+            if span.span_id not in reached:
+                reached.add(span.span_id)
+                stack.extend(children.get(span.span_id, []))
+
+    reach(children[None])
+    for span in sorted(finished, key=lambda span: (span.start_time, span.span_id)):
+        if span.span_id not in reached:
+            children[span.parent_span_id].remove(span)
+            children[None].append(span)
+            reach([span])
+    for siblings in children.values():
+        siblings.sort(key=lambda span: (span.end_time, span.start_time), reverse=True)
+
+    roots = children[None]
+    first_start = min(span.start_time for span in roots)
+    start = min(start, first_start) if start else first_start
+    end = end or roots[0].end_time
+    result = {}
+    # (parent span_id or None for the trace, window start, window end)
+    stack = [(None, start, end)]
+    while stack:
+        parent_id, low, high = stack.pop()
+        cursor = high
+        own = 0.0
+        for child in children.get(parent_id, []):
+            if cursor <= low or child.end_time <= low:
+                break
+            if child.start_time >= cursor:
+                continue
+            child_end = min(child.end_time, cursor)
+            own += (cursor - child_end).total_seconds() * 1000
+            child_start = max(child.start_time, low)
+            stack.append((child.span_id, child_start, child_end))
+            cursor = child_start
+        own += max((cursor - low).total_seconds() * 1000, 0.0)
+        if parent_id is not None:
+            result[parent_id] = own
+    return result
+
+
+def assign_critical_path(trace, spans):
+    """Set critical_ms/on_critical_path on span rows (see critical_path), only where they change"""
+    path = critical_path(spans, trace.start_time, trace.end_time)
+    for span in spans:
+        critical_ms = path.get(span.span_id)
+        if span.critical_ms != critical_ms:
+            span.critical_ms = critical_ms
+        if span.on_critical_path != (critical_ms is not None):
+            span.on_critical_path = critical_ms is not None
+
+
+# Flame graph paths are the span names from a root down, joined with PATH_SEPARATOR
+# (which becomes ":" inside names). They are rollup keys, so spans whose path
+# would be longer than MAX_PATH_BYTES (UTF-8) are left out with their subtrees.
+PATH_SEPARATOR = ";"
+MAX_PATH_BYTES = 1024
+
+
+def path_frame(name: str) -> str:
+    return (name or "").replace(PATH_SEPARATOR, ":")
+
+
+def span_paths(spans) -> dict:
+    """
+    path -> {"span_count", "total_ms_sum", "self_ms_sum"} of the spans at that
+    path. Roots are spans whose parent isn't in the trace; spans only
+    reachable through a cycle are left out.
+    """
+    span_ids = {span.span_id for span in spans}
+    children = defaultdict(list)
+    for span in spans:
+        if span.parent_span_id and span.parent_span_id in span_ids:
+            children[span.parent_span_id].append(span)
+    stack = [
+        (span, path_frame(span.name)) for span in spans
+        if not (span.parent_span_id and span.parent_span_id in span_ids)
+    ]
+    result = defaultdict(lambda: {"span_count": 0, "total_ms_sum": 0.0, "self_ms_sum": 0.0})
+    while stack:
+        span, path = stack.pop()
+        if len(path.encode()) > MAX_PATH_BYTES:
+            continue
+        row = result[path]
+        row["span_count"] += 1
+        row["total_ms_sum"] += span.duration_ms or 0.0
+        row["self_ms_sum"] += span.self_ms or 0.0
+        stack.extend((child, path + PATH_SEPARATOR + path_frame(child.name)) for child in children[span.span_id])
+    return dict(result)
@@ -0,0 +1,87 @@
+"""
+What it does: Two-sample significance tests on rollup data (latency sketches and count/sum/sum of squares)
+
+Kolmogorov-Smirnov compares whole latency distributions from their sketches,
+Welch's test compares means (tokens, cost) and the two-proportion z test
+compares error rates. p-values use large-sample approximations, so callers
+should not test samples smaller than MIN_SAMPLES.
+"""
+import math
+from app.core import sketch
+
+MIN_SAMPLES = 20
+
+
+def _two_sided_p(z: float) -> float:
+    """Two-sided p-value of a standard normal statistic"""
+    return math.erfc(abs(z) / math.sqrt(2))
+
+
+def _kolmogorov_q(x: float) -> float:
+    """P(K > x) for the Kolmogorov distribution (1.0 where the series doesn't converge, i.e. small x)"""
+    total = 0.0
+    previous = 0.0
+    for k in range(1, 101):
+        term = 2 * (-1) ** (k - 1) * math.exp(-2 * k * k * x * x)
+        total += term
+        if abs(term) <= 1e-3 * previous or abs(term) <= 1e-8 * total:
+            return min(max(total, 0.0), 1.0)
+        previous = abs(term)
+    return 1.0
+
+
+def ks_test(a: dict | None, b: dict | None) -> tuple[float, float]:
+    """
+    (D, p-value) of the two-sample Kolmogorov-Smirnov test on two sketches;
+    values in one bucket (within 1% of each other) count as ties
+    """
+    a = {int(index): int(count) for index, count in (a or {}).items()}
+    b = {int(index): int(count) for index, count in (b or {}).items()}
+    n, m = sketch.count(a), sketch.count(b)
+    if not n or not m:
+        return 0.0, 1.0
+    seen_a = seen_b = 0
+    distance = 0.0
+    for index in sorted(set(a) | set(b)):
+        seen_a += a.get(index, 0)
+        seen_b += b.get(index, 0)
+        distance = max(distance, abs(seen_a / n - seen_b / m))
+    effective = math.sqrt(n * m / (n + m))
+    # Stephens' small-sample correction
+    return distance, _kolmogorov_q((effective + 0.12 + 0.11 / effective) * distance)
+
+
+def welch_test(n1: int, sum1: float, sumsq1: float, n2: int, sum2: float, sumsq2: float) -> float:
+    """p-value for equal means, from each sample's count, sum and sum of squares"""
+    if n1 < 2 or n2 < 2:
+        return 1.0
+    mean1, mean2 = sum1 / n1, sum2 / n2
+    var1 = max((sumsq1 - n1 * mean1 * mean1) / (n1 - 1), 0.0)
+    var2 = max((sumsq2 - n2 * mean2 * mean2) / (n2 - 1), 0.0)
+    error = math.sqrt(var1 / n1 + var2 / n2)
+    if error == 0:
+        return 1.0 if math.isclose(mean1, mean2) else 0.0
+    return _two_sided_p((mean2 - mean1) / error)
+
+
+def proportion_test(x1: int, n1: int, x2: int, n2: int) -> float:
+    """p-value for equal rates x1/n1 and x2/n2 (pooled two-proportion z test)"""
+    if not n1 or not n2:
+        return 1.0
+    pooled = (x1 + x2) / (n1 + n2)
+    error = math.sqrt(pooled * (1 - pooled) * (1 / n1 + 1 / n2))
+    if error == 0:
+        return 1.0
+    return _two_sided_p((x2 / n2 - x1 / n1) / error)
+
+
+def benjamini_hochberg(p_values: list) -> list:
+    """False discovery rate adjusted p-values (q-values), in the same order; None stays None"""
+    ranked = sorted((p, i) for i, p in enumerate(p_values) if p is not None)
+    q_values = [None] * len(p_values)
+    smallest = 1.0
+    for rank in range(len(ranked), 0, -1):
+        p, i = ranked[rank - 1]
+        smallest = min(smallest, p * len(ranked) / rank)
+        q_values[i] = smallest
+    return q_values
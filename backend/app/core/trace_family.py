@@ -0,0 +1,28 @@
+"""
+What it does: Groups trace names into families by masking the parts that change from run to run
+
+"ResearchAgent_run_42" and "ResearchAgent_run_43" are one family,
+"ResearchAgent_run_*": UUIDs, hex ids of 8+ characters and numbers become "*".
+Stored per trace (traces.family) when it is ingested, so analytics can group
+and filter by family without pattern matching in SQL.
+"""
+import re
+
+MASK = "*"
+# Longer families are cut, as they are part of rollup keys
+MAX_FAMILY_CHARS = 200
+
+_VARIABLE_PARTS = [
+    re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"),
+    # Hex ids (with at least one digit, so words like "deadbeef" stay)
+    re.compile(r"(?<![0-9A-Za-z])(?=[a-fA-F]*[0-9])[0-9a-fA-F]{8,}(?![0-9A-Za-z])"),
+    re.compile(r"[0-9]+"),
+]
+
+
+def trace_family(name: str | None) -> str:
+    """Trace name with per-run ids and numbers replaced by MASK"""
+    family = name or ""
+    for pattern in _VARIABLE_PARTS:
+        family = pattern.sub(MASK, family)
+    return family[:MAX_FAMILY_CHARS]
@@ -1,56 +1,103 @@
 """
 Analytics CRUD operations - aggregation queries for dashboard metrics
 """
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from sqlalchemy.orm import Session
-from sqlalchemy import func, case, and_, or_
+from sqlalchemy import func, and_, or_, true
 from app.models.trace import Trace
 from app.models.span import Span, LLMCall, ToolCall
 from app.models.project import Project
-from datetime import datetime, timedelta
+from app.models.anomaly import Anomaly
+from app.crud import rollup as rollup_crud
+from app.database import SessionLocal
+from app.config import settings
+from app.core.partitions import PARTITION_SLACK
+from app.core.rollups import (
+    TRACE_ROW, CRITICAL_TRACE_ROW, PATH_TRACE_ROW, ALL_TAGS, ALL_TRACES,
+    empty_row, empty_span_row, empty_critical_row, empty_path_row, empty_cohort_row, merge_row, cohort_meta_keys,
+    truncate
+)
+from app.core.span_tree import PATH_SEPARATOR
+from app.core import sketch, stats
+from app.core.analytics_cache import cached
+from datetime import datetime, timedelta, timezone
 from typing import List, Optional, Tuple
 from uuid import UUID
 
 
-def _get_time_filter(time_range: str, start_date: Optional[datetime], end_date: Optional[datetime]) -> Optional[any]:
-    """
-    Generate time filter based on time_range or custom dates
-    Returns SQLAlchemy filter condition
-    """
+def _naive_utc(moment: datetime) -> datetime:
+    """Timestamps are stored as naive UTC; convert aware datetimes (e.g. ISO dates ending in Z)"""
+    if moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+# Runs dashboard panels concurrently; bounded so panels can't take the whole connection pool
+_panel_executor = ThreadPoolExecutor(max_workers=settings.ANALYTICS_PANEL_WORKERS, thread_name_prefix="analytics-panel")
+
+
+def _get_time_window(time_range: str, start_date: Optional[datetime], end_date: Optional[datetime]) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """(start, end) of the requested time range as naive UTC; (None, None) for all time"""
     if time_range == "custom" and start_date and end_date:
-        return and_(Trace.start_time >= start_date, Trace.start_time <= end_date)
+        return _naive_utc(start_date), _naive_utc(end_date)
     
     now = datetime.utcnow()
     
     if time_range == "last_24h":
-        cutoff = now - timedelta(hours=24)
-        return Trace.start_time >= cutoff
+        return now - timedelta(hours=24), None
     elif time_range == "last_7d":
-        cutoff = now - timedelta(days=7)
-        return Trace.start_time >= cutoff
+        return now - timedelta(days=7), None
     elif time_range == "last_30d":
-        cutoff = now - timedelta(days=30)
-        return Trace.start_time >= cutoff
+        return now - timedelta(days=30), None
     elif time_range == "this_year":
         # Get traces from start of current year to now
-        year_start = datetime(now.year, 1, 1)
-        return Trace.start_time >= year_start
+        return datetime(now.year, 1, 1), None
     
-    return None
+    return None, None
 
 
-def _get_project_filter(project_ids: Optional[List[str]]) -> Optional[any]:
-    """Generate project filter condition"""
+def _get_time_filter(time_range: str, start_date: Optional[datetime], end_date: Optional[datetime]) -> Optional[any]:
+    """
+    Generate time filter based on time_range or custom dates
+    Returns SQLAlchemy filter condition
+    """
+    start, end = _get_time_window(time_range, start_date, end_date)
+    if start is None:
+        return None
+    if end is not None:
+        return and_(Trace.start_time >= start, Trace.start_time <= end)
+    return Trace.start_time >= start
+
+
+def _child_time_filter(model, time_range: str, start_date: Optional[datetime], end_date: Optional[datetime]):
+    """
+    Lower bound on a span/LLM call's start_time implied by the trace time filter,
+    so Postgres prunes child-table partitions too (children start after their trace)
+    Returns a condition for the join's ON clause, or True for all time
+    """
+    start, _ = _get_time_window(time_range, start_date, end_date)
+    if start is None:
+        return true()
+    return model.start_time >= start - PARTITION_SLACK
+
+
+def _project_uuids(project_ids: Optional[List[str]]) -> Optional[List[UUID]]:
+    """Project ids as UUIDs; None (no filter) if empty or any is invalid"""
     if not project_ids:
         return None
-    
-    # Convert string IDs to UUIDs
     try:
-        uuid_list = [UUID(pid) for pid in project_ids]
-        return Trace.project_id.in_(uuid_list)
+        return [UUID(pid) for pid in project_ids]
     except (ValueError, AttributeError):
         return None
 
 
+def _get_project_filter(project_ids: Optional[List[str]]) -> Optional[any]:
+    """Generate project filter condition"""
+    uuid_list = _project_uuids(project_ids)
+    return Trace.project_id.in_(uuid_list) if uuid_list else None
+
+
 def _determine_granularity(time_range: str, start_date: Optional[datetime], end_date: Optional[datetime]) -> str:
     """Determine appropriate time granularity for trends"""
     if time_range == "last_24h":
@@ -73,6 +120,30 @@ def _determine_granularity(time_range: str, start_date: Optional[datetime], end_
         return "day"
 
 
+def _overhead_pct(overhead_ms: float, duration_ms: float) -> float:
+    """SDK self-time as a percentage of traced wall time"""
+    return float(overhead_ms / duration_ms * 100) if duration_ms > 0 else 0.0
+
+
+def _rollup_rows(
+    db: Session,
+    time_range: str,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    project_ids: Optional[List[str]],
+    granularity: Optional[str] = None,
+    family: str = "models",
+    where: Optional[dict] = None
+) -> dict:
+    """Rollup metrics for the requested range (see rollup_crud.collect_rows)"""
+    start, end = _get_time_window(time_range, start_date, end_date)
+    if end is not None:
+        # Custom ranges include their end; rollup ranges are half-open
+        end += timedelta(microseconds=1)
+    return rollup_crud.collect_rows(db, start, end, _project_uuids(project_ids), granularity, family, where)
+
+
+@cached("summary")
 def get_analytics_summary(
     db: Session,
     time_range: str = "all_time",
@@ -82,58 +153,44 @@ def get_analytics_summary(
 ) -> dict:
     """
     Get aggregated summary metrics
+    Read from the analytics rollups, with durations per trace
+    (percentiles from the merged latency sketches)
     """
-    # Build filters
-    filters = []
-    
-    time_filter = _get_time_filter(time_range, start_date, end_date)
-    if time_filter is not None:
-        filters.append(time_filter)
-    
-    project_filter = _get_project_filter(project_ids)
-    if project_filter is not None:
-        filters.append(project_filter)
-    
-    # Main aggregation query
-    query = db.query(
-        func.count(func.distinct(Trace.id)).label('total_traces'),
-        func.count(func.distinct(case((Span.type == 'llm_call', Span.id)))).label('total_llm_calls'),
-        func.count(func.distinct(case((Span.type == 'tool_call', Span.id)))).label('total_tool_calls'),
-        func.coalesce(func.sum(LLMCall.input_tokens), 0).label('total_input_tokens'),
-        func.coalesce(func.sum(LLMCall.output_tokens), 0).label('total_output_tokens'),
-        func.coalesce(func.sum(LLMCall.total_tokens), 0).label('total_tokens'),
-        func.coalesce(func.sum(LLMCall.cost), 0.0).label('total_cost'),
-        func.coalesce(func.avg(Trace.duration_ms), 0.0).label('avg_duration_ms'),
-        func.coalesce(func.min(Trace.duration_ms), 0.0).label('min_duration_ms'),
-        func.coalesce(func.max(Trace.duration_ms), 0.0).label('max_duration_ms'),
-        func.coalesce(func.sum(Trace.duration_ms), 0.0).label('total_duration_ms'),
-        func.count(func.distinct(Trace.project_id)).label('unique_projects')
-    ).select_from(Trace)\
-     .outerjoin(Span, Trace.trace_id == Span.trace_id)\
-     .outerjoin(LLMCall, Span.span_id == LLMCall.span_id)
-    
-    # Apply filters
-    if filters:
-        query = query.filter(and_(*filters))
-    
-    result = query.first()
-    
+    total = empty_row()
+    durations = {}
+    projects = set()
+    for (project_id, _, model_name, provider), row in _rollup_rows(
+        db, time_range, start_date, end_date, project_ids
+    ).items():
+        merge_row(total, row)
+        if (model_name, provider) == TRACE_ROW:
+            sketch.merge(durations, row["duration_sketch"])
+            if row["trace_count"] > 0:
+                projects.add(project_id)
+    
+    duration_count = total["duration_count"]
     return {
-        "total_traces": result.total_traces or 0,
-        "total_llm_calls": result.total_llm_calls or 0,
-        "total_tool_calls": result.total_tool_calls or 0,
-        "total_input_tokens": int(result.total_input_tokens or 0),
-        "total_output_tokens": int(result.total_output_tokens or 0),
-        "total_tokens": int(result.total_tokens or 0),
-        "total_cost": float(result.total_cost or 0.0),
-        "avg_duration_ms": float(result.avg_duration_ms or 0.0),
-        "min_duration_ms": float(result.min_duration_ms or 0.0),
-        "max_duration_ms": float(result.max_duration_ms or 0.0),
-        "total_duration_ms": float(result.total_duration_ms or 0.0),
-        "unique_projects": result.unique_projects or 0
+        "total_traces": int(total["trace_count"]),
+        "total_llm_calls": int(total["llm_span_count"]),
+        "total_tool_calls": int(total["tool_span_count"]),
+        "total_input_tokens": int(total["input_tokens"]),
+        "total_output_tokens": int(total["output_tokens"]),
+        "total_tokens": int(total["total_tokens"]),
+        "total_cost": float(total["cost"]),
+        "avg_duration_ms": float(total["duration_ms_sum"] / duration_count) if duration_count else 0.0,
+        "min_duration_ms": float(total["duration_ms_min"] or 0.0),
+        "max_duration_ms": float(total["duration_ms_max"] or 0.0),
+        **sketch.percentiles(durations),
+        "total_duration_ms": float(total["duration_ms_sum"]),
+        "unique_projects": len(projects),
+        "total_sdk_overhead_ms": float(total["sdk_overhead_ms"]),
+        "instrumentation_overhead_pct": _overhead_pct(
+            float(total["sdk_overhead_ms"]), float(total["overhead_duration_ms"])
+        )
     }
 
 
+@cached("trends")
 def get_analytics_trends(
     db: Session,
     time_range: str = "all_time",
@@ -148,54 +205,36 @@ def get_analytics_trends(
     # Determine granularity
     granularity = _determine_granularity(time_range, start_date, end_date)
     
-    # Build filters
-    filters = []
-    
-    time_filter = _get_time_filter(time_range, start_date, end_date)
-    if time_filter is not None:
-        filters.append(time_filter)
-    
-    project_filter = _get_project_filter(project_ids)
-    if project_filter is not None:
-        filters.append(project_filter)
-    
-    # Query with time bucketing
-    query = db.query(
-        func.date_trunc(granularity, Trace.start_time).label('timestamp'),
-        func.coalesce(func.sum(LLMCall.input_tokens), 0).label('input_tokens'),
-        func.coalesce(func.sum(LLMCall.output_tokens), 0).label('output_tokens'),
-        func.coalesce(func.sum(LLMCall.total_tokens), 0).label('total_tokens'),
-        func.coalesce(func.sum(LLMCall.cost), 0.0).label('cost'),
-        func.count(func.distinct(Trace.id)).label('trace_count')
-    ).select_from(Trace)\
-     .outerjoin(Span, Trace.trace_id == Span.trace_id)\
-     .outerjoin(LLMCall, Span.span_id == LLMCall.span_id)
-    
-    # Apply filters
-    if filters:
-        query = query.filter(and_(*filters))
-    
-    # Group by time bucket and order
-    query = query.group_by(func.date_trunc(granularity, Trace.start_time))\
-                 .order_by(func.date_trunc(granularity, Trace.start_time))
-    
-    results = query.all()
+    buckets = defaultdict(empty_row)
+    durations = defaultdict(dict)
+    for (_, bucket, model_name, provider), row in _rollup_rows(
+        db, time_range, start_date, end_date, project_ids, granularity
+    ).items():
+        merge_row(buckets[bucket], row)
+        if (model_name, provider) == TRACE_ROW:
+            sketch.merge(durations[bucket], row["duration_sketch"])
     
     data_points = [
         {
-            "timestamp": row.timestamp,
-            "input_tokens": int(row.input_tokens or 0),
-            "output_tokens": int(row.output_tokens or 0),
-            "total_tokens": int(row.total_tokens or 0),
-            "cost": float(row.cost or 0.0),
-            "trace_count": row.trace_count or 0
+            "timestamp": bucket,
+            "input_tokens": int(row["input_tokens"]),
+            "output_tokens": int(row["output_tokens"]),
+            "total_tokens": int(row["total_tokens"]),
+            "cost": float(row["cost"]),
+            "trace_count": int(row["trace_count"]),
+            **sketch.percentiles(durations[bucket]),
+            "instrumentation_overhead_pct": _overhead_pct(
+                float(row["sdk_overhead_ms"]), float(row["overhead_duration_ms"])
+            )
         }
-        for row in results
+        for bucket, row in sorted(buckets.items())
+        if row["trace_count"] > 0
     ]
     
     return data_points, granularity
 
 
+@cached("models")
 def get_model_breakdown(
     db: Session,
     time_range: str = "all_time",
@@ -206,60 +245,432 @@ def get_model_breakdown(
     """
     Get cost and usage breakdown by LLM model
     """
-    # Build filters
-    filters = []
-    
-    time_filter = _get_time_filter(time_range, start_date, end_date)
-    if time_filter is not None:
-        filters.append(time_filter)
-    
-    project_filter = _get_project_filter(project_ids)
-    if project_filter is not None:
-        filters.append(project_filter)
-    
-    # Query model breakdown
-    query = db.query(
-        LLMCall.model_name,
-        LLMCall.provider,
-        func.sum(LLMCall.cost).label('total_cost'),
-        func.sum(LLMCall.input_tokens).label('input_tokens'),
-        func.sum(LLMCall.output_tokens).label('output_tokens'),
-        func.sum(LLMCall.total_tokens).label('total_tokens'),
-        func.count(LLMCall.id).label('call_count')
-    ).select_from(LLMCall)\
-     .join(Span, LLMCall.span_id == Span.span_id)\
-     .join(Trace, Span.trace_id == Trace.trace_id)
-    
-    # Apply filters
-    if filters:
-        query = query.filter(and_(*filters))
-    
-    # Group and order
-    query = query.group_by(LLMCall.model_name, LLMCall.provider)\
-                 .order_by(func.sum(LLMCall.cost).desc())
-    
-    results = query.all()
+    by_model = defaultdict(empty_row)
+    for (_, _, model_name, provider), row in _rollup_rows(
+        db, time_range, start_date, end_date, project_ids
+    ).items():
+        if (model_name, provider) != TRACE_ROW:
+            merge_row(by_model[(model_name, provider)], row)
+    results = sorted(
+        ((key, row) for key, row in by_model.items() if row["call_count"] > 0),
+        key=lambda item: item[1]["cost"], reverse=True
+    )
     
     # Calculate total cost for percentages
-    total_cost = sum(row.total_cost or 0.0 for row in results)
+    total_cost = sum(row["cost"] for _, row in results)
     
     models = [
         {
-            "model_name": row.model_name,
-            "provider": row.provider,
-            "total_cost": float(row.total_cost or 0.0),
-            "cost_percentage": float((row.total_cost or 0.0) / total_cost * 100) if total_cost > 0 else 0.0,
-            "input_tokens": int(row.input_tokens or 0),
-            "output_tokens": int(row.output_tokens or 0),
-            "total_tokens": int(row.total_tokens or 0),
-            "call_count": row.call_count or 0
+            "model_name": model_name,
+            "provider": provider,
+            "total_cost": float(row["cost"]),
+            "cost_percentage": float(row["cost"] / total_cost * 100) if total_cost > 0 else 0.0,
+            "input_tokens": int(row["input_tokens"]),
+            "output_tokens": int(row["output_tokens"]),
+            "total_tokens": int(row["total_tokens"]),
+            "call_count": int(row["call_count"]),
+            **sketch.percentiles(row["duration_sketch"], "latency_ms")
         }
-        for row in results
+        for (model_name, provider), row in results
     ]
     
     return models
 
 
+# sort_by of the tool/agent breakdowns -> item field (descending)
+SPAN_SORT_FIELDS = {
+    "total_time": "total_duration_ms",
+    "self_time": "total_self_ms",
+    "calls": "call_count",
+    "errors": "error_count",
+    "p99": "p99_duration_ms",
+}
+
+
+def _span_breakdown(
+    db: Session,
+    kind: str,
+    time_range: str,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    project_ids: Optional[List[str]],
+    limit: int,
+    sort_by: str
+) -> List[dict]:
+    """Per-name call, error and time metrics of one span rollup kind ("tool" or "agent")"""
+    by_name = defaultdict(empty_span_row)
+    for (_, _, row_kind, name), row in _rollup_rows(
+        db, time_range, start_date, end_date, project_ids, family="spans"
+    ).items():
+        if row_kind == kind:
+            merge_row(by_name[name], row)
+    
+    total_self_ms = sum(row["self_ms_sum"] for row in by_name.values())
+    items = [
+        {
+            "name": name,
+            "call_count": int(row["call_count"]),
+            "error_count": int(row["error_count"]),
+            "error_rate": float(row["error_count"] / row["call_count"]),
+            "total_duration_ms": float(row["duration_ms_sum"]),
+            "avg_duration_ms": float(row["duration_ms_sum"] / row["duration_count"]) if row["duration_count"] else 0.0,
+            "total_self_ms": float(row["self_ms_sum"]),
+            "self_time_percentage": float(row["self_ms_sum"] / total_self_ms * 100) if total_self_ms > 0 else 0.0,
+            **sketch.percentiles(row["duration_sketch"])
+        }
+        for name, row in by_name.items()
+        if row["call_count"] > 0
+    ]
+    items.sort(key=lambda item: (item[SPAN_SORT_FIELDS[sort_by]], item["name"]), reverse=True)
+    return items[:limit]
+
+
+@cached("tools")
+def get_tool_breakdown(
+    db: Session,
+    time_range: str = "all_time",
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    project_ids: Optional[List[str]] = None,
+    limit: int = 50,
+    sort_by: str = "total_time"
+) -> List[dict]:
+    """
+    Get call counts, error rate, total/self time and latency percentiles per tool
+    sort_by: "total_time", "self_time", "calls", "errors" or "p99"
+    """
+    return _span_breakdown(db, "tool", time_range, start_date, end_date, project_ids, limit, sort_by)
+
+
+@cached("agents")
+def get_agent_breakdown(
+    db: Session,
+    time_range: str = "all_time",
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    project_ids: Optional[List[str]] = None,
+    limit: int = 50,
+    sort_by: str = "total_time"
+) -> List[dict]:
+    """
+    Same as get_tool_breakdown, per agent (the LLM spans of each "<agent>:<AgentClass>")
+    """
+    return _span_breakdown(db, "agent", time_range, start_date, end_date, project_ids, limit, sort_by)
+
+
+# sort_by of the critical path breakdown -> item field (descending)
+CRITICAL_SORT_FIELDS = {
+    "dominant": "dominant_count",
+    "time": "total_critical_ms",
+    "traces": "trace_count",
+}
+
+
+@cached("critical_path")
+def get_critical_path_breakdown(
+    db: Session,
+    time_range: str = "all_time",
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    project_ids: Optional[List[str]] = None,
+    limit: int = 50,
+    sort_by: str = "dominant"
+) -> Tuple[List[dict], int]:
+    """
+    Get how often and how long each span name was on its trace's critical path
+    Returns (items, traces with a critical path)
+    sort_by: "dominant" (traces where it had the largest share of the path), "time" or "traces"
+    """
+    by_name = defaultdict(empty_critical_row)
+    for (_, _, name), row in _rollup_rows(
+        db, time_range, start_date, end_date, project_ids, family="critical"
+    ).items():
+        merge_row(by_name[name], row)
+    
+    totals = by_name.pop(CRITICAL_TRACE_ROW, empty_critical_row())
+    trace_count = totals["trace_count"]
+    items = [
+        {
+            "name": name,
+            "trace_count": int(row["trace_count"]),
+            "trace_percentage": float(row["trace_count"] / trace_count * 100) if trace_count > 0 else 0.0,
+            "dominant_count": int(row["dominant_count"]),
+            "dominant_percentage": float(row["dominant_count"] / trace_count * 100) if trace_count > 0 else 0.0,
+            "span_count": int(row["span_count"]),
+            "total_critical_ms": float(row["critical_ms_sum"]),
+            "avg_critical_ms": float(row["critical_ms_sum"] / row["trace_count"]),
+            "critical_percentage": (
+                float(row["critical_ms_sum"] / totals["critical_ms_sum"] * 100) if totals["critical_ms_sum"] > 0 else 0.0
+            )
+        }
+        for name, row in by_name.items()
+        if row["trace_count"] > 0
+    ]
+    items.sort(key=lambda item: (item[CRITICAL_SORT_FIELDS[sort_by]], item["name"]), reverse=True)
+    return items[:limit], int(trace_count)
+
+
+@cached("flamegraph")
+def get_flamegraph(
+    db: Session,
+    time_range: str = "all_time",
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    project_ids: Optional[List[str]] = None,
+    trace_family: Optional[str] = None,
+    tag: Optional[str] = None,
+    weight: str = "total"
+) -> dict:
+    """
+    Get span time merged over all matching traces as collapsed stacks
+    {"root;child;...": ms} for a flame graph, from the path rollups
+    trace_family: only traces of this family (Trace.family); tag: only traces with this tag
+    weight: "total" (frames as wide as their spans' durations, so parallel
+    children can add up to more than their parent) or "self"
+    Returns {"trace_count", "span_count", "total_ms", "stacks"}
+    """
+    where = {"tag": tag or ALL_TAGS}
+    if trace_family is not None:
+        where["family"] = trace_family
+    by_path = defaultdict(empty_path_row)
+    for (_, _, _, _, path), row in _rollup_rows(
+        db, time_range, start_date, end_date, project_ids, family="paths", where=where
+    ).items():
+        merge_row(by_path[path], row)
+    
+    totals = by_path.pop(PATH_TRACE_ROW, empty_path_row())
+    if weight == "self":
+        values = {path: row["self_ms_sum"] for path, row in by_path.items()}
+    else:
+        # Folded stacks add children into their parents, so keep only the part not in the children
+        values = {path: row["total_ms_sum"] for path, row in by_path.items()}
+        for path, row in by_path.items():
+            parent = path.rpartition(PATH_SEPARATOR)[0]
+            if parent in values:
+                values[parent] -= row["total_ms_sum"]
+    stacks = {path: round(value, 3) for path, value in values.items() if round(value, 3) > 0}
+    return {
+        "trace_count": int(totals["trace_count"]),
+        "span_count": int(totals["span_count"]),
+        "total_ms": float(totals["total_ms_sum"]),
+        "stacks": stacks
+    }
+
+
+def cohort_dimension(cohort: Optional[str]) -> str:
+    """Rollup dimension of a cohort key: "tag", a configured meta key, or None for all traces"""
+    if not cohort:
+        return ALL_TRACES[0]
+    if cohort == "tag":
+        return "tag"
+    if cohort not in cohort_meta_keys():
+        raise ValueError(f"Cohorts are kept for tags and the meta keys {cohort_meta_keys()}, not '{cohort}'")
+    return f"meta.{cohort}"
+
+
+@cached("cohort")
+def get_cohort_metrics(
+    db: Session,
+    time_range: str = "all_time",
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    project_ids: Optional[List[str]] = None,
+    dimension: str = ALL_TRACES[0],
+    value: str = ALL_TRACES[1]
+) -> dict:
+    """
+    Get the cohort rollup metrics of one cohort (all traces, or those with a
+    tag / meta value), keyed (kind, name): kind "trace" by trace family,
+    "model" by model name and "tool" by tool name
+    """
+    by_name = defaultdict(empty_cohort_row)
+    for (_, _, _, _, kind, name), row in _rollup_rows(
+        db, time_range, start_date, end_date, project_ids, family="cohorts",
+        where={"dimension": dimension, "value": value}
+    ).items():
+        merge_row(by_name[(kind, name)], row)
+    return dict(by_name)
+
+
+def _change_pct(baseline: float, candidate: float) -> Optional[float]:
+    if baseline == 0:
+        return 0.0 if candidate == 0 else None
+    return float((candidate - baseline) / baseline * 100)
+
+
+def _metric_shifts(kind: str, a: dict, b: dict) -> List[dict]:
+    """Per-metric shifts from cohort row a to b, with p-values (None when a cohort is too small to test)"""
+    shifts = []
+    enough = a["count"] >= stats.MIN_SAMPLES and b["count"] >= stats.MIN_SAMPLES
+    if a["duration_count"] and b["duration_count"]:
+        tested = a["duration_count"] >= stats.MIN_SAMPLES and b["duration_count"] >= stats.MIN_SAMPLES
+        baseline, candidate = sketch.quantile(a["duration_sketch"], 0.95), sketch.quantile(b["duration_sketch"], 0.95)
+        shifts.append({
+            "metric": "p95_duration_ms",
+            "baseline": baseline,
+            "candidate": candidate,
+            "baseline_p50": sketch.quantile(a["duration_sketch"], 0.5),
+            "candidate_p50": sketch.quantile(b["duration_sketch"], 0.5),
+            "change_pct": _change_pct(baseline, candidate),
+            # Kolmogorov-Smirnov: any shift of the distribution, not only of the p95
+            "p_value": stats.ks_test(a["duration_sketch"], b["duration_sketch"])[1] if tested else None,
+        })
+    baseline, candidate = a["error_count"] / a["count"], b["error_count"] / b["count"]
+    shifts.append({
+        "metric": "error_rate",
+        "baseline": float(baseline),
+        "candidate": float(candidate),
+        "change_pct": _change_pct(baseline, candidate),
+        "p_value": stats.proportion_test(a["error_count"], a["count"], b["error_count"], b["count"]) if enough else None,
+    })
+    if kind == "tool":
+        return shifts
+    for metric, prefix in (("avg_tokens", "tokens"), ("avg_cost", "cost")):
+        a_sums = (int(a["count"]), float(a[f"{prefix}_sum"]), float(a[f"{prefix}_sumsq"]))
+        b_sums = (int(b["count"]), float(b[f"{prefix}_sum"]), float(b[f"{prefix}_sumsq"]))
+        baseline, candidate = a_sums[1] / a_sums[0], b_sums[1] / b_sums[0]
+        shifts.append({
+            "metric": metric,
+            "baseline": baseline,
+            "candidate": candidate,
+            "change_pct": _change_pct(baseline, candidate),
+            "p_value": stats.welch_test(*a_sums, *b_sums) if enough else None,
+        })
+    return shifts
+
+
+def compare_cohorts(
+    db: Session,
+    baseline: dict,
+    candidate: dict,
+    project_ids: Optional[List[str]] = None,
+    alpha: float = 0.01,
+    min_change_pct: float = 5.0,
+    limit: int = 100,
+    top: int = 10
+) -> dict:
+    """
+    Compare two cohorts per trace family, model and tool
+    baseline/candidate: {"time_range", "start_date", "end_date", "cohort", "value"}
+    where cohort is None (all traces), "tag" or a meta key of ANALYTICS_COHORT_META_KEYS
+    
+    Latency is compared with a Kolmogorov-Smirnov test on the sketches, error
+    rates with a two-proportion z test and average tokens and cost with
+    Welch's test. A shift is significant when its Benjamini-Hochberg adjusted
+    p-value (q_value) is at most alpha, and a regression when it is also at
+    least min_change_pct worse. Returns the cohorts' trace counts, the `limit`
+    busiest names found in both cohorts with their shifts, and the `top`
+    largest regressions.
+    """
+    metrics = []
+    for cohort in (baseline, candidate):
+        metrics.append(get_cohort_metrics(
+            db, cohort["time_range"], cohort.get("start_date"), cohort.get("end_date"), project_ids,
+            cohort_dimension(cohort.get("cohort")), cohort.get("value") or ALL_TRACES[1]
+        ))
+    a_rows, b_rows = metrics
+    
+    items = []
+    for kind, name in set(a_rows) & set(b_rows):
+        a, b = a_rows[(kind, name)], b_rows[(kind, name)]
+        if a["count"] > 0 and b["count"] > 0:
+            items.append({
+                "kind": kind,
+                "name": name,
+                "baseline_count": int(a["count"]),
+                "candidate_count": int(b["count"]),
+                "shifts": _metric_shifts(kind, a, b)
+            })
+    
+    shifts = [shift for item in items for shift in item["shifts"]]
+    for shift, q_value in zip(shifts, stats.benjamini_hochberg([shift["p_value"] for shift in shifts])):
+        shift["q_value"] = q_value
+        shift["significant"] = q_value is not None and q_value <= alpha
+        # Every compared metric is worse when it goes up
+        shift["regression"] = shift["significant"] and shift["candidate"] > shift["baseline"] and (
+            shift["change_pct"] is None or shift["change_pct"] >= min_change_pct
+        )
+    
+    regressions = [
+        {"kind": item["kind"], "name": item["name"], **shift}
+        for item in items for shift in item["shifts"] if shift["regression"]
+    ]
+    # Metrics that were zero before (change_pct None) first
+    regressions.sort(key=lambda shift: (
+        shift["change_pct"] is None, shift["change_pct"] or 0.0, shift["kind"], shift["name"]
+    ), reverse=True)
+    items.sort(key=lambda item: (item["baseline_count"] + item["candidate_count"], item["kind"], item["name"]), reverse=True)
+    trace_counts = [
+        int(sum(row["count"] for (kind, _), row in rows.items() if kind == "trace")) for rows in metrics
+    ]
+    return {
+        "baseline_trace_count": trace_counts[0],
+        "candidate_trace_count": trace_counts[1],
+        "items": items[:limit],
+        "regressions": regressions[:top]
+    }
+
+
+def get_anomalies(
+    db: Session,
+    time_range: str = "last_7d",
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    project_ids: Optional[List[str]] = None,
+    kind: Optional[str] = None,
+    name: Optional[str] = None,
+    metric: Optional[str] = None,
+    direction: Optional[str] = None,
+    limit: int = 100
+) -> List[dict]:
+    """
+    Get the hours that deviated from their baselines (see app.core.anomalies), newest and largest first
+    kind: "trace" (name = trace family) or "model"; direction: "up" or "down" (None = both)
+    Not cached: ingest adds anomalies for hours that ended a while ago.
+    """
+    query = db.query(Anomaly, Project.name.label("project_name")).join(Project, Anomaly.project_id == Project.id)
+    
+    start, end = _get_time_window(time_range, start_date, end_date)
+    if start is not None:
+        query = query.filter(Anomaly.bucket >= truncate(start, "hour"))
+    if end is not None:
+        query = query.filter(Anomaly.bucket <= end)
+    uuid_list = _project_uuids(project_ids)
+    if uuid_list:
+        query = query.filter(Anomaly.project_id.in_(uuid_list))
+    if kind:
+        query = query.filter(Anomaly.kind == kind)
+    if name is not None:
+        query = query.filter(Anomaly.name == name)
+    if metric:
+        query = query.filter(Anomaly.metric == metric)
+    if direction == "up":
+        query = query.filter(Anomaly.z_score > 0)
+    elif direction == "down":
+        query = query.filter(Anomaly.z_score < 0)
+    
+    results = query.order_by(Anomaly.bucket.desc(), func.abs(Anomaly.z_score).desc()).limit(limit).all()
+    return [
+        {
+            "project_id": str(anomaly.project_id),
+            "project_name": project_name,
+            "hour": anomaly.bucket,
+            "kind": anomaly.kind,
+            "name": anomaly.name,
+            "metric": anomaly.metric,
+            "observed": float(anomaly.observed),
+            "expected": float(anomaly.expected),
+            "stddev": float(anomaly.stddev),
+            "z_score": float(anomaly.z_score),
+            "change_pct": _change_pct(anomaly.expected, anomaly.observed),
+            "sample_count": anomaly.sample_count,
+            "detected_at": anomaly.detected_at
+        }
+        for anomaly, project_name in results
+    ]
+
+
+@cached("top_traces")
 def get_top_traces(
     db: Session,
     time_range: str = "all_time",
@@ -286,11 +697,14 @@ def get_top_traces(
     
     # Subquery for LLM call counts
     llm_count_subq = db.query(
-        Span.trace_id,
+        Span.trace_key,
         func.count(LLMCall.id).label('llm_call_count')
     ).select_from(Span)\
-     .outerjoin(LLMCall, Span.span_id == LLMCall.span_id)\
-     .group_by(Span.trace_id)\
+     .outerjoin(LLMCall, and_(
+         Span.span_key == LLMCall.span_key, _child_time_filter(LLMCall, time_range, start_date, end_date)
+     ))\
+     .filter(_child_time_filter(Span, time_range, start_date, end_date))\
+     .group_by(Span.trace_key)\
      .subquery()
     
     # Main query
@@ -306,7 +720,7 @@ def get_top_traces(
         Trace.status
     ).select_from(Trace)\
      .join(Project, Trace.project_id == Project.id)\
-     .outerjoin(llm_count_subq, Trace.trace_id == llm_count_subq.c.trace_id)
+     .outerjoin(llm_count_subq, Trace.trace_key == llm_count_subq.c.trace_key)
     
     # Apply filters
     if filters:
@@ -341,3 +755,40 @@ def get_top_traces(
     ]
     
     return traces
+
+
+def _run_panel(function, **kwargs):
+    """Run one panel query in its own session (and pooled connection)"""
+    db = SessionLocal()
+    try:
+        return function(db=db, **kwargs)
+    finally:
+        db.close()
+
+
+def get_dashboard(
+    time_range: str = "all_time",
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    project_ids: Optional[List[str]] = None,
+    top_limit: int = 10,
+    sort_by: str = "tokens"
+) -> dict:
+    """
+    Get all dashboard panels (summary, trends, models, top traces) at once
+    Panels run concurrently on separate connections, so the response takes
+    as long as the slowest one
+    """
+    filters = dict(time_range=time_range, start_date=start_date, end_date=end_date, project_ids=project_ids)
+    summary = _panel_executor.submit(_run_panel, get_analytics_summary, **filters)
+    trends = _panel_executor.submit(_run_panel, get_analytics_trends, **filters)
+    models = _panel_executor.submit(_run_panel, get_model_breakdown, **filters)
+    top_traces = _panel_executor.submit(_run_panel, get_top_traces, **filters, limit=top_limit, sort_by=sort_by)
+    
+    data_points, granularity = trends.result()
+    return {
+        "summary": summary.result(),
+        "trends": {"data": data_points, "granularity": granularity},
+        "models": models.result(),
+        "top_traces": top_traces.result()
+    }
@@ -0,0 +1,91 @@
+"""
+What it does: Updates the anomaly baselines from ingest and records anomalies (see app.core.anomalies)
+"""
+import logging
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+from app.config import settings
+from app.models.anomaly import AnomalyBaseline, Anomaly
+from app.models.rollup import CohortRollupHourly
+from app.core.anomalies import series_hours, observe_hour, catch_up_start
+from app.core.rollups import RollupDelta, ALL_TRACES
+
+logger = logging.getLogger(__name__)
+
+
+def _close_hours(db: Session, baseline: AnomalyBaseline, hour) -> list:
+    """Score and fold in the series' hours from its current hour up to (not including) hour"""
+    dimension, value = ALL_TRACES
+    rows = db.query(CohortRollupHourly).filter(
+        CohortRollupHourly.project_id == baseline.project_id,
+        CohortRollupHourly.bucket >= catch_up_start(baseline.current_hour, hour),
+        CohortRollupHourly.bucket < hour,
+        CohortRollupHourly.dimension == dimension,
+        CohortRollupHourly.value == value,
+        CohortRollupHourly.kind == baseline.kind,
+        CohortRollupHourly.name == baseline.name,
+    ).order_by(CohortRollupHourly.bucket).all()
+
+    state = {metric: dict(values, season=list(values["season"])) for metric, values in baseline.state.items()}
+    anomalies = []
+    for row in rows:
+        for found in observe_hour(state, row.bucket, row):
+            anomalies.append({
+                "project_id": baseline.project_id, "bucket": row.bucket,
+                "kind": baseline.kind, "name": baseline.name, **found,
+            })
+    baseline.state = state
+    baseline.current_hour = hour
+    return anomalies
+
+
+def _observe(db: Session, delta: RollupDelta):
+    hours = series_hours(delta)
+    if not hours:
+        return
+    keys = sorted(hours, key=lambda key: (str(key[0]), key[1], key[2]))
+    columns = tuple_(AnomalyBaseline.project_id, AnomalyBaseline.kind, AnomalyBaseline.name)
+    current = {
+        (row.project_id, row.kind, row.name): row.current_hour
+        for row in db.query(
+            AnomalyBaseline.project_id, AnomalyBaseline.kind, AnomalyBaseline.name, AnomalyBaseline.current_hour
+        ).filter(columns.in_(keys))
+    }
+
+    new = [key for key in keys if key not in current]
+    if new:
+        db.execute(insert(AnomalyBaseline).values([
+            {"project_id": project_id, "kind": kind, "name": name, "current_hour": hours[(project_id, kind, name)]}
+            for project_id, kind, name in new
+        ]).on_conflict_do_nothing())
+
+    # Series whose hour closed; locked (in key order) so only one ingest closes it
+    due = [key for key in keys if key in current and current[key] < hours[key]]
+    if not due:
+        return
+    anomalies = []
+    for baseline in db.query(AnomalyBaseline).filter(columns.in_(due)).order_by(
+        AnomalyBaseline.project_id, AnomalyBaseline.kind, AnomalyBaseline.name
+    ).with_for_update().all():
+        hour = hours[(baseline.project_id, baseline.kind, baseline.name)]
+        if baseline.current_hour < hour:
+            anomalies += _close_hours(db, baseline, hour)
+    if anomalies:
+        db.execute(insert(Anomaly).values(anomalies).on_conflict_do_nothing())
+        logger.info(f"🚨 {len(anomalies)} analytics anomalies detected")
+
+
+def observe(db: Session, delta: RollupDelta):
+    """
+    Advance the anomaly baselines of the series in an ingest's rollup changes
+    (after they are applied, in the same transaction); the caller commits.
+    A failure is logged and doesn't fail the ingest.
+    """
+    if not settings.ANALYTICS_ANOMALY_ENABLED or not delta:
+        return
+    try:
+        with db.begin_nested():
+            _observe(db, delta)
+    except Exception as e:
+        logger.error(f"❌ Anomaly detection failed: {e}")
@@ -0,0 +1,84 @@
+"""
+What it does: Moves large span/LLM/tool payloads into the blob store and loads them back for one trace
+"""
+import json
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from app.models.trace import Trace
+from app.models.span import Span, LLMCall, ToolCall
+from app.core.blobstore import blob_store, blob_hash
+from app.config import settings
+
+# Model -> (body column, reference column); text columns hold str, the rest JSON
+OFFLOADED = {
+    Span: (("inputs", "inputs_blob"), ("outputs", "outputs_blob")),
+    LLMCall: (("prompt", "prompt_blob"), ("response", "response_blob")),
+    ToolCall: (("tool_inputs", "tool_inputs_blob"), ("tool_outputs", "tool_outputs_blob")),
+}
+TEXT_FIELDS = {"prompt", "response"}
+
+
+def offload_payloads(db: Session, rows: list):
+    """
+    Replace bodies of at least BLOB_MIN_BYTES with a blob reference (before
+    the rows are inserted). Identical bodies are stored once.
+    """
+    blobs = {}
+    for row in rows:
+        for field, ref in OFFLOADED.get(type(row), ()):
+            value = getattr(row, field)
+            if not value:
+                continue
+            if isinstance(value, str):
+                data = value.encode("utf-8")
+            else:
+                data = json.dumps(value, default=str, separators=(",", ":")).encode("utf-8")
+            if len(data) < settings.BLOB_MIN_BYTES:
+                continue
+            digest = blob_hash(data)
+            blobs[digest] = data
+            setattr(row, ref, digest)
+            setattr(row, field, None if field in TEXT_FIELDS else {})
+    if blobs:
+        blob_store.put_many(db, blobs)
+
+
+def _referencing_field(db: Session, trace_id: str, digest: str) -> str | None:
+    """Name of a column in this trace that references the blob, or None"""
+    span = db.query(Span).filter(
+        Span.trace_id == trace_id,
+        or_(Span.inputs_blob == digest, Span.outputs_blob == digest)
+    ).first()
+    if span:
+        return "inputs" if span.inputs_blob == digest else "outputs"
+    
+    llm_call = db.query(LLMCall).join(Span, Span.span_key == LLMCall.span_key).filter(
+        Span.trace_id == trace_id,
+        or_(LLMCall.prompt_blob == digest, LLMCall.response_blob == digest)
+    ).first()
+    if llm_call:
+        return "prompt" if llm_call.prompt_blob == digest else "response"
+    
+    tool_call = db.query(ToolCall).join(Span, Span.span_key == ToolCall.span_key).filter(
+        Span.trace_id == trace_id,
+        or_(ToolCall.tool_inputs_blob == digest, ToolCall.tool_outputs_blob == digest)
+    ).first()
+    if tool_call:
+        return "tool_inputs" if tool_call.tool_inputs_blob == digest else "tool_outputs"
+    return None
+
+
+def get_trace_blob(db: Session, trace: Trace, digest: str) -> dict | None:
+    """
+    Body of a blob referenced by this trace: {"hash", "field", "content"}
+    (content is a string for prompts/responses, JSON otherwise).
+    None if the trace doesn't reference it or it is missing.
+    """
+    field = _referencing_field(db, trace.trace_id, digest)
+    if field is None:
+        return None
+    data = blob_store.get(db, digest)
+    if data is None:
+        return None
+    text = data.decode("utf-8")
+    return {"hash": digest, "field": field, "content": text if field in TEXT_FIELDS else json.loads(text)}
@@ -0,0 +1,455 @@
+"""
+What it does: Bulk ingest path - stages a whole trace (spans, calls, profiles) and saves batches in one transaction
+Also provides a COPY-based loader for the bulk import CLI
+"""
+import io
+import json
+from collections import Counter, defaultdict
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from app.models.trace import Trace, TRACE_KEY_SEQ
+from app.models.span import Span, LLMCall, ToolCall, SPAN_KEY_SEQ
+from app.models.profile import SpanProfile
+from app.schemas.trace import TraceIngest
+from app.crud import project as project_crud
+from app.crud import prompt as prompt_crud
+from app.crud import blob as blob_crud
+from app.crud import rollup as rollup_crud
+from app.crud import anomaly as anomaly_crud
+from app.crud.trace import build_trace, build_span, build_llm_call, build_tool_call
+from app.crud.profile import build_span_profile
+from app.core.partitions import PARTITION_SLACK
+from app.core.rollups import RollupDelta
+from app.core import analytics_cache
+from app.core.clock_skew import skew_adjustment, subtree, index_children
+from app.core.span_tree import assign_self_times, assign_critical_path
+from uuid import UUID
+from datetime import datetime, timedelta
+
+# Insert order for COPY (parents first)
+COPY_ORDER = [Trace, Span, LLMCall, ToolCall, SpanProfile]
+
+
+def stage_trace(project_id: UUID, data: TraceIngest) -> tuple[Trace, list, list]:
+    """
+    Build the unsaved rows for a complete trace: (trace, spans, children)
+    where children are LLM/tool calls and profiles. Token and cost totals
+    and span self times and critical path are computed in memory.
+    """
+    trace = build_trace(project_id, data.trace)
+    spans = []
+    children = []
+    total_tokens = 0
+    total_cost = 0.0
+    
+    for span_data in data.spans:
+        spans.append(build_span(span_data))
+        
+        if span_data.span_id in data.llm_calls:
+            llm_call = build_llm_call(span_data.span_id, data.llm_calls[span_data.span_id])
+            total_tokens += llm_call.total_tokens
+            total_cost += llm_call.cost
+            children.append(llm_call)
+        
+        if span_data.span_id in data.tool_calls:
+            children.append(build_tool_call(span_data.span_id, data.tool_calls[span_data.span_id]))
+        
+        if span_data.profile and span_data.profile.stacks:
+            children.append(build_span_profile(span_data))
+    
+    trace.total_tokens = total_tokens
+    trace.total_cost = total_cost
+    # Spans remember their host, so clock skew is only corrected across hosts when fragments merge
+    host = (trace.meta or {}).get("fragment_host")
+    if host:
+        for span in spans:
+            span.meta = {**(span.meta or {}), "fragment_host": host}
+    assign_self_times(spans)
+    
+    # Mark complete if all spans are done (same rule as update_trace_metrics)
+    if not trace.end_time and all(span.end_time is not None for span in spans):
+        trace.end_time = datetime.utcnow()
+        trace.duration_ms = (trace.end_time - trace.start_time).total_seconds() * 1000
+        trace.status = "success"
+    assign_critical_path(trace, spans)
+    return trace, spans, children
+
+
+def _prompt_part_calls(children: list) -> list:
+    """LLM calls whose prompt is stored as parts referencing prompt segments"""
+    return [child for child in children if isinstance(child, LLMCall) and child.prompt_parts]
+
+
+def lock_traces(db: Session, trace_ids: list[str]):
+    """
+    Transaction-level advisory locks on trace ids, taken in sorted order so
+    batches touching the same traces can't deadlock
+    """
+    for trace_id in sorted(set(trace_ids)):
+        db.execute(text("SELECT pg_advisory_xact_lock(hashtextextended(:trace_id, 0))"), {"trace_id": trace_id})
+
+
+def _next_keys(db: Session, sequence, count: int) -> list[int]:
+    """Reserve count values of a key sequence in one round trip"""
+    if not count:
+        return []
+    return list(db.execute(
+        text("SELECT nextval(:sequence) FROM generate_series(1, :count)"),
+        {"sequence": sequence.name, "count": count}
+    ).scalars())
+
+
+def _assign_keys(db: Session, traces: list, spans: list, children: list):
+    """
+    Fill in the integer join keys before insert: trace_key for new traces,
+    span_key and trace_key for spans, span_key and start_time (partition key)
+    for LLM/tool calls. Spans get the trace_key of the trace with their
+    trace_id in traces, so that list must include existing traces that new
+    spans are added to.
+    """
+    new_traces = [trace for trace in traces if trace.trace_key is None]
+    for trace, key in zip(new_traces, _next_keys(db, TRACE_KEY_SEQ, len(new_traces))):
+        trace.trace_key = key
+    trace_keys = {trace.trace_id: trace.trace_key for trace in traces}
+    
+    for span, key in zip(spans, _next_keys(db, SPAN_KEY_SEQ, len(spans))):
+        span.span_key = key
+        span.trace_key = trace_keys[span.trace_id]
+    spans_by_id = {span.span_id: span for span in spans}
+    
+    for child in children:
+        if isinstance(child, (LLMCall, ToolCall)):
+            span = spans_by_id[child.span_id]
+            child.span_key = span.span_key
+            child.start_time = span.start_time
+
+
+def _shift(spans: list, delta: timedelta):
+    for span in spans:
+        span.start_time += delta
+        if span.end_time:
+            span.end_time += delta
+
+
+def _same_host(parent, child) -> bool:
+    """Whether two spans were recorded on the same known host (one clock, so no skew to correct)"""
+    host = (parent.meta or {}).get("fragment_host")
+    return host is not None and host == (child.meta or {}).get("fragment_host")
+
+
+def _align_fragments(new_spans: list, existing_spans: list) -> timedelta:
+    """
+    Correct clock skew across cross-host parent/child links between a new
+    fragment and the spans already stored for the trace. Whichever side holds
+    the remote child is shifted (with its whole subtree). Links between spans
+    from the same host are left alone, as Jaeger does: a child outliving its
+    parent there is real, not skew.
+    Returns the offset applied to the new fragment.
+    """
+    new_by_id = {span.span_id: span for span in new_spans}
+    old_by_id = {span.span_id: span for span in existing_spans}
+    new_children = index_children(new_spans)
+    old_children = index_children(existing_spans)
+    fragment_delta = timedelta(0)
+    
+    # New fragment called from a stored span (remote callee arriving after its caller)
+    for span in new_spans:
+        parent = old_by_id.get(span.parent_span_id)
+        if parent is None or _same_host(parent, span):
+            continue
+        delta = skew_adjustment(parent.start_time, parent.end_time, span.start_time, span.end_time)
+        if delta:
+            _shift([new_by_id[span_id] for span_id in subtree(span.span_id, new_children)], delta)
+            fragment_delta = fragment_delta or delta
+    
+    # Stored fragment called from a new span (callee finished and arrived first)
+    for span in existing_spans:
+        parent = new_by_id.get(span.parent_span_id)
+        if parent is None or _same_host(parent, span):
+            continue
+        delta = skew_adjustment(parent.start_time, parent.end_time, span.start_time, span.end_time)
+        if delta:
+            _shift([old_by_id[span_id] for span_id in subtree(span.span_id, old_children)], delta)
+    
+    return fragment_delta
+
+
+def _fragment_info(meta: dict, spans: list, delta: timedelta) -> dict:
+    return {
+        "host": meta.get("fragment_host"),
+        "root": _has_root(spans),
+        "spans": len(spans),
+        "clock_skew_ms": round(delta.total_seconds() * 1000, 3),
+    }
+
+
+def _has_root(spans: list) -> bool:
+    """Whether a fragment holds the trace's top-level spans (remote fragments hang off a caller's span)"""
+    return any(span.parent_span_id is None for span in spans)
+
+
+def _merge_fragment(existing: Trace, fragment: Trace, spans: list, existing_spans: list, delta: timedelta):
+    """Fold a fragment's trace-level fields into the stored trace"""
+    meta = dict(existing.meta or {})
+    fragment_meta = fragment.meta or {}
+    fragments = meta.get("fragments") or [_fragment_info(meta, existing_spans, timedelta(0))]
+    
+    if _has_root(spans):
+        # The fragment with the top-level spans (the caller's) names the trace
+        existing.name = fragment.name
+        existing.family = fragment.family
+        meta = {key: value for key, value in meta.items() if key not in ("remote_parent_span_id", "fragment_host")}
+        meta.update(fragment_meta)
+        existing.tags = list(dict.fromkeys((fragment.tags or []) + (existing.tags or [])))
+    meta["fragments"] = fragments + [_fragment_info(fragment_meta, spans, delta)]
+    existing.meta = meta
+    
+    existing.start_time = min(existing.start_time, fragment.start_time + delta)
+    ends = [end for end in (existing.end_time, fragment.end_time and fragment.end_time + delta) if end]
+    existing.end_time = max(ends) if ends else None
+    if existing.end_time:
+        existing.duration_ms = (existing.end_time - existing.start_time).total_seconds() * 1000
+        if existing.status == "running":
+            existing.status = "success"
+    
+    existing.total_tokens = (existing.total_tokens or 0) + fragment.total_tokens
+    existing.total_cost = (existing.total_cost or 0.0) + fragment.total_cost
+    if fragment.sdk_overhead_ms is not None:
+        existing.sdk_overhead_ms = (existing.sdk_overhead_ms or 0.0) + fragment.sdk_overhead_ms
+
+
+def add_trace(db: Session, project_id: UUID, data: TraceIngest, rollup: RollupDelta | None = None) -> Trace:
+    """
+    Stage a complete trace with its spans, LLM/tool calls and profiles; the caller commits.
+    Its analytics rollup changes are added to `rollup` for the caller to
+    apply, or applied here when it is None.
+    
+    If the trace already exists, this payload is another fragment of it (e.g.
+    a remote agent that joined via traceparent): its spans are added with
+    clock skew corrected and the trace totals and time range are merged.
+    Re-sent payloads whose spans are all stored already are ignored.
+    Raises ValueError if the trace_id belongs to another project.
+    """
+    trace, spans, children = stage_trace(project_id, data)
+    prompt_crud.save_segments(db, project_id, data.prompt_segments, _prompt_part_calls(children))
+    contribution = RollupDelta()
+    
+    # trace_id isn't unique in the (partitioned) table; serialize fragments of one trace instead
+    lock_traces(db, [trace.trace_id])
+    existing = db.query(Trace).filter(Trace.trace_id == trace.trace_id).first()
+    if existing is None:
+        _assign_keys(db, [trace], [], [])
+        db.add(trace)
+        db.flush()
+        contribution.add_trace(trace, spans, children)
+    else:
+        if existing.project_id != project_id:
+            raise ValueError(f"Trace {trace.trace_id} belongs to another project")
+        existing_spans = db.query(Span).filter(
+            Span.trace_id == trace.trace_id,
+            Span.start_time >= existing.start_time - PARTITION_SLACK
+        ).all()
+        stored_ids = {span.span_id for span in existing_spans}
+        if stored_ids.intersection(span.span_id for span in spans):
+            # Replayed payload (e.g. an SDK retry after a lost response)
+            spans = [span for span in spans if span.span_id not in stored_ids]
+            children = [child for child in children if child.span_id not in stored_ids]
+            if not spans:
+                return existing
+            trace.total_tokens = sum(c.total_tokens for c in children if isinstance(c, LLMCall))
+            trace.total_cost = sum(c.cost for c in children if isinstance(c, LLMCall))
+        
+        # The merge can move the trace to another hour, so take out its old contribution and re-add it whole
+        stored_calls = []
+        if existing_spans:
+            for model in (LLMCall, ToolCall):
+                stored_calls += db.query(model).filter(
+                    model.span_key.in_([span.span_key for span in existing_spans]),
+                    model.start_time >= existing.start_time - PARTITION_SLACK
+                ).all()
+        contribution.add_trace(existing, existing_spans, stored_calls, sign=-1)
+        
+        delta = _align_fragments(spans, existing_spans)
+        # Calls are partitioned on (and pruned by) their span's start time, so they move with shifted spans
+        stored_by_key = {span.span_key: span for span in existing_spans}
+        for call in stored_calls:
+            call.start_time = stored_by_key[call.span_key].start_time
+        _merge_fragment(existing, trace, spans, existing_spans, delta)
+        trace = existing
+        # New children (e.g. a remote agent under a stored span) change their parents' self time,
+        # and the merged trace can have a different critical path
+        assign_self_times(existing_spans + spans)
+        assign_critical_path(trace, existing_spans + spans)
+        contribution.add_trace(trace, existing_spans + spans, stored_calls + children)
+    
+    _assign_keys(db, [trace], spans, children)
+    blob_crud.offload_payloads(db, spans + children)
+    
+    # Flush parents first; rows are inserted in multi-row batches per table
+    if spans:
+        db.add_all(spans)
+        db.flush()
+    if children:
+        db.add_all(children)
+        db.flush()
+    
+    if rollup is None:
+        rollup_crud.apply_delta(db, contribution)
+    else:
+        rollup.merge(contribution)
+    return trace
+
+
+def ingest_trace(db: Session, project_id: UUID, data: TraceIngest) -> Trace:
+    """Save one trace (see add_trace) with its rollup changes and commit"""
+    rollup = RollupDelta()
+    trace = add_trace(db, project_id, data, rollup)
+    rollup_crud.apply_delta(db, rollup)
+    anomaly_crud.observe(db, rollup)
+    db.commit()
+    analytics_cache.invalidate(rollup.oldest_by_project())
+    return trace
+
+
+def resolve_projects(db: Session, items: list[TraceIngest], cache: dict | None = None) -> dict:
+    """Map each distinct API key in items to its project id (None if invalid)"""
+    project_ids = cache if cache is not None else {}
+    for item in items:
+        if item.api_key not in project_ids:
+            project = project_crud.get_project_by_api_key(db, item.api_key)
+            project_ids[item.api_key] = project.id if project else None
+    return project_ids
+
+
+def _copy_value(value) -> str:
+    """Encode one value for COPY ... FROM STDIN text format"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, default=str)
+    elif isinstance(value, datetime):
+        value = value.isoformat()
+    else:
+        value = str(value)
+    return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def _copy_rows(cursor, rows: list):
+    """COPY ORM objects of one mapped class into their table, applying column defaults"""
+    table = rows[0].__table__
+    columns = list(table.columns)
+    buffer = io.StringIO()
+    for row in rows:
+        values = []
+        for column in columns:
+            value = getattr(row, column.key)
+            if value is None and column.default is not None:
+                value = column.default.arg(None) if column.default.is_callable else column.default.arg
+            values.append(_copy_value(value))
+        buffer.write("\t".join(values))
+        buffer.write("\n")
+    buffer.seek(0)
+    column_list = ", ".join(column.name for column in columns)
+    cursor.copy_expert(f"COPY {table.name} ({column_list}) FROM STDIN", buffer)
+
+
+def _check_new_traces(db: Session, traces: list):
+    """Raise IntegrityError if any trace_id is repeated or already stored (nothing enforces it in COPY)"""
+    trace_ids = [trace.trace_id for trace in traces]
+    lock_traces(db, trace_ids)
+    duplicates = {trace_id for trace_id, count in Counter(trace_ids).items() if count > 1}
+    if trace_ids:
+        duplicates.update(db.execute(
+            text("SELECT trace_id FROM traces WHERE trace_id = ANY(:trace_ids)"), {"trace_ids": trace_ids}
+        ).scalars())
+    if duplicates:
+        raise IntegrityError("COPY traces", None, ValueError(f"trace_id already exists: {sorted(duplicates)[:5]}"))
+
+
+def copy_batch(db: Session, items: list[TraceIngest], project_ids: dict) -> tuple[list[str], list[dict]]:
+    """
+    Bulk load traces with PostgreSQL COPY (used by the bulk import CLI).
+    All-or-nothing: any conflict (a trace_id that already exists or repeats
+    within the batch) raises IntegrityError, and the caller should roll back
+    and retry the batch with ingest_batch().
+    Returns (accepted trace_ids, rejected [{trace_id, error}]); the caller commits.
+    """
+    accepted = []
+    rejected = []
+    tables = defaultdict(list)
+    rollup = RollupDelta()
+    
+    for item in items:
+        project_id = project_ids.get(item.api_key)
+        if not project_id:
+            rejected.append({"trace_id": item.trace.trace_id, "error": "invalid_api_key"})
+            continue
+        trace, spans, children = stage_trace(project_id, item)
+        # Segments repeat across traces, so they are upserted rather than copied
+        prompt_crud.save_segments(db, project_id, item.prompt_segments, _prompt_part_calls(children))
+        tables[Trace].append(trace)
+        tables[Span].extend(spans)
+        for child in children:
+            tables[type(child)].append(child)
+        rollup.add_trace(trace, spans, children)
+        accepted.append(item.trace.trace_id)
+    
+    _check_new_traces(db, tables.get(Trace, []))
+    _assign_keys(
+        db, tables.get(Trace, []), tables.get(Span, []),
+        tables.get(LLMCall, []) + tables.get(ToolCall, [])
+    )
+    for model in (Span, LLMCall, ToolCall):
+        if model in tables:
+            blob_crud.offload_payloads(db, tables[model])
+    
+    # Parents before children so foreign keys resolve
+    cursor = db.connection().connection.cursor()
+    try:
+        for model in sorted(tables, key=lambda m: COPY_ORDER.index(m)):
+            _copy_rows(cursor, tables[model])
+    finally:
+        cursor.close()
+    rollup_crud.apply_delta(db, rollup)
+    return accepted, rejected
+
+
+def ingest_batch(db: Session, items: list[TraceIngest], project_ids: dict | None = None) -> tuple[list[str], list[dict]]:
+    """
+    Save many traces (possibly for different projects) in one transaction.
+    Each trace gets a savepoint so one bad trace doesn't fail the batch.
+    project_ids maps API key -> project id; resolved from the database if omitted.
+    Returns (accepted trace_ids, rejected [{trace_id, error}])
+    """
+    accepted = []
+    rejected = []
+    if project_ids is None:
+        project_ids = resolve_projects(db, items)
+    lock_traces(db, [item.trace.trace_id for item in items])
+    rollup = RollupDelta()
+    
+    for item in items:
+        project_id = project_ids.get(item.api_key)
+        if not project_id:
+            rejected.append({"trace_id": item.trace.trace_id, "error": "invalid_api_key"})
+            continue
+        
+        try:
+            # Rollup changes of a trace count only once its savepoint is released
+            item_rollup = RollupDelta()
+            with db.begin_nested():
+                add_trace(db, project_id, item, item_rollup)
+            rollup.merge(item_rollup)
+            accepted.append(item.trace.trace_id)
+        except IntegrityError as e:
+            rejected.append({"trace_id": item.trace.trace_id, "error": f"integrity_error: {e.orig}"})
+        except ValueError as e:
+            rejected.append({"trace_id": item.trace.trace_id, "error": str(e)})
+    
+    # One upsert per rollup table for the whole batch
+    rollup_crud.apply_delta(db, rollup)
+    anomaly_crud.observe(db, rollup)
+    db.commit()
+    analytics_cache.invalidate(rollup.oldest_by_project())
+    return accepted, rejected
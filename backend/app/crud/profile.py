@@ -0,0 +1,73 @@
+"""
+What it does: Span profile operations (store SDK profiler samples, merge them into flame graphs)
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import and_
+from app.models.profile import SpanProfile
+from app.models.trace import Trace
+from app.schemas.trace import SpanCreate
+from app.crud.analytics import _get_time_filter, _get_project_filter
+from app.core.profile import merge_stacks
+from datetime import datetime
+from typing import List, Optional
+
+
+def build_span_profile(span_data: SpanCreate) -> SpanProfile:
+    """Build (unsaved) profile record for a span"""
+    return SpanProfile(
+        span_id=span_data.span_id,
+        trace_id=span_data.trace_id,
+        span_name=span_data.name,
+        interval_ms=span_data.profile.interval_ms,
+        sample_count=span_data.profile.sample_count,
+        stacks=span_data.profile.stacks
+    )
+
+
+def create_span_profile(db: Session, span_data: SpanCreate) -> SpanProfile:
+    """Create profile record for a span"""
+    profile = build_span_profile(span_data)
+    db.add(profile)
+    db.commit()
+    return profile
+
+
+def get_trace_profile(db: Session, trace_id: str) -> dict:
+    """Merge all span profiles of one trace (in ms, see merge_stacks), stacks prefixed by span name"""
+    rows = db.query(SpanProfile.span_name, SpanProfile.stacks, SpanProfile.interval_ms)\
+             .filter(SpanProfile.trace_id == trace_id).all()
+    return merge_stacks(((row.span_name, row.stacks, row.interval_ms) for row in rows), prefix=True)
+
+
+def get_span_name_profile(
+    db: Session,
+    span_name: str,
+    time_range: str = "all_time",
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    project_ids: Optional[List[str]] = None,
+    limit: int = 1000
+) -> tuple[dict, int]:
+    """
+    Merge profiles of every span with this name across traces (in ms, see merge_stacks)
+    Returns (stacks, trace_count)
+    """
+    filters = [SpanProfile.span_name == span_name]
+
+    time_filter = _get_time_filter(time_range, start_date, end_date)
+    if time_filter is not None:
+        filters.append(time_filter)
+
+    project_filter = _get_project_filter(project_ids)
+    if project_filter is not None:
+        filters.append(project_filter)
+
+    rows = db.query(SpanProfile.trace_id, SpanProfile.stacks, SpanProfile.interval_ms)\
+             .join(Trace, SpanProfile.trace_id == Trace.trace_id)\
+             .filter(and_(*filters))\
+             .order_by(Trace.start_time.desc())\
+             .limit(limit)\
+             .all()
+
+    stacks = merge_stacks((span_name, row.stacks, row.interval_ms) for row in rows)
+    return stacks, len({row.trace_id for row in rows})
@@ -19,6 +19,7 @@ def create_project(db: Session, project: ProjectCreate, owner_id: UUID) -> Proje
         description=project.description,
         api_key=generate_api_key(),
         owner_id=owner_id,
+        retention_days=project.retention_days,
         created_at=datetime.utcnow()
     )
     db.add(db_project)
@@ -44,3 +45,13 @@ def get_user_projects(db: Session, user_id: UUID) -> list[Project]:
         db.commit()
     
     return projects
+
+def update_retention(db: Session, project_id: UUID, owner_id: UUID, retention_days: int | None) -> Project | None:
+    """Set how many days of traces a project keeps (enforced by partition maintenance)"""
+    project = db.query(Project).filter(Project.id == project_id, Project.owner_id == owner_id).first()
+    if not project:
+        return None
+    project.retention_days = retention_days
+    db.commit()
+    db.refresh(project)
+    return project
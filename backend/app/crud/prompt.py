@@ -0,0 +1,64 @@
+"""
+What it does: Prompt segment operations (store deduplicated segments, rebuild LLM call prompts)
+"""
+import logging
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+from app.models.prompt import PromptSegment
+from app.core.prompt_segments import segment_hash, part_hashes, render_prompt
+from app.core.blobstore import LAST_USED_REFRESH
+from uuid import UUID
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+def save_segments(db: Session, project_id: UUID, segments: dict, llm_calls: list = ()):
+    """
+    Store segments sent by the SDK; already-stored and mismatched hashes are
+    skipped. Stored segments that are resent or referenced by llm_calls'
+    prompt parts are marked as used, so orphan collection leaves them alone.
+    """
+    now = datetime.utcnow()
+    used = set(segments)
+    for llm_call in llm_calls:
+        used |= part_hashes(llm_call.prompt_parts)
+    if used:
+        # Before the insert, like blob_store.put_many
+        db.query(PromptSegment).filter(
+            PromptSegment.project_id == project_id,
+            PromptSegment.hash.in_(sorted(used)),
+            PromptSegment.last_used_at < now - LAST_USED_REFRESH
+        ).update({PromptSegment.last_used_at: now}, synchronize_session=False)
+    
+    rows = []
+    for digest, text in sorted(segments.items()):
+        if segment_hash(text) != digest:
+            logger.warning(f"⚠️ Ignoring prompt segment with mismatched hash {digest[:12]} for project {project_id}")
+            continue
+        rows.append({"project_id": project_id, "hash": digest, "text": text, "size": len(text), "last_used_at": now})
+    if rows:
+        db.execute(insert(PromptSegment).values(rows).on_conflict_do_nothing())
+
+
+def load_segments(db: Session, project_id: UUID, hashes: set) -> dict:
+    """{hash: text} for the given hashes"""
+    if not hashes:
+        return {}
+    rows = db.query(PromptSegment.hash, PromptSegment.text).filter(
+        PromptSegment.project_id == project_id,
+        PromptSegment.hash.in_(hashes)
+    ).all()
+    return {row.hash: row.text for row in rows}
+
+
+def render_prompts(db: Session, project_id: UUID, llm_calls: list) -> dict:
+    """{llm_call.id: prompt} for LLM calls stored as prompt parts"""
+    hashes = set()
+    for llm_call in llm_calls:
+        hashes |= part_hashes(llm_call.prompt_parts)
+    segments = load_segments(db, project_id, hashes)
+    return {
+        llm_call.id: render_prompt(llm_call.prompt_parts, segments)
+        for llm_call in llm_calls if llm_call.prompt_parts
+    }
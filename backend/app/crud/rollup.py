@@ -0,0 +1,534 @@
+"""
+What it does: Reads and writes the analytics rollup tables (see app.core.rollups)
+"""
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import func, and_, case, cast, text, select, literal, literal_column, union, union_all, true, Integer, String, Float
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.dialects.postgresql import insert
+from app.models.trace import Trace
+from app.models.span import Span, LLMCall, ToolCall
+from app.models.rollup import (
+    AnalyticsRollupHourly, AnalyticsRollupDaily, SpanRollupHourly, SpanRollupDaily,
+    CriticalPathRollupHourly, CriticalPathRollupDaily, PathRollupHourly, PathRollupDaily,
+    CohortRollupHourly, CohortRollupDaily, RollupState
+)
+from app.core import sketch
+from app.core.partitions import PARTITION_SLACK
+from app.core.span_tree import PATH_SEPARATOR, MAX_PATH_BYTES
+from app.core.rollups import (
+    RollupDelta, MIN_METRICS, MAX_METRICS, SKETCH_METRICS, SPAN_KINDS, TRACE_ROW, CRITICAL_TRACE_ROW,
+    PATH_TRACE_ROW, ALL_TAGS, MAX_TAG_CHARS, ALL_TRACES, DAY,
+    plan_segments, merge_row, truncate, cohort_meta_keys, span_row, tool_cohort_row,
+    empty_row, empty_span_row, empty_critical_row, empty_path_row, empty_cohort_row
+)
+
+ROLLUP_MODELS = {"hour": AnalyticsRollupHourly, "day": AnalyticsRollupDaily}
+SPAN_ROLLUP_MODELS = {"hour": SpanRollupHourly, "day": SpanRollupDaily}
+CRITICAL_ROLLUP_MODELS = {"hour": CriticalPathRollupHourly, "day": CriticalPathRollupDaily}
+PATH_ROLLUP_MODELS = {"hour": PathRollupHourly, "day": PathRollupDaily}
+COHORT_ROLLUP_MODELS = {"hour": CohortRollupHourly, "day": CohortRollupDaily}
+STATE_ID = 1
+# Postgres allows at most this many bind parameters in one statement
+MAX_BIND_PARAMS = 65535
+
+
+def _upsert(db: Session, model, rows: dict):
+    """Add rows keyed by the table's primary key into it (multi-row upserts within the bind parameter limit)"""
+    if not rows:
+        return
+    table = model.__table__
+    key_columns = [column.name for column in table.primary_key]
+    values = []
+    for key, metrics in rows.items():
+        row = dict(zip(key_columns, key))
+        for metric, value in metrics.items():
+            row[metric] = sketch.to_json(value) if metric in SKETCH_METRICS else value
+        values.append(row)
+
+    chunk = MAX_BIND_PARAMS // len(values[0])
+    for offset in range(0, len(values), chunk):
+        statement = insert(model).values(values[offset:offset + chunk])
+        updates = {}
+        for metric in values[0]:
+            if metric in key_columns:
+                continue
+            column, new = table.c[metric], statement.excluded[metric]
+            if metric in SKETCH_METRICS:
+                updates[metric] = func.agentops_sketch_merge(column, new)
+            elif metric in MIN_METRICS:
+                updates[metric] = func.least(column, new)
+            elif metric in MAX_METRICS:
+                updates[metric] = func.greatest(column, new)
+            else:
+                updates[metric] = column + new
+        db.execute(statement.on_conflict_do_update(index_elements=key_columns, set_=updates))
+
+
+def apply_delta(db: Session, delta: RollupDelta):
+    """Add ingest's pending rollup changes (one upsert per table, rows in a fixed order to avoid deadlocks)"""
+    if not delta:
+        return
+    for granularity in ("hour", "day"):
+        _upsert(db, ROLLUP_MODELS[granularity], delta.by_granularity(granularity))
+        _upsert(db, SPAN_ROLLUP_MODELS[granularity], delta.spans_by_granularity(granularity))
+        _upsert(db, CRITICAL_ROLLUP_MODELS[granularity], delta.critical_by_granularity(granularity))
+        _upsert(db, PATH_ROLLUP_MODELS[granularity], delta.paths_by_granularity(granularity))
+        _upsert(db, COHORT_ROLLUP_MODELS[granularity], delta.cohorts_by_granularity(granularity))
+
+
+def _time_filters(column, start: datetime | None, end: datetime | None) -> list:
+    filters = []
+    if start is not None:
+        filters.append(column >= start)
+    if end is not None:
+        filters.append(column < end)
+    return filters
+
+
+def _sketch_index(column):
+    """SQL equivalent of sketch.bucket_index"""
+    clamped = func.greatest(func.least(column, sketch.MAX_VALUE_MS), sketch.MIN_VALUE_MS)
+    return func.ceil(func.ln(clamped) / sketch.LOG_GAMMA).cast(Integer).label("sketch_index")
+
+
+def _trace_scope(start: datetime | None, end: datetime | None, project_ids: list | None):
+    """(trace filters, span join filter, call join filter) for traces started in [start, end)"""
+    filters = _time_filters(Trace.start_time, start, end)
+    if project_ids:
+        filters.append(Trace.project_id.in_(project_ids))
+    span_filter = and_(*_time_filters(Span.start_time, start - PARTITION_SLACK, None)) if start else True
+    call_filter = lambda model: and_(*_time_filters(model.start_time, start - PARTITION_SLACK, None)) if start else True
+    return filters, span_filter, call_filter
+
+
+def _is_summary():
+    """
+    Spans whose meta has a span_summary (SDK span-budget summaries, which
+    stand for many folded spans); their rows are built in Python like ingest does
+    """
+    return Span.meta["span_summary"].isnot(None)
+
+
+def _trace_tags(filters: list):
+    """(trace_key, tag) of the matching traces' tags, as app.core.rollups.trace_tags (without ALL_TAGS)"""
+    tags = case((func.json_typeof(Trace.tags) == "array", Trace.tags), else_=literal_column("'[]'::json"))
+    element = func.json_array_elements(tags).table_valued("value", joins_implicitly=True)
+    tag = func.left(element.c.value.op("#>>")(literal_column("'{}'")), MAX_TAG_CHARS)
+    return select(Trace.trace_key, tag.label("tag")).select_from(Trace).join(element, true())\
+        .where(*filters, func.json_typeof(element.c.value) == "string", tag != ALL_TAGS)
+
+
+def raw_rows(db: Session, start: datetime | None, end: datetime | None, project_ids: list | None = None) -> dict:
+    """Rollup-shaped rows computed from the raw tables for traces started in [start, end), by hour"""
+    filters, child_filter, call_filter = _trace_scope(start, end, project_ids)
+    hour = func.date_trunc("hour", Trace.start_time)
+    has_overhead = and_(Trace.sdk_overhead_ms.isnot(None), Trace.duration_ms > 0)
+    rows = defaultdict(empty_row)
+
+    for row in db.query(
+        Trace.project_id, hour.label("bucket"),
+        func.count(Trace.id).label("trace_count"),
+        func.count(Trace.duration_ms).label("duration_count"),
+        func.coalesce(func.sum(Trace.duration_ms), 0.0).label("duration_ms_sum"),
+        func.min(Trace.duration_ms).label("duration_ms_min"),
+        func.max(Trace.duration_ms).label("duration_ms_max"),
+        func.coalesce(func.sum(Trace.sdk_overhead_ms).filter(has_overhead), 0.0).label("sdk_overhead_ms"),
+        func.coalesce(func.sum(Trace.duration_ms).filter(has_overhead), 0.0).label("overhead_duration_ms"),
+    ).filter(*filters).group_by(Trace.project_id, hour):
+        merge_row(rows[(row.project_id, row.bucket) + TRACE_ROW], row._asdict())
+
+    index = _sketch_index(Trace.duration_ms)
+    for row in db.query(Trace.project_id, hour.label("bucket"), index, func.count().label("count"))\
+            .filter(*filters, Trace.duration_ms.isnot(None)).group_by(Trace.project_id, hour, index):
+        merge_row(rows[(row.project_id, row.bucket) + TRACE_ROW], {"duration_sketch": {row.sketch_index: row.count}})
+
+    for row in db.query(
+        Trace.project_id, hour.label("bucket"),
+        func.count(Span.id).filter(Span.type == "llm_call").label("llm_span_count"),
+        func.count(Span.id).filter(Span.type == "tool_call").label("tool_span_count"),
+    ).join(Span, and_(Trace.trace_key == Span.trace_key, child_filter))\
+     .filter(*filters).group_by(Trace.project_id, hour):
+        merge_row(rows[(row.project_id, row.bucket) + TRACE_ROW], row._asdict())
+
+    llm_query = lambda *columns: db.query(Trace.project_id, hour.label("bucket"), LLMCall.model_name, LLMCall.provider, *columns)\
+        .join(Span, and_(Trace.trace_key == Span.trace_key, child_filter))\
+        .join(LLMCall, and_(Span.span_key == LLMCall.span_key, call_filter(LLMCall)))\
+        .filter(*filters)
+    for row in llm_query(
+        func.count(LLMCall.id).label("call_count"),
+        func.coalesce(func.sum(LLMCall.input_tokens), 0).label("input_tokens"),
+        func.coalesce(func.sum(LLMCall.output_tokens), 0).label("output_tokens"),
+        func.coalesce(func.sum(LLMCall.total_tokens), 0).label("total_tokens"),
+        func.coalesce(func.sum(LLMCall.cost), 0.0).label("cost"),
+    ).group_by(Trace.project_id, hour, LLMCall.model_name, LLMCall.provider):
+        merge_row(rows[(row.project_id, row.bucket, row.model_name, row.provider)], row._asdict())
+
+    index = _sketch_index(Span.duration_ms)
+    for row in llm_query(index, func.count().label("count"))\
+            .filter(Span.duration_ms.isnot(None))\
+            .group_by(Trace.project_id, hour, LLMCall.model_name, LLMCall.provider, index):
+        merge_row(rows[(row.project_id, row.bucket, row.model_name, row.provider)],
+                  {"duration_sketch": {row.sketch_index: row.count}})
+    return rows
+
+
+def raw_span_rows(db: Session, start: datetime | None, end: datetime | None, project_ids: list | None = None) -> dict:
+    """Span rollup rows (per tool and agent) computed from the raw tables for traces started in [start, end), by hour"""
+    filters, child_filter, call_filter = _trace_scope(start, end, project_ids)
+    hour = func.date_trunc("hour", Trace.start_time)
+    is_tool = Span.type == SPAN_KINDS["tool"]
+    kind = case((is_tool, "tool"), else_="agent")
+    name = case((is_tool, func.coalesce(ToolCall.tool_name, Span.name)), else_=Span.name)
+    rows = defaultdict(empty_span_row)
+
+    span_query = lambda *columns: db.query(
+        Trace.project_id, hour.label("bucket"), kind.label("kind"), name.label("name"), *columns
+    ).join(Span, and_(Trace.trace_key == Span.trace_key, child_filter))\
+     .outerjoin(ToolCall, and_(is_tool, Span.span_key == ToolCall.span_key, call_filter(ToolCall)))\
+     .filter(*filters, Span.type.in_(list(SPAN_KINDS.values())))
+    for row in span_query(
+        func.count(Span.id).label("call_count"),
+        func.count(Span.error).label("error_count"),
+        func.count(Span.duration_ms).label("duration_count"),
+        func.coalesce(func.sum(Span.duration_ms), 0.0).label("duration_ms_sum"),
+        func.coalesce(func.sum(Span.self_ms), 0.0).label("self_ms_sum"),
+    ).filter(~_is_summary()).group_by(Trace.project_id, hour, kind, name):
+        merge_row(rows[(row.project_id, row.bucket, row.kind, row.name)], row._asdict())
+
+    index = _sketch_index(Span.duration_ms)
+    for row in span_query(index, func.count().label("count"))\
+            .filter(~_is_summary(), Span.duration_ms.isnot(None)).group_by(Trace.project_id, hour, kind, name, index):
+        merge_row(rows[(row.project_id, row.bucket, row.kind, row.name)], {"duration_sketch": {row.sketch_index: row.count}})
+
+    for row in span_query(Span.meta, Span.error, Span.duration_ms, Span.self_ms).filter(_is_summary()):
+        merge_row(rows[(row.project_id, row.bucket, row.kind, row.name)], span_row(row))
+    return rows
+
+
+def raw_critical_rows(db: Session, start: datetime | None, end: datetime | None, project_ids: list | None = None) -> dict:
+    """Critical path rollup rows computed from the raw tables for traces started in [start, end), by hour"""
+    filters, child_filter, _ = _trace_scope(start, end, project_ids)
+    hour = func.date_trunc("hour", Trace.start_time)
+    per_trace = db.query(
+        Trace.project_id, hour.label("bucket"), Trace.trace_key, Span.name,
+        func.count(Span.id).label("span_count"),
+        func.coalesce(func.sum(Span.critical_ms), 0.0).label("critical_ms"),
+    ).join(Span, and_(Trace.trace_key == Span.trace_key, child_filter))\
+     .filter(*filters, Span.on_critical_path)\
+     .group_by(Trace.project_id, hour, Trace.trace_key, Span.name).subquery()
+    # Same tie-break as RollupDelta.add_trace: largest share, then name in code point order
+    rank = func.row_number().over(
+        partition_by=per_trace.c.trace_key,
+        order_by=(per_trace.c.critical_ms.desc(), per_trace.c.name.collate("C"))
+    ).label("rank")
+    ranked = db.query(per_trace, rank).subquery()
+    rows = defaultdict(empty_critical_row)
+
+    for row in db.query(
+        ranked.c.project_id, ranked.c.bucket, ranked.c.name,
+        func.count().label("trace_count"),
+        func.count().filter(ranked.c.rank == 1).label("dominant_count"),
+        func.sum(ranked.c.span_count).label("span_count"),
+        func.sum(ranked.c.critical_ms).label("critical_ms_sum"),
+    ).group_by(ranked.c.project_id, ranked.c.bucket, ranked.c.name):
+        merge_row(rows[(row.project_id, row.bucket, row.name)], row._asdict())
+        # Every trace has exactly one dominant name
+        merge_row(rows[(row.project_id, row.bucket, CRITICAL_TRACE_ROW)], {
+            "trace_count": row.dominant_count, "span_count": row.span_count, "critical_ms_sum": row.critical_ms_sum
+        })
+    return rows
+
+
+def raw_path_rows(db: Session, start: datetime | None, end: datetime | None, project_ids: list | None = None) -> dict:
+    """
+    Path rollup rows computed from the raw tables for traces started in
+    [start, end), by hour: the same paths as app.core.span_tree.span_paths,
+    walked down from the roots with a recursive query
+    """
+    filters, _, span_filter = _trace_scope(start, end, project_ids)
+    hour = func.date_trunc("hour", Trace.start_time)
+    frame = lambda model: func.replace(model.name, PATH_SEPARATOR, ":", type_=String)
+    parent = aliased(Span)
+    has_parent = select(parent.id).where(
+        parent.trace_key == Span.trace_key, parent.span_id == Span.parent_span_id, span_filter(parent)
+    ).exists()
+    tree = select(
+        Trace.project_id, hour.label("bucket"), func.coalesce(Trace.family, "").label("family"),
+        Trace.trace_key, Trace.duration_ms.label("trace_ms"),
+        Span.span_id, frame(Span).label("path"), Span.duration_ms, Span.self_ms,
+    ).join(Span, and_(Trace.trace_key == Span.trace_key, span_filter(Span)))\
+     .where(*filters, ~has_parent, func.octet_length(frame(Span)) <= MAX_PATH_BYTES)\
+     .cte("tree", recursive=True)
+    child = aliased(Span)
+    child_path = tree.c.path.concat(PATH_SEPARATOR).concat(frame(child))
+    tree = tree.union_all(
+        select(
+            tree.c.project_id, tree.c.bucket, tree.c.family, tree.c.trace_key, tree.c.trace_ms,
+            child.span_id, child_path, child.duration_ms, child.self_ms,
+        ).join(child, and_(
+            child.trace_key == tree.c.trace_key, child.parent_span_id == tree.c.span_id, span_filter(child)
+        )).where(func.octet_length(child_path) <= MAX_PATH_BYTES)
+    )
+
+    trace_columns = [tree.c.project_id, tree.c.bucket, tree.c.family, tree.c.trace_key]
+    per_path = select(
+        *trace_columns, tree.c.path, func.max(tree.c.trace_ms).label("trace_ms"),
+        func.count().label("span_count"),
+        func.coalesce(func.sum(tree.c.duration_ms), 0.0).label("total_ms_sum"),
+        func.coalesce(func.sum(tree.c.self_ms), 0.0).label("self_ms_sum"),
+    ).group_by(*trace_columns, tree.c.path).cte("per_path")
+    trace_columns = [per_path.c.project_id, per_path.c.bucket, per_path.c.family, per_path.c.trace_key]
+    per_trace = union_all(
+        select(*trace_columns, per_path.c.path, per_path.c.span_count, per_path.c.total_ms_sum, per_path.c.self_ms_sum),
+        select(
+            *trace_columns, literal(PATH_TRACE_ROW).label("path"),
+            func.sum(per_path.c.span_count), func.coalesce(func.max(per_path.c.trace_ms), 0.0),
+            func.sum(per_path.c.self_ms_sum),
+        ).group_by(*trace_columns),
+    ).subquery()
+
+    trace_tags = union(
+        select(Trace.trace_key, literal(ALL_TAGS).label("tag")).where(*filters), _trace_tags(filters)
+    ).subquery()
+
+    key = [per_trace.c.project_id, per_trace.c.bucket, per_trace.c.family, trace_tags.c.tag, per_trace.c.path]
+    rows = defaultdict(empty_path_row)
+    for row in db.execute(select(
+        *key,
+        func.count().label("trace_count"),
+        func.sum(per_trace.c.span_count).label("span_count"),
+        func.sum(per_trace.c.total_ms_sum).label("total_ms_sum"),
+        func.sum(per_trace.c.self_ms_sum).label("self_ms_sum"),
+    ).join(trace_tags, trace_tags.c.trace_key == per_trace.c.trace_key).group_by(*key)):
+        merge_row(rows[(row.project_id, row.bucket, row.family, row.tag, row.path)], row._asdict())
+    return rows
+
+
+def raw_cohort_rows(db: Session, start: datetime | None, end: datetime | None, project_ids: list | None = None) -> dict:
+    """Cohort rollup rows computed from the raw tables for traces started in [start, end), by hour"""
+    filters, child_filter, call_filter = _trace_scope(start, end, project_ids)
+    hour = func.date_trunc("hour", Trace.start_time)
+
+    # Same cohorts as app.core.rollups.trace_cohorts
+    tags = _trace_tags(filters).subquery()
+    cohorts = [
+        select(Trace.trace_key, literal(ALL_TRACES[0]).label("dimension"), literal(ALL_TRACES[1]).label("value"))
+        .where(*filters),
+        select(tags.c.trace_key, literal("tag"), tags.c.tag),
+    ]
+    for key in cohort_meta_keys():
+        value = Trace.meta[key]
+        cohorts.append(
+            select(Trace.trace_key, literal(f"meta.{key}"), func.left(value.as_string(), MAX_TAG_CHARS))
+            .where(*filters, func.json_typeof(value) == "string", value.as_string() != "")
+        )
+    cohorts = union(*cohorts).subquery()
+    key = [Trace.project_id, hour.label("bucket"), cohorts.c.dimension, cohorts.c.value]
+    rows = defaultdict(empty_cohort_row)
+
+    def add(kind: str, query):
+        for row in query:
+            merge_row(rows[(row.project_id, row.bucket, row.dimension, row.value, kind, row.name)], row._asdict())
+
+    def sums(count, error_count, duration, tokens=None, cost=None) -> list:
+        squared = lambda column: func.coalesce(func.sum(func.power(cast(column, Float), 2)), 0.0)
+        columns = [
+            count.label("count"), error_count.label("error_count"),
+            func.count(duration).label("duration_count"),
+            func.coalesce(func.sum(duration), 0.0).label("duration_ms_sum"),
+        ]
+        if tokens is not None:
+            columns += [
+                func.coalesce(func.sum(func.coalesce(tokens, 0)), 0).label("tokens_sum"),
+                squared(func.coalesce(tokens, 0)).label("tokens_sumsq"),
+                func.coalesce(func.sum(func.coalesce(cost, 0.0)), 0.0).label("cost_sum"),
+                squared(func.coalesce(cost, 0.0)).label("cost_sumsq"),
+            ]
+        return columns
+
+    family = func.coalesce(Trace.family, "")
+    has_error = select(Span.id).where(Span.trace_key == Trace.trace_key, Span.error.isnot(None), child_filter).exists()
+    trace_query = lambda *columns: db.query(*key, family.label("name"), *columns)\
+        .join(cohorts, cohorts.c.trace_key == Trace.trace_key).filter(*filters)
+    add("trace", trace_query(*sums(
+        func.count(Trace.id), func.count(Trace.id).filter(has_error), Trace.duration_ms,
+        Trace.total_tokens, Trace.total_cost
+    )).group_by(*key, family))
+
+    llm_query = lambda *columns: db.query(*key, LLMCall.model_name.label("name"), *columns)\
+        .join(cohorts, cohorts.c.trace_key == Trace.trace_key)\
+        .join(Span, and_(Trace.trace_key == Span.trace_key, child_filter))\
+        .join(LLMCall, and_(Span.span_key == LLMCall.span_key, call_filter(LLMCall)))\
+        .filter(*filters)
+    add("model", llm_query(*sums(
+        func.count(LLMCall.id), func.count(Span.error), Span.duration_ms, LLMCall.total_tokens, LLMCall.cost
+    )).group_by(*key, LLMCall.model_name))
+
+    is_tool = Span.type == SPAN_KINDS["tool"]
+    tool_name = func.coalesce(ToolCall.tool_name, Span.name)
+    tool_query = lambda *columns: db.query(*key, tool_name.label("name"), *columns)\
+        .join(cohorts, cohorts.c.trace_key == Trace.trace_key)\
+        .join(Span, and_(Trace.trace_key == Span.trace_key, child_filter))\
+        .outerjoin(ToolCall, and_(Span.span_key == ToolCall.span_key, call_filter(ToolCall)))\
+        .filter(*filters, is_tool)
+    add("tool", tool_query(*sums(func.count(Span.id), func.count(Span.error), Span.duration_ms))
+        .filter(~_is_summary()).group_by(*key, tool_name))
+    for row in tool_query(Span.meta, Span.error, Span.duration_ms).filter(_is_summary()):
+        merge_row(rows[(row.project_id, row.bucket, row.dimension, row.value, "tool", row.name)], tool_cohort_row(row))
+
+    for kind, query, name, duration, exclude in (
+        ("trace", trace_query, family, Trace.duration_ms, None),
+        ("model", llm_query, LLMCall.model_name, Span.duration_ms, None),
+        ("tool", tool_query, tool_name, Span.duration_ms, _is_summary()),
+    ):
+        index = _sketch_index(duration)
+        query = query(index, func.count().label("count")).filter(duration.isnot(None))
+        if exclude is not None:
+            query = query.filter(~exclude)
+        for row in query.group_by(*key, name, index):
+            merge_row(rows[(row.project_id, row.bucket, row.dimension, row.value, kind, row.name)],
+                      {"duration_sketch": {row.sketch_index: row.count}})
+    return rows
+
+
+# family -> (tables by level, key columns after project_id/bucket, raw rows function, empty row)
+FAMILIES = {
+    "models": (ROLLUP_MODELS, ("model_name", "provider"), raw_rows, empty_row),
+    "spans": (SPAN_ROLLUP_MODELS, ("kind", "name"), raw_span_rows, empty_span_row),
+    "critical": (CRITICAL_ROLLUP_MODELS, ("name",), raw_critical_rows, empty_critical_row),
+    "paths": (PATH_ROLLUP_MODELS, ("family", "tag", "path"), raw_path_rows, empty_path_row),
+    "cohorts": (COHORT_ROLLUP_MODELS, ("dimension", "value", "kind", "name"), raw_cohort_rows, empty_cohort_row),
+}
+# family -> RollupDelta attribute holding its rows
+DELTA_ROWS = {"models": "rows", "spans": "spans", "critical": "critical", "paths": "paths", "cohorts": "cohorts"}
+
+
+def stored_rows(db: Session, family: str, level: str, start: datetime, end: datetime | None,
+                project_ids: list | None = None, granularity: str | None = None, where: dict | None = None) -> list:
+    """
+    Rollup rows for buckets in [start, end), summed per project/key and
+    granularity bucket (None = all); where: {key column: value} to keep
+    """
+    models, key_columns, _, empty = FAMILIES[family]
+    model = models[level]
+    bucket = func.date_trunc(granularity, model.bucket) if granularity else None
+    columns = [model.project_id] + [getattr(model, column) for column in key_columns]
+    if bucket is not None:
+        columns.append(bucket.label("bucket"))
+    aggregates = []
+    for metric in empty():
+        column = getattr(model, metric)
+        if metric in SKETCH_METRICS:
+            aggregates.append(func.agentops_sketch_sum(column).label(metric))
+        elif metric in MIN_METRICS:
+            aggregates.append(func.min(column).label(metric))
+        elif metric in MAX_METRICS:
+            aggregates.append(func.max(column).label(metric))
+        else:
+            aggregates.append(func.sum(column).label(metric))
+    filters = _time_filters(model.bucket, start, end)
+    if project_ids:
+        filters.append(model.project_id.in_(project_ids))
+    filters += [getattr(model, column) == value for column, value in (where or {}).items()]
+    return db.query(*columns, *aggregates).filter(*filters).group_by(*columns).all()
+
+
+def get_covered_from(db: Session) -> datetime | None:
+    state = db.get(RollupState, STATE_ID)
+    return state.covered_from if state else None
+
+
+def collect_rows(db: Session, start: datetime | None, end: datetime | None, project_ids: list | None = None,
+                 granularity: str | None = None, family: str = "models", where: dict | None = None) -> dict:
+    """
+    Metrics for traces started in [start, end) keyed (project_id, bucket,
+    model_name, provider) - or (project_id, bucket, kind, name) for the
+    "spans" family, (project_id, bucket, name) for "critical" and
+    (project_id, bucket, family, tag, path) for "paths" - where bucket is the
+    start of the `granularity` bucket (None when not grouping by time). Only
+    rows whose key columns match `where` are returned. Whole rollup buckets
+    are read from the rollup tables, everything else from the raw tables.
+    """
+    _, key_columns, raw, empty = FAMILIES[family]
+    levels = ("hour",) if granularity == "hour" else ("day", "hour")
+    result = defaultdict(empty)
+    for source, segment_start, segment_end in plan_segments(start, end, get_covered_from(db), levels):
+        if source == "raw":
+            for (project_id, hour, *names), row in raw(db, segment_start, segment_end, project_ids).items():
+                if where and any(dict(zip(key_columns, names))[column] != value for column, value in where.items()):
+                    continue
+                bucket = truncate(hour, granularity) if granularity else None
+                merge_row(result[(project_id, bucket, *names)], row)
+        else:
+            for row in stored_rows(db, family, source, segment_start, segment_end, project_ids, granularity, where):
+                bucket = row.bucket if granularity else None
+                names = tuple(getattr(row, column) for column in key_columns)
+                merge_row(result[(row.project_id, bucket) + names], row._asdict())
+    return result
+
+
+def _stored_hours(db: Session, family: str, day: datetime) -> dict:
+    """A day's hourly rollup rows of a family, keyed like its raw rows"""
+    key_columns = FAMILIES[family][1]
+    return {
+        (row.project_id, row.bucket, *(getattr(row, column) for column in key_columns)): row._asdict()
+        for row in stored_rows(db, family, "hour", day, day + DAY, granularity="hour")
+    }
+
+
+def backfill_next_day(db: Session) -> datetime | None:
+    """
+    Recompute the rollups of the newest day before the watermark that has
+    traces, then move the watermark to it. Returns the day, or None when
+    everything is covered. The read phase is committed here, the caller
+    commits the write.
+
+    The raw tables are aggregated without locks, in one snapshot that also
+    reads the day's rollup rows. Ingest keeps adding to those rows meanwhile,
+    so under a short lock on the rollup tables each row becomes raw + (row now
+    - row at the snapshot).
+    """
+    db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+    state = db.get(RollupState, STATE_ID)
+    if state is None:
+        return None
+    covered_from = state.covered_from
+    bound = covered_from or truncate(state.live_since, "day") + DAY
+    newest = db.query(func.max(Trace.start_time)).filter(Trace.start_time < bound).scalar()
+    day = truncate(newest, "day") if newest is not None else None
+    if day is not None:
+        raw = {family: compute(db, day, day + DAY) for family, (_, _, compute, _) in FAMILIES.items()}
+        seen = {family: _stored_hours(db, family, day) for family in FAMILIES}
+    db.commit()
+
+    state = db.query(RollupState).filter(RollupState.id == STATE_ID).with_for_update().first()
+    if state is None or state.covered_from != covered_from:
+        # Reset meanwhile (by a migration); the next backfill starts over
+        return None
+    if day is None:
+        if covered_from is None:
+            state.covered_from = bound
+        return None
+
+    tables = [models[level] for models, *_ in FAMILIES.values() for level in ("hour", "day")]
+    # Keep ingest from adding to these buckets while they are replaced
+    db.execute(text(
+        f"LOCK TABLE {', '.join(model.__tablename__ for model in tables)} IN SHARE ROW EXCLUSIVE MODE"
+    ))
+    delta = RollupDelta()
+    for family, attribute in DELTA_ROWS.items():
+        rows = getattr(delta, attribute)
+        for key, row in raw[family].items():
+            merge_row(rows[key], row)
+        for key, row in _stored_hours(db, family, day).items():
+            before = seen[family].get(key)
+            if row != before:
+                merge_row(rows[key], row)
+                if before is not None:
+                    merge_row(rows[key], before, -1)
+    for model in tables:
+        db.query(model).filter(model.bucket >= day, model.bucket < day + DAY).delete(synchronize_session=False)
+    apply_delta(db, delta)
+    state.covered_from = day
+    return day
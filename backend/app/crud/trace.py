@@ -1,38 +1,56 @@
 """
 What it does: Trace/span operations (save agent execution data, query traces, calculate metrics)
 """
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
 from app.models.trace import Trace
 from app.models.span import Span, LLMCall, ToolCall
 from app.schemas.trace import TraceCreate, SpanCreate, LLMCallData, ToolCallData
 from app.core.cost import calculate_cost
+from app.core.trace_family import trace_family
+from app.crud import prompt as prompt_crud
+from app.core.partitions import PARTITION_SLACK
 from uuid import UUID
 from datetime import datetime
 
-def create_trace(db: Session, project_id: UUID, trace_data: TraceCreate) -> Trace:
-    """Create new trace record"""
+def _get_sdk_overhead_ms(meta: dict) -> float | None:
+    """Read SDK self-overhead reported in trace meta, if any"""
+    try:
+        value = meta.get("sdk_overhead_ms")
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def build_trace(project_id: UUID, trace_data: TraceCreate) -> Trace:
+    """Build (unsaved) trace record"""
     trace = Trace(
         trace_id=trace_data.trace_id,
         name=trace_data.name,
+        family=trace_family(trace_data.name),
         status="running",
         project_id=project_id,
         start_time=trace_data.start_time,
         end_time=trace_data.end_time,
         meta=trace_data.meta,
-        tags=trace_data.tags
+        tags=trace_data.tags,
+        sdk_overhead_ms=_get_sdk_overhead_ms(trace_data.meta)
     )
     
     if trace_data.end_time:
         trace.duration_ms = (trace_data.end_time - trace_data.start_time).total_seconds() * 1000
         trace.status = "success"
-    
+    return trace
+
+def create_trace(db: Session, project_id: UUID, trace_data: TraceCreate) -> Trace:
+    """Create new trace record"""
+    trace = build_trace(project_id, trace_data)
     db.add(trace)
     db.commit()
     db.refresh(trace)
     return trace
 
-def create_span(db: Session, span_data: SpanCreate) -> Span:
-    """Create new span record"""
+def build_span(span_data: SpanCreate) -> Span:
+    """Build (unsaved) span record"""
     duration_ms = None
     if span_data.end_time:
         duration_ms = (span_data.end_time - span_data.start_time).total_seconds() * 1000
@@ -55,18 +73,27 @@ def create_span(db: Session, span_data: SpanCreate) -> Span:
     
     if span_data.error:
         span.status = "failed"
-    
+    return span
+
+def create_span(db: Session, span_data: SpanCreate) -> Span:
+    """Create new span record"""
+    span = build_span(span_data)
+    span.trace_key = select(Trace.trace_key).where(Trace.trace_id == span.trace_id).scalar_subquery()
     db.add(span)
     db.commit()
     db.refresh(span)
     return span
 
-def create_llm_call(db: Session, span_id: str, llm_data: LLMCallData) -> LLMCall:
-    """Create LLM call record with cost calculation"""
+def _span_column(span_id: str, column):
+    """A column of the span (its key or start_time), resolved inside the INSERT"""
+    return select(column).where(Span.span_id == span_id).scalar_subquery()
+
+def build_llm_call(span_id: str, llm_data: LLMCallData) -> LLMCall:
+    """Build (unsaved) LLM call record with cost calculation"""
     total_tokens = llm_data.input_tokens + llm_data.output_tokens
     cost = calculate_cost(llm_data.model_name, llm_data.input_tokens, llm_data.output_tokens)
     
-    llm_call = LLMCall(
+    return LLMCall(
         span_id=span_id,
         model_name=llm_data.model_name,
         provider=llm_data.provider,
@@ -75,21 +102,34 @@ def create_llm_call(db: Session, span_id: str, llm_data: LLMCallData) -> LLMCall
         total_tokens=total_tokens,
         cost=cost,
         prompt=llm_data.prompt,
+        prompt_parts=llm_data.prompt_parts,
         response=llm_data.response
     )
+
+def create_llm_call(db: Session, span_id: str, llm_data: LLMCallData) -> LLMCall:
+    """Create LLM call record with cost calculation"""
+    llm_call = build_llm_call(span_id, llm_data)
+    llm_call.span_key = _span_column(span_id, Span.span_key)
+    llm_call.start_time = _span_column(span_id, Span.start_time)
     db.add(llm_call)
     db.commit()
     return llm_call
 
-def create_tool_call(db: Session, span_id: str, tool_data: ToolCallData) -> ToolCall:
-    """Create tool call record"""
-    tool_call = ToolCall(
+def build_tool_call(span_id: str, tool_data: ToolCallData) -> ToolCall:
+    """Build (unsaved) tool call record"""
+    return ToolCall(
         span_id=span_id,
         tool_name=tool_data.tool_name,
         tool_inputs=tool_data.tool_inputs,
         tool_outputs=tool_data.tool_outputs,
         error=tool_data.error
     )
+
+def create_tool_call(db: Session, span_id: str, tool_data: ToolCallData) -> ToolCall:
+    """Create tool call record"""
+    tool_call = build_tool_call(span_id, tool_data)
+    tool_call.span_key = _span_column(span_id, Span.span_key)
+    tool_call.start_time = _span_column(span_id, Span.start_time)
     db.add(tool_call)
     db.commit()
     return tool_call
@@ -104,6 +144,44 @@ def get_trace_by_id(db: Session, trace_id: str) -> Trace | None:
     """Get single trace with all spans"""
     return db.query(Trace).filter(Trace.trace_id == trace_id).first()
 
+# Internal join keys, not part of the API
+_INTERNAL_COLUMNS = {"trace_key", "span_key"}
+
+def _columns(row) -> dict:
+    return {
+        column.key: getattr(row, column.key)
+        for column in row.__table__.columns if column.key not in _INTERNAL_COLUMNS
+    }
+
+def get_trace_spans(db: Session, trace: Trace) -> list[dict]:
+    """
+    Spans of a trace with their LLM/tool calls, for the trace detail page.
+    Prompts stored as deduplicated segments are rebuilt here.
+    """
+    spans = db.query(Span).options(
+        selectinload(Span.llm_call), selectinload(Span.tool_call)
+    ).filter(
+        Span.trace_id == trace.trace_id,
+        Span.start_time >= trace.start_time - PARTITION_SLACK  # lets Postgres skip older partitions
+    ).order_by(Span.start_time).all()
+    
+    llm_calls = [span.llm_call for span in spans if span.llm_call]
+    prompts = prompt_crud.render_prompts(db, trace.project_id, llm_calls)
+    
+    result = []
+    for span in spans:
+        data = _columns(span)
+        if span.llm_call:
+            llm_call = _columns(span.llm_call)
+            llm_call.pop("prompt_parts", None)
+            if span.llm_call.id in prompts:
+                llm_call["prompt"] = prompts[span.llm_call.id]
+            data["llm_call"] = llm_call
+        if span.tool_call:
+            data["tool_call"] = _columns(span.tool_call)
+        result.append(data)
+    return result
+
 def update_trace_metrics(db: Session, trace_id: str):
     """Update trace total tokens and cost from all spans"""
     trace = get_trace_by_id(db, trace_id)
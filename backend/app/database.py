@@ -1,5 +1,6 @@
 # What it does: Connects FastAPI to Supabase PostgreSQL database
 
+import time
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
@@ -9,8 +10,8 @@ from app.config import settings
 engine = create_engine(
     settings.DATABASE_URL,
     pool_pre_ping=True,  # Check connection health
-    pool_size=10,  # Connection pool
-    max_overflow=20,
+    pool_size=settings.DB_POOL_SIZE,  # Connection pool
+    max_overflow=settings.DB_MAX_OVERFLOW,
     # connect_args={"options": "-c client_encoding=utf8", "connect_timeout": 10},
 )
 
@@ -29,3 +30,20 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def get_ingest_db():
+    """
+    Database session for ingest routes
+    Checks out a connection up front and records how long the pool made us wait
+    """
+    from app.core.load_shedding import ingest_shedder
+    
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        db.connection()
+        ingest_shedder.record_pool_wait((time.perf_counter() - started) * 1000)
+        yield db
+    finally:
+        db.close()
@@ -1,6 +1,6 @@
 """
 Main FastAPI application
-Starts server, connects routes, creates database tables in Supabase
+Starts server, connects routes, migrates the database schema in Supabase
 """
 import logging
 from fastapi import FastAPI, Request, HTTPException
@@ -8,9 +8,12 @@ from fastapi.middleware.cors import CORSMiddleware
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
-from app.api import auth, projects, traces, analytics
-from app.database import Base, engine
+from app.api import auth, projects, traces, analytics, otlp
+from app.database import engine
+from app.migrations import run_migrations
+from app.core import partitions, rollups
 from app.config import settings
+from app.core.load_shedding import ingest_shedder
 
 # Configure logging
 logging.basicConfig(
@@ -20,10 +23,17 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Create all database tables in Supabase
-logger.info("Creating database tables in Supabase...")
-Base.metadata.create_all(bind=engine)
-logger.info("✅ Database tables created!")
+# Create/upgrade database tables in Supabase
+logger.info("Migrating database schema in Supabase...")
+schema_version = run_migrations(engine)
+logger.info(f"✅ Database schema at version {schema_version}")
+
+# Create upcoming time partitions and apply retention now and then periodically
+partitions.maintain(engine)
+partitions.start_maintenance_thread(engine)
+
+# Fill analytics rollups for days before they were maintained at ingest
+rollups.start_backfill_thread(engine)
 
 # Initialize rate limiter
 limiter = Limiter(key_func=get_remote_address)
@@ -35,9 +45,16 @@ app = FastAPI(
     version="1.0.0"
 )
 
+def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded):
+    """429 with Retry-After so SDKs back off instead of retrying immediately"""
+    response = _rate_limit_exceeded_handler(request, exc)
+    if "Retry-After" not in response.headers:
+        response.headers["Retry-After"] = "60"  # Limits are per minute
+    return response
+
 # Add rate limiter to app state
 app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded_handler)
 
 # Request size limit middleware (10 MB max)
 @app.middleware("http")
@@ -66,6 +83,7 @@ app.include_router(auth.router)
 app.include_router(projects.router)
 app.include_router(traces.router)
 app.include_router(analytics.router)
+app.include_router(otlp.router)
 
 @app.get("/")
 def root():
@@ -78,6 +96,6 @@ def root():
 
 @app.get("/health")
 def health():
-    return {"status": "healthy"}
+    return {"status": "healthy", "ingest": ingest_shedder.stats()}
 
 logger.info(f"AgentOps Monitor API started. Allowed origins: {settings.ALLOWED_ORIGINS}")
@@ -0,0 +1,83 @@
+"""
+What it does: Versioned schema migrations, applied in order at startup (replaces Base.metadata.create_all)
+
+Each module in MIGRATIONS has an upgrade(conn) function. Applied versions are
+recorded in the schema_version table; a Postgres advisory lock keeps several
+workers starting at once from running the same migration twice. Every
+migration runs in its own transaction together with its schema_version row.
+
+Run manually with: python -m app.migrations
+"""
+import logging
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from app.migrations import (
+    v001_baseline, v002_columns_since_baseline, v003_integer_keys_and_indexes, v004_time_partitioning,
+    v005_analytics_rollups, v006_latency_sketches, v007_span_self_time, v008_critical_path,
+    v009_flame_graph_paths, v010_cohort_rollups, v011_anomaly_detection,
+    v012_tool_call_primary_key, v013_span_summary_rollups, v014_orphan_collection,
+)
+
+logger = logging.getLogger(__name__)
+
+# (version, module) in the order they are applied; never renumber or edit an applied migration
+MIGRATIONS = [
+    (1, v001_baseline),
+    (2, v002_columns_since_baseline),
+    (3, v003_integer_keys_and_indexes),
+    (4, v004_time_partitioning),
+    (5, v005_analytics_rollups),
+    (6, v006_latency_sketches),
+    (7, v007_span_self_time),
+    (8, v008_critical_path),
+    (9, v009_flame_graph_paths),
+    (10, v010_cohort_rollups),
+    (11, v011_anomaly_detection),
+    (12, v012_tool_call_primary_key),
+    (13, v013_span_summary_rollups),
+    (14, v014_orphan_collection),
+]
+
+# pg_advisory_lock key ("agentops" in ASCII)
+MIGRATION_LOCK_ID = 0x6167656E746F7073
+
+
+def _name(module) -> str:
+    return module.__name__.rsplit(".", 1)[-1]
+
+
+def current_version(conn) -> int:
+    return conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_version")).scalar()
+
+
+def run_migrations(engine: Engine) -> int:
+    """Apply pending migrations; returns the resulting schema version"""
+    with engine.connect() as conn:
+        # Session-level lock: held across the per-migration transactions below
+        conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        conn.commit()
+        try:
+            with conn.begin():
+                conn.execute(text(
+                    "CREATE TABLE IF NOT EXISTS schema_version ("
+                    " version INTEGER PRIMARY KEY,"
+                    " name VARCHAR NOT NULL,"
+                    " applied_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc'))"
+                ))
+                version = current_version(conn)
+            
+            for migration_version, module in MIGRATIONS:
+                if migration_version <= version:
+                    continue
+                logger.info(f"Applying schema migration {migration_version} ({_name(module)})...")
+                with conn.begin():
+                    module.upgrade(conn)
+                    conn.execute(
+                        text("INSERT INTO schema_version (version, name) VALUES (:version, :name)"),
+                        {"version": migration_version, "name": _name(module)}
+                    )
+                version = migration_version
+            return version
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+            conn.commit()
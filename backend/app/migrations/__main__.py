@@ -0,0 +1,11 @@
+"""
+What it does: Applies pending schema migrations (python -m app.migrations)
+"""
+import logging
+from app.database import engine
+from app.migrations import run_migrations
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    version = run_migrations(engine)
+    print(f"✅ Database schema at version {version}")
@@ -0,0 +1,138 @@
+"""
+What it does: Baseline schema - creates any missing tables as they were before migrations existed
+
+Databases created before migrations existed (by Base.metadata.create_all)
+already have these tables, so this only fills gaps. The schema is frozen here
+rather than taken from the current models: later migrations bring every
+database, old or new, to the current schema the same way, and data-copying
+steps (e.g. migration 4) can rely on the columns each step adds.
+"""
+from sqlalchemy import (
+    MetaData, Table, Column, String, Boolean, DateTime, Float, Integer, Text, JSON, LargeBinary, ForeignKey
+)
+from sqlalchemy.dialects.postgresql import UUID
+
+metadata = MetaData()
+
+Table(
+    "users", metadata,
+    Column("id", UUID(as_uuid=True), primary_key=True),
+    Column("email", String, unique=True, index=True, nullable=False),
+    Column("hashed_password", String, nullable=False),
+    Column("full_name", String, nullable=True),
+    Column("is_active", Boolean),
+    Column("created_at", DateTime),
+)
+
+Table(
+    "projects", metadata,
+    Column("id", UUID(as_uuid=True), primary_key=True),
+    Column("name", String, nullable=False),
+    Column("description", Text, nullable=True),
+    Column("api_key", String, unique=True, index=True, nullable=False),
+    Column("is_active", Boolean),
+    Column("owner_id", UUID(as_uuid=True), ForeignKey("users.id"), nullable=False),
+    Column("created_at", DateTime, nullable=False),
+)
+
+Table(
+    "traces", metadata,
+    Column("id", UUID(as_uuid=True), primary_key=True),
+    Column("trace_id", String, unique=True, index=True, nullable=False),
+    Column("name", String, nullable=False),
+    Column("status", String),
+    Column("project_id", UUID(as_uuid=True), ForeignKey("projects.id"), nullable=False, index=True),
+    Column("start_time", DateTime, nullable=False, index=True),
+    Column("end_time", DateTime, nullable=True),
+    Column("duration_ms", Float, nullable=True),
+    Column("total_tokens", Integer),
+    Column("total_cost", Float),
+    Column("sdk_overhead_ms", Float, nullable=True),
+    Column("meta", JSON),
+    Column("tags", JSON),
+    Column("created_at", DateTime),
+)
+
+Table(
+    "spans", metadata,
+    Column("id", UUID(as_uuid=True), primary_key=True),
+    Column("span_id", String, unique=True, index=True, nullable=False),
+    Column("trace_id", String, ForeignKey("traces.trace_id"), nullable=False),
+    Column("parent_span_id", String, nullable=True),
+    Column("name", String, nullable=False),
+    Column("type", String, nullable=False),
+    Column("status", String),
+    Column("start_time", DateTime, nullable=False),
+    Column("end_time", DateTime, nullable=True),
+    Column("duration_ms", Float, nullable=True),
+    Column("inputs", JSON),
+    Column("outputs", JSON),
+    Column("meta", JSON),
+    Column("error", Text, nullable=True),
+    Column("inputs_blob", String(64), nullable=True),
+    Column("outputs_blob", String(64), nullable=True),
+    Column("created_at", DateTime),
+)
+
+Table(
+    "llm_calls", metadata,
+    Column("id", UUID(as_uuid=True), primary_key=True),
+    Column("span_id", String, ForeignKey("spans.span_id"), nullable=False),
+    Column("model_name", String, nullable=False),
+    Column("provider", String, nullable=False),
+    Column("input_tokens", Integer),
+    Column("output_tokens", Integer),
+    Column("total_tokens", Integer),
+    Column("cost", Float),
+    Column("prompt", Text, nullable=True),
+    Column("response", Text, nullable=True),
+    Column("prompt_parts", JSON, nullable=True),
+    Column("prompt_blob", String(64), nullable=True),
+    Column("response_blob", String(64), nullable=True),
+)
+
+Table(
+    "tool_calls", metadata,
+    Column("id", UUID(as_uuid=True), primary_key=True),
+    Column("span_id", String, ForeignKey("spans.span_id"), nullable=False),
+    Column("tool_name", String, nullable=False),
+    Column("tool_inputs", JSON),
+    Column("tool_outputs", JSON),
+    Column("error", Text, nullable=True),
+    Column("tool_inputs_blob", String(64), nullable=True),
+    Column("tool_outputs_blob", String(64), nullable=True),
+)
+
+Table(
+    "span_profiles", metadata,
+    Column("id", UUID(as_uuid=True), primary_key=True),
+    Column("span_id", String, ForeignKey("spans.span_id"), unique=True, index=True, nullable=False),
+    Column("trace_id", String, ForeignKey("traces.trace_id"), index=True, nullable=False),
+    Column("span_name", String, index=True, nullable=False),
+    Column("interval_ms", Float, nullable=True),
+    Column("sample_count", Integer),
+    Column("stacks", JSON),
+    Column("created_at", DateTime),
+)
+
+Table(
+    "prompt_segments", metadata,
+    Column("project_id", UUID(as_uuid=True), ForeignKey("projects.id"), primary_key=True),
+    Column("hash", String(64), primary_key=True),
+    Column("text", Text, nullable=False),
+    Column("size", Integer, nullable=False),
+    Column("created_at", DateTime),
+)
+
+Table(
+    "blobs", metadata,
+    Column("hash", String(64), primary_key=True),
+    Column("data", LargeBinary, nullable=False),
+    Column("size", Integer, nullable=False),
+    Column("stored_size", Integer, nullable=False),
+    Column("created_at", DateTime),
+)
+
+
+def upgrade(conn):
+    metadata.create_all(bind=conn)
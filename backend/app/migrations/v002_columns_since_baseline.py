@@ -0,0 +1,24 @@
+"""
+What it does: Adds columns introduced after the original schema to databases created by create_all
+(create_all never altered existing tables, so these were missing on older deployments)
+"""
+from sqlalchemy import text
+
+STATEMENTS = [
+    # SDK self-overhead reported per trace
+    "ALTER TABLE traces ADD COLUMN IF NOT EXISTS sdk_overhead_ms DOUBLE PRECISION",
+    # Prompts sent as deduplicated segments
+    "ALTER TABLE llm_calls ADD COLUMN IF NOT EXISTS prompt_parts JSON",
+    # References into the blob store
+    "ALTER TABLE spans ADD COLUMN IF NOT EXISTS inputs_blob VARCHAR(64)",
+    "ALTER TABLE spans ADD COLUMN IF NOT EXISTS outputs_blob VARCHAR(64)",
+    "ALTER TABLE llm_calls ADD COLUMN IF NOT EXISTS prompt_blob VARCHAR(64)",
+    "ALTER TABLE llm_calls ADD COLUMN IF NOT EXISTS response_blob VARCHAR(64)",
+    "ALTER TABLE tool_calls ADD COLUMN IF NOT EXISTS tool_inputs_blob VARCHAR(64)",
+    "ALTER TABLE tool_calls ADD COLUMN IF NOT EXISTS tool_outputs_blob VARCHAR(64)",
+]
+
+
+def upgrade(conn):
+    for statement in STATEMENTS:
+        conn.execute(text(statement))
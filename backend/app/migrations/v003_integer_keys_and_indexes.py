@@ -0,0 +1,58 @@
+"""
+What it does: Compact BIGINT join keys and the indexes analytics/trace queries need
+
+- traces.trace_key / spans.span_key from sequences; spans.trace_key and
+  llm_calls/tool_calls.span_key point at them, so joins compare 8-byte
+  integers instead of "trace_<hex>" strings (public string ids are unchanged)
+- indexes on the previously unindexed join columns, plus composite
+  (project_id, start_time) and (trace_id, start_time) indexes
+"""
+from sqlalchemy import text
+
+STATEMENTS = [
+    # Surrogate keys, backfilled for existing rows
+    "CREATE SEQUENCE IF NOT EXISTS traces_trace_key_seq",
+    "ALTER TABLE traces ADD COLUMN IF NOT EXISTS trace_key BIGINT",
+    "UPDATE traces SET trace_key = nextval('traces_trace_key_seq') WHERE trace_key IS NULL",
+    "ALTER TABLE traces ALTER COLUMN trace_key SET DEFAULT nextval('traces_trace_key_seq')",
+    "CREATE SEQUENCE IF NOT EXISTS spans_span_key_seq",
+    "ALTER TABLE spans ADD COLUMN IF NOT EXISTS span_key BIGINT",
+    "UPDATE spans SET span_key = nextval('spans_span_key_seq') WHERE span_key IS NULL",
+    "ALTER TABLE spans ALTER COLUMN span_key SET DEFAULT nextval('spans_span_key_seq')",
+
+    # Parent references by key
+    "ALTER TABLE spans ADD COLUMN IF NOT EXISTS trace_key BIGINT",
+    "UPDATE spans SET trace_key = traces.trace_key FROM traces "
+    "WHERE spans.trace_id = traces.trace_id AND spans.trace_key IS NULL",
+    "ALTER TABLE llm_calls ADD COLUMN IF NOT EXISTS span_key BIGINT",
+    "UPDATE llm_calls SET span_key = spans.span_key FROM spans "
+    "WHERE llm_calls.span_id = spans.span_id AND llm_calls.span_key IS NULL",
+    "ALTER TABLE tool_calls ADD COLUMN IF NOT EXISTS span_key BIGINT",
+    "UPDATE tool_calls SET span_key = spans.span_key FROM spans "
+    "WHERE tool_calls.span_id = spans.span_id AND tool_calls.span_key IS NULL",
+
+    # Indexes (names match the models so fresh databases get the same ones). The keys come
+    # from sequences; they are not declared UNIQUE because the tables are partitioned later
+    "CREATE INDEX IF NOT EXISTS ix_traces_trace_key ON traces (trace_key)",
+    "CREATE INDEX IF NOT EXISTS ix_traces_project_start ON traces (project_id, start_time) "
+    "INCLUDE (status, duration_ms, total_tokens, total_cost)",
+    "CREATE INDEX IF NOT EXISTS ix_spans_span_key ON spans (span_key)",
+    "CREATE INDEX IF NOT EXISTS ix_spans_trace_key_start ON spans (trace_key, start_time)",
+    "CREATE INDEX IF NOT EXISTS ix_spans_trace_start ON spans (trace_id, start_time)",
+    "CREATE INDEX IF NOT EXISTS ix_spans_parent_span_id ON spans (parent_span_id)",
+    "CREATE INDEX IF NOT EXISTS ix_llm_calls_span_key ON llm_calls (span_key) "
+    "INCLUDE (model_name, provider, input_tokens, output_tokens, total_tokens, cost)",
+    "CREATE INDEX IF NOT EXISTS ix_llm_calls_span_id ON llm_calls (span_id)",
+    "CREATE INDEX IF NOT EXISTS ix_tool_calls_span_key ON tool_calls (span_key)",
+    "CREATE INDEX IF NOT EXISTS ix_tool_calls_span_id ON tool_calls (span_id)",
+
+    "ANALYZE traces",
+    "ANALYZE spans",
+    "ANALYZE llm_calls",
+    "ANALYZE tool_calls",
+]
+
+
+def upgrade(conn):
+    for statement in STATEMENTS:
+        conn.execute(text(statement))
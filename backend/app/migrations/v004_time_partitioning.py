@@ -0,0 +1,198 @@
+"""
+What it does: Converts traces, spans, llm_calls and tool_calls into tables range-partitioned on start_time
+
+Each table is renamed aside, recreated from its model as a partitioned table
+with partitions covering the existing rows, refilled with INSERT ... SELECT and
+the old copy dropped. Partitioned tables can't be the target of foreign keys
+on trace_id/span_id, so those constraints are dropped (the ORM relationships
+join on the same columns). llm_calls/tool_calls get their span's start_time
+as partition key. Also adds projects.retention_days.
+
+The new tables are frozen here as they were at this migration (like the
+baseline), not taken from the current models; later migrations add their
+columns and indexes. Only the columns the old table has are copied.
+For tables that are already partitioned this only makes sure partitions exist.
+"""
+from datetime import datetime
+from sqlalchemy import (
+    MetaData, Table, Column, String, DateTime, Float, Integer, BigInteger, JSON, Text, Index,
+    PrimaryKeyConstraint, ForeignKey, text
+)
+from sqlalchemy.dialects.postgresql import UUID
+from app.core import partitions
+
+metadata = MetaData()
+
+# Referenced by traces.project_id; created by the baseline migration
+Table("projects", metadata, Column("id", UUID(as_uuid=True), primary_key=True))
+
+TABLES = [
+    Table(
+        "traces", metadata,
+        Column("id", UUID(as_uuid=True)),
+        Column("trace_id", String, index=True, nullable=False),
+        Column("trace_key", BigInteger, server_default=text("nextval('traces_trace_key_seq')")),
+        Column("name", String, nullable=False),
+        Column("status", String),
+        Column("project_id", UUID(as_uuid=True), ForeignKey("projects.id"), nullable=False, index=True),
+        Column("start_time", DateTime, nullable=False, index=True),
+        Column("end_time", DateTime, nullable=True),
+        Column("duration_ms", Float, nullable=True),
+        Column("total_tokens", Integer),
+        Column("total_cost", Float),
+        Column("sdk_overhead_ms", Float, nullable=True),
+        Column("meta", JSON),
+        Column("tags", JSON),
+        Column("created_at", DateTime),
+        PrimaryKeyConstraint("id", "start_time"),
+        Index("ix_traces_trace_key", "trace_key"),
+        Index(
+            "ix_traces_project_start", "project_id", "start_time",
+            postgresql_include=["status", "duration_ms", "total_tokens", "total_cost"]
+        ),
+        postgresql_partition_by="RANGE (start_time)",
+    ),
+    Table(
+        "spans", metadata,
+        Column("id", UUID(as_uuid=True)),
+        Column("span_id", String, index=True, nullable=False),
+        Column("trace_id", String, nullable=False),
+        Column("parent_span_id", String, nullable=True),
+        Column("span_key", BigInteger, server_default=text("nextval('spans_span_key_seq')")),
+        Column("trace_key", BigInteger, nullable=True),
+        Column("name", String, nullable=False),
+        Column("type", String, nullable=False),
+        Column("status", String),
+        Column("start_time", DateTime, nullable=False),
+        Column("end_time", DateTime, nullable=True),
+        Column("duration_ms", Float, nullable=True),
+        Column("inputs", JSON),
+        Column("outputs", JSON),
+        Column("meta", JSON),
+        Column("error", Text, nullable=True),
+        Column("inputs_blob", String(64), nullable=True),
+        Column("outputs_blob", String(64), nullable=True),
+        Column("created_at", DateTime),
+        PrimaryKeyConstraint("id", "start_time"),
+        Index("ix_spans_span_key", "span_key"),
+        Index("ix_spans_trace_key_start", "trace_key", "start_time"),
+        Index("ix_spans_trace_start", "trace_id", "start_time"),
+        Index("ix_spans_parent_span_id", "parent_span_id"),
+        postgresql_partition_by="RANGE (start_time)",
+    ),
+    Table(
+        "llm_calls", metadata,
+        Column("id", UUID(as_uuid=True)),
+        Column("span_id", String, nullable=False),
+        Column("span_key", BigInteger, nullable=True),
+        Column("start_time", DateTime, nullable=False),
+        Column("model_name", String, nullable=False),
+        Column("provider", String, nullable=False),
+        Column("input_tokens", Integer),
+        Column("output_tokens", Integer),
+        Column("total_tokens", Integer),
+        Column("cost", Float),
+        Column("prompt", Text, nullable=True),
+        Column("response", Text, nullable=True),
+        Column("prompt_parts", JSON, nullable=True),
+        Column("prompt_blob", String(64), nullable=True),
+        Column("response_blob", String(64), nullable=True),
+        PrimaryKeyConstraint("id", "start_time"),
+        Index(
+            "ix_llm_calls_span_key", "span_key",
+            postgresql_include=["model_name", "provider", "input_tokens", "output_tokens", "total_tokens", "cost"]
+        ),
+        Index("ix_llm_calls_span_id", "span_id"),
+        postgresql_partition_by="RANGE (start_time)",
+    ),
+    Table(
+        "tool_calls", metadata,
+        Column("id", UUID(as_uuid=True)),
+        Column("span_id", String, nullable=False),
+        Column("span_key", BigInteger, nullable=True),
+        Column("start_time", DateTime, nullable=False),
+        Column("tool_name", String, nullable=False),
+        Column("tool_inputs", JSON),
+        Column("tool_outputs", JSON),
+        Column("error", Text, nullable=True),
+        Column("tool_inputs_blob", String(64), nullable=True),
+        Column("tool_outputs_blob", String(64), nullable=True),
+        PrimaryKeyConstraint("id", "start_time"),
+        Index("ix_tool_calls_span_key", "span_key"),
+        Index("ix_tool_calls_span_id", "span_id"),
+        postgresql_partition_by="RANGE (start_time)",
+    ),
+]
+
+# Tables whose foreign keys to traces/spans are dropped
+REFERENCING_TABLES = ["spans", "llm_calls", "tool_calls", "span_profiles"]
+
+
+def _drop_foreign_keys(conn):
+    rows = conn.execute(text(
+        "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+        "WHERE contype = 'f' AND conrelid = ANY(CAST(:tables AS regclass[])) "
+        "AND confrelid IN (CAST('traces' AS regclass), CAST('spans' AS regclass))"
+    ), {"tables": REFERENCING_TABLES}).all()
+    for table, constraint in rows:
+        conn.execute(text(f'ALTER TABLE {table} DROP CONSTRAINT "{constraint}"'))
+
+
+def _add_call_start_times(conn):
+    """Partition key for LLM/tool calls: the start_time of their span"""
+    for table in ("llm_calls", "tool_calls"):
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS start_time TIMESTAMP"))
+        conn.execute(text(
+            f"UPDATE {table} SET start_time = spans.start_time FROM spans "
+            f"WHERE {table}.span_key = spans.span_key AND {table}.start_time IS NULL"
+        ))
+        # Orphaned calls (no span) still need a partition
+        conn.execute(text(
+            f"UPDATE {table} SET start_time = now() AT TIME ZONE 'utc' WHERE start_time IS NULL"
+        ))
+
+
+def _set_aside(conn, table: str) -> str:
+    """Rename a table and its indexes out of the way of the partitioned replacement"""
+    old = f"{table}_unpartitioned"
+    conn.execute(text(f"ALTER TABLE {table} RENAME TO {old}"))
+    indexes = conn.execute(
+        text("SELECT indexname FROM pg_indexes WHERE tablename = :table"), {"table": old}
+    ).scalars().all()
+    for index in indexes:
+        conn.execute(text(f'ALTER INDEX "{index}" RENAME TO "{(index + "_unpartitioned")[-63:]}"'))
+    return old
+
+
+def _convert(conn, new_table: Table):
+    table = new_table.name
+    old = _set_aside(conn, table)
+    new_table.create(bind=conn, checkfirst=True)
+
+    now = datetime.utcnow()
+    first, last = conn.execute(text(f"SELECT MIN(start_time), MAX(start_time) FROM {old}")).one()
+    start = min(first or now, now)
+    end = partitions.next_interval(partitions.interval_start(max(last or now, now)))
+    partitions.create_partitions(conn, table, start, end)
+    partitions.ensure_default_partition(conn, table)
+
+    existing = set(conn.execute(text(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = :table"
+    ), {"table": old}).scalars())
+    columns = ", ".join(column.name for column in new_table.columns if column.name in existing)
+    conn.execute(text(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {old}"))
+    conn.execute(text(f"DROP TABLE {old}"))
+    conn.execute(text(f"ANALYZE {table}"))
+
+
+def upgrade(conn):
+    conn.execute(text("ALTER TABLE projects ADD COLUMN IF NOT EXISTS retention_days INTEGER"))
+
+    pending = [table for table in TABLES if not partitions.is_partitioned(conn, table.name)]
+    if pending:
+        _drop_foreign_keys(conn)
+        _add_call_start_times(conn)
+        for table in pending:
+            _convert(conn, table)
+    partitions.ensure_partitions(conn)
@@ -0,0 +1,57 @@
+"""
+What it does: Creates the hourly/daily analytics rollup tables and their watermark row
+
+Rollups start out live from the moment this runs (ingest keeps them up to
+date); the backfill job in app.core.rollups then recomputes older days from the
+raw tables. Until it has, analytics read those days from the raw tables.
+The tables are frozen here as they were at this migration (later ones add columns).
+"""
+from sqlalchemy import MetaData, Table, Column, String, DateTime, Integer, BigInteger, Float, text
+from sqlalchemy.dialects.postgresql import UUID
+
+metadata = MetaData()
+
+
+def _rollup_table(name: str) -> Table:
+    return Table(
+        name, metadata,
+        Column("project_id", UUID(as_uuid=True), primary_key=True),
+        Column("bucket", DateTime, primary_key=True),
+        Column("model_name", String, primary_key=True),
+        Column("provider", String, primary_key=True),
+        Column("trace_count", Integer, nullable=False),
+        Column("duration_count", Integer, nullable=False),
+        Column("duration_ms_sum", Float, nullable=False),
+        Column("duration_ms_min", Float, nullable=True),
+        Column("duration_ms_max", Float, nullable=True),
+        Column("sdk_overhead_ms", Float, nullable=False),
+        Column("overhead_duration_ms", Float, nullable=False),
+        Column("llm_span_count", Integer, nullable=False),
+        Column("tool_span_count", Integer, nullable=False),
+        Column("call_count", Integer, nullable=False),
+        Column("input_tokens", BigInteger, nullable=False),
+        Column("output_tokens", BigInteger, nullable=False),
+        Column("total_tokens", BigInteger, nullable=False),
+        Column("cost", Float, nullable=False),
+    )
+
+
+TABLES = [
+    _rollup_table("analytics_rollup_hourly"),
+    _rollup_table("analytics_rollup_daily"),
+    Table(
+        "analytics_rollup_state", metadata,
+        Column("id", Integer, primary_key=True),
+        Column("live_since", DateTime, nullable=False),
+        Column("covered_from", DateTime, nullable=True),
+    ),
+]
+
+
+def upgrade(conn):
+    for table in TABLES:
+        table.create(bind=conn, checkfirst=True)
+    conn.execute(text(
+        "INSERT INTO analytics_rollup_state (id, live_since, covered_from) "
+        "VALUES (1, now() AT TIME ZONE 'utc', NULL) ON CONFLICT (id) DO NOTHING"
+    ))
@@ -0,0 +1,73 @@
+"""
+What it does: Adds latency sketches to the analytics rollups, plus per-tool span rollups
+
+Creates the SQL function agentops_sketch_merge(jsonb, jsonb) and aggregate
+agentops_sketch_sum(jsonb), which add sketches bucket by bucket (see
+app.core.sketch). Existing rollups have no sketches, so they are emptied and
+rebuilt: ingest keeps them live from now on and the backfill job recomputes
+older days, which analytics read from the raw tables in the meantime.
+The span rollup tables are frozen here as they were at this migration.
+"""
+from sqlalchemy import MetaData, Table, Column, String, DateTime, Integer, Float, text
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+
+metadata = MetaData()
+
+SPAN_ROLLUP_TABLES = [
+    Table(
+        name, metadata,
+        Column("project_id", UUID(as_uuid=True), primary_key=True),
+        Column("bucket", DateTime, primary_key=True),
+        Column("kind", String, primary_key=True),
+        Column("name", String, primary_key=True),
+        Column("call_count", Integer, nullable=False),
+        Column("duration_count", Integer, nullable=False),
+        Column("duration_ms_sum", Float, nullable=False),
+        Column("duration_sketch", JSONB, nullable=False, server_default=text("'{}'::jsonb")),
+    )
+    for name in ("analytics_span_rollup_hourly", "analytics_span_rollup_daily")
+]
+
+# Emptied at the end (see the module docstring)
+ROLLUP_TABLES = [
+    "analytics_rollup_hourly", "analytics_rollup_daily",
+    "analytics_span_rollup_hourly", "analytics_span_rollup_daily",
+]
+
+
+def upgrade(conn):
+    for table in ("analytics_rollup_hourly", "analytics_rollup_daily"):
+        conn.execute(text(
+            f"ALTER TABLE {table} "
+            f"ADD COLUMN IF NOT EXISTS duration_sketch JSONB NOT NULL DEFAULT '{{}}'::jsonb"
+        ))
+    for table in SPAN_ROLLUP_TABLES:
+        table.create(bind=conn, checkfirst=True)
+
+    conn.execute(text("""
+        CREATE OR REPLACE FUNCTION agentops_sketch_merge(a jsonb, b jsonb) RETURNS jsonb
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+            SELECT COALESCE(jsonb_object_agg(key, total), '{}'::jsonb)
+            FROM (
+                SELECT key, SUM(value::bigint) AS total
+                FROM (
+                    SELECT * FROM jsonb_each_text(COALESCE(a, '{}'::jsonb))
+                    UNION ALL
+                    SELECT * FROM jsonb_each_text(COALESCE(b, '{}'::jsonb))
+                ) AS entries
+                GROUP BY key
+            ) AS sums
+            WHERE total <> 0
+        $$
+    """))
+    conn.execute(text("DROP AGGREGATE IF EXISTS agentops_sketch_sum(jsonb)"))
+    conn.execute(text(
+        "CREATE AGGREGATE agentops_sketch_sum(jsonb) ("
+        " SFUNC = agentops_sketch_merge, STYPE = jsonb, INITCOND = '{}',"
+        " COMBINEFUNC = agentops_sketch_merge, PARALLEL = SAFE)"
+    ))
+
+    conn.execute(text(f"TRUNCATE {', '.join(ROLLUP_TABLES)}"))
+    conn.execute(text(
+        "UPDATE analytics_rollup_state SET live_since = now() AT TIME ZONE 'utc', covered_from = NULL"
+    ))
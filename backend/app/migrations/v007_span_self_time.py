@@ -0,0 +1,64 @@
+"""
+What it does: Stores per-span self time and adds errors, self time and agents to the span rollups
+
+- spans.self_ms: duration not covered by the span's children (see
+  app.core.span_tree), computed here for existing spans; overlapping children
+  count once and are clipped to their parent
+- error_count / self_ms_sum on the span rollup tables, which now also hold
+  one row per agent; rollups are emptied and rebuilt as in migration 6
+"""
+from sqlalchemy import text
+
+SPAN_ROLLUP_TABLES = ["analytics_span_rollup_hourly", "analytics_span_rollup_daily"]
+# Emptied at the end (see the module docstring)
+ROLLUP_TABLES = ["analytics_rollup_hourly", "analytics_rollup_daily"] + SPAN_ROLLUP_TABLES
+
+# Union of each parent's child intervals: a child adds the part of it past the
+# furthest end of the children that started before it
+SELF_TIME_BACKFILL = """
+    WITH children AS (
+        SELECT child.trace_id, child.parent_span_id,
+               GREATEST(child.start_time, parent.start_time) AS start_time,
+               LEAST(child.end_time, parent.end_time) AS end_time
+        FROM spans child
+        JOIN spans parent ON parent.trace_id = child.trace_id AND parent.span_id = child.parent_span_id
+        WHERE child.end_time IS NOT NULL AND parent.end_time IS NOT NULL
+    ), ordered AS (
+        SELECT trace_id, parent_span_id, start_time, end_time,
+               MAX(end_time) OVER (
+                   PARTITION BY trace_id, parent_span_id ORDER BY start_time, end_time
+                   ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+               ) AS reached
+        FROM children
+    ), covered AS (
+        SELECT trace_id, parent_span_id,
+               SUM(GREATEST(EXTRACT(EPOCH FROM (
+                   end_time - GREATEST(start_time, COALESCE(reached, start_time))
+               )) * 1000, 0)) AS covered_ms
+        FROM ordered
+        GROUP BY trace_id, parent_span_id
+    )
+    UPDATE spans SET self_ms = GREATEST(spans.duration_ms - COALESCE(covered.covered_ms, 0), 0)
+    FROM spans AS span
+    LEFT JOIN covered ON covered.trace_id = span.trace_id AND covered.parent_span_id = span.span_id
+    WHERE spans.id = span.id AND spans.start_time = span.start_time
+      AND spans.duration_ms IS NOT NULL AND spans.end_time IS NOT NULL AND spans.self_ms IS NULL
+"""
+
+
+def upgrade(conn):
+    conn.execute(text("ALTER TABLE spans ADD COLUMN IF NOT EXISTS self_ms DOUBLE PRECISION"))
+    conn.execute(text(SELF_TIME_BACKFILL))
+
+    for table in SPAN_ROLLUP_TABLES:
+        conn.execute(text(
+            f"ALTER TABLE {table} "
+            f"ADD COLUMN IF NOT EXISTS error_count INTEGER NOT NULL DEFAULT 0, "
+            f"ADD COLUMN IF NOT EXISTS self_ms_sum DOUBLE PRECISION NOT NULL DEFAULT 0"
+        ))
+
+    conn.execute(text(f"TRUNCATE {', '.join(ROLLUP_TABLES)}"))
+    conn.execute(text(
+        "UPDATE analytics_rollup_state SET live_since = now() AT TIME ZONE 'utc', covered_from = NULL"
+    ))
+    conn.execute(text("ANALYZE spans"))
@@ -0,0 +1,91 @@
+"""
+What it does: Stores each span's share of its trace's critical path and adds the critical path rollups
+
+- spans.critical_ms / spans.on_critical_path (see app.core.span_tree),
+  computed here for existing traces in batches of BATCH_TRACES
+- analytics_critical_path_hourly/_daily; rollups are emptied and rebuilt as
+  in migration 6
+"""
+from collections import defaultdict
+from sqlalchemy import MetaData, Table, Column, String, DateTime, Integer, Float, text
+from sqlalchemy.dialects.postgresql import UUID
+from app.core.span_tree import critical_path
+
+BATCH_TRACES = 1000
+
+metadata = MetaData()
+
+# Frozen as they were at this migration
+CRITICAL_PATH_TABLES = [
+    Table(
+        name, metadata,
+        Column("project_id", UUID(as_uuid=True), primary_key=True),
+        Column("bucket", DateTime, primary_key=True),
+        Column("name", String, primary_key=True),
+        Column("trace_count", Integer, nullable=False),
+        Column("dominant_count", Integer, nullable=False),
+        Column("span_count", Integer, nullable=False),
+        Column("critical_ms_sum", Float, nullable=False),
+    )
+    for name in ("analytics_critical_path_hourly", "analytics_critical_path_daily")
+]
+
+# Emptied at the end (see the module docstring)
+ROLLUP_TABLES = [
+    "analytics_rollup_hourly", "analytics_rollup_daily",
+    "analytics_span_rollup_hourly", "analytics_span_rollup_daily",
+    "analytics_critical_path_hourly", "analytics_critical_path_daily",
+]
+
+
+def _backfill_critical_path(conn):
+    after = 0
+    while True:
+        traces = conn.execute(text(
+            "SELECT trace_key, start_time, end_time FROM traces "
+            "WHERE trace_key > :after ORDER BY trace_key LIMIT :limit"
+        ), {"after": after, "limit": BATCH_TRACES}).all()
+        if not traces:
+            return
+        after = traces[-1].trace_key
+
+        spans_by_trace = defaultdict(list)
+        for span in conn.execute(text(
+            "SELECT id, trace_key, span_id, parent_span_id, start_time, end_time FROM spans "
+            "WHERE trace_key = ANY(:keys) AND end_time IS NOT NULL"
+        ), {"keys": [trace.trace_key for trace in traces]}):
+            spans_by_trace[span.trace_key].append(span)
+
+        ids, starts, critical = [], [], []
+        for trace in traces:
+            spans = spans_by_trace.get(trace.trace_key, [])
+            path = critical_path(spans, trace.start_time, trace.end_time)
+            for span in spans:
+                if span.span_id in path:
+                    ids.append(str(span.id))
+                    starts.append(span.start_time)
+                    critical.append(path[span.span_id])
+        if ids:
+            conn.execute(text(
+                "UPDATE spans SET critical_ms = path.critical_ms, on_critical_path = true "
+                "FROM (SELECT unnest(CAST(:ids AS uuid[])) AS id, unnest(CAST(:starts AS timestamp[])) AS start_time, "
+                "unnest(CAST(:critical AS double precision[])) AS critical_ms) AS path "
+                "WHERE spans.id = path.id AND spans.start_time = path.start_time"
+            ), {"ids": ids, "starts": starts, "critical": critical})
+
+
+def upgrade(conn):
+    conn.execute(text(
+        "ALTER TABLE spans "
+        "ADD COLUMN IF NOT EXISTS critical_ms DOUBLE PRECISION, "
+        "ADD COLUMN IF NOT EXISTS on_critical_path BOOLEAN NOT NULL DEFAULT false"
+    ))
+    _backfill_critical_path(conn)
+    for table in CRITICAL_PATH_TABLES:
+        table.create(bind=conn, checkfirst=True)
+
+    conn.execute(text(f"TRUNCATE {', '.join(ROLLUP_TABLES)}"))
+    conn.execute(text(
+        "UPDATE analytics_rollup_state SET live_since = now() AT TIME ZONE 'utc', covered_from = NULL"
+    ))
+    conn.execute(text("ANALYZE spans"))
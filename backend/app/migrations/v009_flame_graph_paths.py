@@ -0,0 +1,65 @@
+"""
+What it does: Adds trace families and the path rollups behind aggregated flame graphs
+
+- traces.family: the name with per-run ids masked (see app.core.trace_family),
+  computed here once per distinct name in batches of BATCH_NAMES
+- analytics_path_rollup_hourly/_daily; rollups are emptied and rebuilt as
+  in migration 6
+"""
+from sqlalchemy import MetaData, Table, Column, String, DateTime, Integer, Float, text
+from sqlalchemy.dialects.postgresql import UUID
+from app.core.trace_family import trace_family
+
+BATCH_NAMES = 1000
+
+metadata = MetaData()
+
+# Frozen as they were at this migration
+PATH_ROLLUP_TABLES = [
+    Table(
+        name, metadata,
+        Column("project_id", UUID(as_uuid=True), primary_key=True),
+        Column("bucket", DateTime, primary_key=True),
+        Column("family", String, primary_key=True),
+        Column("tag", String, primary_key=True),
+        Column("path", String, primary_key=True),
+        Column("trace_count", Integer, nullable=False),
+        Column("span_count", Integer, nullable=False),
+        Column("total_ms_sum", Float, nullable=False),
+        Column("self_ms_sum", Float, nullable=False),
+    )
+    for name in ("analytics_path_rollup_hourly", "analytics_path_rollup_daily")
+]
+
+# Emptied at the end (see the module docstring)
+ROLLUP_TABLES = [
+    "analytics_rollup_hourly", "analytics_rollup_daily",
+    "analytics_span_rollup_hourly", "analytics_span_rollup_daily",
+    "analytics_critical_path_hourly", "analytics_critical_path_daily",
+    "analytics_path_rollup_hourly", "analytics_path_rollup_daily",
+]
+
+
+def _backfill_families(conn):
+    names = conn.execute(text("SELECT DISTINCT name FROM traces WHERE family IS NULL")).scalars().all()
+    for offset in range(0, len(names), BATCH_NAMES):
+        batch = names[offset:offset + BATCH_NAMES]
+        conn.execute(text(
+            "UPDATE traces SET family = families.family "
+            "FROM (SELECT unnest(CAST(:names AS varchar[])) AS name, "
+            "unnest(CAST(:families AS varchar[])) AS family) AS families "
+            "WHERE traces.name = families.name AND traces.family IS NULL"
+        ), {"names": batch, "families": [trace_family(name) for name in batch]})
+
+
+def upgrade(conn):
+    conn.execute(text("ALTER TABLE traces ADD COLUMN IF NOT EXISTS family VARCHAR"))
+    _backfill_families(conn)
+    for table in PATH_ROLLUP_TABLES:
+        table.create(bind=conn, checkfirst=True)
+
+    conn.execute(text(f"TRUNCATE {', '.join(ROLLUP_TABLES)}"))
+    conn.execute(text(
+        "UPDATE analytics_rollup_state SET live_since = now() AT TIME ZONE 'utc', covered_from = NULL"
+    ))
+    conn.execute(text("ANALYZE traces"))
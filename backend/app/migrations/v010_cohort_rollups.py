@@ -0,0 +1,51 @@
+"""
+What it does: Adds the cohort rollups used to compare time windows, tags and releases
+
+- analytics_cohort_rollup_hourly/_daily (see app.core.rollups), frozen here as
+  they were at this migration; rollups are emptied and rebuilt as in migration 6
+"""
+from sqlalchemy import MetaData, Table, Column, String, DateTime, Integer, BigInteger, Float, text
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+
+metadata = MetaData()
+
+COHORT_ROLLUP_TABLES = [
+    Table(
+        name, metadata,
+        Column("project_id", UUID(as_uuid=True), primary_key=True),
+        Column("bucket", DateTime, primary_key=True),
+        Column("dimension", String, primary_key=True),
+        Column("value", String, primary_key=True),
+        Column("kind", String, primary_key=True),
+        Column("name", String, primary_key=True),
+        Column("count", Integer, nullable=False),
+        Column("error_count", Integer, nullable=False),
+        Column("duration_count", Integer, nullable=False),
+        Column("duration_ms_sum", Float, nullable=False),
+        Column("tokens_sum", BigInteger, nullable=False),
+        Column("tokens_sumsq", Float, nullable=False),
+        Column("cost_sum", Float, nullable=False),
+        Column("cost_sumsq", Float, nullable=False),
+        Column("duration_sketch", JSONB, nullable=False, server_default=text("'{}'::jsonb")),
+    )
+    for name in ("analytics_cohort_rollup_hourly", "analytics_cohort_rollup_daily")
+]
+
+# Emptied at the end (see the module docstring)
+ROLLUP_TABLES = [
+    "analytics_rollup_hourly", "analytics_rollup_daily",
+    "analytics_span_rollup_hourly", "analytics_span_rollup_daily",
+    "analytics_critical_path_hourly", "analytics_critical_path_daily",
+    "analytics_path_rollup_hourly", "analytics_path_rollup_daily",
+    "analytics_cohort_rollup_hourly", "analytics_cohort_rollup_daily",
+]
+
+
+def upgrade(conn):
+    for table in COHORT_ROLLUP_TABLES:
+        table.create(bind=conn, checkfirst=True)
+
+    conn.execute(text(f"TRUNCATE {', '.join(ROLLUP_TABLES)}"))
+    conn.execute(text(
+        "UPDATE analytics_rollup_state SET live_since = now() AT TIME ZONE 'utc', covered_from = NULL"
+    ))
@@ -0,0 +1,45 @@
+"""
+What it does: Adds the tables of the streaming anomaly detector (see app.core.anomalies)
+
+- analytics_anomaly_baselines: per project, trace family / model baselines,
+  learned from the hours ingested from now on
+- analytics_anomalies: the hours that deviated from them
+
+Both are frozen here as they were at this migration.
+"""
+from sqlalchemy import MetaData, Table, Column, String, DateTime, Integer, Float, Index, text
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+
+metadata = MetaData()
+
+TABLES = [
+    Table(
+        "analytics_anomaly_baselines", metadata,
+        Column("project_id", UUID(as_uuid=True), primary_key=True),
+        Column("kind", String, primary_key=True),
+        Column("name", String, primary_key=True),
+        Column("current_hour", DateTime, nullable=False),
+        Column("state", JSONB, nullable=False, server_default=text("'{}'::jsonb")),
+        Column("updated_at", DateTime),
+    ),
+    Table(
+        "analytics_anomalies", metadata,
+        Column("project_id", UUID(as_uuid=True), primary_key=True),
+        Column("bucket", DateTime, primary_key=True),
+        Column("kind", String, primary_key=True),
+        Column("name", String, primary_key=True),
+        Column("metric", String, primary_key=True),
+        Column("observed", Float, nullable=False),
+        Column("expected", Float, nullable=False),
+        Column("stddev", Float, nullable=False),
+        Column("z_score", Float, nullable=False),
+        Column("sample_count", Integer, nullable=False),
+        Column("detected_at", DateTime, nullable=False),
+        Index("ix_analytics_anomalies_bucket", "bucket"),
+    ),
+]
+
+
+def upgrade(conn):
+    for table in TABLES:
+        table.create(bind=conn, checkfirst=True)
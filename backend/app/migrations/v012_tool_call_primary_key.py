@@ -0,0 +1,14 @@
+"""
+What it does: Adds the (id, start_time) primary key that migration 4 left off the partitioned tool_calls table
+
+Databases converted by migration 4 since the fix already have it.
+"""
+from sqlalchemy import text
+
+
+def upgrade(conn):
+    has_key = conn.execute(text(
+        "SELECT 1 FROM pg_constraint WHERE conrelid = CAST('tool_calls' AS regclass) AND contype = 'p'"
+    )).first()
+    if not has_key:
+        conn.execute(text("ALTER TABLE tool_calls ADD PRIMARY KEY (id, start_time)"))
@@ -0,0 +1,23 @@
+"""
+What it does: Rebuilds the rollups so SDK span-budget summary spans count every span they folded
+
+Tool/agent span rows and tool cohort rows now take calls, durations and
+percentiles from meta.span_summary instead of counting a summary as one call;
+rollups are emptied and rebuilt as in migration 6.
+"""
+from sqlalchemy import text
+
+ROLLUP_TABLES = [
+    "analytics_rollup_hourly", "analytics_rollup_daily",
+    "analytics_span_rollup_hourly", "analytics_span_rollup_daily",
+    "analytics_critical_path_hourly", "analytics_critical_path_daily",
+    "analytics_path_rollup_hourly", "analytics_path_rollup_daily",
+    "analytics_cohort_rollup_hourly", "analytics_cohort_rollup_daily",
+]
+
+
+def upgrade(conn):
+    conn.execute(text(f"TRUNCATE {', '.join(ROLLUP_TABLES)}"))
+    conn.execute(text(
+        "UPDATE analytics_rollup_state SET live_since = now() AT TIME ZONE 'utc', covered_from = NULL"
+    ))
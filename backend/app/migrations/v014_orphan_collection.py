@@ -0,0 +1,32 @@
+"""
+What it does: Lets partition maintenance collect blobs and prompt segments that no row references any more
+
+- blobs/prompt_segments.last_used_at: bumped when an ingest stores or reuses
+  them, so ones an in-flight ingest depends on are never collected
+- partial indexes on the *_blob reference columns and a GIN index on
+  llm_calls.prompt_parts, so checking whether something is still referenced
+  is an index probe
+"""
+from sqlalchemy import text
+
+STATEMENTS = [
+    "ALTER TABLE blobs ADD COLUMN IF NOT EXISTS last_used_at TIMESTAMP",
+    "UPDATE blobs SET last_used_at = COALESCE(created_at, now() AT TIME ZONE 'utc') WHERE last_used_at IS NULL",
+    "ALTER TABLE prompt_segments ADD COLUMN IF NOT EXISTS last_used_at TIMESTAMP",
+    "UPDATE prompt_segments SET last_used_at = COALESCE(created_at, now() AT TIME ZONE 'utc') WHERE last_used_at IS NULL",
+    "CREATE INDEX IF NOT EXISTS ix_spans_inputs_blob ON spans (inputs_blob) WHERE inputs_blob IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS ix_spans_outputs_blob ON spans (outputs_blob) WHERE outputs_blob IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS ix_llm_calls_prompt_blob ON llm_calls (prompt_blob) WHERE prompt_blob IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS ix_llm_calls_response_blob ON llm_calls (response_blob) WHERE response_blob IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS ix_tool_calls_tool_inputs_blob ON tool_calls (tool_inputs_blob) "
+    "WHERE tool_inputs_blob IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS ix_tool_calls_tool_outputs_blob ON tool_calls (tool_outputs_blob) "
+    "WHERE tool_outputs_blob IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS ix_llm_calls_prompt_segments ON llm_calls "
+    "USING gin ((CAST(prompt_parts AS jsonb)) jsonb_path_ops)",
+]
+
+
+def upgrade(conn):
+    for statement in STATEMENTS:
+        conn.execute(text(statement))
@@ -4,5 +4,17 @@ from app.models.user import User
 from app.models.project import Project
 from app.models.trace import Trace
 from app.models.span import Span, LLMCall, ToolCall
+from app.models.profile import SpanProfile
+from app.models.prompt import PromptSegment
+from app.models.blob import Blob
+from app.models.rollup import (
+    AnalyticsRollupHourly, AnalyticsRollupDaily, SpanRollupHourly, SpanRollupDaily,
+    CriticalPathRollupHourly, CriticalPathRollupDaily, PathRollupHourly, PathRollupDaily,
+    CohortRollupHourly, CohortRollupDaily, RollupState
+)
+from app.models.anomaly import AnomalyBaseline, Anomaly
 
-__all__ = ["User", "Project", "Trace", "Span", "LLMCall", "ToolCall"]
+__all__ = ["User", "Project", "Trace", "Span", "LLMCall", "ToolCall", "SpanProfile", "PromptSegment", "Blob",
+           "AnalyticsRollupHourly", "AnalyticsRollupDaily", "SpanRollupHourly", "SpanRollupDaily",
+           "CriticalPathRollupHourly", "CriticalPathRollupDaily", "PathRollupHourly", "PathRollupDaily",
+           "CohortRollupHourly", "CohortRollupDaily", "RollupState", "AnomalyBaseline", "Anomaly"]
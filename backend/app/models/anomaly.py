@@ -0,0 +1,41 @@
+"""
+What it does: Anomaly detection tables - per-series baselines and the anomalies found (see app.core.anomalies)
+"""
+from sqlalchemy import Column, String, DateTime, Integer, Float, Index, text
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from datetime import datetime
+from app.database import Base
+
+
+class AnomalyBaseline(Base):
+    """One row per series: the hour being filled and the baselines learned from earlier hours"""
+    __tablename__ = "analytics_anomaly_baselines"
+
+    project_id = Column(UUID(as_uuid=True), primary_key=True)
+    kind = Column(String, primary_key=True)  # "trace" or "model"
+    name = Column(String, primary_key=True)  # Trace.family / model name
+    current_hour = Column(DateTime, nullable=False)  # hours before it are in the baselines
+    # metric -> {"level", "variance", "season": [24 hour-of-day offsets], "hours"}
+    state = Column(JSONB, nullable=False, default=dict, server_default=text("'{}'::jsonb"))
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class Anomaly(Base):
+    __tablename__ = "analytics_anomalies"
+    __table_args__ = (
+        # Listing anomalies of all projects, newest first
+        Index("ix_analytics_anomalies_bucket", "bucket"),
+    )
+
+    project_id = Column(UUID(as_uuid=True), primary_key=True)
+    bucket = Column(DateTime, primary_key=True)  # the hour (UTC) that deviated
+    kind = Column(String, primary_key=True)
+    name = Column(String, primary_key=True)
+    metric = Column(String, primary_key=True)  # app.core.anomalies.METRICS
+
+    observed = Column(Float, nullable=False)
+    expected = Column(Float, nullable=False)
+    stddev = Column(Float, nullable=False)
+    z_score = Column(Float, nullable=False)  # > 0: above the baseline
+    sample_count = Column(Integer, nullable=False)  # traces / LLM calls in the hour
+    detected_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,22 @@
+"""
+What it does: Blobs table - content-addressed store for large prompts, responses and span/tool payloads
+Rows in spans/llm_calls/tool_calls hold the sha256 in a *_blob column instead of the body
+"""
+from sqlalchemy import Column, String, DateTime, Integer, LargeBinary
+from datetime import datetime
+from app.database import Base
+
+
+class Blob(Base):
+    __tablename__ = "blobs"
+
+    hash = Column(String(64), primary_key=True)  # sha256 hex of the uncompressed body
+
+    data = Column(LargeBinary, nullable=False)  # zlib-compressed body
+    size = Column(Integer, nullable=False)
+    stored_size = Column(Integer, nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    # Bumped (at most every LAST_USED_REFRESH) when an ingest stores or reuses the blob;
+    # partition maintenance deletes unreferenced blobs unused for ORPHAN_GC_GRACE_HOURS
+    last_used_at = Column(DateTime, default=datetime.utcnow)
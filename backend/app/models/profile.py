@@ -0,0 +1,24 @@
+"""
+What it does: SpanProfiles table - aggregated sampling-profiler stacks for a single span
+Stacks are stored collapsed ("root;child;leaf" -> sample count) so they can be merged into flame graphs
+"""
+from sqlalchemy import Column, String, DateTime, Float, Integer, JSON
+from sqlalchemy.dialects.postgresql import UUID
+from datetime import datetime
+import uuid
+from app.database import Base
+
+
+class SpanProfile(Base):
+    __tablename__ = "span_profiles"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    span_id = Column(String, unique=True, index=True, nullable=False)  # spans.span_id
+    trace_id = Column(String, index=True, nullable=False)  # traces.trace_id
+    span_name = Column(String, index=True, nullable=False)
+
+    interval_ms = Column(Float, nullable=True)
+    sample_count = Column(Integer, default=0)
+    stacks = Column(JSON, default={})  # {"collapsed;stack": count}
+
+    created_at = Column(DateTime, default=datetime.utcnow)
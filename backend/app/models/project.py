@@ -1,7 +1,7 @@
 """
 What it does: Projects table - each user can have multiple projects with unique API keys
 """
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text, Integer
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -17,6 +17,8 @@ class Project(Base):
     api_key = Column(String, unique=True, index=True, nullable=False)
     is_active = Column(Boolean, default=True)
     owner_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    # Days of traces to keep (NULL = settings.RETENTION_DAYS, 0 = forever)
+    retention_days = Column(Integer, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     
     # Relationships
@@ -0,0 +1,22 @@
+"""
+What it does: PromptSegments table - large prompt pieces (e.g. system instructions) stored once per project
+LLM calls reference them by hash from llm_calls.prompt_parts; prompts are rebuilt on read
+"""
+from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, Text
+from sqlalchemy.dialects.postgresql import UUID
+from datetime import datetime
+from app.database import Base
+
+
+class PromptSegment(Base):
+    __tablename__ = "prompt_segments"
+
+    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id"), primary_key=True)
+    hash = Column(String(64), primary_key=True)  # sha256 hex of text
+
+    text = Column(Text, nullable=False)
+    size = Column(Integer, nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    # Bumped when an ingest stores or references the segment (see Blob.last_used_at)
+    last_used_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,157 @@
+"""
+What it does: Analytics rollup tables - summable metrics per project, model and hour/day (see app.core.rollups)
+The row with model_name = provider = "" holds trace-level metrics; other rows hold LLM call metrics per model.
+Span rollups hold per-tool and per-agent call counts and latencies; critical path
+rollups how often and how long each span name was on its trace's critical path;
+path rollups the spans at each root-to-span path of names, for aggregated flame graphs;
+cohort rollups per trace family, model and tool metrics of all traces and of each
+tag / meta value, for comparing cohorts.
+"""
+from sqlalchemy import Column, String, DateTime, Integer, BigInteger, Float, text
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from app.database import Base
+
+
+class RollupColumns:
+    """Columns shared by the hourly and daily rollup tables"""
+
+    project_id = Column(UUID(as_uuid=True), primary_key=True)
+    bucket = Column(DateTime, primary_key=True)  # start of the hour/day (UTC)
+    model_name = Column(String, primary_key=True, default="")
+    provider = Column(String, primary_key=True, default="")
+
+    # Trace-level metrics (model_name = provider = "")
+    trace_count = Column(Integer, nullable=False, default=0)
+    duration_count = Column(Integer, nullable=False, default=0)  # traces with a duration
+    duration_ms_sum = Column(Float, nullable=False, default=0.0)
+    duration_ms_min = Column(Float, nullable=True)
+    duration_ms_max = Column(Float, nullable=True)
+    sdk_overhead_ms = Column(Float, nullable=False, default=0.0)
+    overhead_duration_ms = Column(Float, nullable=False, default=0.0)  # duration of traces reporting overhead
+    llm_span_count = Column(Integer, nullable=False, default=0)
+    tool_span_count = Column(Integer, nullable=False, default=0)
+
+    # LLM call metrics (one row per model)
+    call_count = Column(Integer, nullable=False, default=0)
+    input_tokens = Column(BigInteger, nullable=False, default=0)
+    output_tokens = Column(BigInteger, nullable=False, default=0)
+    total_tokens = Column(BigInteger, nullable=False, default=0)
+    cost = Column(Float, nullable=False, default=0.0)
+
+    # Latency sketch {bucket index: count} (see app.core.sketch): trace
+    # durations on the trace row, LLM span durations on model rows
+    duration_sketch = Column(JSONB, nullable=False, default=dict, server_default=text("'{}'::jsonb"))
+
+
+class AnalyticsRollupHourly(RollupColumns, Base):
+    __tablename__ = "analytics_rollup_hourly"
+
+
+class AnalyticsRollupDaily(RollupColumns, Base):
+    __tablename__ = "analytics_rollup_daily"
+
+
+class SpanRollupColumns:
+    """Columns shared by the hourly and daily span rollup tables"""
+
+    project_id = Column(UUID(as_uuid=True), primary_key=True)
+    bucket = Column(DateTime, primary_key=True)  # start of the hour/day (UTC) the trace started in
+    kind = Column(String, primary_key=True)  # "tool" or "agent" (app.core.rollups.SPAN_KINDS)
+    name = Column(String, primary_key=True)  # tool name / agent span name
+
+    call_count = Column(Integer, nullable=False, default=0)
+    error_count = Column(Integer, nullable=False, default=0, server_default="0")
+    duration_count = Column(Integer, nullable=False, default=0)  # calls with a duration
+    duration_ms_sum = Column(Float, nullable=False, default=0.0)
+    self_ms_sum = Column(Float, nullable=False, default=0.0, server_default="0")  # Span.self_ms
+    duration_sketch = Column(JSONB, nullable=False, default=dict, server_default=text("'{}'::jsonb"))
+
+
+class SpanRollupHourly(SpanRollupColumns, Base):
+    __tablename__ = "analytics_span_rollup_hourly"
+
+
+class SpanRollupDaily(SpanRollupColumns, Base):
+    __tablename__ = "analytics_span_rollup_daily"
+
+
+class CriticalPathRollupColumns:
+    """Columns shared by the hourly and daily critical path rollup tables"""
+
+    project_id = Column(UUID(as_uuid=True), primary_key=True)
+    bucket = Column(DateTime, primary_key=True)  # start of the hour/day (UTC) the trace started in
+    name = Column(String, primary_key=True)  # span name; "" for per-trace totals
+
+    trace_count = Column(Integer, nullable=False, default=0)  # traces with the name on their critical path
+    dominant_count = Column(Integer, nullable=False, default=0)  # ... where it has the largest share of it
+    span_count = Column(Integer, nullable=False, default=0)
+    critical_ms_sum = Column(Float, nullable=False, default=0.0)  # Span.critical_ms
+
+
+class CriticalPathRollupHourly(CriticalPathRollupColumns, Base):
+    __tablename__ = "analytics_critical_path_hourly"
+
+
+class CriticalPathRollupDaily(CriticalPathRollupColumns, Base):
+    __tablename__ = "analytics_critical_path_daily"
+
+
+class PathRollupColumns:
+    """Columns shared by the hourly and daily path rollup tables"""
+
+    project_id = Column(UUID(as_uuid=True), primary_key=True)
+    bucket = Column(DateTime, primary_key=True)  # start of the hour/day (UTC) the trace started in
+    family = Column(String, primary_key=True)  # Trace.family ("" if unknown)
+    tag = Column(String, primary_key=True)  # a trace tag; "" for rows counting every trace
+    path = Column(String, primary_key=True)  # "root;child;..." span names; "" for per-trace totals
+
+    trace_count = Column(Integer, nullable=False, default=0)  # traces with spans at the path
+    span_count = Column(Integer, nullable=False, default=0)
+    total_ms_sum = Column(Float, nullable=False, default=0.0)  # Span.duration_ms (Trace.duration_ms on totals)
+    self_ms_sum = Column(Float, nullable=False, default=0.0)  # Span.self_ms
+
+
+class PathRollupHourly(PathRollupColumns, Base):
+    __tablename__ = "analytics_path_rollup_hourly"
+
+
+class PathRollupDaily(PathRollupColumns, Base):
+    __tablename__ = "analytics_path_rollup_daily"
+
+
+class CohortRollupColumns:
+    """Columns shared by the hourly and daily cohort rollup tables"""
+
+    project_id = Column(UUID(as_uuid=True), primary_key=True)
+    bucket = Column(DateTime, primary_key=True)  # start of the hour/day (UTC) the trace started in
+    dimension = Column(String, primary_key=True)  # "" (all traces), "tag" or "meta.<key>"
+    value = Column(String, primary_key=True)  # the tag / meta value ("" for all traces)
+    kind = Column(String, primary_key=True)  # "trace", "model" or "tool"
+    name = Column(String, primary_key=True)  # Trace.family / model name / tool name
+
+    count = Column(Integer, nullable=False, default=0)  # traces / LLM calls / tool calls
+    error_count = Column(Integer, nullable=False, default=0)  # ... with an error (traces: in any span)
+    duration_count = Column(Integer, nullable=False, default=0)
+    duration_ms_sum = Column(Float, nullable=False, default=0.0)
+    tokens_sum = Column(BigInteger, nullable=False, default=0)
+    tokens_sumsq = Column(Float, nullable=False, default=0.0)
+    cost_sum = Column(Float, nullable=False, default=0.0)
+    cost_sumsq = Column(Float, nullable=False, default=0.0)
+    duration_sketch = Column(JSONB, nullable=False, default=dict, server_default=text("'{}'::jsonb"))
+
+
+class CohortRollupHourly(CohortRollupColumns, Base):
+    __tablename__ = "analytics_cohort_rollup_hourly"
+
+
+class CohortRollupDaily(CohortRollupColumns, Base):
+    __tablename__ = "analytics_cohort_rollup_daily"
+
+
+class RollupState(Base):
+    """Single row: rollups are complete for buckets at or after covered_from"""
+    __tablename__ = "analytics_rollup_state"
+
+    id = Column(Integer, primary_key=True)
+    live_since = Column(DateTime, nullable=False)  # when ingest started maintaining rollups
+    covered_from = Column(DateTime, nullable=True)  # NULL until the first backfill step
@@ -5,7 +5,7 @@ What it does:
 - ToolCall table: Details of tool executions (google_search, calculator, etc.)
 """
 
-from sqlalchemy import Column, String, DateTime, ForeignKey, Float, Integer, JSON, Text
+from sqlalchemy import Column, String, DateTime, Float, Integer, BigInteger, Boolean, JSON, Text, Index, Sequence, PrimaryKeyConstraint, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -13,13 +13,33 @@ import uuid
 from app.database import Base
 
 
+# Compact internal key used for joins (span_id stays the public id)
+SPAN_KEY_SEQ = Sequence("spans_span_key_seq")
+
+# All three tables are range-partitioned on start_time (see app.core.partitions):
+# primary keys include it, and ids are linked without database foreign keys
+
+
 class Span(Base):
     __tablename__ = "spans"
+    __table_args__ = (
+        PrimaryKeyConstraint("id", "start_time"),
+        Index("ix_spans_span_key", "span_key"),
+        Index("ix_spans_trace_key_start", "trace_key", "start_time"),
+        Index("ix_spans_trace_start", "trace_id", "start_time"),
+        Index("ix_spans_parent_span_id", "parent_span_id"),
+        # Blob references, probed when collecting unreferenced blobs
+        Index("ix_spans_inputs_blob", "inputs_blob", postgresql_where=text("inputs_blob IS NOT NULL")),
+        Index("ix_spans_outputs_blob", "outputs_blob", postgresql_where=text("outputs_blob IS NOT NULL")),
+        {"postgresql_partition_by": "RANGE (start_time)"},
+    )
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    span_id = Column(String, unique=True, index=True, nullable=False)
-    trace_id = Column(String, ForeignKey("traces.trace_id"), nullable=False)
+    id = Column(UUID(as_uuid=True), default=uuid.uuid4)
+    span_id = Column(String, index=True, nullable=False)
+    trace_id = Column(String, nullable=False)  # traces.trace_id
     parent_span_id = Column(String, nullable=True)  # For nested spans
+    span_key = Column(BigInteger, SPAN_KEY_SEQ, server_default=SPAN_KEY_SEQ.next_value())
+    trace_key = Column(BigInteger, nullable=True)  # traces.trace_key
 
     # Basic info
     name = Column(String, nullable=False)
@@ -32,30 +52,58 @@ class Span(Base):
     start_time = Column(DateTime, nullable=False)
     end_time = Column(DateTime, nullable=True)
     duration_ms = Column(Float, nullable=True)
+    self_ms = Column(Float, nullable=True)  # duration not covered by child spans (app.core.span_tree)
+    critical_ms = Column(Float, nullable=True)  # time on the trace's critical path; NULL when off it
+    on_critical_path = Column(Boolean, nullable=False, default=False, server_default="false")
 
     # Data
     inputs = Column(JSON, default={})
     outputs = Column(JSON, default={})
     meta = Column(JSON, default={})  # Store ADK/A2A specific meta
     error = Column(Text, nullable=True)
+    
+    # sha256 of large inputs/outputs moved to the blob store (column then holds {})
+    inputs_blob = Column(String(64), nullable=True)
+    outputs_blob = Column(String(64), nullable=True)
 
     created_at = Column(DateTime, default=datetime.utcnow)
 
     # Relationships
-    trace = relationship("Trace", back_populates="spans")
+    trace = relationship(
+        "Trace", primaryjoin="Trace.trace_id == foreign(Span.trace_id)", back_populates="spans"
+    )
     llm_call = relationship(
-        "LLMCall", back_populates="span", uselist=False, cascade="all, delete-orphan"
+        "LLMCall", primaryjoin="Span.span_id == foreign(LLMCall.span_id)",
+        back_populates="span", uselist=False, cascade="all, delete-orphan"
     )
     tool_call = relationship(
-        "ToolCall", back_populates="span", uselist=False, cascade="all, delete-orphan"
+        "ToolCall", primaryjoin="Span.span_id == foreign(ToolCall.span_id)",
+        back_populates="span", uselist=False, cascade="all, delete-orphan"
     )
+    
+    __mapper_args__ = {"primary_key": [id]}
 
 
 class LLMCall(Base):
     __tablename__ = "llm_calls"
+    __table_args__ = (
+        PrimaryKeyConstraint("id", "start_time"),
+        # Covers the model/cost rollups joined from spans
+        Index(
+            "ix_llm_calls_span_key", "span_key",
+            postgresql_include=["model_name", "provider", "input_tokens", "output_tokens", "total_tokens", "cost"]
+        ),
+        Index("ix_llm_calls_span_id", "span_id"),
+        Index("ix_llm_calls_prompt_blob", "prompt_blob", postgresql_where=text("prompt_blob IS NOT NULL")),
+        Index("ix_llm_calls_response_blob", "response_blob", postgresql_where=text("response_blob IS NOT NULL")),
+        # Migration 14 also adds a GIN index (ix_llm_calls_prompt_segments) on CAST(prompt_parts AS jsonb)
+        {"postgresql_partition_by": "RANGE (start_time)"},
+    )
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    span_id = Column(String, ForeignKey("spans.span_id"), nullable=False)
+    id = Column(UUID(as_uuid=True), default=uuid.uuid4)
+    span_id = Column(String, nullable=False)  # spans.span_id
+    span_key = Column(BigInteger, nullable=True)  # spans.span_key
+    start_time = Column(DateTime, nullable=False)  # the span's start_time (partition key)
 
     # Model info
     model_name = Column(String, nullable=False)  # e.g., "gemini-2.0-flash"
@@ -72,21 +120,48 @@ class LLMCall(Base):
     # Content (optional, can be disabled for privacy)
     prompt = Column(Text, nullable=True)
     response = Column(Text, nullable=True)
+    # Prompt sent as parts: [{"text": ...} | {"segment": hash}] (see PromptSegment); prompt is then NULL
+    prompt_parts = Column(JSON, nullable=True)
+    # sha256 of a large prompt/response moved to the blob store (column then NULL)
+    prompt_blob = Column(String(64), nullable=True)
+    response_blob = Column(String(64), nullable=True)
 
     # Relationships
-    span = relationship("Span", back_populates="llm_call")
+    span = relationship(
+        "Span", primaryjoin="Span.span_id == foreign(LLMCall.span_id)", back_populates="llm_call"
+    )
+    
+    __mapper_args__ = {"primary_key": [id]}
 
 
 class ToolCall(Base):
     __tablename__ = "tool_calls"
+    __table_args__ = (
+        PrimaryKeyConstraint("id", "start_time"),
+        Index("ix_tool_calls_span_key", "span_key"),
+        Index("ix_tool_calls_span_id", "span_id"),
+        Index("ix_tool_calls_tool_inputs_blob", "tool_inputs_blob", postgresql_where=text("tool_inputs_blob IS NOT NULL")),
+        Index("ix_tool_calls_tool_outputs_blob", "tool_outputs_blob", postgresql_where=text("tool_outputs_blob IS NOT NULL")),
+        {"postgresql_partition_by": "RANGE (start_time)"},
+    )
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    span_id = Column(String, ForeignKey("spans.span_id"), nullable=False)
+    id = Column(UUID(as_uuid=True), default=uuid.uuid4)
+    span_id = Column(String, nullable=False)  # spans.span_id
+    span_key = Column(BigInteger, nullable=True)  # spans.span_key
+    start_time = Column(DateTime, nullable=False)  # the span's start_time (partition key)
 
     tool_name = Column(String, nullable=False)  # e.g., "google_search", "calculator"
     tool_inputs = Column(JSON, default={})
     tool_outputs = Column(JSON, default={})
     error = Column(Text, nullable=True)
+    
+    # sha256 of large inputs/outputs moved to the blob store (column then holds {})
+    tool_inputs_blob = Column(String(64), nullable=True)
+    tool_outputs_blob = Column(String(64), nullable=True)
 
     # Relationships
-    span = relationship("Span", back_populates="tool_call")
+    span = relationship(
+        "Span", primaryjoin="Span.span_id == foreign(ToolCall.span_id)", back_populates="tool_call"
+    )
+    
+    __mapper_args__ = {"primary_key": [id]}
@@ -2,19 +2,36 @@
 What it does: Traces table - stores complete agent execution runs
 Each trace = one agent execution (e.g., "runner.run('question')")
 """
-from sqlalchemy import Column, String, DateTime, ForeignKey, Float, Integer, JSON
+from sqlalchemy import Column, String, DateTime, ForeignKey, Float, Integer, BigInteger, JSON, Index, Sequence, PrimaryKeyConstraint
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import uuid
 from app.database import Base
 
+# Compact internal key used for joins (trace_id stays the public id)
+TRACE_KEY_SEQ = Sequence("traces_trace_key_seq")
+
 class Trace(Base):
     __tablename__ = "traces"
+    __table_args__ = (
+        # Range-partitioned on start_time (see app.core.partitions), so the
+        # primary key has to include it and trace_id can't be globally unique
+        PrimaryKeyConstraint("id", "start_time"),
+        Index("ix_traces_trace_key", "trace_key"),
+        # Dashboard queries filter by project and time; INCLUDE lets them skip the heap
+        Index(
+            "ix_traces_project_start", "project_id", "start_time",
+            postgresql_include=["status", "duration_ms", "total_tokens", "total_cost"]
+        ),
+        {"postgresql_partition_by": "RANGE (start_time)"},
+    )
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    trace_id = Column(String, unique=True, index=True, nullable=False)
+    id = Column(UUID(as_uuid=True), default=uuid.uuid4)
+    trace_id = Column(String, index=True, nullable=False)
+    trace_key = Column(BigInteger, TRACE_KEY_SEQ, server_default=TRACE_KEY_SEQ.next_value())
     name = Column(String, nullable=False)  # e.g., "ResearchAgent_run"
+    family = Column(String, nullable=True)  # name with per-run ids masked (app.core.trace_family)
     status = Column(String, default="running")  # running, success, failed
     project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id"), nullable=False, index=True)
     
@@ -27,6 +44,9 @@ class Trace(Base):
     total_tokens = Column(Integer, default=0)
     total_cost = Column(Float, default=0.0)
     
+    # Time the SDK spent in its own code (from meta["sdk_overhead_ms"])
+    sdk_overhead_ms = Column(Float, nullable=True)
+    
     # meta
     meta = Column(JSON, default={})  # Store ADK-specific data
     tags = Column(JSON, default=[])      # e.g., ["adk", "gemini", "a2a"]
@@ -35,4 +55,9 @@ class Trace(Base):
     
     # Relationships
     project = relationship("Project", back_populates="traces")
-    spans = relationship("Span", back_populates="trace", cascade="all, delete-orphan")
+    spans = relationship(
+        "Span", primaryjoin="Trace.trace_id == foreign(Span.trace_id)",
+        back_populates="trace", cascade="all, delete-orphan"
+    )
+    
+    __mapper_args__ = {"primary_key": [id]}
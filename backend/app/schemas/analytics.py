@@ -27,8 +27,13 @@ class AnalyticsSummaryResponse(BaseModel):
     avg_duration_ms: float
     min_duration_ms: float
     max_duration_ms: float
+    p50_duration_ms: float = 0.0  # percentiles within 1% (latency sketches)
+    p90_duration_ms: float = 0.0
+    p99_duration_ms: float = 0.0
     total_duration_ms: float
     unique_projects: int
+    total_sdk_overhead_ms: float = 0.0
+    instrumentation_overhead_pct: float = 0.0  # SDK self-time / traced wall time
 
 
 class TrendDataPoint(BaseModel):
@@ -39,6 +44,10 @@ class TrendDataPoint(BaseModel):
     total_tokens: int
     cost: float
     trace_count: int
+    p50_duration_ms: float = 0.0
+    p90_duration_ms: float = 0.0
+    p99_duration_ms: float = 0.0
+    instrumentation_overhead_pct: float = 0.0
 
 
 class TrendsResponse(BaseModel):
@@ -57,6 +66,9 @@ class ModelBreakdownItem(BaseModel):
     output_tokens: int
     total_tokens: int
     call_count: int
+    p50_latency_ms: float = 0.0  # LLM span durations
+    p90_latency_ms: float = 0.0
+    p99_latency_ms: float = 0.0
 
 
 class ModelsResponse(BaseModel):
@@ -64,6 +76,109 @@ class ModelsResponse(BaseModel):
     models: List[ModelBreakdownItem]
 
 
+class SpanBreakdownItem(BaseModel):
+    """Calls, errors and time spent in one tool or agent"""
+    name: str
+    call_count: int
+    error_count: int
+    error_rate: float  # 0-1
+    total_duration_ms: float
+    avg_duration_ms: float
+    total_self_ms: float  # excluding time in child spans
+    self_time_percentage: float  # share of the self time of all tools/agents
+    p50_duration_ms: float
+    p90_duration_ms: float
+    p99_duration_ms: float
+
+
+class ToolsResponse(BaseModel):
+    """Per-tool breakdown"""
+    tools: List[SpanBreakdownItem]
+
+
+class AgentsResponse(BaseModel):
+    """Per-agent breakdown"""
+    agents: List[SpanBreakdownItem]
+
+
+class CriticalPathItem(BaseModel):
+    """How often and how long spans of one name were on their trace's critical path"""
+    name: str
+    trace_count: int  # traces with the name on their critical path
+    trace_percentage: float
+    dominant_count: int  # traces where it had the largest share of the path
+    dominant_percentage: float
+    span_count: int
+    total_critical_ms: float
+    avg_critical_ms: float  # per trace it was on the path of
+    critical_percentage: float  # share of all critical path time
+
+
+class CriticalPathResponse(BaseModel):
+    """Span names ranked by critical path share"""
+    trace_count: int  # traces with a critical path in the window
+    span_names: List[CriticalPathItem]
+
+
+class MetricShift(BaseModel):
+    """Change of one metric between two cohorts"""
+    metric: str  # p95_duration_ms, error_rate, avg_tokens or avg_cost
+    baseline: float
+    candidate: float
+    baseline_p50: Optional[float] = None  # p95_duration_ms only
+    candidate_p50: Optional[float] = None
+    change_pct: Optional[float]  # None when the baseline is 0
+    p_value: Optional[float]  # None when a cohort is too small to test
+    q_value: Optional[float]  # Benjamini-Hochberg adjusted over all shifts
+    significant: bool
+    regression: bool
+
+
+class CohortComparisonItem(BaseModel):
+    """Shifts of one trace family, model or tool"""
+    kind: str  # trace, model or tool
+    name: str
+    baseline_count: int
+    candidate_count: int
+    shifts: List[MetricShift]
+
+
+class Regression(MetricShift):
+    """A significant shift for the worse"""
+    kind: str
+    name: str
+
+
+class CompareResponse(BaseModel):
+    """Comparison of two cohorts (time windows, tags or meta values)"""
+    baseline_trace_count: int
+    candidate_trace_count: int
+    items: List[CohortComparisonItem]
+    regressions: List[Regression]
+
+
+class AnomalyItem(BaseModel):
+    """An hour of a trace family or model that deviated from its baseline"""
+    project_id: str
+    project_name: str
+    hour: datetime
+    kind: str  # trace or model
+    name: str  # trace family / model name
+    metric: str  # error_rate, p95_duration_ms, avg_tokens or cost
+    observed: float
+    expected: float
+    stddev: float
+    z_score: float  # > 0: above the baseline
+    change_pct: Optional[float]  # None when the expected value is 0
+    sample_count: int  # traces / LLM calls in the hour
+    detected_at: datetime
+
+
+class AnomaliesResponse(BaseModel):
+    """Anomalies found by the streaming detector"""
+    anomalies: List[AnomalyItem]
+
+
 class TopTraceItem(BaseModel):
     """High-usage trace information"""
     trace_id: str
@@ -80,3 +195,11 @@ class TopTraceItem(BaseModel):
 class TopTracesResponse(BaseModel):
     """List of top traces"""
     traces: List[TopTraceItem]
+
+
+class DashboardResponse(BaseModel):
+    """All analytics dashboard panels for one filter set"""
+    summary: AnalyticsSummaryResponse
+    trends: TrendsResponse
+    models: List[ModelBreakdownItem]
+    top_traces: List[TopTraceItem]
@@ -1,13 +1,17 @@
 """
 What it does: Defines formats for creating/viewing projects
 """
-from pydantic import BaseModel, field_serializer
+from pydantic import BaseModel, Field, field_serializer
 from datetime import datetime
 from uuid import UUID
 
 class ProjectCreate(BaseModel):
     name: str
     description: str | None = None
+    retention_days: int | None = Field(default=None, ge=0)  # None = server default, 0 = forever
+
+class ProjectRetentionUpdate(BaseModel):
+    retention_days: int | None = Field(default=None, ge=0)
 
 class ProjectResponse(BaseModel):
     id: UUID
@@ -15,6 +19,7 @@ class ProjectResponse(BaseModel):
     description: str | None
     api_key: str
     is_active: bool
+    retention_days: int | None = None
     created_at: datetime
     
     @field_serializer('id')
@@ -8,6 +8,14 @@ from datetime import datetime
 from uuid import UUID
 
 
+class SpanProfileData(BaseModel):
+    """Collapsed-stack samples recorded by the SDK profiler while the span was active"""
+
+    interval_ms: Optional[float] = None
+    sample_count: int = 0
+    stacks: Dict[str, int] = {}
+
+
 class SpanCreate(BaseModel):
     span_id: str
     trace_id: str
@@ -20,6 +28,7 @@ class SpanCreate(BaseModel):
     outputs: Dict = {}
     meta: Dict = {}
     error: Optional[str] = None
+    profile: Optional[SpanProfileData] = None
 
 
 class LLMCallData(BaseModel):
@@ -28,6 +37,7 @@ class LLMCallData(BaseModel):
     input_tokens: int = 0
     output_tokens: int = 0
     prompt: Optional[str] = None
+    prompt_parts: Optional[List[Dict[str, str]]] = None  # [{"text": ...} | {"segment": hash}]
     response: Optional[str] = None
 
 
@@ -55,12 +65,20 @@ class TraceIngest(BaseModel):
     spans: List[SpanCreate] = []
     llm_calls: Dict[str, LLMCallData] = {}
     tool_calls: Dict[str, ToolCallData] = {}
+    prompt_segments: Dict[str, str] = {}  # sha256 hex -> text, referenced by prompt_parts
+
+
+class TraceBatchIngest(BaseModel):
+    """Batch of traces forwarded by the local collector (each carries its own API key)"""
+
+    traces: List[TraceIngest] = []
 
 
 class TraceResponse(BaseModel):
     id: UUID
     trace_id: str
     name: str
+    family: Optional[str] = None
     status: str
     start_time: datetime
     end_time: Optional[datetime]
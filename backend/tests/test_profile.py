@@ -0,0 +1,25 @@
+"""
+What it does: Unit tests for app.core.profile (merging span profiles into flame graphs)
+"""
+from app.core.profile import DEFAULT_INTERVAL_MS, merge_stacks, to_folded, to_tree
+
+
+def test_merge_stacks_weights_samples_by_interval():
+    merged = merge_stacks([
+        ("tool", {"main;work": 3}, 20.0),
+        ("tool", {"main;work": 1, "main": 2}, 40.0),
+    ])
+    assert merged == {"main;work": 100.0, "main": 80.0}
+
+
+def test_merge_stacks_prefix_and_missing_interval():
+    merged = merge_stacks([("search", {"main": 2}, None)], prefix=True)
+    assert merged == {"search;main": 2 * DEFAULT_INTERVAL_MS}
+
+
+def test_renderers_keep_milliseconds():
+    stacks = {"a;b": 12.5, "a": 30.0}
+    assert to_folded(stacks) == "a 30\na;b 12.5"
+    tree = to_tree(stacks)
+    assert tree["value"] == 42.5
+    assert tree["children"][0]["children"][0] == {"name": "b", "value": 12.5, "children": []}
@@ -0,0 +1,71 @@
+"""
+What it does: Unit tests for app.core.span_tree (self time and critical path)
+"""
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from app.core.span_tree import critical_path, self_times
+
+T0 = datetime(2025, 1, 1)
+
+
+def make_span(span_id, parent_span_id, start_ms, end_ms):
+    end_time = T0 + timedelta(milliseconds=end_ms) if end_ms is not None else None
+    return SimpleNamespace(
+        span_id=span_id,
+        parent_span_id=parent_span_id,
+        start_time=T0 + timedelta(milliseconds=start_ms),
+        end_time=end_time,
+        duration_ms=float(end_ms - start_ms) if end_ms is not None else None,
+    )
+
+
+def test_self_times_subtract_overlapping_children_once():
+    spans = [
+        make_span("root", None, 0, 100),
+        make_span("a", "root", 10, 50),
+        make_span("b", "root", 30, 70),
+        make_span("open", "root", 80, None),
+    ]
+    times = self_times(spans)
+    assert times["root"] == 40.0
+    assert times["a"] == 40.0
+    assert times["open"] is None
+
+
+def test_self_times_ignore_self_parented_span():
+    assert self_times([make_span("loop", "loop", 0, 30)]) == {"loop": 30.0}
+
+
+def test_critical_path_follows_last_finishing_child():
+    spans = [
+        make_span("root", None, 0, 100),
+        make_span("fast", "root", 10, 40),
+        make_span("slow", "root", 20, 90),
+    ]
+    path = critical_path(spans)
+    assert path == {"root": 20.0, "slow": 70.0, "fast": 10.0}
+    assert sum(path.values()) == 100.0
+
+
+def test_critical_path_skips_unfinished_spans():
+    spans = [make_span("root", None, 0, 50), make_span("open", "root", 10, None)]
+    assert critical_path(spans) == {"root": 50.0}
+    assert critical_path([make_span("open", None, 0, None)]) == {}
+
+
+def test_critical_path_self_parented_span_is_top_level():
+    spans = [make_span("loop", "loop", 0, 40), make_span("child", "loop", 10, 30)]
+    assert critical_path(spans) == {"loop": 20.0, "child": 20.0}
+
+
+def test_critical_path_parent_cycle_has_a_root():
+    spans = [make_span("a", "b", 0, 100), make_span("b", "a", 20, 60)]
+    path = critical_path(spans)
+    assert path == {"a": 60.0, "b": 40.0}
+
+
+def test_critical_path_extends_to_trace_window():
+    spans = [make_span("root", None, 10, 50)]
+    path = critical_path(spans, T0, T0 + timedelta(milliseconds=60))
+    assert path == {"root": 40.0}
@@ -19,6 +19,7 @@ import {
   ModelBreakdown as ModelBreakdownType,
   TopTrace,
   AnalyticsFilters,
+  AnalyticsDashboard,
 } from '@/types/analytics'
 import { Project } from '@/types'
 
@@ -73,44 +74,21 @@ function AnalyticsPageContent() {
           ? filters.selectedProjects
           : undefined
 
-      // Fetch all analytics data in parallel
-      const [summaryData, trendsData, modelsData, tracesData] =
-        await Promise.all([
-          analyticsAPI.getSummary(
-            filters.timeRange,
-            filters.customStartDate || undefined,
-            filters.customEndDate || undefined,
-            projectIds
-          ),
-          analyticsAPI.getTrends(
-            filters.timeRange,
-            filters.customStartDate || undefined,
-            filters.customEndDate || undefined,
-            projectIds
-          ),
-          analyticsAPI.getModels(
-            filters.timeRange,
-            filters.customStartDate || undefined,
-            filters.customEndDate || undefined,
-            projectIds
-          ),
-          analyticsAPI.getTopTraces(
-            filters.timeRange,
-            filters.customStartDate || undefined,
-            filters.customEndDate || undefined,
-            projectIds,
-            10,
-            'tokens'
-          ),
-        ])
-
-        // console.log(summaryData, trendsData, modelsData, tracesData, "summaryData, trendsData, modelsData, tracesData")
-
-      setSummary(summaryData)
-      setTrends(trendsData.data)
-      setGranularity(trendsData.granularity)
-      setModelBreakdown(modelsData.models)
-      setTopTraces(tracesData.traces)
+      // Fetch all panels in one request (the backend runs them concurrently)
+      const dashboard: AnalyticsDashboard = await analyticsAPI.getDashboard(
+        filters.timeRange,
+        filters.customStartDate || undefined,
+        filters.customEndDate || undefined,
+        projectIds,
+        10,
+        'tokens'
+      )
+
+      setSummary(dashboard.summary)
+      setTrends(dashboard.trends.data)
+      setGranularity(dashboard.trends.granularity)
+      setModelBreakdown(dashboard.models)
+      setTopTraces(dashboard.top_traces)
     } catch (err: any) {
       console.error('Failed to fetch analytics data:', err)
       setError(err.message || 'Failed to load analytics data')
@@ -13,6 +13,7 @@ import { Button } from "@/components/ui/button";
 import { LLMCallCard } from "@/components/smallComponents/LLMCallCard";
 import { ToolCallCard } from "@/components/smallComponents/ToolCallCard";
 import { TraceStats } from "@/components/smallComponents/TraceStats";
+import { BlobContent } from "@/components/smallComponents/BlobContent";
 import Link from "next/link";
 
 interface TraceDetail {
@@ -159,6 +160,7 @@ export default function TraceDetailPage() {
                         key={span.id}
                         llmCall={span.llm_call!}
                         spanName={span.name}
+                        traceId={traceId}
                       />
                     ))}
                 </div>
@@ -180,6 +182,7 @@ export default function TraceDetailPage() {
                         key={span.id}
                         toolCall={span.tool_call!}
                         spanName={span.name}
+                        traceId={traceId}
                         duration={span.duration_ms}
                       />
                     ))}
@@ -206,9 +209,14 @@ export default function TraceDetailPage() {
                               Type: {span.type} | Span ID: {span.span_id}
                             </p>
                           </div>
-                          <Badge className={getStatusColor(span.status)}>
-                            {span.status.toUpperCase()}
-                          </Badge>
+                          <div className="flex gap-2">
+                            {span.on_critical_path && (
+                              <Badge className="text-orange-600 bg-orange-50">CRITICAL PATH</Badge>
+                            )}
+                            <Badge className={getStatusColor(span.status)}>
+                              {span.status.toUpperCase()}
+                            </Badge>
+                          </div>
                         </div>
 
                         <div className="grid grid-cols-2 md:grid-cols-3 gap-4 mt-3">
@@ -218,6 +226,12 @@ export default function TraceDetailPage() {
                               {span.duration_ms ? `${(span.duration_ms / 1000).toFixed(3)}s` : "N/A"}
                             </p>
                           </div>
+                          {span.self_ms != null && (
+                            <div>
+                              <p className="text-sm text-muted-foreground">Self Time</p>
+                              <p className="text-sm">{`${(span.self_ms / 1000).toFixed(3)}s`}</p>
+                            </div>
+                          )}
                           <div>
                             <p className="text-sm text-muted-foreground">Started</p>
                             <p className="text-sm">{formatDateIST(span.start_time)}</p>
@@ -259,6 +273,28 @@ export default function TraceDetailPage() {
                           </details>
                         )}
 
+                        {span.inputs_blob && (
+                          <BlobContent
+                            traceId={traceId}
+                            blobHash={span.inputs_blob}
+                            label="Inputs"
+                            className="mt-3"
+                            summaryClassName="cursor-pointer text-sm font-semibold"
+                            preClassName="mt-2 p-3 bg-gray-50 rounded text-xs overflow-auto"
+                          />
+                        )}
+
+                        {span.outputs_blob && (
+                          <BlobContent
+                            traceId={traceId}
+                            blobHash={span.outputs_blob}
+                            label="Outputs"
+                            className="mt-3"
+                            summaryClassName="cursor-pointer text-sm font-semibold"
+                            preClassName="mt-2 p-3 bg-gray-50 rounded text-xs overflow-auto"
+                          />
+                        )}
+
                         {span.meta && Object.keys(span.meta).length > 0 && (
                           <details className="mt-3">
                             <summary className="cursor-pointer text-sm font-semibold">
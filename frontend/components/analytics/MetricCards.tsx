@@ -75,8 +75,10 @@ export function MetricCards({ summary, isLoading }: MetricCardsProps) {
           title: "Avg Duration",
           value: formatDuration(summary.avg_duration_ms),
           icon: <Clock className="h-4 w-4 text-orange-600" />,
-          description: `Min: ${formatDuration(
-            summary.min_duration_ms
+          description: `p50: ${formatDuration(
+            summary.p50_duration_ms ?? 0
+          )} / p99: ${formatDuration(
+            summary.p99_duration_ms ?? 0
           )} / Max: ${formatDuration(summary.max_duration_ms)}`,
         },
         {
@@ -101,7 +103,9 @@ export function MetricCards({ summary, isLoading }: MetricCardsProps) {
           title: "Total Duration",
           value: formatDuration(summary.total_duration_ms),
           icon: <Clock className="h-4 w-4 text-red-600" />,
-          description: "Cumulative execution time",
+          description: `Instrumentation overhead: ${(
+            summary.instrumentation_overhead_pct ?? 0
+          ).toFixed(2)}%`,
         },
       ]
     : [];
@@ -0,0 +1,47 @@
+"use client";
+
+import { useState, SyntheticEvent } from "react";
+import { tracesAPI } from "@/libs/api";
+
+interface BlobContentProps {
+  traceId: string;
+  blobHash: string;
+  label: string;
+  className?: string;
+  summaryClassName?: string;
+  preClassName?: string;
+}
+
+// Large payloads are stored separately; fetch the body the first time it is expanded
+export function BlobContent({ traceId, blobHash, label, className, summaryClassName, preClassName }: BlobContentProps) {
+  const [content, setContent] = useState<string | null>(null);
+  const [loading, setLoading] = useState(false);
+  const [error, setError] = useState<string | null>(null);
+
+  const handleToggle = async (e: SyntheticEvent<HTMLDetailsElement>) => {
+    if (!e.currentTarget.open || content !== null || loading) return;
+    setLoading(true);
+    setError(null);
+    try {
+      const blob = await tracesAPI.getBlob(traceId, blobHash);
+      setContent(typeof blob.content === "string" ? blob.content : JSON.stringify(blob.content, null, 2));
+    } catch (err) {
+      setError("Failed to load content");
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  return (
+    <details className={className} onToggle={handleToggle}>
+      <summary className={summaryClassName}>{label}</summary>
+      <div className="p-3 pt-0">
+        {loading && <p className="text-xs text-muted-foreground">Loading...</p>}
+        {error && <p className="text-xs text-red-600">{error}</p>}
+        {content !== null && (
+          <pre className={preClassName}>{content}</pre>
+        )}
+      </div>
+    </details>
+  );
+}
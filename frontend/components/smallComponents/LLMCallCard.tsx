@@ -2,13 +2,15 @@ import { LLMCall } from "@/types";
 import { formatCost } from "@/libs/utils";
 import { Card } from "@/components/ui/card";
 import { Badge } from "@/components/ui/badge";
+import { BlobContent } from "@/components/smallComponents/BlobContent";
 
 interface LLMCallCardProps {
   llmCall: LLMCall;
   spanName: string;
+  traceId: string;
 }
 
-export function LLMCallCard({ llmCall, spanName }: LLMCallCardProps) {
+export function LLMCallCard({ llmCall, spanName, traceId }: LLMCallCardProps) {
   const tokenRatio = llmCall.input_tokens > 0 
     ? (llmCall.output_tokens / llmCall.input_tokens).toFixed(2)
     : "N/A";
@@ -77,6 +79,17 @@ export function LLMCallCard({ llmCall, spanName }: LLMCallCardProps) {
           </details>
         )}
 
+        {!llmCall.prompt && llmCall.prompt_blob && (
+          <BlobContent
+            traceId={traceId}
+            blobHash={llmCall.prompt_blob}
+            label="📝 Prompt"
+            className="bg-white rounded-lg"
+            summaryClassName="cursor-pointer p-3 font-semibold text-sm hover:bg-gray-50 rounded-lg"
+            preClassName="text-xs bg-gray-50 p-3 rounded overflow-auto max-h-60 whitespace-pre-wrap"
+          />
+        )}
+
         {llmCall.response && (
           <details className="bg-white rounded-lg">
             <summary className="cursor-pointer p-3 font-semibold text-sm hover:bg-gray-50 rounded-lg">
@@ -89,6 +102,17 @@ export function LLMCallCard({ llmCall, spanName }: LLMCallCardProps) {
             </div>
           </details>
         )}
+
+        {!llmCall.response && llmCall.response_blob && (
+          <BlobContent
+            traceId={traceId}
+            blobHash={llmCall.response_blob}
+            label="💬 Response"
+            className="bg-white rounded-lg"
+            summaryClassName="cursor-pointer p-3 font-semibold text-sm hover:bg-gray-50 rounded-lg"
+            preClassName="text-xs bg-gray-50 p-3 rounded overflow-auto max-h-60 whitespace-pre-wrap"
+          />
+        )}
       </div>
     </Card>
   );
@@ -1,14 +1,16 @@
 import { ToolCall } from "@/types";
 import { Card } from "@/components/ui/card";
 import { Badge } from "@/components/ui/badge";
+import { BlobContent } from "@/components/smallComponents/BlobContent";
 
 interface ToolCallCardProps {
   toolCall: ToolCall;
   spanName: string;
+  traceId: string;
   duration?: number | null;
 }
 
-export function ToolCallCard({ toolCall, spanName, duration }: ToolCallCardProps) {
+export function ToolCallCard({ toolCall, spanName, traceId, duration }: ToolCallCardProps) {
   const hasError = !!toolCall.error;
 
   return (
@@ -60,6 +62,17 @@ export function ToolCallCard({ toolCall, spanName, duration }: ToolCallCardProps
           </details>
         )}
 
+        {toolCall.tool_inputs_blob && (
+          <BlobContent
+            traceId={traceId}
+            blobHash={toolCall.tool_inputs_blob}
+            label="📥 Inputs"
+            className="bg-white rounded-lg"
+            summaryClassName="cursor-pointer p-3 font-semibold text-sm hover:bg-gray-50 rounded-lg"
+            preClassName="text-xs bg-gray-50 p-3 rounded overflow-auto max-h-60"
+          />
+        )}
+
         {/* Outputs */}
         {!hasError && toolCall.tool_outputs && Object.keys(toolCall.tool_outputs).length > 0 && (
           <details className="bg-white rounded-lg">
@@ -73,6 +86,17 @@ export function ToolCallCard({ toolCall, spanName, duration }: ToolCallCardProps
             </div>
           </details>
         )}
+
+        {!hasError && toolCall.tool_outputs_blob && (
+          <BlobContent
+            traceId={traceId}
+            blobHash={toolCall.tool_outputs_blob}
+            label="📤 Outputs"
+            className="bg-white rounded-lg"
+            summaryClassName="cursor-pointer p-3 font-semibold text-sm hover:bg-gray-50 rounded-lg"
+            preClassName="text-xs bg-gray-50 p-3 rounded overflow-auto max-h-60"
+          />
+        )}
       </div>
     </Card>
   );
@@ -81,6 +81,11 @@ export const tracesAPI = {
     const { data } = await api.get(`/traces/detail/${traceId}`)
     return data
   },
+
+  getBlob: async (traceId: string, blobHash: string) => {
+    const { data } = await api.get(`/traces/detail/${traceId}/blobs/${blobHash}`)
+    return data
+  },
 }
 
 // Analytics API
@@ -139,6 +144,176 @@ export const analyticsAPI = {
     return data
   },
 
+  getTools: async (
+    timeRange: string = 'last_24h',
+    startDate?: Date,
+    endDate?: Date,
+    projectIds?: string[],
+    limit: number = 50,
+    sortBy: string = 'total_time'
+  ) => {
+    const params: any = {
+      time_range: timeRange,
+      limit,
+      sort_by: sortBy,
+    }
+    
+    if (startDate) params.start_date = startDate.toISOString()
+    if (endDate) params.end_date = endDate.toISOString()
+    if (projectIds && projectIds.length > 0) {
+      params.project_ids = projectIds.join(',')
+    }
+    
+    const { data } = await api.get('/analytics/tools', { params })
+    return data
+  },
+
+  getAgents: async (
+    timeRange: string = 'last_24h',
+    startDate?: Date,
+    endDate?: Date,
+    projectIds?: string[],
+    limit: number = 50,
+    sortBy: string = 'total_time'
+  ) => {
+    const params: any = {
+      time_range: timeRange,
+      limit,
+      sort_by: sortBy,
+    }
+    
+    if (startDate) params.start_date = startDate.toISOString()
+    if (endDate) params.end_date = endDate.toISOString()
+    if (projectIds && projectIds.length > 0) {
+      params.project_ids = projectIds.join(',')
+    }
+    
+    const { data } = await api.get('/analytics/agents', { params })
+    return data
+  },
+
+  getCriticalPath: async (
+    timeRange: string = 'last_24h',
+    startDate?: Date,
+    endDate?: Date,
+    projectIds?: string[],
+    limit: number = 50,
+    sortBy: string = 'dominant'
+  ) => {
+    const params: any = {
+      time_range: timeRange,
+      limit,
+      sort_by: sortBy,
+    }
+    
+    if (startDate) params.start_date = startDate.toISOString()
+    if (endDate) params.end_date = endDate.toISOString()
+    if (projectIds && projectIds.length > 0) {
+      params.project_ids = projectIds.join(',')
+    }
+    
+    const { data } = await api.get('/analytics/critical-path', { params })
+    return data
+  },
+
+  getFlamegraph: async (
+    timeRange: string = 'last_24h',
+    startDate?: Date,
+    endDate?: Date,
+    projectIds?: string[],
+    family?: string,
+    tag?: string,
+    weight: 'total' | 'self' = 'total'
+  ) => {
+    const params: any = {
+      time_range: timeRange,
+      weight,
+    }
+    
+    if (startDate) params.start_date = startDate.toISOString()
+    if (endDate) params.end_date = endDate.toISOString()
+    if (projectIds && projectIds.length > 0) {
+      params.project_ids = projectIds.join(',')
+    }
+    if (family) params.family = family
+    if (tag) params.tag = tag
+    
+    const { data } = await api.get('/analytics/flamegraph', { params })
+    return data
+  },
+
+  compareCohorts: async (
+    timeRange: string = 'last_7d',
+    startDate?: Date,
+    endDate?: Date,
+    projectIds?: string[],
+    options: {
+      baselineStart?: Date
+      baselineEnd?: Date
+      candidateStart?: Date
+      candidateEnd?: Date
+      cohort?: string
+      baseline?: string
+      candidate?: string
+      alpha?: number
+      minChangePct?: number
+    } = {}
+  ) => {
+    const params: any = {
+      time_range: timeRange,
+    }
+    
+    if (startDate) params.start_date = startDate.toISOString()
+    if (endDate) params.end_date = endDate.toISOString()
+    if (projectIds && projectIds.length > 0) {
+      params.project_ids = projectIds.join(',')
+    }
+    if (options.baselineStart) params.baseline_start = options.baselineStart.toISOString()
+    if (options.baselineEnd) params.baseline_end = options.baselineEnd.toISOString()
+    if (options.candidateStart) params.candidate_start = options.candidateStart.toISOString()
+    if (options.candidateEnd) params.candidate_end = options.candidateEnd.toISOString()
+    if (options.cohort !== undefined) params.cohort = options.cohort
+    if (options.baseline !== undefined) params.baseline = options.baseline
+    if (options.candidate !== undefined) params.candidate = options.candidate
+    if (options.alpha !== undefined) params.alpha = options.alpha
+    if (options.minChangePct !== undefined) params.min_change_pct = options.minChangePct
+    
+    const { data } = await api.get('/analytics/compare', { params })
+    return data
+  },
+
+  getAnomalies: async (
+    timeRange: string = 'last_7d',
+    startDate?: Date,
+    endDate?: Date,
+    projectIds?: string[],
+    options: {
+      kind?: 'trace' | 'model'
+      name?: string
+      metric?: string
+      direction?: 'up' | 'down'
+      limit?: number
+    } = {}
+  ) => {
+    const params: any = {
+      time_range: timeRange,
+    }
+    
+    if (startDate) params.start_date = startDate.toISOString()
+    if (endDate) params.end_date = endDate.toISOString()
+    if (projectIds && projectIds.length > 0) {
+      params.project_ids = projectIds.join(',')
+    }
+    if (options.kind) params.kind = options.kind
+    if (options.name !== undefined) params.name = options.name
+    if (options.metric) params.metric = options.metric
+    if (options.direction) params.direction = options.direction
+    if (options.limit) params.limit = options.limit
+    
+    const { data } = await api.get('/analytics/anomalies', { params })
+    return data
+  },
+
   getTopTraces: async (
     timeRange: string = 'last_24h',
     startDate?: Date,
@@ -163,6 +338,31 @@ export const analyticsAPI = {
     return data
   },
 
+  // All dashboard panels in one request (queried concurrently on the backend)
+  getDashboard: async (
+    timeRange: string = 'last_24h',
+    startDate?: Date,
+    endDate?: Date,
+    projectIds?: string[],
+    limit: number = 10,
+    sortBy: string = 'tokens'
+  ) => {
+    const params: any = {
+      time_range: timeRange,
+      limit,
+      sort_by: sortBy,
+    }
+    
+    if (startDate) params.start_date = startDate.toISOString()
+    if (endDate) params.end_date = endDate.toISOString()
+    if (projectIds && projectIds.length > 0) {
+      params.project_ids = projectIds.join(',')
+    }
+    
+    const { data } = await api.get('/analytics/dashboard', { params })
+    return data
+  },
+
   exportData: async (
     format: 'csv' | 'json',
     timeRange: string = 'last_24h',
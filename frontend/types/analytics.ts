@@ -9,8 +9,13 @@ export interface AnalyticsSummary {
   avg_duration_ms: number
   min_duration_ms: number
   max_duration_ms: number
+  p50_duration_ms: number
+  p90_duration_ms: number
+  p99_duration_ms: number
   total_duration_ms: number
   unique_projects: number
+  total_sdk_overhead_ms: number
+  instrumentation_overhead_pct: number
 }
 
 export interface TrendData {
@@ -20,6 +25,10 @@ export interface TrendData {
   total_tokens: number
   cost: number
   trace_count: number
+  p50_duration_ms: number
+  p90_duration_ms: number
+  p99_duration_ms: number
+  instrumentation_overhead_pct: number
 }
 
 export interface TrendsResponse {
@@ -36,6 +45,109 @@ export interface ModelBreakdown {
   output_tokens: number
   total_tokens: number
   call_count: number
+  p50_latency_ms: number
+  p90_latency_ms: number
+  p99_latency_ms: number
+}
+
+export interface SpanBreakdown {
+  name: string
+  call_count: number
+  error_count: number
+  error_rate: number
+  total_duration_ms: number
+  avg_duration_ms: number
+  total_self_ms: number
+  self_time_percentage: number
+  p50_duration_ms: number
+  p90_duration_ms: number
+  p99_duration_ms: number
+}
+
+export interface CriticalPathItem {
+  name: string
+  trace_count: number
+  trace_percentage: number
+  dominant_count: number
+  dominant_percentage: number
+  span_count: number
+  total_critical_ms: number
+  avg_critical_ms: number
+  critical_percentage: number
+}
+
+export interface CriticalPathBreakdown {
+  trace_count: number
+  span_names: CriticalPathItem[]
+}
+
+export interface FlameGraphNode {
+  name: string
+  value: number
+  children: FlameGraphNode[]
+}
+
+export interface AggregatedFlameGraph {
+  family: string | null
+  tag: string | null
+  weight: 'total' | 'self'
+  trace_count: number
+  span_count: number
+  total_ms: number
+  flamegraph: FlameGraphNode
+}
+
+export interface MetricShift {
+  metric: 'p95_duration_ms' | 'error_rate' | 'avg_tokens' | 'avg_cost'
+  baseline: number
+  candidate: number
+  baseline_p50?: number | null
+  candidate_p50?: number | null
+  change_pct: number | null
+  p_value: number | null
+  q_value: number | null
+  significant: boolean
+  regression: boolean
+}
+
+export interface CohortComparisonItem {
+  kind: 'trace' | 'model' | 'tool'
+  name: string
+  baseline_count: number
+  candidate_count: number
+  shifts: MetricShift[]
+}
+
+export interface Regression extends MetricShift {
+  kind: 'trace' | 'model' | 'tool'
+  name: string
+}
+
+export interface CohortComparison {
+  baseline_trace_count: number
+  candidate_trace_count: number
+  items: CohortComparisonItem[]
+  regressions: Regression[]
+}
+
+export interface Anomaly {
+  project_id: string
+  project_name: string
+  hour: string
+  kind: 'trace' | 'model'
+  name: string
+  metric: 'error_rate' | 'p95_duration_ms' | 'avg_tokens' | 'cost'
+  observed: number
+  expected: number
+  stddev: number
+  z_score: number
+  change_pct: number | null
+  sample_count: number
+  detected_at: string
+}
+
+export interface AnomaliesResponse {
+  anomalies: Anomaly[]
 }
 
 export interface TopTrace {
@@ -50,6 +162,13 @@ export interface TopTrace {
   status: string
 }
 
+export interface AnalyticsDashboard {
+  summary: AnalyticsSummary
+  trends: TrendsResponse
+  models: ModelBreakdown[]
+  top_traces: TopTrace[]
+}
+
 
 export interface AnalyticsFilters {
   timeRange: 'last_24h' | 'last_7d' | 'last_30d' | 'all_time' | 'custom'
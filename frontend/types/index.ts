@@ -10,6 +10,7 @@ export interface Project {
   description: string | null
   api_key: string
   is_active: boolean
+  retention_days: number | null
   created_at: string
 }
 
@@ -17,6 +18,7 @@ export interface Trace {
   id: string
   trace_id: string
   name: string
+  family?: string | null
   status: 'running' | 'success' | 'failed'
   start_time: string
   end_time: string | null
@@ -48,10 +50,15 @@ export interface Span {
   start_time: string
   end_time: string | null
   duration_ms: number | null
+  self_ms?: number | null
+  critical_ms?: number | null
+  on_critical_path?: boolean
   inputs: any
   outputs: any
   meta: any
   error: string | null
+  inputs_blob?: string | null
+  outputs_blob?: string | null
   llm_call?: LLMCall
   tool_call?: ToolCall
 }
@@ -65,6 +72,8 @@ export interface LLMCall {
   cost: number
   prompt: string | null
   response: string | null
+  prompt_blob?: string | null
+  response_blob?: string | null
 }
 
 export interface ToolCall {
@@ -72,4 +81,6 @@ export interface ToolCall {
   tool_inputs: any
   tool_outputs: any
   error: string | null
+  tool_inputs_blob?: string | null
+  tool_outputs_blob?: string | null
 }
@@ -1,3 +1,4 @@
+import os
 import warnings
 import logging
 
@@ -9,8 +10,11 @@ logging.getLogger('google_adk.google.adk.runners').setLevel(logging.ERROR)
 from .adk.agent_wrapper import monitor_agent
 from .adk.runner_wrapper import monitor_runner
 from .adk.tool_wrapper import wrap_tool
+from .registry import unmonitor
 from .decorators import traceable
 from .client import get_client
+from .profiler import enable_profiling, disable_profiling
+from .multiprocess import forwarding_handle, run_traced, submit_traced
 
 def flush_traces(timeout=5):
     """Wait for all queued traces to be sent. Call this before your script exits."""
@@ -22,15 +26,21 @@ def shutdown():
     client = get_client()
     client.shutdown()
 
+# Opt-in sampling profiler, e.g. AGENTOPS_PROFILE=1
+if os.environ.get("AGENTOPS_PROFILE", "").lower() in ("1", "true", "yes"):
+    enable_profiling()
+
 # Optional import for a2a monitoring
 try:
     from .adk.a2a_monitor import monitor_a2a
     __all__ = [
-        "monitor_agent", "monitor_runner", "monitor_a2a", "wrap_tool", "traceable",
-        "flush_traces", "shutdown"
+        "monitor_agent", "monitor_runner", "monitor_a2a", "wrap_tool", "unmonitor", "traceable",
+        "flush_traces", "shutdown", "enable_profiling", "disable_profiling",
+        "forwarding_handle", "run_traced", "submit_traced"
     ]
 except ImportError:
     __all__ = [
-        "monitor_agent", "monitor_runner", "wrap_tool", "traceable",
-        "flush_traces", "shutdown"
+        "monitor_agent", "monitor_runner", "wrap_tool", "unmonitor", "traceable",
+        "flush_traces", "shutdown", "enable_profiling", "disable_profiling",
+        "forwarding_handle", "run_traced", "submit_traced"
     ]
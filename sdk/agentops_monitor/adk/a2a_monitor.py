@@ -3,11 +3,37 @@
 from google.adk.agents.remote_a2a_agent import RemoteA2aAgent
 
 
+def _inject_traceparent(args, kwargs, traceparent):
+    """
+    Put traceparent where the remote side can read it: HTTP headers if the
+    call takes them, otherwise the A2A message metadata. Returns True if set.
+    """
+    headers = kwargs.get("headers")
+    if isinstance(headers, dict):
+        headers["traceparent"] = traceparent
+        return True
+
+    message = kwargs.get("message", args[0] if args else None)
+    if isinstance(message, dict):
+        message.setdefault("metadata", {})
+        if isinstance(message["metadata"], dict):
+            message["metadata"]["traceparent"] = traceparent
+            return True
+    elif message is not None and hasattr(message, "metadata"):
+        if message.metadata is None:
+            message.metadata = {}
+        if isinstance(message.metadata, dict):
+            message.metadata["traceparent"] = traceparent
+            return True
+    return False
+
+
 def monitor_a2a(remote_agent):
     original_send = remote_agent.send
 
     def wrapped_send(*args, **kwargs):
         from ..tracer import add_span, end_span
+        from ..propagation import current_traceparent
 
         span_id = add_span(
             name="A2A message",
@@ -15,12 +41,18 @@ def monitor_a2a(remote_agent):
             meta={"destination": str(remote_agent.url)},
             inputs={"args": args, "kwargs": kwargs},
         )
+        # Propagate trace context so the remote agent's spans join this trace
+        traceparent = current_traceparent(span_id) if span_id else None
+        if traceparent and _inject_traceparent(args, kwargs, traceparent):
+            end_span_meta = {"traceparent": traceparent}
+        else:
+            end_span_meta = None
         try:
             result = original_send(*args, **kwargs)
-            end_span(span_id, outputs={"response": result})
+            end_span(span_id, outputs={"response": result}, meta=end_span_meta)
             return result
         except Exception as e:
-            end_span(span_id, error=str(e))
+            end_span(span_id, error=str(e), meta=end_span_meta)
             raise
 
     remote_agent.send = wrapped_send
@@ -36,8 +36,19 @@ def extract_model_info(agent):
 
 
 def monitor_agent(agent, api_key):
-    """Monitor agent using Google ADK's callback system"""
+    """
+    Monitor agent using Google ADK's callback system.
+    Idempotent: an agent reachable from several parents is wrapped once.
+    """
     from ..tracer import add_span, end_span
+    from ..overhead import measure_overhead, MODEL_CALLBACKS
+    from ..prompt_dict import register_segment
+    from .. import registry
+
+    # Register before recursing so shared and cyclic agent graphs are wrapped once
+    callbacks = ("before_model_callback", "after_model_callback", "on_model_error_callback")
+    if not registry.register(agent, {name: registry.original_attr(agent, name) for name in callbacks}):
+        return agent
 
     # Extract model info once
     model_name, provider = extract_model_info(agent)
@@ -50,34 +61,42 @@ def monitor_agent(agent, api_key):
 
     def before_model_wrapper(callback_context, llm_request):
         """Called before the model is invoked"""
-        # Extract full prompt from llm_request
-        prompt_parts = []
-        try:
-            # Try to get the full request as string first
-            prompt_str = str(llm_request)
-            if prompt_str and len(prompt_str) > 10:
-                prompt_parts.append(prompt_str)
-
-            # Also try to extract structured data
-            if (
-                hasattr(llm_request, "system_instruction")
-                and llm_request.system_instruction
-            ):
-                prompt_parts.append(f"System: {llm_request.system_instruction}")
-
-            if hasattr(llm_request, "messages") and llm_request.messages:
-                for msg in llm_request.messages:
-                    if hasattr(msg, "content"):
-                        prompt_parts.append(str(msg.content))
-                    elif hasattr(msg, "parts"):
-                        for part in msg.parts:
-                            if hasattr(part, "text"):
-                                prompt_parts.append(part.text)
-        except Exception as e:
-            print(f"[DEBUG] Error extracting prompt: {e}")
-            prompt_parts.append(str(llm_request)[:1000])
-
-        prompt = "\n".join(prompt_parts) if prompt_parts else str(llm_request)[:1000]
+        with measure_overhead(MODEL_CALLBACKS):
+            # Extract full prompt from llm_request
+            prompt_parts = []
+            try:
+                # Try to get the full request as string first
+                prompt_str = str(llm_request)
+                if prompt_str and len(prompt_str) > 10:
+                    prompt_parts.append(prompt_str)
+
+                # Also try to extract structured data
+                if (
+                    hasattr(llm_request, "system_instruction")
+                    and llm_request.system_instruction
+                ):
+                    prompt_parts.append(f"System: {llm_request.system_instruction}")
+
+                if hasattr(llm_request, "messages") and llm_request.messages:
+                    for msg in llm_request.messages:
+                        if hasattr(msg, "content"):
+                            prompt_parts.append(str(msg.content))
+                        elif hasattr(msg, "parts"):
+                            for part in msg.parts:
+                                if hasattr(part, "text"):
+                                    prompt_parts.append(part.text)
+            except Exception as e:
+                print(f"[DEBUG] Error extracting prompt: {e}")
+                prompt_parts.append(str(llm_request)[:1000])
+
+            prompt = "\n".join(prompt_parts) if prompt_parts else str(llm_request)[:1000]
+
+            # The system instruction repeats on every call; send it once, then by hash
+            config = getattr(llm_request, "config", None)
+            register_segment(
+                getattr(config, "system_instruction", None)
+                or getattr(llm_request, "system_instruction", None)
+            )
 
         span_id = add_span(
             name=f"{agent.name}:{agent.__class__.__name__}",
@@ -106,41 +125,42 @@ def monitor_agent(agent, api_key):
         prompt = span_tracker.pop("prompt", "")
 
         if span_id:
-            # Extract response text
-            response_text = ""
-            input_tokens = 0
-            output_tokens = 0
+            with measure_overhead(MODEL_CALLBACKS):
+                # Extract response text
+                response_text = ""
+                input_tokens = 0
+                output_tokens = 0
 
-            try:
-                # Try string representation first
-                response_str = str(llm_response)
-                if response_str and len(response_str) > 10:
-                    response_text = response_str
-
-                # Try to extract structured response
-                if hasattr(llm_response, "candidates") and llm_response.candidates:
-                    candidate = llm_response.candidates[0]
-                    if hasattr(candidate, "content"):
-                        if (
-                            hasattr(candidate.content, "parts")
-                            and candidate.content.parts
-                        ):
-                            parts = candidate.content.parts
-                            if hasattr(parts[0], "text"):
-                                response_text = parts[0].text
-                        elif hasattr(candidate.content, "text"):
-                            response_text = candidate.content.text
-
-                # Extract token usage
-                if hasattr(llm_response, "usage_metadata"):
-                    usage = llm_response.usage_metadata
-                    input_tokens = getattr(usage, "prompt_token_count", 0)
-                    output_tokens = getattr(usage, "candidates_token_count", 0)
-            except Exception as e:
-                print(f"[DEBUG] Error extracting response: {e}")
-                # Fallback to string representation
-                if not response_text:
-                    response_text = str(llm_response)[:1000]
+                try:
+                    # Try string representation first
+                    response_str = str(llm_response)
+                    if response_str and len(response_str) > 10:
+                        response_text = response_str
+
+                    # Try to extract structured response
+                    if hasattr(llm_response, "candidates") and llm_response.candidates:
+                        candidate = llm_response.candidates[0]
+                        if hasattr(candidate, "content"):
+                            if (
+                                hasattr(candidate.content, "parts")
+                                and candidate.content.parts
+                            ):
+                                parts = candidate.content.parts
+                                if hasattr(parts[0], "text"):
+                                    response_text = parts[0].text
+                            elif hasattr(candidate.content, "text"):
+                                response_text = candidate.content.text
+
+                    # Extract token usage
+                    if hasattr(llm_response, "usage_metadata"):
+                        usage = llm_response.usage_metadata
+                        input_tokens = getattr(usage, "prompt_token_count", 0)
+                        output_tokens = getattr(usage, "candidates_token_count", 0)
+                except Exception as e:
+                    print(f"[DEBUG] Error extracting response: {e}")
+                    # Fallback to string representation
+                    if not response_text:
+                        response_text = str(llm_response)[:1000]
 
             # Create LLM call record
             add_llm_call(
@@ -187,13 +207,12 @@ def monitor_agent(agent, api_key):
                 
                 if isinstance(tool, AgentTool):
                     # Get the wrapped agent and monitor it recursively
-                    if hasattr(tool, "agent") or hasattr(tool, "_agent"):
-                        wrapped_agent = getattr(tool, "agent", None) or getattr(tool, "_agent", None)
-                        if wrapped_agent:
-                            # Recursively monitor the nested agent
-                            monitor_agent(wrapped_agent, api_key)
+                    wrapped_agent = registry.nested_agent(tool)
+                    if wrapped_agent:
+                        # Recursively monitor the nested agent (no-op if already monitored)
+                        monitor_agent(wrapped_agent, api_key)
                 else:
-                    # Regular tool - wrap it
+                    # Regular tool - wrap it (no-op if already wrapped)
                     wrap_tool(tool)
             except (ImportError, AttributeError):
                 # If AgentTool is not available or tool doesn't match pattern, try wrapping as regular tool
@@ -1,19 +1,43 @@
 # What it does: Wraps Runner execution so you see every run/step/session in platform
 
-from google.adk.runners import Runner
+import weakref
 
 
-def monitor_runner(runner, api_key):
+def _remote_parent_from_call(traceparent, kwargs):
+    """
+    Incoming trace context for a run: an explicit traceparent argument,
+    run_config.custom_metadata["traceparent"], or one attached with
+    agentops_monitor.propagation.attach() by the A2A server handler
+    """
+    from ..propagation import parse_traceparent, extract, current_remote_parent
+
+    if traceparent:
+        return parse_traceparent(traceparent)
+    run_config = kwargs.get("run_config")
+    custom_metadata = getattr(run_config, "custom_metadata", None)
+    if isinstance(custom_metadata, dict):
+        remote = extract(custom_metadata)
+        if remote:
+            return remote
+    return current_remote_parent()
+
+
+# Runner class -> its WrappedRunner subclass, built once per class
+_wrapped_types = weakref.WeakKeyDictionary()
+
+
+def _wrapped_runner_type(runner_cls):
+    """WrappedRunner subclass of runner_cls (cached, so repeated calls don't create new types)"""
     from ..tracer import new_trace, end_trace, add_span, end_span
     from ..client import send_trace
     from ..name_utils import extract_query_from_message, generate_trace_name
 
-    class WrappedRunner(Runner):
-        def __init__(self, *args, **kwargs):
-            super().__init__(*args, **kwargs)
-            self._api_key = api_key
+    wrapped = _wrapped_types.get(runner_cls)
+    if wrapped is not None:
+        return wrapped
 
-        def run(self, *args, **kwargs):
+    class WrappedRunner(runner_cls):
+        def run(self, *args, traceparent=None, **kwargs):
             # Extract new_message from kwargs
             new_message = kwargs.get("new_message")
 
@@ -35,7 +59,9 @@ def monitor_runner(runner, api_key):
                 "runner_args": str(args)[:200],  # Limit size
                 "trace_type": "runner",  # Preserve original type
             }
-            trace = new_trace(name=trace_name, meta=meta, tags=["adk", "runner"])
+            # Join the caller's trace when invoked by a remote agent
+            remote_parent = _remote_parent_from_call(traceparent, kwargs)
+            trace = new_trace(name=trace_name, meta=meta, tags=["adk", "runner"], remote_parent=remote_parent)
             # Runner step span
             span_id = add_span(
                 "Runner.run", "runner_step", meta, inputs={"args": str(args)[:200]}
@@ -52,26 +78,40 @@ def monitor_runner(runner, api_key):
                 # After generator is exhausted, end the span
                 end_span(span_id, outputs={"completed": True})
 
+            except GeneratorExit:
+                # The caller stopped iterating (not an Exception, so handled separately)
+                end_span(span_id, outputs={"completed": False})
+                raise
             except Exception as e:
                 end_span(span_id, error=str(e))
                 raise
             finally:
                 # End and upload trace with all collected data
                 trace, spans, llm_calls, tool_calls = end_trace()
-                send_trace(trace, spans, llm_calls, tool_calls, api_key=self._api_key)
-
-    # Get the app and session_service from the runner
-    kwargs = {}
-    if hasattr(runner, "app") and runner.app:
-        kwargs["app"] = runner.app
-    elif hasattr(runner, "agent") and runner.agent:
-        # Fallback for older API or direct agent usage
-        kwargs["agent"] = runner.agent
-    else:
+                send_trace(trace, spans, llm_calls, tool_calls, api_key=self._agentops_api_key)
+
+    _wrapped_types[runner_cls] = WrappedRunner
+    return WrappedRunner
+
+
+def monitor_runner(runner, api_key):
+    """
+    Trace every run of a Runner. The runner is instrumented in place (its
+    services, plugins and sessions are kept) by switching it to a cached
+    WrappedRunner subclass; calling this twice is a no-op and
+    agentops_monitor.unmonitor(runner) switches it back.
+    """
+    from .. import registry
+
+    if not (getattr(runner, "app", None) or getattr(runner, "agent", None)):
         raise ValueError("Runner must have either an app or agent attribute")
 
-    # Pass through the session_service
-    if hasattr(runner, "session_service") and runner.session_service:
-        kwargs["session_service"] = runner.session_service
+    if not registry.register(runner, {
+        "__class__": runner.__class__,
+        "_agentops_api_key": registry.original_attr(runner, "_agentops_api_key"),
+    }):
+        return runner
 
-    return WrappedRunner(**kwargs)
+    runner._agentops_api_key = api_key
+    runner.__class__ = _wrapped_runner_type(runner.__class__)
+    return runner
@@ -6,24 +6,33 @@ def wrap_tool(tool):
     """
     Wrap a Google ADK tool to capture its execution.
     Note: Google ADK tools are called via their 'run' method, not __call__
+    Wrapping an already wrapped tool is a no-op, so shared tools get one span per call.
     """
+    from .. import registry
+
+    method = 'run' if hasattr(tool, 'run') else '__call__' if hasattr(tool, '__call__') else None
+    if method is None or not registry.register(tool, {method: registry.original_attr(tool, method)}):
+        return tool
+
     # Check if tool has a 'run' method (Google ADK pattern)
-    if hasattr(tool, 'run'):
+    if method == 'run':
         original_run = tool.run
         
         def wrapped_run(*args, **kwargs):
             from ..tracer import add_span, end_span, add_tool_call
+            from ..overhead import measure_overhead, TOOL_SERIALIZATION
             
-            # Extract tool name - try multiple attributes
-            tool_name = getattr(tool, 'name', None) or getattr(tool, '_name', None) or tool.__class__.__name__
-            tool_description = getattr(tool, 'description', None) or getattr(tool, '_description', '')
-            
-            tool_inputs = {"args": str(args)[:500], "kwargs": str(kwargs)[:500]}
-            
-            # Include tool description in metadata
-            tool_meta = {}
-            if tool_description:
-                tool_meta['description'] = str(tool_description)[:200]
+            with measure_overhead(TOOL_SERIALIZATION):
+                # Extract tool name - try multiple attributes
+                tool_name = getattr(tool, 'name', None) or getattr(tool, '_name', None) or tool.__class__.__name__
+                tool_description = getattr(tool, 'description', None) or getattr(tool, '_description', '')
+                
+                tool_inputs = {"args": str(args)[:500], "kwargs": str(kwargs)[:500]}
+                
+                # Include tool description in metadata
+                tool_meta = {}
+                if tool_description:
+                    tool_meta['description'] = str(tool_description)[:200]
             
             span_id = add_span(
                 name=tool_name,
@@ -35,15 +44,18 @@ def wrap_tool(tool):
             try:
                 result = original_run(*args, **kwargs)
                 
+                with measure_overhead(TOOL_SERIALIZATION):
+                    result_str = str(result)
+                
                 # Create tool call record
                 add_tool_call(
                     span_id=span_id,
                     tool_name=tool_name,
                     tool_inputs=tool_inputs,
-                    tool_outputs={"result": str(result)[:1000]}
+                    tool_outputs={"result": result_str[:1000]}
                 )
                 
-                end_span(span_id, outputs={"result": str(result)[:500]})
+                end_span(span_id, outputs={"result": result_str[:500]})
                 return result
             except Exception as e:
                 # Create tool call record with error
@@ -60,22 +72,24 @@ def wrap_tool(tool):
         tool.run = wrapped_run
     
     # Also try __call__ for other tool types
-    elif hasattr(tool, '__call__'):
+    else:
         original_call = tool.__call__
         
         def wrapped_call(*args, **kwargs):
             from ..tracer import add_span, end_span, add_tool_call
+            from ..overhead import measure_overhead, TOOL_SERIALIZATION
             
-            # Extract tool name - try multiple attributes
-            tool_name = getattr(tool, 'name', None) or getattr(tool, '_name', None) or tool.__class__.__name__
-            tool_description = getattr(tool, 'description', None) or getattr(tool, '_description', '')
-            
-            tool_inputs = {"args": str(args)[:500], "kwargs": str(kwargs)[:500]}
-            
-            # Include tool description in metadata
-            tool_meta = {}
-            if tool_description:
-                tool_meta['description'] = str(tool_description)[:200]
+            with measure_overhead(TOOL_SERIALIZATION):
+                # Extract tool name - try multiple attributes
+                tool_name = getattr(tool, 'name', None) or getattr(tool, '_name', None) or tool.__class__.__name__
+                tool_description = getattr(tool, 'description', None) or getattr(tool, '_description', '')
+                
+                tool_inputs = {"args": str(args)[:500], "kwargs": str(kwargs)[:500]}
+                
+                # Include tool description in metadata
+                tool_meta = {}
+                if tool_description:
+                    tool_meta['description'] = str(tool_description)[:200]
             
             span_id = add_span(
                 name=tool_name,
@@ -87,15 +101,18 @@ def wrap_tool(tool):
             try:
                 result = original_call(*args, **kwargs)
                 
+                with measure_overhead(TOOL_SERIALIZATION):
+                    result_str = str(result)
+                
                 # Create tool call record
                 add_tool_call(
                     span_id=span_id,
                     tool_name=tool_name,
                     tool_inputs=tool_inputs,
-                    tool_outputs={"result": str(result)[:1000]}
+                    tool_outputs={"result": result_str[:1000]}
                 )
                 
-                end_span(span_id, outputs={"result": str(result)[:500]})
+                end_span(span_id, outputs={"result": result_str[:500]})
                 return result
             except Exception as e:
                 # Create tool call record with error
@@ -0,0 +1,276 @@
+# What it does: Bounded trace queue (items and bytes) with pluggable overflow policies
+
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+# Overflow policies
+BLOCK = "block"                                # wait up to block_timeout for room, then drop newest
+DROP_NEWEST = "drop_newest"                    # reject the incoming trace
+DROP_OLDEST = "drop_oldest"                    # evict from the head until the new trace fits
+DROP_LOWEST_PRIORITY = "drop_lowest_priority"  # evict successful traces before failed ones
+DOWNSAMPLE = "downsample"                      # thin successful traces as the queue fills
+
+POLICIES = (BLOCK, DROP_NEWEST, DROP_OLDEST, DROP_LOWEST_PRIORITY, DOWNSAMPLE)
+
+# Priorities: failed traces are kept in preference to successful ones
+PRIORITY_SUCCESS = 0
+PRIORITY_ERROR = 1
+
+
+def trace_priority(spans):
+    """Failed traces (any span with an error) outrank successful ones"""
+    return PRIORITY_ERROR if any(span.get("error") for span in spans) else PRIORITY_SUCCESS
+
+
+class QueueEntry:
+    """A serialized trace waiting to be sent"""
+
+    __slots__ = ("trace_id", "body", "size", "priority", "enqueued_at", "attempts", "prompt_segments")
+
+    def __init__(self, trace_id, body, priority=PRIORITY_SUCCESS, prompt_segments=None):
+        self.trace_id = trace_id
+        self.body = body
+        self.size = len(body)
+        self.priority = priority
+        self.enqueued_at = time.time()
+        self.attempts = 0
+        # (api_key, [hash]) of prompt segments defined in body, acknowledged once delivered
+        self.prompt_segments = prompt_segments
+
+
+class TraceQueue:
+    """
+    FIFO of QueueEntry bounded by both item count and total bytes.
+
+    put() applies the overflow policy and returns (accepted, evicted_entries)
+    so the caller can count drops and signal overload to the agent.
+    """
+
+    def __init__(self, max_items=1000, max_bytes=64 * 1024 * 1024, policy=DROP_LOWEST_PRIORITY,
+                 block_timeout=0.5, downsample_watermark=0.5):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown queue policy {policy!r}, expected one of {POLICIES}")
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.downsample_watermark = downsample_watermark
+
+        self._entries = deque()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+
+    # ---- sizing -------------------------------------------------------------
+
+    def _fits(self, size, items=None, used=None):
+        items = len(self._entries) if items is None else items
+        used = self._bytes if used is None else used
+        return items < self.max_items and used + size <= self.max_bytes
+
+    def fill_ratio(self):
+        """Fraction of the tighter of the two limits currently in use"""
+        with self._lock:
+            return self._fill_ratio()
+
+    def _fill_ratio(self):
+        return max(len(self._entries) / self.max_items, self._bytes / self.max_bytes)
+
+    def sample_rate(self, priority):
+        """
+        Probability of accepting a trace under the downsample policy.
+        Failed traces are always accepted; successful ones are thinned
+        linearly from 1.0 at the watermark to 0.0 when full.
+        """
+        if self.policy != DOWNSAMPLE or priority >= PRIORITY_ERROR:
+            return 1.0
+        fill = self.fill_ratio()
+        if fill <= self.downsample_watermark:
+            return 1.0
+        return max(0.0, (1.0 - fill) / (1.0 - self.downsample_watermark))
+
+    def should_sample(self, priority):
+        """Decide (randomly) whether a trace survives downsampling; returns (keep, rate)"""
+        rate = self.sample_rate(priority)
+        return rate >= 1.0 or random.random() < rate, rate
+
+    # ---- producer side ------------------------------------------------------
+
+    def put(self, entry):
+        evicted = []
+        with self._lock:
+            if entry.size > self.max_bytes:
+                return False, evicted
+
+            if not self._fits(entry.size):
+                if self.policy == BLOCK:
+                    deadline = time.monotonic() + self.block_timeout
+                    while not self._fits(entry.size):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0 or not self._not_full.wait(remaining):
+                            break
+                    if not self._fits(entry.size):
+                        return False, evicted
+                elif self.policy == DROP_NEWEST:
+                    return False, evicted
+                elif self.policy == DROP_OLDEST:
+                    while self._entries and not self._fits(entry.size):
+                        evicted.append(self._pop_left())
+                else:  # DROP_LOWEST_PRIORITY, DOWNSAMPLE
+                    victims = self._victims(entry)
+                    if victims is None:
+                        # Not enough room held by traces that matter no more than the newcomer
+                        return False, evicted
+                    for victim in victims:
+                        self._remove(victim)
+                    evicted.extend(victims)
+
+            self._entries.append(entry)
+            self._bytes += entry.size
+            self._not_empty.notify()
+            return True, evicted
+
+    def requeue(self, entry):
+        """Put a trace back at the head for retry; returns False if there is no room"""
+        with self._lock:
+            if not self._fits(entry.size):
+                return False
+            self._entries.appendleft(entry)
+            self._bytes += entry.size
+            self._not_empty.notify()
+            return True
+
+    def _victims(self, entry):
+        """
+        Entries to evict for entry, lowest priority then oldest first and none
+        above its priority; None if evicting all of those wouldn't make room
+        """
+        items, used = len(self._entries), self._bytes
+        victims = []
+        for victim in sorted((e for e in self._entries if e.priority <= entry.priority), key=lambda e: e.priority):
+            if self._fits(entry.size, items, used):
+                break
+            victims.append(victim)
+            items -= 1
+            used -= victim.size
+        return victims if self._fits(entry.size, items, used) else None
+
+    def _remove(self, entry):
+        self._entries.remove(entry)
+        self._bytes -= entry.size
+
+    def _pop_left(self):
+        entry = self._entries.popleft()
+        self._bytes -= entry.size
+        return entry
+
+    # ---- consumer side ------------------------------------------------------
+
+    def get(self, timeout=None):
+        """Remove and return the oldest entry; raises queue.Empty on timeout"""
+        with self._lock:
+            if not self._entries:
+                self._not_empty.wait(timeout)
+            if not self._entries:
+                raise queue.Empty
+            entry = self._pop_left()
+            self._not_full.notify()
+            return entry
+
+    def qsize(self):
+        with self._lock:
+            return len(self._entries)
+
+    def empty(self):
+        return self.qsize() == 0
+
+    def snapshot(self):
+        """Queue gauges for stats()"""
+        with self._lock:
+            oldest = self._entries[0].enqueued_at if self._entries else None
+            return {
+                "queue_depth": len(self._entries),
+                "queue_bytes": self._bytes,
+                "queue_capacity": self.max_items,
+                "queue_capacity_bytes": self.max_bytes,
+                "queue_policy": self.policy,
+                "oldest_queued_age_s": round(time.time() - oldest, 3) if oldest else 0.0,
+            }
+
+
+def queue_from_env(max_items=None):
+    """Build a TraceQueue from AGENTOPS_QUEUE_* environment variables"""
+    return TraceQueue(
+        max_items=max_items or int(os.environ.get("AGENTOPS_QUEUE_MAX_ITEMS", "1000")),
+        max_bytes=int(os.environ.get("AGENTOPS_QUEUE_MAX_BYTES", str(64 * 1024 * 1024))),
+        policy=os.environ.get("AGENTOPS_QUEUE_POLICY", DROP_LOWEST_PRIORITY).lower(),
+        block_timeout=float(os.environ.get("AGENTOPS_QUEUE_BLOCK_TIMEOUT", "0.5")),
+        downsample_watermark=float(os.environ.get("AGENTOPS_QUEUE_DOWNSAMPLE_WATERMARK", "0.5")),
+    )
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD limit on concurrent sends: halves on overload signals from the
+    backend, grows by one slot per `limit` successful sends up to max_limit.
+    Used as a context manager around each send.
+    """
+
+    def __init__(self, max_limit=2):
+        self.max_limit = max(1, max_limit)
+        self.limit = float(self.max_limit)
+        self.in_use = 0
+        self._cond = threading.Condition()
+
+    def __enter__(self):
+        with self._cond:
+            while self.in_use >= int(self.limit):
+                self._cond.wait()
+            self.in_use += 1
+        return self
+
+    def __exit__(self, *exc):
+        with self._cond:
+            self.in_use -= 1
+            self._cond.notify()
+
+    def on_success(self):
+        with self._cond:
+            if self.limit < self.max_limit:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+                self._cond.notify_all()
+
+    def on_overload(self):
+        with self._cond:
+            self.limit = max(1.0, self.limit / 2)
+
+
+def parse_retry_after(value):
+    """Retry-After header as seconds (delta-seconds or HTTP-date), or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def jittered_backoff(attempt, retry_after=None, base=1.0, cap=60.0):
+    """
+    Delay before retrying an overloaded send. Honors Retry-After as a floor
+    and spreads hosts over the following window so they don't retry in lockstep;
+    without it, uses exponential backoff with full jitter.
+    """
+    if retry_after is not None:
+        return min(cap, retry_after + random.uniform(0, max(retry_after, base) / 2))
+    return random.uniform(0, min(cap, base * 2 ** attempt))
@@ -2,44 +2,118 @@
 
 import requests
 import os
+import gzip
+import json
 import threading
 import queue
 import time
 import logging
+import random
 import atexit
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+from .context import get_trace
+from .overhead import measure_overhead, overhead_meta, ENQUEUE
+from .stats import TransportStats
+from .exporters import exporter_from_env
+from .prompt_dict import PROMPT_DEDUP, get_prompt_dictionary
+from .backpressure import (
+    AdaptiveConcurrency, QueueEntry, jittered_backoff, parse_retry_after, queue_from_env, trace_priority
+)
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Library logger - applications decide the level and handlers
 logger = logging.getLogger("agentops_monitor")
 
 BACKEND_API = os.environ.get("AGENTOPS_API_URL", "http://localhost:8000")
 DEFAULT_INGEST = f"{BACKEND_API}/traces/ingest"
 
+# "gzip" (default) or "none"
+COMPRESSION = os.environ.get("AGENTOPS_COMPRESSION", "gzip").lower()
+
+# Seconds between periodic stats reports (0 disables the emitter)
+STATS_INTERVAL = float(os.environ.get("AGENTOPS_STATS_INTERVAL", "0"))
+
+# Minimum seconds between "queue overloaded" warnings
+OVERLOAD_WARNING_INTERVAL = 60
+
+# Parallel sender threads; the effective concurrency adapts to backend overload
+SENDER_THREADS = int(os.environ.get("AGENTOPS_SENDER_THREADS", "2"))
+
+# Attempts per trace while the backend keeps answering 429/503
+MAX_SEND_ATTEMPTS = int(os.environ.get("AGENTOPS_MAX_SEND_ATTEMPTS", "5"))
+
+# Responses that mean "back off", handled with Retry-After instead of urllib3 retries
+OVERLOAD_STATUSES = (429, 503)
+
+
+class _CountingRetry(Retry):
+    """urllib3 Retry with full jitter that reports every retry attempt to TransportStats"""
+    
+    stats = None
+    
+    def get_backoff_time(self):
+        # Full jitter keeps many SDK hosts from retrying in lockstep
+        return random.uniform(0, super().get_backoff_time())
+    
+    def new(self, **kw):
+        retry = super().new(**kw)
+        retry.stats = self.stats
+        return retry
+    
+    def increment(self, *args, **kwargs):
+        retry = super().increment(*args, **kwargs)
+        if self.stats is not None:
+            self.stats.record_retry()
+        return retry
+
 
 class AgentOpsClient:
     """Client for sending traces to AgentOps Monitor backend with async sending and retry logic"""
     
-    def __init__(self, max_queue_size=1000):
+    def __init__(self, max_queue_size=None, compression=COMPRESSION, stats_interval=STATS_INTERVAL,
+                 trace_queue=None, sender_threads=SENDER_THREADS, exporter=None):
         self.shutdown_event = threading.Event()  # Create this FIRST
+        self.transport_stats = TransportStats()
+        self.compression = compression
         self.session = self._create_session_with_retries()
-        self.trace_queue = queue.Queue(maxsize=max_queue_size)
-        self.worker_thread = threading.Thread(target=self._process_queue, daemon=True)
-        self.worker_thread.start()
-        logger.info(f"AgentOps Monitor client initialized. Backend: {BACKEND_API}")
+        # File (AGENTOPS_EXPORT_DIR) or local collector (AGENTOPS_COLLECTOR_SOCKET);
+        # None sends straight to the backend
+        self.exporter = exporter or exporter_from_env()
+        # Large repeated prompt segments are sent once per API key, then by hash
+        # (not for exporters whose consumers can't rebuild prompts, e.g. OTLP)
+        self.prompt_dictionary = None
+        if PROMPT_DEDUP and getattr(self.exporter, "prompt_dedup", True):
+            self.prompt_dictionary = get_prompt_dictionary()
+        # Bounded by items and bytes; overflow policy from AGENTOPS_QUEUE_POLICY
+        self.trace_queue = trace_queue or queue_from_env(max_queue_size)
+        self._last_overload_warning = 0.0
+        # Shared by all senders: no sends before this time.monotonic() deadline
+        self._backoff_until = 0.0
+        self.concurrency = AdaptiveConcurrency(max_limit=sender_threads)
+        self.worker_threads = [
+            threading.Thread(target=self._process_queue, name=f"agentops-sender-{i}", daemon=True)
+            for i in range(self.concurrency.max_limit)
+        ]
+        for worker in self.worker_threads:
+            worker.start()
+        self.stats_thread = None
+        if stats_interval and stats_interval > 0:
+            self.start_stats_emitter(stats_interval)
+        logger.debug(f"AgentOps Monitor client initialized. Backend: {BACKEND_API}")
     
     def _create_session_with_retries(self):
         """Create requests session with retry strategy"""
         session = requests.Session()
         
-        # Retry strategy: 3 attempts with exponential backoff
-        retry_strategy = Retry(
+        # Retry strategy: 3 attempts with jittered exponential backoff (up to 1s, 2s, 4s).
+        # 429/503 are left to _send_trace_sync so Retry-After is honored across senders.
+        retry_strategy = _CountingRetry(
             total=3,
-            backoff_factor=1,  # Wait 1s, 2s, 4s between retries
-            status_forcelist=[429, 500, 502, 503, 504],
+            backoff_factor=1,
+            status_forcelist=[500, 502, 504],
             allowed_methods=["POST"]
         )
+        retry_strategy.stats = self.transport_stats
         
         adapter = HTTPAdapter(max_retries=retry_strategy)
         session.mount("http://", adapter)
@@ -49,51 +123,165 @@ class AgentOpsClient:
     
     def send_trace(self, trace, spans, llm_calls, tool_calls, api_key):
         """
-        Queue trace for async sending (non-blocking)
-        This method returns immediately without waiting for upload
+        Queue trace for async sending (non-blocking unless the policy is "block")
+        Returns False if the trace was dropped by the queue's overflow policy
         """
-        payload = {
-            "api_key": api_key,
-            "trace": trace,
-            "spans": spans,
-            "llm_calls": llm_calls,
-            "tool_calls": tool_calls,
-        }
+        trace_id = trace.get("trace_id")
+        with measure_overhead(ENQUEUE):
+            priority = trace_priority(spans)
+            keep, sample_rate = self.trace_queue.should_sample(priority)
+            if not keep:
+                self._record_drop(trace_id, "downsampled")
+                return False
+            if sample_rate < 1.0:
+                # Lets the backend re-weight counts for downsampled periods
+                trace.setdefault("meta", {})["sample_rate"] = round(sample_rate, 4)
+            
+            definitions = {}
+            if self.prompt_dictionary is not None and llm_calls:
+                llm_calls, definitions = self.prompt_dictionary.encode(llm_calls, api_key)
+            
+            payload = {
+                "api_key": api_key,
+                "trace": trace,
+                "spans": spans,
+                "llm_calls": llm_calls,
+                "tool_calls": tool_calls,
+            }
+            if definitions:
+                payload["prompt_segments"] = definitions
         
-        try:
-            self.trace_queue.put_nowait(payload)
-        except queue.Full:
-            logger.warning(f"Trace queue full, dropping trace {trace.get('trace_id')}")
+        # Refresh overhead totals so they include the enqueue step
+        if get_trace() is trace:
+            trace.setdefault("meta", {}).update(overhead_meta())
+        
+        # Serialize up front so the queue can be bounded in bytes
+        body = json.dumps(payload, default=str).encode("utf-8")
+        accepted, evicted = self.trace_queue.put(QueueEntry(
+            trace_id, body, priority, prompt_segments=(api_key, list(definitions)) if definitions else None
+        ))
+        
+        for entry in evicted:
+            self._record_drop(entry.trace_id, "evicted")
+        if not accepted:
+            self._record_drop(trace_id, "queue_full")
+            return False
+        
+        self.transport_stats.record_enqueued()
+        return True
+    
+    def _record_drop(self, trace_id, reason):
+        """Count a dropped trace and warn (rate-limited) that the SDK is overloaded"""
+        self.transport_stats.record_dropped(reason=reason)
+        logger.debug(f"Dropping trace {trace_id} ({reason})")
+        now = time.time()
+        if now - self._last_overload_warning >= OVERLOAD_WARNING_INTERVAL:
+            self._last_overload_warning = now
+            logger.warning(
+                f"AgentOps trace queue overloaded ({self.trace_queue.policy}): "
+                f"dropping traces; see get_client().stats()"
+            )
+    
+    def is_overloaded(self):
+        """True once the queue is past its downsample watermark"""
+        return self.trace_queue.fill_ratio() >= self.trace_queue.downsample_watermark
     
     def _process_queue(self):
         """Background worker that sends queued traces"""
         while not self.shutdown_event.is_set():
             try:
+                # Honor the backend's Retry-After before taking more work
+                delay = self._backoff_until - time.monotonic()
+                if delay > 0:
+                    self.shutdown_event.wait(min(delay, 1))
+                    continue
                 # Wait up to 1 second for a trace
-                payload = self.trace_queue.get(timeout=1)
-                self._send_trace_sync(payload)
-                self.trace_queue.task_done()
+                entry = self.trace_queue.get(timeout=1)
+                with self.concurrency:
+                    self._send_trace_sync(entry)
             except queue.Empty:
                 continue
             except Exception as e:
                 logger.error(f"Error processing trace queue: {e}")
     
-    def _send_trace_sync(self, payload):
-        """Synchronously send a single trace with retry logic"""
-        trace = payload.get("trace", {})
-        trace_id = trace.get("trace_id", "unknown")
+    def _handle_overload(self, entry, response):
+        """
+        Back off after a 429/503: all senders pause for Retry-After (plus jitter),
+        concurrency is halved, and the trace goes back to the head of the queue.
+        Returns True if the trace was requeued.
+        """
+        entry.attempts += 1
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        delay = jittered_backoff(entry.attempts, retry_after)
+        self._backoff_until = max(self._backoff_until, time.monotonic() + delay)
+        self.concurrency.on_overload()
+        
+        if entry.attempts >= MAX_SEND_ATTEMPTS:
+            logger.warning(
+                f"⚠️  Backend overloaded ({response.status_code}), giving up on trace {entry.trace_id} "
+                f"after {entry.attempts} attempts"
+            )
+            return False
+        if not self.trace_queue.requeue(entry):
+            logger.warning(f"⚠️  Backend overloaded and queue full, giving up on trace {entry.trace_id}")
+            return False
+        logger.debug(
+            f"Backend overloaded ({response.status_code}), retrying trace {entry.trace_id} in {delay:.1f}s"
+        )
+        return True
+    
+    def _acknowledge_segments(self, entry):
+        """Prompt segments carried by a delivered trace can be sent by hash from now on"""
+        if entry.prompt_segments and self.prompt_dictionary is not None:
+            api_key, hashes = entry.prompt_segments
+            self.prompt_dictionary.acknowledge(api_key, hashes)
+    
+    def _encode_payload(self, raw):
+        """Compress a serialized payload if enabled. Returns (raw_size, body, headers)"""
+        headers = {"Content-Type": "application/json"}
+        if self.compression == "gzip":
+            body = gzip.compress(raw, compresslevel=6)
+            headers["Content-Encoding"] = "gzip"
+        else:
+            body = raw
+        return len(raw), body, headers
+    
+    def _send_trace_sync(self, entry):
+        """Synchronously send a single queued trace with retry logic"""
+        trace_id = entry.trace_id or "unknown"
+        
+        logger.debug(f"Sending trace {trace_id}")
         
-        logger.info(f"Sending trace {trace_id} [{trace.get('name')}]")
+        if self.exporter is not None:
+            started = time.perf_counter()
+            if self.exporter.export(entry.body):
+                latency_ms = (time.perf_counter() - started) * 1000
+                self.transport_stats.record_send(True, latency_ms, entry.size, entry.size)
+                self.concurrency.on_success()
+                self._acknowledge_segments(entry)
+                return
+            # Exporter unavailable: fall back to sending directly
         
+        raw_size, body, headers = self._encode_payload(entry.body)
+        started = time.perf_counter()
+        ok = False
+        throttled = False
         try:
             resp = self.session.post(
                 DEFAULT_INGEST,
-                json=payload,
+                data=body,
+                headers=headers,
                 timeout=10  # 10 second timeout
             )
+            if resp.status_code in OVERLOAD_STATUSES:
+                throttled = self._handle_overload(entry, resp)
+                return
             resp.raise_for_status()
+            ok = True
+            self.concurrency.on_success()
+            self._acknowledge_segments(entry)
             
-            logger.info(f"✅ Trace uploaded: {trace_id}")
+            logger.debug(f"✅ Trace uploaded: {trace_id}")
             
         except requests.exceptions.Timeout:
             logger.error(f"❌ Timeout sending trace {trace_id}")
@@ -102,8 +290,6 @@ class AgentOpsClient:
         except requests.exceptions.HTTPError as e:
             if e.response.status_code == 401:
                 logger.error(f"❌ Invalid API key for trace {trace_id}")
-            elif e.response.status_code == 429:
-                logger.warning(f"⚠️  Rate limit exceeded for trace {trace_id}")
             else:
                 try:
                     error_detail = e.response.json()
@@ -114,6 +300,42 @@ class AgentOpsClient:
             import traceback
             logger.error(f"❌ Failed to send trace {trace_id}: {e}")
             logger.error(f"Traceback: {traceback.format_exc()}")
+        finally:
+            latency_ms = (time.perf_counter() - started) * 1000
+            self.transport_stats.record_send(ok, latency_ms, raw_size, len(body), throttled=throttled)
+    
+    def stats(self):
+        """
+        Snapshot of transport health: queue depth, enqueued/sent/failed/dropped
+        counters, retries, send latency histogram, payload bytes before and
+        after compression, age of the oldest queued trace, and the current
+        send concurrency / backoff imposed by the backend
+        """
+        return self.transport_stats.snapshot(
+            **self.trace_queue.snapshot(),
+            send_concurrency=round(self.concurrency.limit, 2),
+            backoff_remaining_s=round(max(0.0, self._backoff_until - time.monotonic()), 3),
+        )
+    
+    def start_stats_emitter(self, interval=60, callback=None):
+        """
+        Report stats() every `interval` seconds on a daemon thread.
+        callback(stats_dict) defaults to an INFO log line.
+        """
+        def emit():
+            while not self.shutdown_event.wait(interval):
+                try:
+                    snapshot = self.stats()
+                    if callback:
+                        callback(snapshot)
+                    else:
+                        logger.info(f"AgentOps transport stats: {snapshot}")
+                except Exception as e:
+                    logger.error(f"Error emitting transport stats: {e}")
+        
+        self.stats_thread = threading.Thread(target=emit, name="agentops-stats", daemon=True)
+        self.stats_thread.start()
+        return self.stats_thread
     
     def flush(self, timeout=5):
         """Wait for all queued traces to be sent (useful for shutdown)"""
@@ -133,7 +355,9 @@ class AgentOpsClient:
             # If queue is empty, give worker thread a moment to complete current send
             if self.trace_queue.empty():
                 time.sleep(0.2)  # Brief wait for worker to complete current HTTP request
-                logger.info("All traces flushed successfully")
+                if self.exporter is not None:
+                    self.exporter.flush()
+                logger.debug("All traces flushed successfully")
             else:
                 logger.warning(f"{self.trace_queue.qsize()} traces remaining in queue after flush timeout")
                 
@@ -144,10 +368,13 @@ class AgentOpsClient:
     
     def shutdown(self):
         """Gracefully shutdown client"""
-        logger.info("Shutting down AgentOps Monitor client...")
+        logger.debug("Shutting down AgentOps Monitor client...")
         self.shutdown_event.set()
         self.flush()
-        self.worker_thread.join(timeout=5)
+        for worker in self.worker_threads:
+            worker.join(timeout=5)
+        if self.exporter is not None:
+            self.exporter.close()
         self.session.close()
 
 
@@ -159,8 +386,22 @@ def _cleanup_on_exit():
     """Automatically flush traces when Python exits"""
     global _client
     if _client is not None:
-        logger.info("Python exiting, flushing remaining traces...")
+        logger.debug("Python exiting, flushing remaining traces...")
         _client.flush(timeout=10)
+        if _client.exporter is not None:
+            _client.exporter.close()
+
+def _reset_after_fork():
+    """
+    The parent's sender threads don't exist in a forked child, so its client
+    would queue forever. Drop it (the parent still sends what it queued) and
+    let get_client() build a fresh one in the child.
+    """
+    global _client
+    _client = None
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
 
 def get_client():
     """Get or create global client instance"""
@@ -172,7 +413,7 @@ def get_client():
         if not _atexit_registered:
             atexit.register(_cleanup_on_exit)
             _atexit_registered = True
-            logger.info("Registered automatic trace flushing on exit")
+            logger.debug("Registered automatic trace flushing on exit")
     
     return _client
 
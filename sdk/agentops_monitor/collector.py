@@ -0,0 +1,451 @@
+"""
+What it does: agentops-collector, a local daemon that batches traces from many SDK processes
+
+SDK processes on the host set AGENTOPS_COLLECTOR_SOCKET and write each trace
+as a length-prefixed JSON frame to this daemon's Unix socket. The collector
+batches traces from all of them, gzips each batch, and POSTs it to the
+backend's /traces/ingest/batch endpoint over one connection pool. It handles
+429/503 Retry-After and spools batches to disk while the backend is
+unreachable, then drains the spool oldest-first once it recovers.
+"""
+
+import argparse
+import gzip
+import logging
+import os
+import queue
+import signal
+import socket
+import socketserver
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .backpressure import jittered_backoff, parse_retry_after
+from .exporters import FRAME_HEADER, MAX_FRAME_BYTES
+from .stats import TransportStats
+
+logger = logging.getLogger("agentops_monitor.collector")
+
+DEFAULT_SOCKET = "/tmp/agentops-collector.sock"
+DEFAULT_SPOOL_DIR = os.path.join(os.path.expanduser("~"), ".agentops", "spool")
+
+OVERLOAD_STATUSES = (429, 503)
+
+
+class Spool:
+    """
+    Directory of gzipped batch bodies waiting to be sent. Files are named by
+    creation time so they drain oldest-first; the oldest are deleted when the
+    spool exceeds max_bytes.
+    """
+
+    def __init__(self, directory, max_bytes=1024 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._counter = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _files(self):
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith(".json.gz"))
+        return [os.path.join(self.directory, name) for name in names]
+
+    def write(self, body):
+        """Persist a batch; returns the number of older batches evicted to make room"""
+        with self._lock:
+            self._counter += 1
+            path = os.path.join(self.directory, f"{time.time_ns():020d}-{os.getpid()}-{self._counter}.json.gz")
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+            return self._enforce_limit()
+
+    def _enforce_limit(self):
+        files = self._files()
+        sizes = {path: os.path.getsize(path) for path in files}
+        total = sum(sizes.values())
+        evicted = 0
+        for path in files[:-1]:
+            if total <= self.max_bytes:
+                break
+            total -= sizes[path]
+            os.remove(path)
+            evicted += 1
+        return evicted
+
+    def oldest(self, exclude=()):
+        with self._lock:
+            for path in self._files():
+                if path not in exclude:
+                    return path
+        return None
+
+    def read(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def remove(self, path):
+        with self._lock:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def snapshot(self):
+        with self._lock:
+            files = self._files()
+            return {
+                "spool_batches": len(files),
+                "spool_bytes": sum(os.path.getsize(path) for path in files),
+            }
+
+
+class Batch:
+    """A gzipped upload body, either freshly built or loaded from the spool"""
+
+    __slots__ = ("body", "count", "raw_size", "spool_path")
+
+    def __init__(self, body, count, raw_size, spool_path=None):
+        self.body = body
+        self.count = count
+        self.raw_size = raw_size
+        self.spool_path = spool_path
+
+
+class Collector:
+    """Buffers frames from the socket server and delivers them upstream in batches"""
+
+    def __init__(self, api_url, spool_dir=DEFAULT_SPOOL_DIR, batch_size=200,
+                 batch_bytes=4 * 1024 * 1024, flush_interval=1.0, upload_threads=2,
+                 max_buffer_bytes=256 * 1024 * 1024, spool_max_bytes=1024 * 1024 * 1024,
+                 max_attempts=3):
+        self.ingest_url = f"{api_url.rstrip('/')}/traces/ingest/batch"
+        self.batch_size = batch_size
+        self.batch_bytes = batch_bytes
+        self.flush_interval = flush_interval
+        self.max_buffer_bytes = max_buffer_bytes
+        self.max_attempts = max_attempts
+
+        self.stats = TransportStats()
+        self.spool = Spool(spool_dir, spool_max_bytes)
+
+        self._buffer = []
+        self._buffer_bytes = 0
+        self._lock = threading.Lock()
+        self._flush_requested = threading.Event()
+        self._stopping = threading.Event()
+        self._backoff_until = 0.0
+        self._inflight_spool = set()
+        self._uploads = queue.Queue(maxsize=upload_threads * 2)
+
+        # One upstream connection pool shared by all upload threads
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=upload_threads)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._threads = [threading.Thread(target=self._flush_loop, name="collector-flush", daemon=True)]
+        self._threads += [
+            threading.Thread(target=self._upload_loop, name=f"collector-upload-{i}", daemon=True)
+            for i in range(upload_threads)
+        ]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    # ---- intake -------------------------------------------------------------
+
+    def add(self, body):
+        """Called by socket handlers for every trace frame"""
+        self.stats.record_enqueued()
+        with self._lock:
+            self._buffer.append(body)
+            self._buffer_bytes += len(body)
+            full = len(self._buffer) >= self.batch_size or self._buffer_bytes >= self.batch_bytes
+            overflowing = self._buffer_bytes >= self.max_buffer_bytes
+            bodies = self._take_locked() if overflowing else None
+        if bodies:
+            # Upstream can't keep up; move the buffer to disk rather than grow memory
+            self._spool(self._build(bodies))
+        elif full:
+            self._flush_requested.set()
+
+    def _take_locked(self):
+        """Pop the next batch: up to batch_size traces and batch_bytes (at least one trace)"""
+        count = 0
+        size = 0
+        for body in self._buffer[:self.batch_size]:
+            if count and size + len(body) > self.batch_bytes:
+                break
+            count += 1
+            size += len(body)
+        bodies = self._buffer[:count]
+        self._buffer = self._buffer[count:]
+        self._buffer_bytes -= size
+        return bodies
+
+    def _build(self, bodies):
+        raw = b'{"traces":[' + b",".join(bodies) + b"]}"
+        return Batch(gzip.compress(raw, compresslevel=6), len(bodies), len(raw))
+
+    # ---- delivery -----------------------------------------------------------
+
+    def _flush_loop(self):
+        while not self._stopping.is_set():
+            self._flush_requested.wait(self.flush_interval)
+            self._flush_requested.clear()
+            self._flush_buffer()
+            self._drain_spool()
+
+    def _flush_buffer(self):
+        while True:
+            with self._lock:
+                bodies = self._take_locked() if self._buffer else None
+            if not bodies:
+                return
+            batch = self._build(bodies)
+            if self._backing_off():
+                self._spool(batch)
+                continue
+            try:
+                self._uploads.put_nowait(batch)
+            except queue.Full:
+                self._spool(batch)
+
+    def _drain_spool(self):
+        """Feed spooled batches to idle uploaders while upstream is healthy"""
+        while not self._backing_off() and not self._uploads.full():
+            path = self.spool.oldest(exclude=self._inflight_spool)
+            if path is None:
+                return
+            try:
+                body = self.spool.read(path)
+            except FileNotFoundError:
+                continue
+            self._inflight_spool.add(path)
+            self._uploads.put(Batch(body, count=0, raw_size=0, spool_path=path))
+
+    def _backing_off(self):
+        return time.monotonic() < self._backoff_until
+
+    def _spool(self, batch):
+        if batch.spool_path:
+            return  # already on disk
+        try:
+            evicted = self.spool.write(batch.body)
+            if evicted:
+                self.stats.record_dropped(evicted, reason="spool_full")
+        except OSError as e:
+            logger.error(f"Failed to spool batch of {batch.count} traces: {e}")
+            self.stats.record_dropped(batch.count, reason="spool_error")
+
+    def _upload_loop(self):
+        while True:
+            batch = self._uploads.get()
+            if batch is None:
+                return
+            try:
+                if self._upload(batch):
+                    if batch.spool_path:
+                        self.spool.remove(batch.spool_path)
+                else:
+                    self._spool(batch)
+            except Exception as e:
+                logger.error(f"Error uploading batch: {e}")
+                self._spool(batch)
+            finally:
+                self._inflight_spool.discard(batch.spool_path)
+
+    def _upload(self, batch):
+        """POST one batch; returns True once it is delivered (or permanently rejected)"""
+        headers = {"Content-Type": "application/json", "Content-Encoding": "gzip"}
+        for attempt in range(1, self.max_attempts + 1):
+            if attempt > 1:
+                self.stats.record_retry()
+            started = time.perf_counter()
+            try:
+                resp = self.session.post(self.ingest_url, data=batch.body, headers=headers, timeout=30)
+            except requests.exceptions.RequestException as e:
+                self.stats.record_send(False, (time.perf_counter() - started) * 1000, batch.raw_size, len(batch.body))
+                logger.warning(f"Upload failed (attempt {attempt}): {e}")
+                if self._stopping.wait(jittered_backoff(attempt)):
+                    return False
+                continue
+            latency_ms = (time.perf_counter() - started) * 1000
+
+            if resp.status_code in OVERLOAD_STATUSES:
+                self.stats.record_send(False, latency_ms, batch.raw_size, len(batch.body), throttled=True)
+                delay = jittered_backoff(attempt, parse_retry_after(resp.headers.get("Retry-After")))
+                self._backoff_until = max(self._backoff_until, time.monotonic() + delay)
+                logger.warning(f"Backend overloaded ({resp.status_code}), pausing uploads for {delay:.1f}s")
+                return False
+            if resp.status_code >= 500:
+                self.stats.record_send(False, latency_ms, batch.raw_size, len(batch.body))
+                if self._stopping.wait(jittered_backoff(attempt)):
+                    return False
+                continue
+            if resp.status_code >= 400:
+                # Malformed or oversized batch: retrying won't help
+                self.stats.record_send(False, latency_ms, batch.raw_size, len(batch.body))
+                self.stats.record_dropped(batch.count or 1, reason=f"http_{resp.status_code}")
+                logger.error(f"Backend rejected batch ({resp.status_code}): {resp.text[:500]}")
+                return True
+
+            self.stats.record_send(True, latency_ms, batch.raw_size, len(batch.body))
+            rejected = resp.json().get("rejected", [])
+            if rejected:
+                self.stats.record_dropped(len(rejected), reason="rejected")
+                logger.warning(f"Backend rejected {len(rejected)} traces, e.g. {rejected[0]}")
+            return True
+        return False
+
+    # ---- lifecycle ----------------------------------------------------------
+
+    def snapshot(self):
+        with self._lock:
+            buffered = len(self._buffer)
+        return self.stats.snapshot(
+            buffered_traces=buffered,
+            upload_queue=self._uploads.qsize(),
+            backoff_remaining_s=round(max(0.0, self._backoff_until - time.monotonic()), 3),
+            **self.spool.snapshot(),
+        )
+
+    def stop(self, timeout=10):
+        """Stop flushing; queued batches get one upload attempt, everything else is spooled"""
+        self._stopping.set()
+        self._flush_requested.set()
+        self._threads[0].join(timeout)
+        with self._lock:
+            while self._buffer:
+                self._spool(self._build(self._take_locked()))
+        for _ in self._threads[1:]:
+            self._uploads.put(None)
+        for thread in self._threads[1:]:
+            thread.join(timeout)
+        # Batches still queued for upload go to disk
+        while True:
+            try:
+                batch = self._uploads.get_nowait()
+            except queue.Empty:
+                break
+            if batch is not None:
+                self._spool(batch)
+        self.session.close()
+
+
+class _FrameHandler(socketserver.BaseRequestHandler):
+    """One SDK connection: a stream of length-prefixed trace frames"""
+
+    def handle(self):
+        rfile = self.request.makefile("rb")
+        while True:
+            header = rfile.read(FRAME_HEADER.size)
+            if len(header) < FRAME_HEADER.size:
+                return
+            (length,) = FRAME_HEADER.unpack(header)
+            if length > MAX_FRAME_BYTES:
+                logger.warning(f"Closing connection: frame of {length} bytes exceeds limit")
+                return
+            body = rfile.read(length)
+            if len(body) < length:
+                return
+            self.server.collector.add(body)
+
+
+class CollectorServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, collector):
+        self.collector = collector
+        _remove_stale_socket(socket_path)
+        super().__init__(socket_path, _FrameHandler)
+        os.chmod(socket_path, 0o660)
+
+
+def _remove_stale_socket(socket_path):
+    """Remove a socket file left by a dead collector; refuse to replace a live one"""
+    if not os.path.exists(socket_path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except OSError:
+        os.remove(socket_path)
+        return
+    finally:
+        probe.close()
+    raise SystemExit(f"Another agentops-collector is already listening on {socket_path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="agentops-collector",
+        description="Batch traces from local SDK processes and forward them to the AgentOps backend"
+    )
+    parser.add_argument("--socket", default=os.environ.get("AGENTOPS_COLLECTOR_SOCKET", DEFAULT_SOCKET),
+                        help="Unix socket SDK processes connect to")
+    parser.add_argument("--api-url", default=os.environ.get("AGENTOPS_API_URL", "http://localhost:8000"),
+                        help="AgentOps backend URL")
+    parser.add_argument("--spool-dir", default=os.environ.get("AGENTOPS_COLLECTOR_SPOOL_DIR", DEFAULT_SPOOL_DIR),
+                        help="Directory for batches that could not be sent yet")
+    parser.add_argument("--spool-max-mb", type=int, default=1024)
+    parser.add_argument("--batch-size", type=int, default=200, help="Maximum traces per upload")
+    parser.add_argument("--batch-kb", type=int, default=4096, help="Maximum uncompressed KB per upload")
+    parser.add_argument("--flush-interval", type=float, default=1.0, help="Seconds between flushes")
+    parser.add_argument("--upload-threads", type=int, default=2)
+    parser.add_argument("--stats-interval", type=float, default=60.0, help="Seconds between stats log lines (0 disables)")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=getattr(logging, args.log_level.upper()),
+        format="[%(asctime)s] %(levelname)s %(name)s: %(message)s",
+    )
+
+    collector = Collector(
+        api_url=args.api_url,
+        spool_dir=args.spool_dir,
+        batch_size=args.batch_size,
+        batch_bytes=args.batch_kb * 1024,
+        flush_interval=args.flush_interval,
+        upload_threads=args.upload_threads,
+        spool_max_bytes=args.spool_max_mb * 1024 * 1024,
+    )
+    collector.start()
+    server = CollectorServer(args.socket, collector)
+
+    def handle_signal(signum, frame):
+        logger.info(f"Received signal {signum}, shutting down")
+        # shutdown() blocks until serve_forever returns, so call it off the main thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    if args.stats_interval > 0:
+        def emit_stats():
+            while not collector._stopping.wait(args.stats_interval):
+                logger.info(f"Collector stats: {collector.snapshot()}")
+        threading.Thread(target=emit_stats, name="collector-stats", daemon=True).start()
+
+    logger.info(f"agentops-collector listening on {args.socket}, forwarding to {collector.ingest_url}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        try:
+            os.remove(args.socket)
+        except FileNotFoundError:
+            pass
+        collector.stop()
+        logger.info(f"agentops-collector stopped: {collector.snapshot()}")
+
+
+if __name__ == "__main__":
+    main()
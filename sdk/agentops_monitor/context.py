@@ -1,6 +1,10 @@
 # What it does: Handles current trace and span; ensures spans stack properly
 
+import os
 import threading
+import contextvars
+
+from .span_budget import SpanBudget
 
 # Use a global dict with thread ID as key to support multi-threaded execution
 _global_context = {}
@@ -16,7 +20,10 @@ def set_trace(trace):
         'trace': trace,
         'spans': [],
         'llm_calls': {},
-        'tool_calls': {}
+        'tool_calls': {},
+        'overhead': {},
+        'open_spans': {},  # span_id -> span dict, so end_span doesn't scan the span list
+        'budget': SpanBudget()
     }
 
 def get_trace():
@@ -33,6 +40,33 @@ def get_spans():
         return _global_context[_current_trace_id]['spans']
     return []
 
+def open_span(span):
+    """Add a new span to the current trace"""
+    if _current_trace_id and _current_trace_id in _global_context:
+        ctx = _global_context[_current_trace_id]
+        ctx['spans'].append(span)
+        ctx['open_spans'][span['span_id']] = span
+        ctx['budget'].on_start(span)
+
+def close_span(span_id):
+    """Remove a span from the open set; returns it, or None if it isn't open in the current trace"""
+    if _current_trace_id and _current_trace_id in _global_context:
+        return _global_context[_current_trace_id]['open_spans'].pop(span_id, None)
+    return None
+
+def apply_span_budget(span):
+    """Let the trace's span budget keep or fold a span that just ended"""
+    if _current_trace_id and _current_trace_id in _global_context:
+        ctx = _global_context[_current_trace_id]
+        ctx['budget'].on_end(span, ctx['spans'], ctx['llm_calls'], ctx['tool_calls'])
+
+def finish_spans():
+    """Finalize span folding for the current trace; returns trace meta about it"""
+    if _current_trace_id and _current_trace_id in _global_context:
+        ctx = _global_context[_current_trace_id]
+        return ctx['budget'].finish(ctx['spans'], ctx['llm_calls'], ctx['tool_calls'])
+    return {}
+
 def set_calls(llm_calls, tool_calls):
     if _current_trace_id and _current_trace_id in _global_context:
         _global_context[_current_trace_id]['llm_calls'] = llm_calls
@@ -44,6 +78,40 @@ def get_calls():
         return (ctx['llm_calls'], ctx['tool_calls'])
     return ({}, {})
 
+def add_overhead(category, seconds):
+    """Accumulate time spent in SDK code for the current trace"""
+    if _current_trace_id and _current_trace_id in _global_context:
+        overhead = _global_context[_current_trace_id]['overhead']
+        overhead[category] = overhead.get(category, 0.0) + seconds
+
+def get_overhead():
+    """Return {category: seconds} of SDK time recorded for the current trace"""
+    if _current_trace_id and _current_trace_id in _global_context:
+        return _global_context[_current_trace_id]['overhead']
+    return {}
+
+def merge_spans(trace_id, spans, llm_calls, tool_calls):
+    """
+    Add spans recorded elsewhere (e.g. a child process) to an open trace.
+    Returns False if the trace has already finished or is unknown.
+    """
+    ctx = _global_context.get(trace_id)
+    if ctx is None:
+        return False
+    ctx['spans'].extend(spans)
+    for span in spans:
+        ctx['budget'].on_start(span)
+    ctx['llm_calls'].update(llm_calls)
+    ctx['tool_calls'].update(tool_calls)
+    return True
+
+def clear_trace(trace_id):
+    """Forget a trace's context (used by child processes after forwarding)"""
+    global _current_trace_id
+    _global_context.pop(trace_id, None)
+    if _current_trace_id == trace_id:
+        _current_trace_id = None
+
 def add_llm_call_to_context(span_id, llm_data):
     """Add an LLM call to the current context"""
     llm_calls, _ = get_calls()
@@ -53,3 +121,90 @@ def add_tool_call_to_context(span_id, tool_data):
     """Add a tool call to the current context"""
     _, tool_calls = get_calls()
     tool_calls[span_id] = tool_data
+
+
+# Span stack of the running thread or asyncio task (innermost last), used to
+# parent new spans; a context variable so interleaved coroutines each see their own
+_span_stack = contextvars.ContextVar("agentops_span_stack", default=())
+
+def _open_spans():
+    if _current_trace_id and _current_trace_id in _global_context:
+        return _global_context[_current_trace_id]['open_spans']
+    return {}
+
+# Active span stack per thread (innermost span last) of (span_id, span type)
+# Used by the sampling profiler to attribute stack samples to a span
+_active_spans = {}
+
+def push_active_span(span_id, span_type=None):
+    """Mark a span as active on the current thread, and the parent of spans started in this thread/task"""
+    _active_spans.setdefault(threading.get_ident(), []).append((span_id, span_type))
+    # Ids no longer open (ended elsewhere, or from an earlier trace) are dropped on the way
+    open_spans = _open_spans()
+    _span_stack.set(tuple(s for s in _span_stack.get() if s in open_spans) + (span_id,))
+
+def _remove_active(stack, span_id):
+    for index in range(len(stack) - 1, -1, -1):
+        if stack[index][0] == span_id:
+            del stack[index]
+            return True
+    return False
+
+def pop_active_span(span_id):
+    """Remove a span from the active stack (spans may end on a different thread)"""
+    span_stack = _span_stack.get()
+    if span_id in span_stack:
+        _span_stack.set(tuple(s for s in span_stack if s != span_id))
+    thread_id = threading.get_ident()
+    stack = _active_spans.get(thread_id)
+    if stack and _remove_active(stack, span_id):
+        if not stack:
+            # Drop empty stacks so finished threads don't accumulate
+            _active_spans.pop(thread_id, None)
+        return
+    for stack in list(_active_spans.values()):
+        if _remove_active(stack, span_id):
+            return
+
+def open_span_ids():
+    """Spans of the current trace that haven't ended"""
+    return list(_open_spans())
+
+def get_active_spans(span_types=None):
+    """
+    Return {thread_id: innermost active span_id} for all threads; with
+    span_types, the innermost span of one of those types (threads without one are left out)
+    """
+    active = {}
+    for thread_id, stack in list(_active_spans.items()):
+        for span_id, span_type in reversed(list(stack)):
+            if span_types is None or span_type in span_types:
+                active[thread_id] = span_id
+                break
+    return active
+
+
+def current_span_id():
+    """
+    Innermost span open in the current trace on this thread/task, or None.
+    Spans that never ended or belong to another trace are skipped.
+    """
+    open_spans = _open_spans()
+    for span_id in reversed(_span_stack.get()):
+        if span_id in open_spans:
+            return span_id
+    return None
+
+
+def _reset_after_fork():
+    """
+    A forked child inherits the parent's open traces, but spans it adds would
+    never reach the parent. Start clean; use multiprocess.run_traced to forward.
+    """
+    global _current_trace_id
+    _global_context.clear()
+    _current_trace_id = None
+    _active_spans.clear()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
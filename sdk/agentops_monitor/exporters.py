@@ -0,0 +1,175 @@
+# What it does: Alternative destinations for serialized traces (local collector, rotating files, OTLP) instead of POSTing directly
+
+import os
+import gzip
+import socket
+import struct
+import threading
+import time
+import zlib
+import logging
+from datetime import datetime
+
+logger = logging.getLogger("agentops_monitor")
+
+# Unix socket of a local agentops-collector; when set, traces go there instead of the backend
+COLLECTOR_SOCKET = os.environ.get("AGENTOPS_COLLECTOR_SOCKET")
+
+# Directory for rotating gzip JSONL trace files; when set, traces are written there instead of sent
+EXPORT_DIR = os.environ.get("AGENTOPS_EXPORT_DIR")
+EXPORT_MAX_BYTES = int(float(os.environ.get("AGENTOPS_EXPORT_MAX_MB", "64")) * 1024 * 1024)
+EXPORT_ROTATE_SECONDS = float(os.environ.get("AGENTOPS_EXPORT_ROTATE_SECONDS", "300"))
+
+# Frames on the collector socket: 4-byte big-endian length, then the JSON trace payload
+FRAME_HEADER = struct.Struct(">I")
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+
+def encode_frame(body):
+    return FRAME_HEADER.pack(len(body)) + body
+
+
+class CollectorExporter:
+    """
+    Writes traces to a local agentops-collector over a Unix domain socket.
+    A send is one local write; the collector owns batching, compression,
+    retries and spooling. If the collector is unreachable, export() returns
+    False (the client then sends directly) and reconnects are retried at
+    most every reconnect_interval seconds.
+    """
+
+    # A local write doesn't mean the backend stored the payload's prompt
+    # segments (the collector can still drop it), so prompts are always sent whole
+    prompt_dedup = False
+
+    def __init__(self, socket_path, timeout=1.0, reconnect_interval=5.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.reconnect_interval = reconnect_interval
+        self._sock = None
+        self._lock = threading.Lock()
+        self._next_connect = 0.0
+
+    def _connect(self):
+        if time.monotonic() < self._next_connect:
+            return None
+        try:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            logger.debug(f"Connected to agentops-collector at {self.socket_path}")
+            return sock
+        except OSError as e:
+            self._next_connect = time.monotonic() + self.reconnect_interval
+            logger.warning(f"⚠️  agentops-collector unavailable at {self.socket_path}: {e}")
+            return None
+
+    def export(self, body):
+        """Send one serialized trace; returns True if the collector took it"""
+        frame = encode_frame(body)
+        with self._lock:
+            for _ in range(2):  # one reconnect if the collector restarted
+                if self._sock is None:
+                    self._sock = self._connect()
+                    if self._sock is None:
+                        return False
+                try:
+                    self._sock.sendall(frame)
+                    return True
+                except OSError:
+                    self._close()
+            return False
+
+    def flush(self):
+        pass
+
+    def _close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+
+class FileExporter:
+    """
+    Appends traces (one ingest payload per line) to rotating gzip JSONL files,
+    so jobs can trace with no network dependency. Files are written as
+    "*.jsonl.gz.part" and renamed to "*.jsonl.gz" once rotated or closed;
+    load finished files with the backend's `python -m app.cli.bulk_import`.
+    """
+
+    # Files may never be imported (e.g. unfinished .part files), so prompts are always written whole
+    prompt_dedup = False
+
+    def __init__(self, directory, max_bytes=EXPORT_MAX_BYTES, rotate_seconds=EXPORT_ROTATE_SECONDS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self._lock = threading.Lock()
+        self._file = None
+        self._path = None
+        self._bytes = 0
+        self._opened_at = 0.0
+        self._seq = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _open(self):
+        self._seq += 1
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+        name = f"traces-{socket.gethostname()}-{os.getpid()}-{stamp}-{self._seq:04d}.jsonl.gz"
+        self._path = os.path.join(self.directory, name)
+        self._file = gzip.open(self._path + ".part", "wb", compresslevel=6)
+        self._bytes = 0
+        self._opened_at = time.monotonic()
+
+    def _rotate(self):
+        """Finish the current file so importers can pick it up"""
+        if self._file is None:
+            return
+        self._file.close()
+        os.replace(self._path + ".part", self._path)
+        logger.debug(f"Finished trace file {self._path}")
+        self._file = None
+
+    def export(self, body):
+        """Append one serialized trace; returns False if the file can't be written"""
+        with self._lock:
+            try:
+                if self._file is None:
+                    self._open()
+                self._file.write(body + b"\n")
+                self._bytes += len(body) + 1
+                if self._bytes >= self.max_bytes or time.monotonic() - self._opened_at >= self.rotate_seconds:
+                    self._rotate()
+                return True
+            except OSError as e:
+                logger.error(f"❌ Cannot write trace file in {self.directory}: {e}")
+                return False
+
+    def flush(self):
+        """Make everything written so far readable from the open file"""
+        with self._lock:
+            if self._file is not None:
+                self._file.flush(zlib.Z_SYNC_FLUSH)
+
+    def close(self):
+        with self._lock:
+            self._rotate()
+
+
+def exporter_from_env():
+    """Exporter configured via environment variables, or None to send directly"""
+    if os.environ.get("AGENTOPS_OTLP_ENDPOINT"):
+        from .otlp import exporter_from_env as otlp_exporter_from_env
+        return otlp_exporter_from_env()
+    if EXPORT_DIR:
+        return FileExporter(EXPORT_DIR)
+    if COLLECTOR_SOCKET:
+        return CollectorExporter(COLLECTOR_SOCKET)
+    return None
@@ -0,0 +1,202 @@
+# What it does: Ships spans recorded in child processes back to the parent's open trace
+
+import atexit
+import logging
+import os
+import threading
+from multiprocessing.connection import Listener, Client
+from multiprocessing import AuthenticationError
+
+from .context import (
+    get_trace, get_spans, get_calls, set_trace, set_spans, set_calls,
+    merge_spans, clear_trace, current_span_id, finish_spans
+)
+from .tracer import add_span, end_span
+
+logger = logging.getLogger("agentops_monitor")
+
+
+class SpanForwardingHandle:
+    """
+    Picklable pointer to a trace open in the parent process. Pass it to a
+    child process (with run_traced) so spans recorded there join that trace.
+    """
+
+    def __init__(self, address, authkey, pid, trace_id, trace_name, parent_span_id,
+                 name=None, type="tool_call"):
+        self.address = address
+        self.authkey = authkey
+        self.pid = pid
+        self.trace_id = trace_id
+        self.trace_name = trace_name
+        self.parent_span_id = parent_span_id
+        self.name = name
+        self.type = type
+
+
+class SpanForwarder:
+    """
+    Listens on a local socket (named pipe on Windows) for span batches sent by
+    child processes and merges them into the parent's open traces. Each batch
+    is acknowledged after merging, so a child's result is only returned once
+    its spans are part of the trace.
+    """
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.authkey = os.urandom(32)
+        self.listener = Listener(authkey=self.authkey)
+        self.address = self.listener.address
+        self._closed = False
+        self.thread = threading.Thread(target=self._serve, name="agentops-forwarder", daemon=True)
+        self.thread.start()
+
+    def _serve(self):
+        while not self._closed:
+            try:
+                conn = self.listener.accept()
+            except AuthenticationError:
+                continue
+            except OSError:
+                if self._closed:
+                    break
+                continue
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        with conn:
+            try:
+                while True:
+                    batch = conn.recv()
+                    merged = merge_spans(
+                        batch["trace_id"], batch["spans"], batch["llm_calls"], batch["tool_calls"]
+                    )
+                    if not merged:
+                        logger.debug(
+                            f"Dropping {len(batch['spans'])} forwarded spans: trace {batch['trace_id']} already ended"
+                        )
+                    conn.send(merged)
+            except EOFError:
+                pass
+            except Exception as e:
+                logger.error(f"Error receiving forwarded spans: {e}")
+
+    def close(self):
+        self._closed = True
+        self.listener.close()
+
+
+# Per-process forwarder, started on first use
+_forwarder = None
+_forwarder_lock = threading.Lock()
+
+
+def get_forwarder():
+    global _forwarder
+    with _forwarder_lock:
+        if _forwarder is None:
+            _forwarder = SpanForwarder()
+            atexit.register(_forwarder.close)
+        return _forwarder
+
+
+def _reset_after_fork():
+    # The listener thread doesn't survive fork and the socket belongs to the parent
+    global _forwarder, _forwarder_lock
+    _forwarder = None
+    _forwarder_lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def forwarding_handle(name=None, type="tool_call", parent_span_id=None):
+    """
+    Handle for the current trace, or None if no trace is active.
+    parent_span_id defaults to the innermost open span on this thread/task.
+    """
+    trace = get_trace()
+    if not trace:
+        return None
+    if parent_span_id is None:
+        parent_span_id = current_span_id()
+    forwarder = get_forwarder()
+    return SpanForwardingHandle(
+        address=forwarder.address,
+        authkey=forwarder.authkey,
+        pid=forwarder.pid,
+        trace_id=trace["trace_id"],
+        trace_name=trace.get("name"),
+        parent_span_id=parent_span_id,
+        name=name,
+        type=type,
+    )
+
+
+def _run_in_span(handle, func, args, kwargs):
+    span_id = add_span(
+        name=handle.name or func.__name__,
+        type=handle.type,
+        meta={"pid": os.getpid()},
+        parent_span_id=handle.parent_span_id,
+    )
+    try:
+        result = func(*args, **kwargs)
+        end_span(span_id, outputs={"result": result})
+        return result
+    except Exception as e:
+        end_span(span_id, error=str(e))
+        raise
+
+
+def _forward(handle):
+    """Send this process's spans for handle's trace to the parent and forget them"""
+    finish_spans()
+    spans = get_spans()
+    llm_calls, tool_calls = get_calls()
+    clear_trace(handle.trace_id)
+    try:
+        with Client(handle.address, authkey=handle.authkey) as conn:
+            conn.send({
+                "trace_id": handle.trace_id,
+                "spans": spans,
+                "llm_calls": llm_calls,
+                "tool_calls": tool_calls,
+            })
+            conn.recv()
+    except Exception as e:
+        logger.warning(f"Could not forward {len(spans)} spans to parent process {handle.pid}: {e}")
+
+
+def run_traced(handle, func, *args, **kwargs):
+    """
+    Run func in a span that belongs to the parent's trace. Call this inside
+    the child process; spans func records (including nested @traceable and
+    wrapped tools) are forwarded to the parent when it returns or raises.
+    """
+    if handle is None:
+        return func(*args, **kwargs)
+    if os.getpid() == handle.pid:
+        # Not actually in a child (e.g. a thread pool); record spans directly
+        return _run_in_span(handle, func, args, kwargs)
+
+    set_trace({
+        "trace_id": handle.trace_id,
+        "name": handle.trace_name,
+        "meta": {},
+        "tags": [],
+    })
+    set_spans([])
+    set_calls({}, {})
+    try:
+        return _run_in_span(handle, func, args, kwargs)
+    finally:
+        _forward(handle)
+
+
+def submit_traced(executor, func, *args, **kwargs):
+    """
+    executor.submit() for process pools that keeps the child's spans in the
+    current trace. func must be picklable (a module-level function).
+    """
+    return executor.submit(run_traced, forwarding_handle(), func, *args, **kwargs)
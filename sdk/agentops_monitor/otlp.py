@@ -0,0 +1,310 @@
+# What it does: Exports traces as OTLP/HTTP (protobuf, or JSON without opentelemetry-proto) using GenAI semantic conventions
+
+import base64
+import gzip
+import hashlib
+import json
+import os
+import threading
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import requests
+
+from .backpressure import jittered_backoff, parse_retry_after
+from .tracer import to_otlp_trace_id, to_otlp_span_id
+
+try:
+    from google.protobuf.json_format import ParseDict
+    from opentelemetry.proto.collector.trace.v1.trace_service_pb2 import ExportTraceServiceRequest
+except ImportError:  # pip install agentops-monitor[otlp] for protobuf
+    ExportTraceServiceRequest = None
+
+logger = logging.getLogger("agentops_monitor")
+
+# OTLP/HTTP endpoint (e.g. http://otel-collector:4318); when set, traces are exported as OTLP
+OTLP_ENDPOINT = os.environ.get("AGENTOPS_OTLP_ENDPOINT")
+# Extra headers, "key=value,key2=value2" (same format as OTEL_EXPORTER_OTLP_HEADERS)
+OTLP_HEADERS = os.environ.get("AGENTOPS_OTLP_HEADERS", "")
+
+SERVICE_NAME = os.environ.get("OTEL_SERVICE_NAME", "agentops-agent")
+SCOPE_NAME = "agentops_monitor"
+
+# OTLP enums
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_CLIENT = 3
+STATUS_CODE_ERROR = 2
+
+# gen_ai.operation.name for each SDK span type
+OPERATION_NAMES = {
+    "llm_call": "chat",
+    "tool_call": "execute_tool",
+    "agent_step": "invoke_agent",
+}
+
+# Header carrying the AgentOps API key (read by the backend's /v1/traces receiver)
+API_KEY_HEADER = "x-agentops-api-key"
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _unix_nanos(timestamp):
+    """ISO timestamp (naive UTC, as written by the tracer) -> OTLP fixed64 nanos (JSON string)"""
+    if not timestamp:
+        return "0"
+    dt = datetime.fromisoformat(timestamp)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    delta = dt - _EPOCH
+    return str((delta.days * 86400 + delta.seconds) * 10**9 + delta.microseconds * 1000)
+
+
+def _any_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, str):
+        return {"stringValue": value}
+    if isinstance(value, (list, tuple)) and all(isinstance(v, (str, int, float, bool)) for v in value):
+        return {"arrayValue": {"values": [_any_value(v) for v in value]}}
+    return {"stringValue": json.dumps(value, default=str)}
+
+
+def _attributes(values):
+    return [{"key": key, "value": _any_value(value)} for key, value in values.items() if value is not None]
+
+
+def root_span_id(trace_id):
+    """Span id of the synthetic span that carries trace-level fields"""
+    return hashlib.sha256(f"root:{trace_id}".encode()).hexdigest()[:16]
+
+
+def _span_attributes(span, llm_call, tool_call):
+    attrs = {
+        "agentops.span.type": span.get("type"),
+        "gen_ai.operation.name": OPERATION_NAMES.get(span.get("type")),
+    }
+    if span.get("inputs"):
+        attrs["agentops.span.inputs"] = span["inputs"]
+    if span.get("outputs"):
+        attrs["agentops.span.outputs"] = span["outputs"]
+    if span.get("meta"):
+        attrs["agentops.span.meta"] = span["meta"]
+
+    if llm_call:
+        attrs.update({
+            "gen_ai.system": llm_call.get("provider"),
+            "gen_ai.request.model": llm_call.get("model_name"),
+            "gen_ai.usage.input_tokens": llm_call.get("input_tokens") or 0,
+            "gen_ai.usage.output_tokens": llm_call.get("output_tokens") or 0,
+            "gen_ai.prompt": llm_call.get("prompt"),
+            "gen_ai.completion": llm_call.get("response"),
+        })
+    if tool_call:
+        attrs.update({
+            "gen_ai.tool.name": tool_call.get("tool_name"),
+            "gen_ai.tool.call.arguments": tool_call.get("tool_inputs") or {},
+            "gen_ai.tool.call.result": tool_call.get("tool_outputs") or {},
+            "agentops.tool.error": tool_call.get("error"),
+        })
+    if span.get("type") == "agent_step":
+        attrs["gen_ai.agent.name"] = span.get("name")
+    return attrs
+
+
+def payload_to_resource_spans(payload):
+    """
+    Convert one SDK ingest payload (trace, spans, llm_calls, tool_calls) into an
+    OTLP ResourceSpans dict (OTLP/JSON field names, hex ids).
+
+    Trace name, meta and tags ride on a synthetic root span marked with
+    agentops.trace.root; SDK spans without a parent become its children.
+    """
+    trace = payload["trace"]
+    llm_calls = payload.get("llm_calls") or {}
+    tool_calls = payload.get("tool_calls") or {}
+    trace_id = to_otlp_trace_id(trace["trace_id"])
+    root_id = root_span_id(trace["trace_id"])
+
+    otlp_spans = [{
+        "traceId": trace_id,
+        "spanId": root_id,
+        "name": trace.get("name") or "trace",
+        "kind": SPAN_KIND_INTERNAL,
+        "startTimeUnixNano": _unix_nanos(trace.get("start_time")),
+        "endTimeUnixNano": _unix_nanos(trace.get("end_time") or trace.get("start_time")),
+        "attributes": _attributes({
+            "agentops.trace.root": True,
+            "agentops.trace.id": trace["trace_id"],
+            "agentops.trace.meta": trace.get("meta") or {},
+            "agentops.trace.tags": list(trace.get("tags") or []),
+        }),
+    }]
+
+    for span in payload.get("spans", []):
+        llm_call = llm_calls.get(span["span_id"])
+        tool_call = tool_calls.get(span["span_id"])
+        otlp_span = {
+            "traceId": trace_id,
+            "spanId": to_otlp_span_id(span["span_id"]),
+            "parentSpanId": to_otlp_span_id(span.get("parent_span_id")) or root_id,
+            "name": span.get("name", ""),
+            "kind": SPAN_KIND_CLIENT if llm_call else SPAN_KIND_INTERNAL,
+            "startTimeUnixNano": _unix_nanos(span.get("start_time")),
+            "endTimeUnixNano": _unix_nanos(span.get("end_time") or span.get("start_time")),
+            "attributes": _attributes(_span_attributes(span, llm_call, tool_call)),
+        }
+        if span.get("error"):
+            otlp_span["status"] = {"code": STATUS_CODE_ERROR, "message": str(span["error"])}
+        otlp_spans.append(otlp_span)
+
+    return {
+        "resource": {"attributes": _attributes({"service.name": SERVICE_NAME, "telemetry.sdk.name": SCOPE_NAME})},
+        "scopeSpans": [{"scope": {"name": SCOPE_NAME}, "spans": otlp_spans}],
+    }
+
+
+def _b64_ids(resource_spans):
+    """protobuf's JSON mapping wants bytes fields base64-encoded, not hex"""
+    converted = []
+    for rs in resource_spans:
+        spans = []
+        for span in rs["scopeSpans"][0]["spans"]:
+            span = dict(span)
+            for field in ("traceId", "spanId", "parentSpanId"):
+                if span.get(field):
+                    span[field] = base64.b64encode(bytes.fromhex(span[field])).decode()
+            spans.append(span)
+        converted.append({**rs, "scopeSpans": [{**rs["scopeSpans"][0], "spans": spans}]})
+    return converted
+
+
+def encode_request(resource_spans, encoding="protobuf"):
+    """Serialize an ExportTraceServiceRequest; returns (body, content_type)"""
+    if encoding == "protobuf" and ExportTraceServiceRequest is not None:
+        message = ParseDict({"resourceSpans": _b64_ids(resource_spans)}, ExportTraceServiceRequest())
+        return message.SerializeToString(), "application/x-protobuf"
+    return json.dumps({"resourceSpans": resource_spans}).encode("utf-8"), "application/json"
+
+
+def _parse_headers(value):
+    headers = {}
+    for pair in value.split(","):
+        if "=" in pair:
+            key, _, val = pair.partition("=")
+            headers[key.strip()] = val.strip()
+    return headers
+
+
+class OTLPExporter:
+    """
+    Client exporter that converts queued traces to OTLP and sends them in
+    batches from a background thread, one request per API key. Works with
+    any OTLP/HTTP collector or the AgentOps backend's /v1/traces receiver.
+    """
+
+    # OTLP consumers need complete prompts, so the client doesn't send segments by hash
+    prompt_dedup = False
+
+    def __init__(self, endpoint, headers=None, max_batch_spans=512, flush_interval=5.0,
+                 max_pending_spans=20000, max_attempts=3, encoding="protobuf"):
+        endpoint = endpoint.rstrip("/")
+        self.url = endpoint if endpoint.endswith("/v1/traces") else f"{endpoint}/v1/traces"
+        self.headers = headers or {}
+        self.max_batch_spans = max_batch_spans
+        self.flush_interval = flush_interval
+        self.max_pending_spans = max_pending_spans
+        self.max_attempts = max_attempts
+        self.encoding = encoding if ExportTraceServiceRequest is not None else "json"
+
+        self.session = requests.Session()
+        self._pending = defaultdict(list)  # api_key -> [ResourceSpans]
+        self._pending_spans = 0
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="agentops-otlp", daemon=True)
+        self._thread.start()
+
+    def export(self, body):
+        """Convert and buffer one serialized trace; returns False if it can't be converted"""
+        try:
+            payload = json.loads(body)
+            resource_spans = payload_to_resource_spans(payload)
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error(f"❌ Cannot convert trace to OTLP: {e}")
+            return False
+        span_count = len(resource_spans["scopeSpans"][0]["spans"])
+        with self._lock:
+            self._pending[payload.get("api_key", "")].append(resource_spans)
+            self._pending_spans += span_count
+            if self._pending_spans > self.max_pending_spans:
+                self._drop_oldest()
+            if self._pending_spans >= self.max_batch_spans:
+                self._wake.set()
+        return True
+
+    def _drop_oldest(self):
+        for batch in self._pending.values():
+            while batch and self._pending_spans > self.max_pending_spans:
+                dropped = batch.pop(0)
+                self._pending_spans -= len(dropped["scopeSpans"][0]["spans"])
+                logger.warning("⚠️  OTLP endpoint not keeping up, dropping oldest buffered trace")
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Send everything buffered now"""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(list)
+            self._pending_spans = 0
+        with self._send_lock:
+            for api_key, resource_spans in pending.items():
+                self._send(api_key, resource_spans)
+
+    def _send(self, api_key, resource_spans):
+        body, content_type = encode_request(resource_spans, self.encoding)
+        headers = {**self.headers, "Content-Type": content_type, "Content-Encoding": "gzip"}
+        if api_key:
+            headers[API_KEY_HEADER] = api_key
+        body = gzip.compress(body, compresslevel=6)
+
+        for attempt in range(1, self.max_attempts + 1):
+            retry_after = None
+            try:
+                resp = self.session.post(self.url, data=body, headers=headers, timeout=10)
+                if resp.status_code < 300:
+                    logger.debug(f"Exported {len(resource_spans)} traces via OTLP")
+                    return True
+                if resp.status_code not in (429, 502, 503, 504):
+                    logger.error(f"❌ OTLP export rejected ({resp.status_code}): {resp.text[:500]}")
+                    return False
+                retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+            except requests.exceptions.RequestException as e:
+                logger.warning(f"⚠️  OTLP export failed (attempt {attempt}): {e}")
+            if attempt < self.max_attempts and self._stopping.wait(jittered_backoff(attempt, retry_after)):
+                break
+        logger.error(f"❌ Dropping {len(resource_spans)} traces after {self.max_attempts} OTLP export attempts")
+        return False
+
+    def close(self):
+        self._stopping.set()
+        self._wake.set()
+        self._thread.join(timeout=5)
+        self.flush()
+        self.session.close()
+
+
+def exporter_from_env():
+    if OTLP_ENDPOINT:
+        return OTLPExporter(OTLP_ENDPOINT, headers=_parse_headers(OTLP_HEADERS))
+    return None
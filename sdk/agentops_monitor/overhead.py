@@ -0,0 +1,32 @@
+# What it does: Measures the time the SDK spends in its own code so it can be reported per trace
+
+import time
+from contextlib import contextmanager
+from .context import add_overhead, get_overhead
+
+# Categories reported in trace meta["sdk_overhead"]
+MODEL_CALLBACKS = "model_callbacks"        # prompt/response extraction in agent callbacks
+TOOL_SERIALIZATION = "tool_serialization"  # stringifying tool inputs/outputs
+SPAN_BOOKKEEPING = "span_bookkeeping"      # creating/ending spans and call records
+ENQUEUE = "enqueue"                        # building the payload and queueing it
+
+
+@contextmanager
+def measure_overhead(category):
+    """Add the wall time of the enclosed block to the current trace's SDK overhead"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_overhead(category, time.perf_counter() - started)
+
+
+def overhead_meta():
+    """Summarize recorded overhead as trace meta fields (milliseconds)"""
+    overhead = get_overhead()
+    return {
+        "sdk_overhead_ms": round(sum(overhead.values()) * 1000, 3),
+        "sdk_overhead": {
+            category: round(seconds * 1000, 3) for category, seconds in overhead.items()
+        },
+    }
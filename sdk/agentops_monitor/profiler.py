@@ -0,0 +1,187 @@
+# What it does: Opt-in low-frequency sampling profiler that attributes Python stacks to the active span
+
+import os
+import sys
+import threading
+import time
+import logging
+from collections import defaultdict
+
+from .context import get_active_spans
+
+logger = logging.getLogger("agentops_monitor")
+
+# Stacks beyond this many unique entries per span are counted under one bucket
+TRUNCATED_STACK = "[truncated]"
+
+
+class SamplingProfiler:
+    """
+    Samples every thread's stack on a timer thread using sys._current_frames()
+    and aggregates samples per active span as collapsed stacks ("a;b;c" -> count).
+    With span_types, a sample goes to the thread's innermost span of those
+    types, and threads without one aren't sampled.
+
+    Overhead is bounded: if sampling takes more than max_overhead of the
+    interval, the interval is doubled (up to max_interval_ms) until it fits.
+    """
+
+    def __init__(self, interval_ms=20, max_interval_ms=1000, max_depth=64,
+                 max_stacks_per_span=500, max_overhead=0.01, span_types=None):
+        self.interval_ms = interval_ms
+        self.base_interval_ms = interval_ms
+        self.max_interval_ms = max(max_interval_ms, interval_ms)
+        self.max_depth = max_depth
+        self.max_stacks_per_span = max_stacks_per_span
+        self.max_overhead = max_overhead
+        self.span_types = set(span_types) if span_types else None
+
+        self._profiles = defaultdict(lambda: defaultdict(int))
+        # span_id -> sum of the intervals its samples stand for (the interval changes as it adapts)
+        self._sampled_ms = defaultdict(float)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="agentops-profiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=1)
+        self._thread = None
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def tracks(self, span_type):
+        """Whether spans of this type should be profiled"""
+        return self.span_types is None or span_type in self.span_types
+
+    def _run(self):
+        interval_ms = self.interval_ms
+        while not self._stop_event.wait(interval_ms / 1000.0):
+            started = time.perf_counter()
+            try:
+                self._sample(interval_ms)
+            except Exception as e:
+                logger.debug(f"Profiler sample failed: {e}")
+            self._adapt_interval(time.perf_counter() - started)
+            interval_ms = self.interval_ms
+
+    def _adapt_interval(self, elapsed):
+        """Back off when sampling cost exceeds the overhead budget, recover slowly otherwise"""
+        budget = self.interval_ms / 1000.0 * self.max_overhead
+        if elapsed > budget and self.interval_ms < self.max_interval_ms:
+            self.interval_ms = min(self.interval_ms * 2, self.max_interval_ms)
+        elif elapsed < budget / 4 and self.interval_ms > self.base_interval_ms:
+            self.interval_ms = max(self.interval_ms * 0.9, self.base_interval_ms)
+
+    def _sample(self, interval_ms):
+        active = get_active_spans(self.span_types)
+        if not active:
+            return
+        frames = sys._current_frames()
+        for thread_id, span_id in active.items():
+            frame = frames.get(thread_id)
+            if frame is None:
+                continue
+            stack = self._collapse(frame)
+            with self._lock:
+                stacks = self._profiles[span_id]
+                if stack not in stacks and len(stacks) >= self.max_stacks_per_span:
+                    stack = TRUNCATED_STACK
+                stacks[stack] += 1
+                self._sampled_ms[span_id] += interval_ms
+
+    def _collapse(self, frame):
+        """Render a frame chain as a root-first, semicolon-separated stack"""
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            names.append(
+                f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            )
+            frame = frame.f_back
+        names.reverse()
+        return ";".join(names)
+
+    def pop_profile(self, span_id):
+        """Remove and return the aggregated profile for a finished span, or None"""
+        with self._lock:
+            stacks = self._profiles.pop(span_id, None)
+            sampled_ms = self._sampled_ms.pop(span_id, 0.0)
+        if not stacks:
+            return None
+        sample_count = sum(stacks.values())
+        return {
+            # Average over the span's samples, so sample_count * interval_ms is the time they cover
+            "interval_ms": sampled_ms / sample_count,
+            "sample_count": sample_count,
+            "stacks": dict(stacks),
+        }
+
+
+# Global profiler instance (None until enabled)
+_profiler = None
+
+
+def enable_profiling(interval_ms=None, max_stacks_per_span=500, max_overhead=0.01,
+                     span_types=None):
+    """
+    Start the sampling profiler. Spans that end while it runs carry a
+    collapsed-stack profile that is shipped with the trace.
+
+    interval_ms defaults to AGENTOPS_PROFILE_INTERVAL_MS or 20ms.
+    """
+    global _profiler
+    if interval_ms is None:
+        interval_ms = float(os.environ.get("AGENTOPS_PROFILE_INTERVAL_MS", "20"))
+    if _profiler is not None:
+        _profiler.stop()
+    _profiler = SamplingProfiler(
+        interval_ms=interval_ms,
+        max_stacks_per_span=max_stacks_per_span,
+        max_overhead=max_overhead,
+        span_types=span_types,
+    )
+    _profiler.start()
+    return _profiler
+
+
+def disable_profiling():
+    """Stop the sampling profiler"""
+    global _profiler
+    if _profiler is not None:
+        _profiler.stop()
+        _profiler = None
+
+
+def _reset_after_fork():
+    """The sampler thread does not survive fork; restart it in the child if it was on"""
+    global _profiler
+    parent = _profiler
+    _profiler = None
+    if parent is not None:
+        enable_profiling(
+            interval_ms=parent.base_interval_ms,
+            max_stacks_per_span=parent.max_stacks_per_span,
+            max_overhead=parent.max_overhead,
+            span_types=parent.span_types,
+        )
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_profiler():
+    """Return the running profiler, or None when profiling is disabled"""
+    return _profiler
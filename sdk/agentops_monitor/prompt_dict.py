@@ -0,0 +1,117 @@
+# What it does: Sends large repeated prompt segments (e.g. system instructions) once per process and project, then only their hash
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Set AGENTOPS_PROMPT_DEDUP=0 to always send prompts verbatim
+PROMPT_DEDUP = os.environ.get("AGENTOPS_PROMPT_DEDUP", "1").lower() not in ("0", "false", "no")
+# Segments shorter than this are sent inline
+SEGMENT_MIN_BYTES = int(os.environ.get("AGENTOPS_PROMPT_SEGMENT_MIN_BYTES", "1024"))
+# Known segments kept per process (least recently used are forgotten)
+MAX_SEGMENTS = 256
+
+
+def segment_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class PromptDictionary:
+    """
+    Dictionary of large prompt segments. Instrumentation registers text it
+    knows repeats across calls (system instructions); when a trace is queued,
+    encode() replaces occurrences in LLM call prompts with {"segment": hash}
+    parts. A segment's text rides along in the payload's "prompt_segments"
+    until a send carrying it succeeds for that API key (acknowledge()); after
+    that only the hash is sent. The backend rebuilds prompts on read.
+    """
+
+    def __init__(self, min_bytes=SEGMENT_MIN_BYTES, max_segments=MAX_SEGMENTS):
+        self.min_bytes = min_bytes
+        self.max_segments = max_segments
+        self._segments = OrderedDict()  # text -> hash
+        self._acked = {}                # api_key -> hashes stored by the backend
+        self._lock = threading.Lock()
+
+    def register(self, text):
+        """Remember a segment; its repr() form is registered too since prompts embed str(llm_request)"""
+        if not isinstance(text, str) or len(text) < self.min_bytes:
+            return
+        with self._lock:
+            for form in (text, repr(text)):
+                if form in self._segments:
+                    self._segments.move_to_end(form)
+                    continue
+                self._segments[form] = segment_hash(form)
+                while len(self._segments) > self.max_segments:
+                    self._segments.popitem(last=False)
+
+    def _split(self, prompt, segments):
+        """Prompt -> list of {"text": ...} / {"segment": hash} parts, or None if no segment occurs"""
+        parts = [prompt]
+        used = False
+        for text, digest in segments:
+            split_parts = []
+            for part in parts:
+                if not isinstance(part, str) or text not in part:
+                    split_parts.append(part)
+                    continue
+                used = True
+                for i, piece in enumerate(part.split(text)):
+                    if i:
+                        split_parts.append({"segment": digest})
+                    if piece:
+                        split_parts.append(piece)
+            parts = split_parts
+        if not used:
+            return None
+        return [{"text": part} if isinstance(part, str) else part for part in parts]
+
+    def encode(self, llm_calls, api_key):
+        """
+        Returns (llm_calls, definitions): llm_calls with prompts replaced by
+        prompt_parts where segments occur (the input dicts are not modified)
+        and the {hash: text} definitions the payload must carry; acknowledge
+        their hashes once the payload is delivered.
+        """
+        with self._lock:
+            if not self._segments:
+                return llm_calls, {}
+            # Longest first so a segment's repr() form wins over text it contains
+            segments = sorted(self._segments.items(), key=lambda item: len(item[0]), reverse=True)
+            acked = set(self._acked.get(api_key, ()))
+        texts = {digest: text for text, digest in segments}
+
+        encoded = {}
+        definitions = {}
+        for span_id, llm_call in llm_calls.items():
+            prompt = llm_call.get("prompt")
+            parts = self._split(prompt, segments) if prompt and len(prompt) >= self.min_bytes else None
+            if parts is None:
+                encoded[span_id] = llm_call
+                continue
+            for part in parts:
+                digest = part.get("segment")
+                if digest and digest not in acked and digest not in definitions:
+                    definitions[digest] = texts[digest]
+            encoded[span_id] = {**llm_call, "prompt": None, "prompt_parts": parts}
+        return encoded, definitions
+
+    def acknowledge(self, api_key, hashes):
+        """The backend stored these segments for api_key's project"""
+        with self._lock:
+            self._acked.setdefault(api_key, set()).update(hashes)
+
+
+_dictionary = PromptDictionary()
+
+
+def get_prompt_dictionary():
+    return _dictionary
+
+
+def register_segment(text):
+    """Mark text (e.g. an agent's system instruction) as a repeated prompt segment"""
+    if PROMPT_DEDUP:
+        _dictionary.register(text)
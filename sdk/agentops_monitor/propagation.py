@@ -0,0 +1,99 @@
+# What it does: W3C traceparent propagation so remote agents' spans join the caller's trace
+
+import re
+import contextvars
+from contextlib import contextmanager
+
+from .context import get_trace, current_span_id
+from .tracer import to_otlp_trace_id, to_otlp_span_id
+
+TRACEPARENT = "traceparent"
+
+_TRACEPARENT_RE = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+# Remote parent for the next trace started in this context (set by attach())
+_remote_parent = contextvars.ContextVar("agentops_remote_parent", default=None)
+
+
+def format_traceparent(trace_id, span_id, sampled=True):
+    """traceparent header value for an SDK trace/span"""
+    return f"00-{to_otlp_trace_id(trace_id)}-{to_otlp_span_id(span_id)}-{'01' if sampled else '00'}"
+
+
+def parse_traceparent(value):
+    """
+    Parse a traceparent header into (trace_id, parent_span_id) in SDK id form,
+    or None if it is missing or invalid
+    """
+    if not value:
+        return None
+    match = _TRACEPARENT_RE.match(value.strip().lower())
+    if not match:
+        return None
+    version, trace_hex, span_hex, _ = match.groups()
+    if version == "ff" or trace_hex == "0" * 32 or span_hex == "0" * 16:
+        return None
+    # Zero-padded ids were generated by this SDK (trace_<16 hex>)
+    trace_id = f"trace_{trace_hex[16:]}" if trace_hex.startswith("0" * 16) else f"trace_{trace_hex}"
+    return trace_id, f"span_{span_hex}"
+
+
+def current_traceparent(span_id=None):
+    """traceparent for the current trace; span_id defaults to the innermost open span on this thread/task"""
+    trace = get_trace()
+    if not trace:
+        return None
+    if span_id is None:
+        span_id = current_span_id()
+    if not span_id:
+        return None
+    return format_traceparent(trace["trace_id"], span_id)
+
+
+def inject(carrier, span_id=None):
+    """Add a traceparent entry to a dict of headers/metadata; returns the carrier"""
+    traceparent = current_traceparent(span_id)
+    if traceparent:
+        carrier[TRACEPARENT] = traceparent
+    return carrier
+
+
+def extract(carrier):
+    """(trace_id, parent_span_id) from a dict of headers/metadata, or None"""
+    if not carrier:
+        return None
+    for key, value in carrier.items():
+        if isinstance(key, str) and key.lower() == TRACEPARENT:
+            return parse_traceparent(value)
+    return None
+
+
+def attach(carrier_or_traceparent):
+    """
+    Make the next trace started in this context join a remote caller's trace.
+    Accepts a traceparent string or a headers/metadata dict; returns a token for detach().
+    """
+    if isinstance(carrier_or_traceparent, str):
+        remote = parse_traceparent(carrier_or_traceparent)
+    else:
+        remote = extract(carrier_or_traceparent)
+    return _remote_parent.set(remote)
+
+
+def detach(token):
+    _remote_parent.reset(token)
+
+
+@contextmanager
+def remote_parent(carrier_or_traceparent):
+    """Context manager form of attach()/detach() for A2A server handlers"""
+    token = attach(carrier_or_traceparent)
+    try:
+        yield
+    finally:
+        detach(token)
+
+
+def current_remote_parent():
+    """Remote (trace_id, parent_span_id) attached to this context, if any"""
+    return _remote_parent.get()
@@ -0,0 +1,99 @@
+# What it does: Tracks which agents/tools/runners are instrumented so wrapping is idempotent and reversible
+
+import threading
+import weakref
+
+# Marker for an attribute that only existed on the class (restoring deletes the instance override)
+UNSET = object()
+
+# id(instrumented object) -> (weak reference to it, {attribute: original value or UNSET}).
+# Keyed by id because agents are pydantic models (unhashable); the weak
+# reference drops the entry when the object is collected and tells a reused id apart.
+_originals = {}
+_lock = threading.RLock()
+
+
+def original_attr(obj, name):
+    """Current instance value of an attribute, or UNSET if it comes from the class"""
+    try:
+        return vars(obj).get(name, UNSET)
+    except TypeError:  # no __dict__ (slots)
+        return getattr(obj, name, UNSET)
+
+
+def _forget(key, ref):
+    with _lock:
+        entry = _originals.get(key)
+        if entry is not None and entry[0] is ref:
+            del _originals[key]
+
+
+def _reference(obj):
+    key = id(obj)
+    try:
+        return weakref.ref(obj, lambda ref: _forget(key, ref))
+    except TypeError:
+        # Can't be weakly referenced (__slots__ without __weakref__): hold it instead
+        return lambda: obj
+
+
+def is_instrumented(obj):
+    with _lock:
+        entry = _originals.get(id(obj))
+        return entry is not None and entry[0]() is obj
+
+
+def register(obj, originals):
+    """
+    Record the original attributes of an object about to be instrumented.
+    Returns False (and records nothing) if it is already instrumented, so
+    callers can use it as the idempotency check.
+    """
+    with _lock:
+        if is_instrumented(obj):
+            return False
+        _originals[id(obj)] = (_reference(obj), dict(originals))
+        return True
+
+
+def restore(obj):
+    """Put back the attributes recorded by register(); returns False if obj wasn't instrumented"""
+    with _lock:
+        if not is_instrumented(obj):
+            return False
+        originals = _originals.pop(id(obj))[1]
+    for name, value in originals.items():
+        if value is UNSET:
+            try:
+                delattr(obj, name)
+            except AttributeError:
+                pass
+        else:
+            setattr(obj, name, value)
+    return True
+
+
+def nested_agent(tool):
+    """Agent behind an AgentTool, or None for regular tools"""
+    return getattr(tool, "agent", None) or getattr(tool, "_agent", None)
+
+
+def unmonitor(obj, _seen=None):
+    """
+    Remove AgentOps instrumentation from an agent, tool or runner, restoring
+    its original callbacks/methods. For agents this also walks the tools and
+    agent tools monitor_agent() instrumented (including ones shared with other
+    agents). Returns the object.
+    """
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return obj
+    seen.add(id(obj))
+
+    restore(obj)
+    for tool in getattr(obj, "tools", None) or []:
+        agent = nested_agent(tool)
+        if agent is not None:
+            unmonitor(agent, seen)
+        unmonitor(tool, seen)
+    return obj
@@ -0,0 +1,190 @@
+# What it does: Caps spans per trace by folding repeated spans into summary spans
+
+import os
+import random
+import uuid
+from collections import Counter, deque
+from datetime import datetime
+
+# Spans kept verbatim per trace before repeated spans start being folded (0 disables folding)
+MAX_SPANS_PER_TRACE = int(os.environ.get("AGENTOPS_MAX_SPANS_PER_TRACE", "2000"))
+# First and last N occurrences of each (name, parent) group that are always kept
+KEEP_EDGE_SPANS = int(os.environ.get("AGENTOPS_SPAN_KEEP_EDGES", "5"))
+
+# Durations kept per group for percentiles (reservoir sample)
+RESERVOIR_SIZE = 1024
+
+
+def _duration_ms(span):
+    if not span.get("end_time"):
+        return 0.0
+    delta = datetime.fromisoformat(span["end_time"]) - datetime.fromisoformat(span["start_time"])
+    return delta.total_seconds() * 1000
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class _Group:
+    """Occurrences of one (name, parent_span_id) pair within a trace"""
+
+    __slots__ = ("count", "errors", "tail", "summary", "folded", "total_ms",
+                 "min_ms", "max_ms", "durations", "input_tokens", "output_tokens")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.tail = deque()
+        self.summary = None
+        self.folded = 0
+        self.total_ms = 0.0
+        self.min_ms = None
+        self.max_ms = 0.0
+        self.durations = []
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def add_duration(self, duration_ms):
+        self.total_ms += duration_ms
+        self.min_ms = duration_ms if self.min_ms is None else min(self.min_ms, duration_ms)
+        self.max_ms = max(self.max_ms, duration_ms)
+        if len(self.durations) < RESERVOIR_SIZE:
+            self.durations.append(duration_ms)
+        else:
+            slot = random.randrange(self.folded)
+            if slot < RESERVOIR_SIZE:
+                self.durations[slot] = duration_ms
+
+
+class SpanBudget:
+    """
+    Per-trace span budget. Spans are checked when they end: once the trace
+    holds more than max_spans spans, finished leaf spans that repeat the
+    same name under the same parent are folded into one summary span per
+    group (count, duration total/min/max/p50/p95/p99, error count). Spans
+    with errors, spans with children, and the first and last `keep`
+    occurrences of each group are always kept verbatim.
+    """
+
+    def __init__(self, max_spans=MAX_SPANS_PER_TRACE, keep=KEEP_EDGE_SPANS):
+        self.max_spans = max_spans
+        self.keep = keep
+        self.children = Counter()  # span_id -> number of child spans
+        self.groups = {}           # (name, parent_span_id) -> _Group
+        self.folded = 0            # spans folded so far
+        self._removed = set()      # folded span ids still in the span list
+
+    def on_start(self, span):
+        if span.get("parent_span_id"):
+            self.children[span["parent_span_id"]] += 1
+
+    def on_end(self, span, spans, llm_calls, tool_calls):
+        """Keep or fold a span that just ended; spans/llm_calls/tool_calls are the trace's collections"""
+        if self.max_spans <= 0:
+            return
+        group = self.groups.get((span["name"], span.get("parent_span_id")))
+        if group is None:
+            group = self.groups[(span["name"], span.get("parent_span_id"))] = _Group()
+        group.count += 1
+        if span.get("error"):
+            group.errors += 1
+            return
+        if group.count <= self.keep or self.children[span["span_id"]]:
+            return
+        if not group.tail and len(spans) - len(self._removed) <= self.max_spans:
+            return
+        # Over budget: the newest occurrences wait in the tail, older ones are folded
+        group.tail.append(span)
+        if len(group.tail) > self.keep:
+            self._fold(group, group.tail.popleft(), spans, llm_calls, tool_calls)
+
+    def _fold(self, group, span, spans, llm_calls, tool_calls):
+        if self.children[span["span_id"]]:
+            # Gained a child (e.g. merged from a subprocess) after ending; keep it
+            return
+        group.folded += 1
+        self.folded += 1
+        group.add_duration(_duration_ms(span))
+        llm_call = llm_calls.pop(span["span_id"], None)
+        tool_calls.pop(span["span_id"], None)
+        if llm_call:
+            group.input_tokens += llm_call.get("input_tokens") or 0
+            group.output_tokens += llm_call.get("output_tokens") or 0
+
+        if group.summary is None:
+            group.summary = {
+                "span_id": f"span_{uuid.uuid4().hex[:16]}",
+                "trace_id": span["trace_id"],
+                "parent_span_id": span.get("parent_span_id"),
+                "name": span["name"],
+                "type": span["type"],
+                "start_time": span["start_time"],
+                "end_time": span.get("end_time") or span["start_time"],
+                "inputs": {},
+                "outputs": {},
+                "meta": {},
+                "error": None,
+            }
+            spans.append(group.summary)
+            if llm_call:
+                llm_calls[group.summary["span_id"]] = {
+                    "model_name": llm_call.get("model_name"),
+                    "provider": llm_call.get("provider"),
+                    "input_tokens": 0,
+                    "output_tokens": 0,
+                    "prompt": None,
+                    "response": None,
+                }
+            elif span["type"] == "tool_call":
+                tool_calls[group.summary["span_id"]] = {
+                    "tool_name": span["name"],
+                    "tool_inputs": {},
+                    "tool_outputs": {},
+                    "error": None,
+                }
+        summary = group.summary
+        summary["start_time"] = min(summary["start_time"], span["start_time"])
+        summary["end_time"] = max(summary["end_time"], span.get("end_time") or span["start_time"])
+
+        self._removed.add(span["span_id"])
+        if len(self._removed) > len(spans) // 2:
+            self._compact(spans)
+
+    def _compact(self, spans):
+        spans[:] = [span for span in spans if span["span_id"] not in self._removed]
+        self._removed.clear()
+
+    def finish(self, spans, llm_calls, tool_calls):
+        """Drop folded spans and fill in summary stats; call once when the trace ends"""
+        if self._removed:
+            self._compact(spans)
+        for group in self.groups.values():
+            if group.summary is None:
+                continue
+            durations = sorted(group.durations)
+            group.summary["meta"]["span_summary"] = {
+                "count": group.folded,
+                "occurrences": group.count,
+                "error_count": group.errors,
+                "duration_ms": {
+                    "total": round(group.total_ms, 3),
+                    "min": round(group.min_ms or 0.0, 3),
+                    "max": round(group.max_ms, 3),
+                    "p50": round(_percentile(durations, 0.50), 3),
+                    "p95": round(_percentile(durations, 0.95), 3),
+                    "p99": round(_percentile(durations, 0.99), 3),
+                },
+            }
+            group.summary["outputs"] = {"folded_spans": group.folded}
+            llm_call = llm_calls.get(group.summary["span_id"])
+            if llm_call:
+                llm_call["input_tokens"] = group.input_tokens
+                llm_call["output_tokens"] = group.output_tokens
+            tool_call = tool_calls.get(group.summary["span_id"])
+            if tool_call:
+                tool_call["tool_outputs"] = {"folded_calls": group.folded}
+        return {"spans_folded": self.folded} if self.folded else {}
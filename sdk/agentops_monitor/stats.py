@@ -0,0 +1,86 @@
+# What it does: Counters and histograms describing the health of the trace transport
+
+import bisect
+import threading
+import time
+
+# Upper bounds (ms) of the send latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class TransportStats:
+    """Thread-safe transport counters, read via AgentOpsClient.stats()"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.enqueued = 0
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.dropped_by_reason = {}
+        self.retries = 0
+        self.throttled = 0
+        self.bytes_uncompressed = 0
+        self.bytes_compressed = 0
+        self.latency_counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.latency_sum_ms = 0.0
+
+    def record_enqueued(self):
+        with self._lock:
+            self.enqueued += 1
+
+    def record_dropped(self, count=1, reason="queue_full"):
+        with self._lock:
+            self.dropped += count
+            self.dropped_by_reason[reason] = self.dropped_by_reason.get(reason, 0) + count
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def record_send(self, ok, latency_ms, raw_bytes, wire_bytes, throttled=False):
+        """throttled: the backend asked us to back off (429/503) and the trace was requeued"""
+        with self._lock:
+            if ok:
+                self.sent += 1
+            elif throttled:
+                self.throttled += 1
+            else:
+                self.failed += 1
+            self.bytes_uncompressed += raw_bytes
+            self.bytes_compressed += wire_bytes
+            self.latency_counts[bisect.bisect_left(LATENCY_BUCKETS_MS, latency_ms)] += 1
+            self.latency_sum_ms += latency_ms
+
+    def snapshot(self, **extra):
+        """Return a plain dict of all counters plus any extra gauges"""
+        with self._lock:
+            attempts = sum(self.latency_counts)
+            buckets = [
+                {"le_ms": bound, "count": count}
+                for bound, count in zip(LATENCY_BUCKETS_MS + (None,), self.latency_counts)
+            ]
+            stats = {
+                "uptime_s": round(time.time() - self.started_at, 3),
+                "enqueued": self.enqueued,
+                "sent": self.sent,
+                "failed": self.failed,
+                "dropped": self.dropped,
+                "dropped_by_reason": dict(self.dropped_by_reason),
+                "retries": self.retries,
+                "throttled": self.throttled,
+                "bytes_uncompressed": self.bytes_uncompressed,
+                "bytes_compressed": self.bytes_compressed,
+                "compression_ratio": (
+                    round(self.bytes_uncompressed / self.bytes_compressed, 3)
+                    if self.bytes_compressed else None
+                ),
+                "send_latency_ms": {
+                    "count": attempts,
+                    "avg": round(self.latency_sum_ms / attempts, 3) if attempts else None,
+                    "buckets": buckets,
+                },
+            }
+        stats.update(extra)
+        return stats
@@ -8,20 +8,61 @@ What it does:
 """
 
 import uuid
+import socket
+import hashlib
 from datetime import datetime
 from .context import (
     set_trace, set_spans, get_spans, set_calls, get_calls, get_trace,
-    add_llm_call_to_context, add_tool_call_to_context
+    add_llm_call_to_context, add_tool_call_to_context,
+    push_active_span, pop_active_span, current_span_id, open_span_ids,
+    open_span, close_span, apply_span_budget, finish_spans
 )
+from .profiler import get_profiler
+from .overhead import measure_overhead, overhead_meta, SPAN_BOOKKEEPING
 
 
-def new_trace(name, meta, tags=None):
-    trace_id = f"trace_{uuid.uuid4().hex[:16]}"
+def _id_hex(value, prefix, length):
+    """Hex part of an SDK id, or a stable hash for ids the SDK didn't generate"""
+    if value and value.startswith(prefix):
+        hex_part = value[len(prefix):]
+        if len(hex_part) <= length:
+            try:
+                int(hex_part, 16)
+                return hex_part.rjust(length, "0")
+            except ValueError:
+                pass
+    return hashlib.sha256(str(value).encode()).hexdigest()[:length]
+
+
+def to_otlp_trace_id(trace_id):
+    """"trace_<16 hex>" -> 32-hex OTLP trace id (left-padded with zeros)"""
+    return _id_hex(trace_id, "trace_", 32)
+
+
+def to_otlp_span_id(span_id):
+    """"span_<16 hex>" -> 16-hex OTLP span id"""
+    return _id_hex(span_id, "span_", 16) if span_id else ""
+
+
+def new_trace(name, meta, tags=None, remote_parent=None):
+    """
+    Start a trace. remote_parent=(trace_id, span_id) from an incoming
+    traceparent makes this trace a fragment of the caller's trace: it reuses
+    the caller's trace_id and its top-level spans hang off the caller's span.
+    """
+    meta = meta or {}
+    # Lets the backend tell cross-host fragments (clock skew) from same-host ones
+    meta["fragment_host"] = socket.gethostname()
+    if remote_parent:
+        trace_id, parent_span_id = remote_parent
+        meta["remote_parent_span_id"] = parent_span_id
+    else:
+        trace_id = f"trace_{uuid.uuid4().hex[:16]}"
     trace = {
         "trace_id": trace_id,
         "name": name,
         "start_time": datetime.utcnow().isoformat(),
-        "meta": meta or {},
+        "meta": meta,
         "tags": tags or [],
     }
     set_trace(trace)
@@ -39,6 +80,19 @@ def end_trace(end_time=None, meta=None):
     if meta:
         trace["meta"].update(meta)
     
+    with measure_overhead(SPAN_BOOKKEEPING):
+        # Spans that never ended (e.g. a model error without an after-callback) stop being active
+        profiler = get_profiler()
+        for span_id in open_span_ids():
+            pop_active_span(span_id)
+            if profiler:
+                profiler.pop_profile(span_id)
+        # Fold repeated spans past the per-trace span budget into summaries
+        trace["meta"].update(finish_spans())
+
+    # Record how much time the SDK itself spent on this trace
+    trace["meta"].update(overhead_meta())
+    
     # Get all collected data
     spans = get_spans()
     llm_calls, tool_calls = get_calls()
@@ -49,74 +103,90 @@ def end_trace(end_time=None, meta=None):
 def add_span(
     name, type, meta, parent_span_id=None, inputs=None, outputs=None, error=None
 ):
-    # Check if trace exists, if not return None (monitoring not active)
-    trace = get_trace()
-    if not trace:
-        return None
+    with measure_overhead(SPAN_BOOKKEEPING):
+        # Check if trace exists, if not return None (monitoring not active)
+        trace = get_trace()
+        if not trace:
+            return None
     
-    span_id = f"span_{uuid.uuid4().hex[:16]}"
-    span = {
-        "span_id": span_id,
-        "trace_id": trace["trace_id"],
-        "parent_span_id": parent_span_id,
-        "name": name,
-        "type": type,
-        "start_time": datetime.utcnow().isoformat(),
-        "inputs": inputs or {},
-        "outputs": outputs or {},
-        "meta": meta or {},
-        "error": error,
-    }
-    spans = get_spans()
-    spans.append(span)
-    set_spans(spans)
-    return span_id
+        span_id = f"span_{uuid.uuid4().hex[:16]}"
+        if parent_span_id is None:
+            # Nest under the innermost span open in this trace on this thread/task;
+            # top-level spans of a remote fragment belong under the caller's span
+            parent_span_id = current_span_id() or trace["meta"].get("remote_parent_span_id")
+        span = {
+            "span_id": span_id,
+            "trace_id": trace["trace_id"],
+            "parent_span_id": parent_span_id,
+            "name": name,
+            "type": type,
+            "start_time": datetime.utcnow().isoformat(),
+            "inputs": inputs or {},
+            "outputs": outputs or {},
+            "meta": meta or {},
+            "error": error,
+        }
+        open_span(span)
+        push_active_span(span_id, type)
+        return span_id
 
 
 def end_span(span_id, outputs=None, error=None, meta=None):
-    # If span_id is None, monitoring wasn't active when span was created
-    if not span_id:
-        return
+    with measure_overhead(SPAN_BOOKKEEPING):
+        # If span_id is None, monitoring wasn't active when span was created
+        if not span_id:
+            return
     
-    spans = get_spans()
-    for span in spans:
-        if span["span_id"] == span_id:
-            span["end_time"] = datetime.utcnow().isoformat()
-            if outputs:
-                span["outputs"] = outputs
-            if meta:
-                span["meta"].update(meta)
-            if error:
-                span["error"] = error
-            break
+        pop_active_span(span_id)
+        profiler = get_profiler()
+    
+        span = close_span(span_id)
+        if span is None:
+            if profiler:
+                profiler.pop_profile(span_id)
+            return
+        span["end_time"] = datetime.utcnow().isoformat()
+        if outputs:
+            span["outputs"] = outputs
+        if meta:
+            span["meta"].update(meta)
+        if error:
+            span["error"] = error
+        if profiler:
+            profile = profiler.pop_profile(span_id)
+            if profile and profiler.tracks(span["type"]):
+                span["profile"] = profile
+        apply_span_budget(span)
 
 
 def add_llm_call(span_id, model_name, provider, prompt=None, response=None, 
                  input_tokens=0, output_tokens=0):
     """Create an LLM call record associated with a span"""
-    if not span_id:
-        return
+    with measure_overhead(SPAN_BOOKKEEPING):
+        if not span_id:
+            return
     
-    llm_data = {
-        "model_name": model_name,
-        "provider": provider,
-        "input_tokens": input_tokens,
-        "output_tokens": output_tokens,
-        "prompt": prompt,
-        "response": response,
-    }
-    add_llm_call_to_context(span_id, llm_data)
+        llm_data = {
+            "model_name": model_name,
+            "provider": provider,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "prompt": prompt,
+            "response": response,
+        }
+        add_llm_call_to_context(span_id, llm_data)
 
 
 def add_tool_call(span_id, tool_name, tool_inputs, tool_outputs=None, error=None):
     """Create a tool call record associated with a span"""
-    if not span_id:
-        return
+    with measure_overhead(SPAN_BOOKKEEPING):
+        if not span_id:
+            return
     
-    tool_data = {
-        "tool_name": tool_name,
-        "tool_inputs": tool_inputs,
-        "tool_outputs": tool_outputs or {},
-        "error": error,
-    }
-    add_tool_call_to_context(span_id, tool_data)
+        tool_data = {
+            "tool_name": tool_name,
+            "tool_inputs": tool_inputs,
+            "tool_outputs": tool_outputs or {},
+            "error": error,
+        }
+        add_tool_call_to_context(span_id, tool_data)